@@ -0,0 +1,310 @@
+"""
+Benchmarks of the resolution and packaging phases on synthetic projects.
+
+    python -m benchmarks.run_benchmarks run -s small -s medium -r 5
+    python -m benchmarks.run_benchmarks compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+    python -m benchmarks.run_benchmarks memory -f 60000
+"""
+
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Callable, Tuple
+
+import click
+from asciitree import LeftAligned
+
+from .synthetic_project import SyntheticProjectParameters, SyntheticProject, generate_synthetic_project, generate_synthetic_layer
+
+
+BENCHMARKS_DIRPATH = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRPATH = os.path.dirname(BENCHMARKS_DIRPATH)
+if REPOSITORY_DIRPATH not in sys.path:
+    sys.path.insert(0, REPOSITORY_DIRPATH)
+
+from serverlesspack.imports_resolver import Resolver
+from serverlesspack.packager import (
+    package_files, files_to_zip, files_to_folder, recursive_get_files_in_layer_folder, iter_files_in_layer_folder,
+    LocalFileItem, ContentFileItem
+)
+
+
+SCENARIOS: Dict[str, SyntheticProjectParameters] = {
+    'small': SyntheticProjectParameters(
+        modules_count=50, imports_fan_out=2, depth=4, packages_nesting=1,
+        distributions_count=3, distribution_modules_count=10
+    ),
+    'medium': SyntheticProjectParameters(
+        modules_count=400, imports_fan_out=3, depth=8, packages_nesting=2,
+        distributions_count=15, distribution_modules_count=40
+    ),
+    'large': SyntheticProjectParameters(
+        modules_count=2000, imports_fan_out=4, depth=12, packages_nesting=3,
+        distributions_count=40, distribution_modules_count=100
+    ),
+}
+PHASES_NAMES = ['resolver_init', 'resolver_process_file', 'package_files', 'files_to_zip', 'files_to_folder']
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_DIRPATH,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        )
+        return result.stdout.decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def unload_synthetic_modules(project: SyntheticProject):
+    """The Resolver imports the modules it resolves, so they need to be removed from sys.modules between the runs,
+    otherwise every run after the first one would measure imports that are already cached."""
+    top_level_modules_names = set(project.top_level_modules_names)
+    for module_name in list(sys.modules.keys()):
+        if module_name.split('.')[0] in top_level_modules_names:
+            del sys.modules[module_name]
+
+def run_scenario_once(project: SyntheticProject, output_dirpath: str) -> Tuple[Dict[str, float], Dict[str, int]]:
+    durations: Dict[str, float] = dict()
+
+    def timed(phase_name: str, function: Callable):
+        start = time.perf_counter()
+        result = function()
+        durations[phase_name] = time.perf_counter() - start
+        return result
+
+    unload_synthetic_modules(project=project)
+    resolver: Resolver = timed('resolver_init', lambda: Resolver(root_filepath=project.root_filepath, target_os='linux'))
+    timed('resolver_process_file', lambda: resolver.process_file(project.root_filepath))
+    code_files = timed('package_files', lambda: package_files(
+        included_files_absolute_paths=resolver.included_files_absolute_paths,
+        output_base_dirpath=project.project_dirpath
+    ))
+    local_files_items: List[LocalFileItem] = [
+        *code_files[0],
+        *recursive_get_files_in_layer_folder(source_dirpath=project.site_packages_dirpath, base_layer_dirpath="python")
+    ]
+    content_files_items: List[ContentFileItem] = code_files[1]
+    timed('files_to_zip', lambda: files_to_zip(
+        root_path=output_dirpath, destination_file_key="build",
+        local_files_items=local_files_items, content_files_items=content_files_items
+    ))
+    timed('files_to_folder', lambda: files_to_folder(
+        root_path=output_dirpath, destination_dirname="build",
+        local_files_items=local_files_items, content_files_items=content_files_items
+    ))
+    counts: Dict[str, int] = {
+        'included_files': len(resolver.included_files_absolute_paths),
+        'included_dependencies': len(resolver.included_dependencies_names),
+        'packaged_files': len(local_files_items) + len(content_files_items),
+    }
+    return durations, counts
+
+def run_scenario(name: str, parameters: SyntheticProjectParameters, repeats: int, working_dirpath: str) -> dict:
+    project: SyntheticProject = generate_synthetic_project(dirpath=os.path.join(working_dirpath, name), parameters=parameters)
+    output_dirpath: str = os.path.join(working_dirpath, name, "dist")
+    os.makedirs(output_dirpath, exist_ok=True)
+
+    sys.path.insert(0, project.project_dirpath)
+    sys.path.insert(0, project.site_packages_dirpath)
+    samples: Dict[str, List[float]] = {phase_name: [] for phase_name in PHASES_NAMES}
+    counts: Dict[str, int] = dict()
+    try:
+        with open(os.devnull, 'w') as devnull:
+            for _ in range(repeats):
+                # The progress bars and messages are still rendered, in order to include their cost like in a real
+                # build, but they are redirected to avoid flooding the output of the benchmarks.
+                with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                    durations, counts = run_scenario_once(project=project, output_dirpath=output_dirpath)
+                for phase_name, duration in durations.items():
+                    samples[phase_name].append(duration)
+    finally:
+        sys.path.remove(project.project_dirpath)
+        sys.path.remove(project.site_packages_dirpath)
+        unload_synthetic_modules(project=project)
+
+    return {
+        'parameters': parameters.to_dict(),
+        'counts': counts,
+        'phases': {
+            phase_name: {
+                'median_seconds': statistics.median(phase_samples),
+                'min_seconds': min(phase_samples),
+                'samples_seconds': phase_samples,
+            } for phase_name, phase_samples in samples.items()
+        }
+    }
+
+def print_results(results: dict):
+    print(LeftAligned()({f"Benchmarks of commit {results['commit']}": {
+        f"{scenario_name} ({scenario['counts'].get('included_files')} files resolved, {scenario['counts'].get('packaged_files')} files packaged)": {
+            f"{phase_name} : median {phase['median_seconds'] * 1000:.1f} ms, min {phase['min_seconds'] * 1000:.1f} ms": {}
+            for phase_name, phase in scenario['phases'].items()
+        } for scenario_name, scenario in results['scenarios'].items()
+    }}))
+
+
+@click.group()
+def benchmarks_cli():
+    pass
+
+@benchmarks_cli.command(name='run')
+@click.option('-s', '--scenario', 'scenarios_names', multiple=True, type=click.Choice(list(SCENARIOS.keys())), default=['small', 'medium'])
+@click.option('-r', '--repeats', type=int, default=5)
+@click.option('-o', '--output_filepath', type=click.Path(), required=False)
+@click.option('--modules_count', type=int, required=False, help="Override the modules count of the selected scenarios")
+@click.option('--imports_fan_out', type=int, required=False)
+@click.option('--depth', type=int, required=False)
+@click.option('--packages_nesting', type=int, required=False)
+@click.option('--distributions_count', type=int, required=False)
+@click.option('--distribution_modules_count', type=int, required=False)
+def run_cli(scenarios_names: List[str], repeats: int, output_filepath: Optional[str] = None, **parameters_overrides):
+    commit: Optional[str] = get_git_commit()
+    results: dict = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'repeats': repeats,
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as working_dirpath:
+        for scenario_name in scenarios_names:
+            parameters: SyntheticProjectParameters = SyntheticProjectParameters(**{
+                **SCENARIOS[scenario_name].to_dict(),
+                **{key: value for key, value in parameters_overrides.items() if value is not None}
+            })
+            click.echo(f"Running scenario {scenario_name}...")
+            results['scenarios'][scenario_name] = run_scenario(
+                name=scenario_name, parameters=parameters, repeats=repeats, working_dirpath=working_dirpath
+            )
+
+    if output_filepath is None:
+        output_filepath = os.path.join(BENCHMARKS_DIRPATH, "results", f"{(commit or 'uncommitted')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_filepath)), exist_ok=True)
+    with open(output_filepath, 'w+') as output_file:
+        output_file.write(json.dumps(results, indent=2))
+    print_results(results=results)
+    click.secho(f"Benchmarks results available at {os.path.abspath(output_filepath)}", fg='green')
+
+@benchmarks_cli.command(name='compare')
+@click.argument('baseline_filepath', type=click.Path(exists=True))
+@click.argument('current_filepath', type=click.Path(exists=True))
+@click.option('-t', '--threshold', type=float, default=0.1, help="Relative slowdown of a phase median considered as a regression")
+@click.option('-f', '--fail_on_regression', type=bool, default=False)
+def compare_cli(baseline_filepath: str, current_filepath: str, threshold: float = 0.1, fail_on_regression: bool = False):
+    with open(baseline_filepath, 'r') as baseline_file:
+        baseline: dict = json.load(baseline_file)
+    with open(current_filepath, 'r') as current_file:
+        current: dict = json.load(current_file)
+
+    regressions: List[str] = list()
+    tree: Dict[str, dict] = dict()
+    for scenario_name, scenario in current['scenarios'].items():
+        baseline_scenario: Optional[dict] = baseline['scenarios'].get(scenario_name, None)
+        if baseline_scenario is None:
+            continue
+        if baseline_scenario['parameters'] != scenario['parameters']:
+            click.secho(f"The parameters of the scenario {scenario_name} differ between both results", fg='yellow')
+        scenario_tree: Dict[str, dict] = dict()
+        for phase_name, phase in scenario['phases'].items():
+            baseline_phase: Optional[dict] = baseline_scenario['phases'].get(phase_name, None)
+            if baseline_phase is None or baseline_phase['median_seconds'] == 0:
+                continue
+            ratio: float = phase['median_seconds'] / baseline_phase['median_seconds']
+            is_regression: bool = ratio > 1 + threshold
+            if is_regression:
+                regressions.append(f"{scenario_name}.{phase_name}")
+            scenario_tree[(
+                f"{phase_name} : {baseline_phase['median_seconds'] * 1000:.1f} ms -> {phase['median_seconds'] * 1000:.1f} ms "
+                f"({(ratio - 1) * 100:+.1f}%){' REGRESSION' if is_regression else ''}"
+            )] = {}
+        tree[scenario_name] = scenario_tree
+
+    print(LeftAligned()({f"Comparison of {baseline['commit']} -> {current['commit']}": tree}))
+    if len(regressions) > 0:
+        click.secho(f"{len(regressions)} phases slower by more than {threshold * 100:.0f}% : {', '.join(regressions)}", fg='red')
+        if fail_on_regression is True:
+            sys.exit(1)
+
+
+MEMORY_MODES = ['baseline', 'items_list', 'zip_from_list', 'zip_from_generator']
+
+def get_peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        # The resource module is not available on Windows.
+        return None
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The max RSS is expressed in bytes on macOS, and in kilobytes on Linux.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+@benchmarks_cli.command(name='memory-worker', hidden=True)
+@click.option('--mode', type=click.Choice(MEMORY_MODES), required=True)
+@click.option('--layer_dirpath', type=click.Path(exists=True), required=True)
+@click.option('--output_dirpath', type=click.Path(), required=True)
+def memory_worker_cli(mode: str, layer_dirpath: str, output_dirpath: str):
+    """Run a single mode in its own process, since the peak RSS of a process can only grow."""
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        if mode == 'items_list':
+            local_files_items = recursive_get_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath="python")
+        elif mode == 'zip_from_list':
+            local_files_items = recursive_get_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath="python")
+            files_to_zip(output_dirpath, 'lambda_layer', local_files_items, [])
+        elif mode == 'zip_from_generator':
+            files_to_zip(output_dirpath, 'lambda_layer', iter_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath="python"), [])
+    print(json.dumps({'peak_rss_bytes': get_peak_rss_bytes(), 'duration_seconds': time.perf_counter() - start}))
+
+@benchmarks_cli.command(name='memory')
+@click.option('-f', '--files_count', type=int, default=60000)
+@click.option('-o', '--output_filepath', type=click.Path(), required=False)
+def memory_cli(files_count: int, output_filepath: Optional[str] = None):
+    commit: Optional[str] = get_git_commit()
+    results: dict = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'files_count': files_count,
+        'modes': {},
+    }
+    with tempfile.TemporaryDirectory() as working_dirpath:
+        click.echo(f"Generating a layer of {files_count} files...")
+        layer_dirpath: str = generate_synthetic_layer(dirpath=os.path.join(working_dirpath, "layer"), files_count=files_count)
+        for mode in MEMORY_MODES:
+            result = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.run_benchmarks', 'memory-worker', '--mode', mode,
+                 '--layer_dirpath', layer_dirpath, '--output_dirpath', working_dirpath],
+                cwd=REPOSITORY_DIRPATH, stdout=subprocess.PIPE, check=True
+            )
+            results['modes'][mode] = json.loads(result.stdout.decode('utf-8').strip().splitlines()[-1])
+
+    baseline_rss_bytes: Optional[int] = results['modes']['baseline']['peak_rss_bytes']
+    print(LeftAligned()({f"Peak RSS on a layer of {files_count} files (commit {commit})": {
+        (
+            f"{mode} : {mode_result['peak_rss_bytes'] / 1024 / 1024:.1f} MB "
+            f"(+{(mode_result['peak_rss_bytes'] - baseline_rss_bytes) / 1024 / 1024:.1f} MB over baseline), "
+            f"{mode_result['duration_seconds'] * 1000:.0f} ms"
+            if mode_result['peak_rss_bytes'] is not None else f"{mode} : peak RSS not available on this platform"
+        ): {} for mode, mode_result in results['modes'].items()
+    }}))
+
+    if output_filepath is None:
+        output_filepath = os.path.join(BENCHMARKS_DIRPATH, "results", f"memory_{(commit or 'uncommitted')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_filepath)), exist_ok=True)
+    with open(output_filepath, 'w+') as output_file:
+        output_file.write(json.dumps(results, indent=2))
+    click.secho(f"Memory benchmark results available at {os.path.abspath(output_filepath)}", fg='green')
+
+
+if __name__ == '__main__':
+    benchmarks_cli()
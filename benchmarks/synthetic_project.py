@@ -0,0 +1,182 @@
+import os
+import random
+import shutil
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict
+
+
+@dataclass
+class SyntheticProjectParameters:
+    modules_count: int = 200
+    imports_fan_out: int = 3
+    depth: int = 6
+    packages_nesting: int = 2
+    distributions_count: int = 10
+    distribution_modules_count: int = 20
+    distribution_imports_per_module: int = 1
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+@dataclass
+class SyntheticProject:
+    parameters: SyntheticProjectParameters
+    project_dirpath: str
+    site_packages_dirpath: str
+    root_filepath: str
+    local_modules_names: List[str] = field(default_factory=list)
+    distributions_modules_names: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def top_level_modules_names(self) -> List[str]:
+        return sorted({
+            *(module_name.split('.')[0] for module_name in self.local_modules_names),
+            *self.distributions_modules_names.keys()
+        })
+
+
+def make_distribution_name(i_distribution: int) -> str:
+    return f"synthdist_{i_distribution}"
+
+def write_distribution(
+        site_packages_dirpath: str, distribution_name: str, modules_count: int,
+        requirements_names: List[str], rng: random.Random
+) -> List[str]:
+    """Write an installed distribution as pip would, with its package folder and its .dist-info folder."""
+    package_dirpath: str = os.path.join(site_packages_dirpath, distribution_name)
+    os.makedirs(package_dirpath)
+    modules_names: List[str] = [distribution_name]
+    records_relative_filepaths: List[str] = [f"{distribution_name}/__init__.py"]
+
+    submodules_names: List[str] = [f"module_{i_module}" for i_module in range(max(modules_count - 1, 0))]
+    init_lines: List[str] = [f"from {distribution_name} import {submodule_name}" for submodule_name in submodules_names]
+    init_lines.extend(f"import {requirement_name}" for requirement_name in requirements_names)
+    with open(os.path.join(package_dirpath, "__init__.py"), 'w') as init_file:
+        init_file.write("\n".join(init_lines) + "\n")
+
+    for i_submodule, submodule_name in enumerate(submodules_names):
+        # Each submodule imports one of the previous submodules, which creates intra-distribution edges without cycles.
+        submodule_lines: List[str] = []
+        if i_submodule > 0:
+            submodule_lines.append(f"from {distribution_name} import {submodules_names[rng.randrange(i_submodule)]}")
+        submodule_lines.append(f"VALUE = {i_submodule}")
+        submodule_lines.append("def run():\n    return VALUE\n")
+        with open(os.path.join(package_dirpath, f"{submodule_name}.py"), 'w') as submodule_file:
+            submodule_file.write("\n".join(submodule_lines))
+        modules_names.append(f"{distribution_name}.{submodule_name}")
+        records_relative_filepaths.append(f"{distribution_name}/{submodule_name}.py")
+
+    dist_info_dirname: str = f"{distribution_name}-1.0.0.dist-info"
+    dist_info_dirpath: str = os.path.join(site_packages_dirpath, dist_info_dirname)
+    os.makedirs(dist_info_dirpath)
+    with open(os.path.join(dist_info_dirpath, "METADATA"), 'w') as metadata_file:
+        metadata_file.write("\n".join([
+            "Metadata-Version: 2.1", f"Name: {distribution_name}", "Version: 1.0.0",
+            *(f"Requires-Dist: {requirement_name}" for requirement_name in requirements_names)
+        ]) + "\n")
+    with open(os.path.join(dist_info_dirpath, "top_level.txt"), 'w') as top_level_file:
+        top_level_file.write(f"{distribution_name}\n")
+    with open(os.path.join(dist_info_dirpath, "INSTALLER"), 'w') as installer_file:
+        installer_file.write("pip\n")
+    with open(os.path.join(dist_info_dirpath, "RECORD"), 'w') as record_file:
+        for relative_filepath in [
+            *records_relative_filepaths,
+            *(f"{dist_info_dirname}/{filename}" for filename in ["METADATA", "top_level.txt", "INSTALLER", "RECORD"])
+        ]:
+            record_file.write(f"{relative_filepath},,\n")
+    return modules_names
+
+def generate_synthetic_project(dirpath: str, parameters: SyntheticProjectParameters) -> SyntheticProject:
+    """Generate a project whose local modules are spread over `depth` levels of the import graph, where each module
+    imports `imports_fan_out` modules of the next level, and the modules of the last level import the distributions
+    of a fake site-packages folder. The generation is deterministic for a given seed."""
+    rng = random.Random(parameters.seed)
+    if os.path.exists(dirpath):
+        shutil.rmtree(dirpath)
+    project_dirpath: str = os.path.join(dirpath, "project")
+    # The folder must be named site-packages for the Resolver to consider its files as part of libraries.
+    site_packages_dirpath: str = os.path.join(dirpath, "lib", "site-packages")
+    os.makedirs(project_dirpath)
+    os.makedirs(site_packages_dirpath)
+
+    distributions_modules_names: Dict[str, List[str]] = dict()
+    for i_distribution in range(parameters.distributions_count):
+        distribution_name: str = make_distribution_name(i_distribution)
+        # Some distributions require the next one, in order to have dependencies between libraries as well.
+        requirements_names: List[str] = (
+            [make_distribution_name(i_distribution + 1)]
+            if i_distribution + 1 < parameters.distributions_count and rng.random() < 0.3 else []
+        )
+        distributions_modules_names[distribution_name] = write_distribution(
+            site_packages_dirpath=site_packages_dirpath, distribution_name=distribution_name,
+            modules_count=parameters.distribution_modules_count, requirements_names=requirements_names, rng=rng
+        )
+
+    levels_count: int = max(parameters.depth, 1)
+    modules_by_level: List[List[str]] = [[] for _ in range(levels_count)]
+    for i_module in range(parameters.modules_count):
+        i_level: int = i_module % levels_count
+        packages_parts: List[str] = [
+            f"pkg_{i_level}_{i_nesting}_{rng.randrange(2)}" if i_nesting > 0 else f"pkg_{i_level}"
+            for i_nesting in range(parameters.packages_nesting)
+        ]
+        modules_by_level[i_level].append(".".join([*packages_parts, f"module_{i_module}"]))
+
+    all_distributions_names: List[str] = list(distributions_modules_names.keys())
+    for i_level, level_modules_names in enumerate(modules_by_level):
+        next_level_modules_names: List[str] = modules_by_level[i_level + 1] if i_level + 1 < levels_count else []
+        for module_name in level_modules_names:
+            imports_lines: List[str] = []
+            for imported_module_name in rng.sample(next_level_modules_names, min(parameters.imports_fan_out, len(next_level_modules_names))):
+                imports_lines.append(f"import {imported_module_name}")
+            if len(all_distributions_names) > 0:
+                for _ in range(parameters.distribution_imports_per_module):
+                    distribution_name: str = rng.choice(all_distributions_names)
+                    imported_distribution_module_name: str = rng.choice(distributions_modules_names[distribution_name])
+                    imports_lines.append(f"import {imported_distribution_module_name}")
+
+            module_parts: List[str] = module_name.split('.')
+            module_dirpath: str = os.path.join(project_dirpath, *module_parts[:-1])
+            os.makedirs(module_dirpath, exist_ok=True)
+            for i_part in range(1, len(module_parts)):
+                init_filepath: str = os.path.join(project_dirpath, *module_parts[:i_part], "__init__.py")
+                if not os.path.exists(init_filepath):
+                    open(init_filepath, 'w').close()
+            with open(os.path.join(module_dirpath, f"{module_parts[-1]}.py"), 'w') as module_file:
+                module_file.write("\n".join([
+                    *imports_lines, "",
+                    "def handler(event):",
+                    "    return event",
+                ]) + "\n")
+
+    root_filepath: str = os.path.join(project_dirpath, "app.py")
+    with open(root_filepath, 'w') as root_file:
+        root_file.write("\n".join([
+            *(f"import {module_name}" for module_name in modules_by_level[0]), "",
+            "def lambda_handler(event, context):",
+            "    return event",
+        ]) + "\n")
+
+    return SyntheticProject(
+        parameters=parameters, project_dirpath=project_dirpath, site_packages_dirpath=site_packages_dirpath,
+        root_filepath=root_filepath, local_modules_names=[module_name for level in modules_by_level for module_name in level],
+        distributions_modules_names=distributions_modules_names
+    )
+
+def generate_synthetic_layer(dirpath: str, files_count: int, files_per_folder: int = 40, distributions_count: int = 50) -> str:
+    """Generate an installed layer folder of files_count small files, nested like the packages of a site-packages."""
+    if os.path.exists(dirpath):
+        shutil.rmtree(dirpath)
+    site_packages_dirpath: str = os.path.join(dirpath, "python", "lib", "python3.9", "site-packages")
+    for i_file in range(files_count):
+        i_folder: int = i_file // files_per_folder
+        folder_dirpath: str = os.path.join(
+            site_packages_dirpath, make_distribution_name(i_folder % distributions_count),
+            f"subpackage_{i_folder // distributions_count}"
+        )
+        if i_file % files_per_folder == 0:
+            os.makedirs(folder_dirpath, exist_ok=True)
+        with open(os.path.join(folder_dirpath, f"module_{i_file}.py"), 'w') as file:
+            file.write(f"VALUE = {i_file}\n")
+    return site_packages_dirpath
@@ -1,3 +1,3 @@
-from .cli import package_cli, package_api, PackageApiOutput
+from .cli import serverlesspack_cli, package_cli, package_api, PackageApiOutput
 from .configuration_client import Config
 from .exceptions import OutputDirpathTooLow
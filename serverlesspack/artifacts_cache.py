@@ -0,0 +1,219 @@
+import dataclasses
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+import uuid
+from typing import List, Optional, Dict, Any
+
+from pydantic import BaseModel
+
+from .configuration_client import Config, ArtifactsCacheConfig
+from .imports_resolver import Resolver
+from .instrumentation import span
+
+
+# Incremented when the content of the cache key changes, in order to not restore artifacts made by an incompatible version.
+ARTIFACTS_CACHE_KEY_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+
+
+def hash_file(filepath: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump() if hasattr(value, 'model_dump') else value.dict()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value)} is not JSON serializable")
+
+def make_artifacts_cache_key(
+        resolver: Resolver, config: Config, config_filepath: str, output_base_dirpath: str,
+        target_os: str, packaging_options: Dict[str, Any]
+) -> str:
+    """Hash the inputs of the packaging once the files have been resolved. The paths are made relative to the project,
+    so that CI workers which checked out the same commit in different folders share the same keys."""
+    config_dirpath: str = os.path.dirname(os.path.abspath(config_filepath))
+    config_dict: Dict[str, Any] = dataclasses.asdict(config)
+    # The location of the cache, of the traces files and of the lockfile, the build matrix, the interpreters used for the
+    # resolution and the docker builder container do not change the packaged artifacts, since the resolved files and
+    # dependencies are hashed separately.
+    config_dict.pop('artifacts_cache', None)
+    config_dict.pop('traces', None)
+    config_dict.pop('dependencies_lock', None)
+    config_dict.pop('build_matrix', None)
+    config_dict.pop('resolution_workers', None)
+    config_dict.pop('docker_builder', None)
+    serialized_config: str = json.dumps(config_dict, default=_to_jsonable, sort_keys=True)
+    # The absolute paths in the config are rendered from the location of the config file.
+    serialized_config = serialized_config.replace(json.dumps(config_dirpath)[1:-1], "<config_dirpath>")
+
+    key_inputs: Dict[str, Any] = {
+        'version': ARTIFACTS_CACHE_KEY_VERSION,
+        'target_os': target_os,
+        'python_version': config.python_version,
+        # The dependencies are installed by the pip of the building machine, so their wheels depend on its architecture.
+        'machine': platform.machine(),
+        'config': serialized_config,
+        'packaging_options': packaging_options,
+        'files': [
+            [os.path.relpath(filepath, output_base_dirpath).replace(os.sep, '/'), hash_file(filepath)]
+            for filepath in sorted(resolver.included_files_absolute_paths)
+        ],
+        'dependencies': [
+            [dependency_name, getattr(resolver.included_dependencies_distributions.get(dependency_name, None), 'version', None)]
+            for dependency_name in sorted(resolver.included_dependencies_names)
+        ]
+    }
+    if config.dependencies_lock is not None and os.path.isfile(config.dependencies_lock.filepath):
+        # The lockfile pins the versions and hashes of the indirect dependencies, which are not part of the resolution.
+        key_inputs['lockfile'] = hash_file(config.dependencies_lock.filepath)
+    return hashlib.sha256(json.dumps(key_inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root_dirpath, filename))
+        for root_dirpath, dirs, filenames in os.walk(path) for filename in filenames
+    )
+
+def copy_path(source_path: str, destination_path: str):
+    if os.path.isdir(destination_path):
+        shutil.rmtree(destination_path)
+    elif os.path.isfile(destination_path):
+        os.remove(destination_path)
+    if os.path.isdir(source_path):
+        shutil.copytree(source_path, destination_path)
+    else:
+        shutil.copy2(source_path, destination_path)
+
+
+class ArtifactsCache:
+    """Content-addressed cache of the packaged artifacts. The entries are published by renaming a fully written staging
+    folder, which is atomic on a same filesystem, so that concurrent workers sharing the cache folder (for example on a
+    NFS mount) never see a partially written entry. The least recently used entries are evicted above the size limits."""
+
+    def __init__(self, dirpath: str, max_total_bytes: Optional[int] = None, max_entries_count: Optional[int] = None):
+        self.dirpath = dirpath
+        self.max_total_bytes = max_total_bytes
+        self.max_entries_count = max_entries_count
+        self.entries_dirpath = os.path.join(dirpath, "entries")
+        self.staging_dirpath = os.path.join(dirpath, "staging")
+
+    @staticmethod
+    def from_config(config: ArtifactsCacheConfig) -> 'ArtifactsCache':
+        return ArtifactsCache(dirpath=config.dirpath, max_total_bytes=config.max_total_bytes, max_entries_count=config.max_entries_count)
+
+    def get_entry_dirpath(self, key: str) -> str:
+        # The entries are spread in sub folders, to not have too many files in a single folder of a network filesystem.
+        return os.path.join(self.entries_dirpath, key[:2], key)
+
+    def restore(self, key: str, destination_dirpath: str) -> Optional[dict]:
+        """Copy the artifacts of the entry to the destination folder, and return the metadata of the entry,
+        or None if there is no entry for the key."""
+        with span('artifacts_cache_restore', category='cache'):
+            entry_dirpath: str = self.get_entry_dirpath(key=key)
+            manifest_filepath: str = os.path.join(entry_dirpath, MANIFEST_FILENAME)
+            try:
+                with open(manifest_filepath) as manifest_file:
+                    manifest: dict = json.load(manifest_file)
+                os.makedirs(destination_dirpath, exist_ok=True)
+                for artifact_name in manifest['artifacts_names']:
+                    copy_path(
+                        source_path=os.path.join(entry_dirpath, artifact_name),
+                        destination_path=os.path.join(destination_dirpath, artifact_name)
+                    )
+                # The modification time of the manifest is the last usage time used by the eviction.
+                os.utime(manifest_filepath)
+            except (FileNotFoundError, NotADirectoryError):
+                # The entry does not exist, or has been evicted by another worker while being restored.
+                return None
+            return manifest['metadata']
+
+    def publish(self, key: str, artifacts_paths: List[str], metadata: dict) -> bool:
+        """Store a copy of the artifacts under the key. Return False if another worker already published the key."""
+        with span('artifacts_cache_publish', category='cache'):
+            entry_dirpath: str = self.get_entry_dirpath(key=key)
+            if os.path.exists(entry_dirpath):
+                return False
+
+            entry_staging_dirpath: str = os.path.join(self.staging_dirpath, f"{key}-{uuid.uuid4().hex}")
+            os.makedirs(entry_staging_dirpath)
+            try:
+                artifacts_names: List[str] = []
+                for artifact_path in artifacts_paths:
+                    artifact_name: str = os.path.basename(os.path.normpath(artifact_path))
+                    copy_path(source_path=artifact_path, destination_path=os.path.join(entry_staging_dirpath, artifact_name))
+                    artifacts_names.append(artifact_name)
+                with open(os.path.join(entry_staging_dirpath, MANIFEST_FILENAME), 'w') as manifest_file:
+                    json.dump({
+                        'key': key, 'created_at': time.time(), 'artifacts_names': artifacts_names,
+                        'total_bytes': get_path_size(entry_staging_dirpath), 'metadata': metadata
+                    }, manifest_file)
+
+                os.makedirs(os.path.dirname(entry_dirpath), exist_ok=True)
+                try:
+                    os.rename(entry_staging_dirpath, entry_dirpath)
+                except OSError:
+                    if os.path.exists(entry_dirpath):
+                        # Another worker published the same key between our check and our rename.
+                        return False
+                    raise
+            finally:
+                if os.path.exists(entry_staging_dirpath):
+                    shutil.rmtree(entry_staging_dirpath, ignore_errors=True)
+            self.evict(kept_key=key)
+            return True
+
+    def list_entries(self) -> List[dict]:
+        entries: List[dict] = []
+        if not os.path.isdir(self.entries_dirpath):
+            return entries
+        for prefix_dirname in os.listdir(self.entries_dirpath):
+            prefix_dirpath: str = os.path.join(self.entries_dirpath, prefix_dirname)
+            for key in os.listdir(prefix_dirpath) if os.path.isdir(prefix_dirpath) else []:
+                manifest_filepath: str = os.path.join(prefix_dirpath, key, MANIFEST_FILENAME)
+                try:
+                    with open(manifest_filepath) as manifest_file:
+                        total_bytes: int = json.load(manifest_file)['total_bytes']
+                    entries.append({'key': key, 'last_used_at': os.path.getmtime(manifest_filepath), 'total_bytes': total_bytes})
+                except (FileNotFoundError, ValueError, KeyError):
+                    continue
+        return entries
+
+    def evict(self, kept_key: Optional[str] = None) -> List[str]:
+        """Remove the least recently used entries until the cache is under its size limits."""
+        entries: List[dict] = sorted(self.list_entries(), key=lambda entry: entry['last_used_at'])
+        total_bytes: int = sum(entry['total_bytes'] for entry in entries)
+        remaining_entries_count: int = len(entries)
+        evicted_keys: List[str] = []
+        for entry in entries:
+            is_over_bytes_limit: bool = self.max_total_bytes is not None and total_bytes > self.max_total_bytes
+            is_over_count_limit: bool = self.max_entries_count is not None and remaining_entries_count > self.max_entries_count
+            if not is_over_bytes_limit and not is_over_count_limit:
+                break
+            if entry['key'] == kept_key:
+                continue
+            # The entry is first moved out of the entries folder, so that it is atomically removed for the other workers.
+            evicted_dirpath: str = os.path.join(self.staging_dirpath, f"evicted-{entry['key']}-{uuid.uuid4().hex}")
+            os.makedirs(self.staging_dirpath, exist_ok=True)
+            try:
+                os.rename(self.get_entry_dirpath(key=entry['key']), evicted_dirpath)
+            except FileNotFoundError:
+                # Already evicted by another worker.
+                pass
+            else:
+                shutil.rmtree(evicted_dirpath, ignore_errors=True)
+            total_bytes -= entry['total_bytes']
+            remaining_entries_count -= 1
+            evicted_keys.append(entry['key'])
+        return evicted_keys
@@ -0,0 +1,177 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Set, Tuple, Union
+
+import click
+from asciitree import LeftAligned
+
+from .artifacts_cache import hash_file
+from .instrumentation import add_counter, traced
+from .packager import LocalFileItem, ContentFileItem
+
+
+SITE_PACKAGES_DIRNAMES = ('site-packages', 'dist-packages')
+# The number of shadowing files listed in the warning, since a vendored library can shadow thousands of files.
+MAX_LISTED_SHADOWING_FILES = 10
+
+
+def get_importable_relative_filepath(local_file_item: Union[LocalFileItem, ContentFileItem]) -> str:
+    """The path of the file relative to the root of its artifact on the Lambda python path (/var/task for the code
+    package and python/lib/pythonX.Y/site-packages for the layer), without the archive prefix of the item."""
+    relative_filepath: str = local_file_item.relative_filepath.replace(os.sep, '/')
+    if local_file_item.archive_prefix is not None:
+        return relative_filepath[len(local_file_item.archive_prefix.replace(os.sep, '/')) + 1:]
+    return relative_filepath
+
+def get_site_packages_relative_filepath(relative_filepath: str) -> Optional[str]:
+    """The path of a file relative to the last site-packages folder of its path, like the files of a virtualenv located
+    in the project root, which are never importable from the code package, since that folder is not on its python path."""
+    parts = Path(relative_filepath).parts
+    for i_part in range(len(parts) - 1, -1, -1):
+        if parts[i_part] in SITE_PACKAGES_DIRNAMES:
+            return '/'.join(parts[i_part + 1:]) if i_part + 1 < len(parts) else None
+    return None
+
+
+@dataclass
+class DeduplicatedFileItem:
+    importable_relative_filepath: str
+    # Either 'code' or 'layer', the artifact from which the file has been removed.
+    removed_from: str
+    size: int
+
+@dataclass
+class ArtifactsDeduplicationResult:
+    code_local_files_items: List[LocalFileItem]
+    layer_local_files_items: List[LocalFileItem]
+    deduplicated_files: List[DeduplicatedFileItem] = field(default_factory=list)
+    # The files of the code package found first by the runtime, while the layer contains a different file at the same path.
+    shadowing_relative_filepaths: List[str] = field(default_factory=list)
+
+    @property
+    def saved_bytes(self) -> int:
+        return sum(deduplicated_file.size for deduplicated_file in self.deduplicated_files)
+
+
+class FilesComparator:
+    def __init__(self):
+        self._hashes_by_filepath: Dict[str, str] = dict()
+
+    def _get_hash(self, filepath: str) -> str:
+        file_hash: Optional[str] = self._hashes_by_filepath.get(filepath, None)
+        if file_hash is None:
+            file_hash = hash_file(filepath=filepath)
+            self._hashes_by_filepath[filepath] = file_hash
+        return file_hash
+
+    def are_identical(self, first_filepath: str, second_filepath: str) -> bool:
+        # Only the files with the same size are hashed, which excludes most of the different files without reading them.
+        if os.path.getsize(first_filepath) != os.path.getsize(second_filepath):
+            return False
+        return self._get_hash(first_filepath) == self._get_hash(second_filepath)
+
+
+@traced('artifacts_deduplication', category='packaging')
+def deduplicate_artifacts_files(
+        code_local_files_items: List[LocalFileItem], layer_local_files_items: List[LocalFileItem],
+        can_remove_code_files: bool = True
+) -> ArtifactsDeduplicationResult:
+    """Keep each file present in both the code package and the dependencies layer in a single of them.
+
+    The code package is before the layer in the python path of the runtime, so a layer file with the same path as an
+    identical code file is never loaded, and is removed from the layer. A code file inside a site-packages folder (like a
+    virtualenv in the project root) is not importable, and is removed from the code package when the layer contains the
+    identical file, unless the code files have already been archived, like with the pipelined build."""
+    layer_items_by_relative_filepath: Dict[str, LocalFileItem] = {
+        get_importable_relative_filepath(layer_local_file_item): layer_local_file_item
+        for layer_local_file_item in layer_local_files_items
+    }
+    comparator = FilesComparator()
+    result = ArtifactsDeduplicationResult(code_local_files_items=[], layer_local_files_items=[])
+    removed_layer_relative_filepaths: Set[str] = set()
+
+    for code_local_file_item in code_local_files_items:
+        relative_filepath: str = get_importable_relative_filepath(code_local_file_item)
+        layer_local_file_item: Optional[LocalFileItem] = layer_items_by_relative_filepath.get(relative_filepath, None)
+        if layer_local_file_item is not None:
+            if comparator.are_identical(code_local_file_item.absolute_filepath, layer_local_file_item.absolute_filepath):
+                if relative_filepath not in removed_layer_relative_filepaths:
+                    removed_layer_relative_filepaths.add(relative_filepath)
+                    result.deduplicated_files.append(DeduplicatedFileItem(
+                        importable_relative_filepath=relative_filepath, removed_from='layer',
+                        size=os.path.getsize(layer_local_file_item.absolute_filepath)
+                    ))
+            else:
+                result.shadowing_relative_filepaths.append(relative_filepath)
+            result.code_local_files_items.append(code_local_file_item)
+            continue
+
+        site_packages_relative_filepath: Optional[str] = get_site_packages_relative_filepath(relative_filepath)
+        layer_local_file_item = (
+            layer_items_by_relative_filepath.get(site_packages_relative_filepath, None)
+            if can_remove_code_files and site_packages_relative_filepath is not None else None
+        )
+        if layer_local_file_item is not None and comparator.are_identical(
+                code_local_file_item.absolute_filepath, layer_local_file_item.absolute_filepath
+        ):
+            result.deduplicated_files.append(DeduplicatedFileItem(
+                importable_relative_filepath=relative_filepath, removed_from='code',
+                size=os.path.getsize(code_local_file_item.absolute_filepath)
+            ))
+            continue
+        result.code_local_files_items.append(code_local_file_item)
+
+    result.layer_local_files_items = [
+        layer_local_file_item for layer_local_file_item in layer_local_files_items
+        if get_importable_relative_filepath(layer_local_file_item) not in removed_layer_relative_filepaths
+    ]
+    add_counter('deduplicated_files', len(result.deduplicated_files))
+    add_counter('deduplicated_bytes', result.saved_bytes)
+    return result
+
+def print_artifacts_deduplication_report(result: ArtifactsDeduplicationResult):
+    if len(result.deduplicated_files) > 0:
+        packages_bytes: Dict[str, Dict[str, int]] = {'code': {}, 'layer': {}}
+        for deduplicated_file in result.deduplicated_files:
+            # The removed code files are grouped by their package inside the site-packages folder, like the layer files.
+            package_relative_filepath: str = (
+                get_site_packages_relative_filepath(deduplicated_file.importable_relative_filepath) or deduplicated_file.importable_relative_filepath
+                if deduplicated_file.removed_from == 'code' else deduplicated_file.importable_relative_filepath
+            )
+            package_name: str = Path(Path(package_relative_filepath).parts[0]).stem
+            removed_from_packages_bytes = packages_bytes[deduplicated_file.removed_from]
+            removed_from_packages_bytes[package_name] = removed_from_packages_bytes.get(package_name, 0) + deduplicated_file.size
+        print(LeftAligned()({
+            f"Saved {result.saved_bytes} bytes by keeping {len(result.deduplicated_files)} duplicated files in a single artifact": {
+                title: {
+                    f"{package_name} ({removed_bytes} bytes)": {}
+                    for package_name, removed_bytes in sorted(packages_bytes[removed_from].items(), key=lambda item: -item[1])
+                }
+                for removed_from, title in [
+                    ('layer', "Removed from the layer, since the code package contains them"),
+                    ('code', "Removed from the code package, since they are not importable from a site-packages folder")
+                ] if len(packages_bytes[removed_from]) > 0
+            }
+        }))
+    if len(result.shadowing_relative_filepaths) > 0:
+        listed_relative_filepaths: List[str] = result.shadowing_relative_filepaths[:MAX_LISTED_SHADOWING_FILES]
+        remaining_count: int = len(result.shadowing_relative_filepaths) - len(listed_relative_filepaths)
+        click.secho(
+            f"WARNING - {len(result.shadowing_relative_filepaths)} files of the code package shadow a different file of the "
+            f"dependencies layer : {', '.join(listed_relative_filepaths)}" + (f" and {remaining_count} more" if remaining_count > 0 else ""),
+            fg='yellow'
+        )
+
+def apply_artifacts_deduplication(
+        code_local_files_items: List[LocalFileItem], layer_local_files_items: List[LocalFileItem],
+        can_remove_code_files: bool = True
+) -> Tuple[List[LocalFileItem], List[LocalFileItem]]:
+    if len(code_local_files_items) == 0 or len(layer_local_files_items) == 0:
+        return code_local_files_items, layer_local_files_items
+    result: ArtifactsDeduplicationResult = deduplicate_artifacts_files(
+        code_local_files_items=code_local_files_items, layer_local_files_items=layer_local_files_items,
+        can_remove_code_files=can_remove_code_files
+    )
+    print_artifacts_deduplication_report(result=result)
+    return result.code_local_files_items, result.layer_local_files_items
@@ -0,0 +1,337 @@
+import dataclasses
+import os
+import platform
+import re
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple, Set
+
+import click
+from asciitree import LeftAligned
+
+from .artifacts_cache import copy_path
+from .configuration_client import ConfigClient, Config, BuildMatrixConfig, DependenciesLockConfig
+from .imports_resolver import Resolver
+from .instrumentation import span, record_timings
+from .layer_pruning import prune_layer_files
+from .layers_splitting import package_split_layers
+from .packager import LocalFileItem, ContentFileItem, make_base_python_layer_packages_dir, package_files, \
+    resolve_install_and_get_dependencies_files
+from .pipeline import check_packaged_files
+from .priming import make_priming_content_file_item
+
+
+# The compiled extensions built for a single python version and architecture, like module.cpython-39-x86_64-linux-gnu.so
+# or module.cp39-win_amd64.pyd. The abi3 and untagged extensions are loaded by every python version.
+COMPILED_EXTENSION_TAG_REGEX = re.compile(r'^(?P<module>[^.]+)\.(?P<tag>cpython-\d+[a-z]*-[^.]+|cp\d+-win_[^.]+)\.(?P<extension>so|pyd)$')
+
+@dataclass(frozen=True)
+class MatrixTarget:
+    target_os: str
+    python_version: str
+    architecture: str = 'x86_64'
+
+    @property
+    def key(self) -> str:
+        return f"{self.target_os}-{self.architecture}-python{self.python_version}"
+
+def make_matrix_targets(targets_os: List[str], python_versions: List[str], architectures: Optional[List[str]] = None) -> List[MatrixTarget]:
+    targets: List[MatrixTarget] = []
+    for target_os in targets_os:
+        for architecture in architectures or ['x86_64']:
+            for python_version in python_versions:
+                target = MatrixTarget(target_os=target_os, python_version=python_version, architecture=architecture)
+                if target not in targets:
+                    targets.append(target)
+    return targets
+
+def get_resolution_target_os(targets_os: List[str]) -> str:
+    # Resolving for the os of the building machine when it is part of the matrix means that no compiled extension file
+    # is substituted in the shared resolution, and the other target os only substitute their own compiled files.
+    system_os: str = platform.system().lower()
+    return system_os if system_os in targets_os else targets_os[0]
+
+
+def make_compiled_extension_tag(target: MatrixTarget) -> str:
+    version_nodot: str = target.python_version.replace('.', '')
+    if target.target_os == 'windows':
+        return f"cp{version_nodot}-{'win_arm64' if target.architecture == 'arm64' else 'win_amd64'}"
+    # The python versions before 3.8 were built with pymalloc, which was part of their abi tag.
+    abi_flags: str = 'm' if tuple(int(part) for part in target.python_version.split('.')[:2]) < (3, 8) else ''
+    return f"cpython-{version_nodot}{abi_flags}-{'aarch64' if target.architecture == 'arm64' else 'x86_64'}-linux-gnu"
+
+def get_target_included_files(included_files_absolute_paths: Set[str], target: MatrixTarget) -> Set[str]:
+    """The resolution only finds the compiled extensions of the project built for the resolving interpreter. They are
+    substituted with the files built for the python version and architecture of the target next to them, or kept with
+    a warning when there is none, since the variant would fail to import them."""
+    target_included_files_absolute_paths: Set[str] = set()
+    target_tag: str = make_compiled_extension_tag(target=target)
+    for filepath in included_files_absolute_paths:
+        compiled_extension_match = COMPILED_EXTENSION_TAG_REGEX.match(os.path.basename(filepath))
+        if compiled_extension_match is None or compiled_extension_match.group('tag') == target_tag:
+            target_included_files_absolute_paths.add(filepath)
+            continue
+        target_filepath: str = os.path.join(
+            os.path.dirname(filepath),
+            f"{compiled_extension_match.group('module')}.{target_tag}.{Resolver.OS_TO_COMPILED_EXTENSIONS[target.target_os]}"
+        )
+        if os.path.isfile(target_filepath):
+            target_included_files_absolute_paths.add(target_filepath)
+        else:
+            click.secho(
+                f"WARNING - No compiled extension {os.path.basename(target_filepath)} found for the {target.key} variant, "
+                f"which packages {os.path.basename(filepath)} instead", fg='yellow'
+            )
+            target_included_files_absolute_paths.add(filepath)
+    return target_included_files_absolute_paths
+
+
+def install_and_prune_dependencies_files(
+        resolver: Resolver, config: Config, lambda_layer_dirpath: str, base_layer_dirpath: str,
+        lock_config: Optional[DependenciesLockConfig]
+) -> List[LocalFileItem]:
+    dependencies_local_files_items: List[LocalFileItem] = resolve_install_and_get_dependencies_files(
+        resolver=resolver,
+        lambda_layer_dirpath=lambda_layer_dirpath,
+        base_layer_dirpath=base_layer_dirpath,
+        python_version=config.python_version,
+        use_prototype_docker_install=config.use_prototype_docker_pip_install,
+        docker_builder_config=config.docker_builder,
+        should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages,
+        lock_config=lock_config,
+        architecture=config.architecture
+    )
+    if config.layer_pruning is not None:
+        with span('layer_pruning', category='dependencies'):
+            dependencies_local_files_items = prune_layer_files(
+                local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+                python_version=config.python_version, config=config.layer_pruning
+            )
+    return dependencies_local_files_items
+
+def package_matrix_variant(
+        resolver: Resolver, config: Config, variant_dist_dirpath: str,
+        code_files_items: Tuple[List[LocalFileItem], List[ContentFileItem]], shared_code_output_path: Optional[str],
+        package_dependencies_in_layer_for_code_package: bool, lock_config: Optional[DependenciesLockConfig]
+):
+    """Package the target specific parts of a variant of the matrix : its dependencies, and its code archive when it
+    includes the dependencies (layer package type) or when it cannot be copied from the archive of another variant."""
+    from .cli import PackageApiOutput, safe_get_package_files_handler
+
+    package_files_handler = safe_get_package_files_handler(output_type=config.output_type)
+    os.makedirs(variant_dist_dirpath, exist_ok=True)
+    lambda_layer_dirpath: str = os.path.join(variant_dist_dirpath, 'lambda_layer')
+    base_layer_dirpath: str = make_base_python_layer_packages_dir(python_version=config.python_version)
+    code_local_files_items, code_content_files_items = code_files_items
+
+    if config.package_type == 'layer':
+        dependencies_local_files_items = install_and_prune_dependencies_files(
+            resolver=resolver, config=config, lambda_layer_dirpath=lambda_layer_dirpath,
+            base_layer_dirpath=base_layer_dirpath, lock_config=lock_config
+        )
+        check_packaged_files(
+            config=config, resolver=resolver, dist_dirpath=variant_dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+            code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+            layer_local_files_items=dependencies_local_files_items
+        )
+        return PackageApiOutput(
+            code_path=package_files_handler(
+                variant_dist_dirpath, 'build', [*code_local_files_items, *dependencies_local_files_items], code_content_files_items
+            ),
+            layer_path=None, required_dependencies_names=resolver.included_dependencies_names
+        )
+
+    if shared_code_output_path is not None:
+        code_output_path: str = os.path.join(variant_dist_dirpath, os.path.basename(shared_code_output_path))
+        # The variant in which folder the shared archive has been written does not copy it on itself.
+        if os.path.abspath(code_output_path) != os.path.abspath(shared_code_output_path):
+            with span('code_archive_copy', category='packaging'):
+                copy_path(source_path=shared_code_output_path, destination_path=code_output_path)
+    else:
+        code_output_path: str = package_files_handler(variant_dist_dirpath, 'build', code_local_files_items, code_content_files_items)
+
+    if package_dependencies_in_layer_for_code_package is not True:
+        check_packaged_files(
+            config=config, resolver=resolver, dist_dirpath=variant_dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+            code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+            layer_local_files_items=[]
+        )
+        return PackageApiOutput(code_path=code_output_path, layer_path=None, required_dependencies_names=resolver.included_dependencies_names)
+
+    dependencies_local_files_items = install_and_prune_dependencies_files(
+        resolver=resolver, config=config, lambda_layer_dirpath=lambda_layer_dirpath,
+        base_layer_dirpath=base_layer_dirpath, lock_config=lock_config
+    )
+    check_packaged_files(
+        config=config, resolver=resolver, dist_dirpath=variant_dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+        code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+        layer_local_files_items=dependencies_local_files_items
+    )
+    if config.layers_splitting is not None:
+        layers_output_paths: List[str] = package_split_layers(
+            local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+            dist_dirpath=variant_dist_dirpath, output_type=config.output_type, config=config.layers_splitting,
+            package_files_handler=package_files_handler
+        )
+        return PackageApiOutput(
+            code_path=code_output_path, layer_path=None, layers_paths=layers_output_paths,
+            required_dependencies_names=resolver.included_dependencies_names
+        )
+    return PackageApiOutput(
+        code_path=code_output_path,
+        layer_path=package_files_handler(variant_dist_dirpath, 'lambda_layer', dependencies_local_files_items, []),
+        required_dependencies_names=resolver.included_dependencies_names
+    )
+
+
+def print_build_matrix_report(outputs: Dict[str, 'PackageApiOutput']):
+    print(LeftAligned()({'Build matrix': {
+        target_key: {os.path.abspath(path): {} for path in output.artifacts_paths}
+        for target_key, output in outputs.items()
+    }}))
+
+@record_timings
+def package_matrix_api(
+        config_filepath: str, targets_os: Optional[List[str]] = None, python_versions: Optional[List[str]] = None,
+        architectures: Optional[List[str]] = None, verbose: bool = False, overriding_attributes: Optional[dict] = None,
+        package_dependencies_in_layer_for_code_package: Optional[bool] = None,
+        max_workers: Optional[int] = None, timings_filepath: Optional[str] = None
+) -> Dict[str, 'PackageApiOutput']:
+    """Package every combination of target os, architecture and python version of the matrix from a single resolution.
+    The local files are resolved and planned once, the code archive is written once per distinct content and copied to
+    the other variants, and only the dependencies installation and the layers archiving run for each variant, in parallel."""
+    from .cli import python_path_wrapper, resolve_config_files, get_output_base_dirpath
+
+    config_client = ConfigClient(verbose=verbose)
+    with span('config_loading'):
+        # The target os of the rendering is only used for the os specific folders includes, which are compared below.
+        base_config: Config = config_client.load_render_config_file(
+            filepath=config_filepath, target_os=(targets_os or ['linux'])[0],
+            overriding_attributes=overriding_attributes
+        )
+    if base_config.output_type == 'oci':
+        raise Exception("The build matrix only supports the zip and folder output types")
+    build_matrix_config: BuildMatrixConfig = base_config.build_matrix if base_config.build_matrix is not None else BuildMatrixConfig()
+    targets_os = targets_os or build_matrix_config.targets_os
+    python_versions = python_versions or build_matrix_config.python_versions or [base_config.python_version]
+    architectures = architectures or build_matrix_config.architectures or [base_config.architecture]
+    if not targets_os:
+        raise Exception("The target os of the matrix must be passed as options or defined in the build_matrix section of the config file")
+    targets: List[MatrixTarget] = make_matrix_targets(targets_os=targets_os, python_versions=python_versions, architectures=architectures)
+
+    with span('config_loading'):
+        # The prompted attributes of the first rendering are re-used, in order to only prompt them once.
+        configs_by_target_os: Dict[str, Config] = {
+            target_os: config_client.load_render_config_file(
+                filepath=config_filepath, target_os=target_os,
+                overriding_attributes={
+                    'package_type': base_config.package_type, 'output_type': base_config.output_type,
+                    'python_version': base_config.python_version, 'architecture': base_config.architecture
+                }
+            ) for target_os in targets_os
+        }
+
+    confirmed_package_dependencies_in_layer_for_code_package: bool = base_config.package_type == 'code' and (
+        click.confirm("Package your application dependencies as lambda layer ?")
+        if package_dependencies_in_layer_for_code_package is None else
+        package_dependencies_in_layer_for_code_package
+    )
+    # A lockfile pins the dependencies of a single python version and platform, so it is only used by the variant
+    # that a package command with the same config would have produced.
+    locked_target = MatrixTarget(target_os=targets_os[0], python_version=base_config.python_version, architecture=base_config.architecture)
+    matrix_dist_dirpath: str = os.path.join(os.path.dirname(config_filepath), "dist", "matrix")
+    output_base_dirpath: str = get_output_base_dirpath(config=base_config, config_filepath=config_filepath)
+
+    def execute_package_matrix_api() -> Dict[str, 'PackageApiOutput']:
+        resolution_target_os: str = get_resolution_target_os(targets_os=targets_os)
+        resolution_config: Config = configs_by_target_os[resolution_target_os]
+        resolver: Resolver = resolve_config_files(config=resolution_config, target_os=resolution_target_os, verbose=verbose)
+        print(f">>> Required dependencies names : {resolver.included_dependencies_names}")
+
+        resolvers_by_target_os: Dict[str, Resolver] = {resolution_target_os: resolver}
+        for target_os, target_os_config in configs_by_target_os.items():
+            if target_os in resolvers_by_target_os:
+                continue
+            if target_os_config.folders_includes == resolution_config.folders_includes:
+                resolvers_by_target_os[target_os] = resolver.for_target_os(target_os=target_os)
+            else:
+                click.secho(f"The folders includes of the config differ for {target_os}, which is resolved separately", fg='yellow')
+                resolvers_by_target_os[target_os] = resolve_config_files(config=target_os_config, target_os=target_os, verbose=verbose)
+
+        # The code files are planned once per distinct archive content. Without archive prefix (code package type) and
+        # without compiled extensions in the project, the code archive of a target os is the same for every python
+        # version and architecture.
+        code_files_items_by_key: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[List[LocalFileItem], List[ContentFileItem]]] = {}
+        shared_code_output_paths: Dict[Tuple[str, Optional[str], Optional[str]], str] = {}
+        variants_code_keys: Dict[MatrixTarget, Tuple[str, Optional[str], Optional[str]]] = {}
+        for target in targets:
+            archive_prefix: Optional[str] = (
+                make_base_python_layer_packages_dir(python_version=target.python_version)
+                if base_config.package_type == 'layer' else None
+            )
+            target_os_resolver: Resolver = resolvers_by_target_os[target.target_os]
+            has_compiled_extensions: bool = any(
+                COMPILED_EXTENSION_TAG_REGEX.match(os.path.basename(filepath)) is not None
+                for filepath in target_os_resolver.included_files_absolute_paths
+            )
+            code_key: Tuple[str, Optional[str], Optional[str]] = (
+                target.target_os, archive_prefix, make_compiled_extension_tag(target=target) if has_compiled_extensions else None
+            )
+            variants_code_keys[target] = code_key
+            if code_key in code_files_items_by_key:
+                continue
+            local_files_items, content_files_items = package_files(
+                included_files_absolute_paths=get_target_included_files(
+                    included_files_absolute_paths=target_os_resolver.included_files_absolute_paths, target=target
+                ),
+                archive_prefix=archive_prefix, output_base_dirpath=output_base_dirpath
+            )
+            if base_config.priming is not None:
+                content_files_items.append(make_priming_content_file_item(
+                    resolver=target_os_resolver, config=base_config.priming,
+                    output_base_dirpath=output_base_dirpath, archive_prefix=archive_prefix
+                ))
+            code_files_items_by_key[code_key] = (local_files_items, content_files_items)
+
+        if base_config.package_type == 'code':
+            from .cli import safe_get_package_files_handler
+            package_files_handler = safe_get_package_files_handler(output_type=base_config.output_type)
+            for target in targets:
+                # The archive of each code key is written in the folder of its first variant, and copied to the others.
+                if variants_code_keys[target] not in shared_code_output_paths:
+                    variant_dist_dirpath: str = os.path.join(matrix_dist_dirpath, target.key)
+                    os.makedirs(variant_dist_dirpath, exist_ok=True)
+                    local_files_items, content_files_items = code_files_items_by_key[variants_code_keys[target]]
+                    shared_code_output_paths[variants_code_keys[target]] = package_files_handler(
+                        variant_dist_dirpath, 'build', local_files_items, content_files_items
+                    )
+
+        def package_variant(target: MatrixTarget) -> 'PackageApiOutput':
+            with span('matrix_variant', category='packaging', target=target.key):
+                variant_dist_dirpath: str = os.path.join(matrix_dist_dirpath, target.key)
+                shared_code_output_path: Optional[str] = shared_code_output_paths.get(variants_code_keys[target], None)
+                return package_matrix_variant(
+                    resolver=resolvers_by_target_os[target.target_os],
+                    config=dataclasses.replace(
+                        configs_by_target_os[target.target_os], python_version=target.python_version, architecture=target.architecture
+                    ),
+                    variant_dist_dirpath=variant_dist_dirpath,
+                    code_files_items=code_files_items_by_key[variants_code_keys[target]],
+                    shared_code_output_path=shared_code_output_path,
+                    package_dependencies_in_layer_for_code_package=confirmed_package_dependencies_in_layer_for_code_package,
+                    lock_config=base_config.dependencies_lock if target == locked_target else None
+                )
+
+        if base_config.dependencies_lock is not None and any(target != locked_target for target in targets):
+            click.secho(
+                f"The lockfile is only used for the {locked_target.key} variant, "
+                f"the dependencies of the other variants are installed without lock", fg='yellow'
+            )
+        # The installations of the dependencies are pip subprocesses, so the variants run in threads.
+        with ThreadPoolExecutor(max_workers=max_workers or build_matrix_config.max_workers or len(targets)) as executor:
+            futures: Dict[str, Future] = {target.key: executor.submit(package_variant, target) for target in targets}
+            outputs: Dict[str, 'PackageApiOutput'] = {target_key: future.result() for target_key, future in futures.items()}
+        print_build_matrix_report(outputs=outputs)
+        return outputs
+
+    return python_path_wrapper(config=base_config, f=execute_package_matrix_api)
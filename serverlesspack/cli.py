@@ -1,14 +1,31 @@
 import os
+import sys
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import List, Callable, Dict, Optional, Set, Any
+from typing import List, Callable, Dict, Optional, Set, Any, Tuple
 
 import click
-from .configuration_client import ConfigClient, Config
+from .artifacts_cache import ArtifactsCache, make_artifacts_cache_key
+from .artifacts_deduplication import apply_artifacts_deduplication
+from .configuration_client import ConfigClient, Config, TracesConfig
+from .import_graph import make_traces_writer, TRACES_FORMATS_EXTENSIONS
 from .imports_resolver import Resolver
 from .packager import ContentFileItem, LocalFileItem, make_base_python_layer_packages_dir, package_files, \
     files_to_zip, files_to_folder, resolve_install_and_get_dependencies_files
+from .import_profiler import profile_import_costs_api
+from .instrumentation import span, traced, record_timings
+from .layer_pruning import prune_layer_files
+from .oci_image import package_oci_image
+from .packages_lock_client import lock_api
+from .layers_splitting import package_split_layers
+from .shared_layers import compute_shared_layers_api
+from .pipeline import package_pipelined_api, check_packaged_files
+from .priming import make_priming_content_file_item, benchmark_priming_api
+from .resolution_workers import get_resolution_worker
+from .runtime_trace import trace_handler_execution, make_runtime_trace_diff_report, \
+    print_runtime_trace_diff_report, save_runtime_trace_diff_report
+from .utils import relative_filepath_to_module_name
 
 
 @dataclass
@@ -16,6 +33,32 @@ class PackageApiOutput:
     code_path: str
     layer_path: Optional[str]
     required_dependencies_names: Set[str]
+    layers_paths: Optional[List[str]] = None
+
+    @property
+    def artifacts_paths(self) -> List[str]:
+        return [self.code_path, *([self.layer_path] if self.layer_path is not None else []), *(self.layers_paths or [])]
+
+    def to_cache_metadata(self) -> dict:
+        # Only the names of the artifacts are stored, since they are restored in the dist folder of the restoring project.
+        return {
+            'code_path': os.path.basename(self.code_path),
+            'layer_path': os.path.basename(self.layer_path) if self.layer_path is not None else None,
+            'layers_paths': [os.path.basename(path) for path in self.layers_paths] if self.layers_paths is not None else None,
+            'required_dependencies_names': sorted(self.required_dependencies_names)
+        }
+
+    @staticmethod
+    def from_cache_metadata(metadata: dict, dist_dirpath: str) -> 'PackageApiOutput':
+        return PackageApiOutput(
+            code_path=os.path.join(dist_dirpath, metadata['code_path']),
+            layer_path=os.path.join(dist_dirpath, metadata['layer_path']) if metadata['layer_path'] is not None else None,
+            layers_paths=(
+                [os.path.join(dist_dirpath, name) for name in metadata['layers_paths']]
+                if metadata['layers_paths'] is not None else None
+            ),
+            required_dependencies_names=set(metadata['required_dependencies_names'])
+        )
 
 class PackageType(Enum):
     code = 'code'
@@ -24,6 +67,7 @@ class PackageType(Enum):
 class OutputType(Enum):
     zip = 'zip'
     folder = 'folder'
+    oci = 'oci'
 
 class PythonVersion(Enum):
     _36 = '3.6'
@@ -32,6 +76,10 @@ class PythonVersion(Enum):
     _39 = '3.9'
     _310 = '3.10'
 
+class Architecture(Enum):
+    x86_64 = 'x86_64'
+    arm64 = 'arm64'
+
 
 package_files_handlers_by_output_type_switch: (
     Dict[str, Callable[[str, str, List[LocalFileItem], List[ContentFileItem]], str]]
@@ -45,186 +93,550 @@ def safe_get_package_files_handler(output_type: str):
     return handler
 
 
-@click.command()
+def python_path_wrapper(config: Config, f: Callable[[], Any]) -> Any:
+    print("Adding content root to Python path")
+    added_paths: Set[str] = set()
+
+    with span('python_path_setup'):
+        content_root_dirpath = os.path.abspath(os.path.dirname(os.path.abspath(config.root_filepath)))
+        for root_dirpath, dirs, filenames in os.walk(content_root_dirpath):
+            for dirname in dirs:
+                dirpath: str = os.path.join(root_dirpath, dirname)
+                expected_init_filepath: str = os.path.join(dirpath, '__init__.py')
+                if os.path.exists(expected_init_filepath):
+                    if config.python_path_exclusions is None or not config.python_path_exclusions.path_is_excluded(path=root_dirpath):
+                        full_path: str = os.path.join(root_dirpath, dirname)
+                        added_paths.add(full_path)
+                        sys.path.insert(0, full_path)
+    print(f"Added {len(added_paths)} paths to Python path")
+    print(sys.path)
+
+    try:
+        return f()
+    finally:
+        for path in added_paths:
+            sys.path.remove(path)
+        print("Removed all added paths from Python path")
+
+@traced('resolution', category='resolution')
+def resolve_config_files(
+        config: Config, target_os: str, verbose: bool = False,
+        allowed_files_absolute_paths: Optional[Set[str]] = None,
+        allowed_top_level_modules_names: Optional[Set[str]] = None,
+        traces_filepath: Optional[str] = None,
+        on_file_included: Optional[Callable[[str], None]] = None,
+        on_dependency_included: Optional[Callable[[str, Any], None]] = None
+) -> Resolver:
+    traces_config: TracesConfig = config.traces if config.traces is not None else TracesConfig()
+    traces_writer = (
+        make_traces_writer(filepath=traces_filepath, traces_format=traces_config.output_format)
+        if traces_filepath is not None else None
+    )
+    try:
+        resolver = Resolver(
+            root_filepath=config.root_filepath, target_os=target_os,
+            global_exclusions=config.global_exclusions, verbose=verbose,
+            allowed_files_absolute_paths=allowed_files_absolute_paths,
+            allowed_top_level_modules_names=allowed_top_level_modules_names,
+            traces_writer=traces_writer,
+            on_file_included=on_file_included,
+            on_dependency_included=on_dependency_included,
+            resolution_worker=get_resolution_worker(python_version=config.python_version, config=config.resolution_workers)
+        )
+        resolver.process_file(config.root_filepath)
+
+        for filepath in config.filepaths_includes:
+            if os.path.exists(filepath):
+                # Technically, the filepath might not be a Python file, but we still use the
+                # add_python_file to potentially handle the case where it is a Python file.
+                resolver.add_python_file(filepath=filepath)
+
+        for folderpath, folder_config in config.folders_includes.items():
+            resolver.import_folder(
+                folderpath=folderpath,
+                included_folders_names=folder_config.included_folders_names,
+                included_files_extensions=folder_config.included_files_extensions,
+                excluded_folders_names=folder_config.excluded_folders_names,
+                excluded_files_extensions=folder_config.excluded_files_extensions
+            )
+        return resolver
+    finally:
+        if traces_writer is not None:
+            traces_writer.close()
+
+def get_traces_filepath(config: Config, dist_dirpath: str) -> str:
+    traces_config: TracesConfig = config.traces if config.traces is not None else TracesConfig()
+    if traces_config.filepath is not None:
+        return traces_config.filepath
+    return os.path.join(dist_dirpath, f"traces.{TRACES_FORMATS_EXTENSIONS[traces_config.output_format]}")
+
+def get_output_base_dirpath(config: Config, config_filepath: str) -> str:
+    return (
+        Path(os.path.realpath(config.project_root_dir)).parent
+        if config.project_root_dir is not None else
+        os.path.dirname(os.path.abspath(config_filepath))
+    )
+
+
+class DefaultCommandGroup(click.Group):
+    """Group falling back to the package command when the first argument is not the name of a command, in
+    order to keep working the original usage of the cli (ie, serverlesspack -os linux -config config.yaml)"""
+
+    default_command_name = 'package'
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if len(args) == 0 or (args[0] not in self.commands and args[0] != '--help'):
+            args.insert(0, self.default_command_name)
+        return super().parse_args(ctx, args)
+
+@click.group(cls=DefaultCommandGroup)
+def serverlesspack_cli():
+    pass
+
+
+@serverlesspack_cli.command(name='package')
 @click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
 @click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
 @click.option('-v', '--verbose', type=bool, required=False)
 @click.option('-pt', '--package_type', type=click.Choice([e.value for e in PackageType]), required=False)
 @click.option('-ot', '--output_type', type=click.Choice([e.value for e in OutputType]), required=False)
 @click.option('-pv', '--python_version', type=click.Choice([e.value for e in PythonVersion]), required=False)
+@click.option('-ar', '--architecture', type=click.Choice([e.value for e in Architecture]), required=False)
 @click.option('-t', '--should_save_trace_files', type=bool, required=False)
 @click.option('-dl', '--package_dependencies_in_layer_for_code_package', type=bool, required=False)
+@click.option('-rt', '--use_runtime_trace', type=bool, required=False)
+@click.option('-tm', '--timings_filepath', type=click.Path(), required=False, help="Export the timings of the build phases as a Chrome trace")
+@click.option('-ac', '--use_artifacts_cache', type=bool, required=False, help="Use the artifacts cache when configured (true by default)")
+@click.option('-pl', '--use_pipeline', type=bool, required=False, help="Resolve, install the dependencies and archive concurrently")
 def package_cli(
         target_os: str, config_filepath: str, verbose: bool = False,
         package_type: Optional[PackageType] = None, output_type: Optional[OutputType] = None,
         python_version: Optional[PythonVersion] = None,
+        architecture: Optional[Architecture] = None,
         should_save_trace_files: Optional[bool] = None,
-        package_dependencies_in_layer_for_code_package: Optional[bool] = None
+        package_dependencies_in_layer_for_code_package: Optional[bool] = None,
+        use_runtime_trace: Optional[bool] = None,
+        timings_filepath: Optional[str] = None,
+        use_artifacts_cache: Optional[bool] = None,
+        use_pipeline: Optional[bool] = None
 ):
     package_api(
         target_os=target_os, config_filepath=config_filepath, verbose=verbose,
         package_type=package_type, output_type=output_type,
-        python_version=python_version,
+        python_version=python_version, architecture=architecture,
         should_save_trace_files=should_save_trace_files,
-        package_dependencies_in_layer_for_code_package=package_dependencies_in_layer_for_code_package
+        package_dependencies_in_layer_for_code_package=package_dependencies_in_layer_for_code_package,
+        use_runtime_trace=use_runtime_trace,
+        timings_filepath=timings_filepath,
+        use_artifacts_cache=use_artifacts_cache,
+        use_pipeline=use_pipeline
     )
 
+@record_timings
 def package_api(
         target_os: str, config_filepath: str, verbose: bool = False,
         output_type: Optional[OutputType] = None, package_type: Optional[PackageType] = None,
         python_version: Optional[PythonVersion] = None,
+        architecture: Optional[Architecture] = None,
         should_save_trace_files: Optional[bool] = None,
-        package_dependencies_in_layer_for_code_package: Optional[bool] = None
+        package_dependencies_in_layer_for_code_package: Optional[bool] = None,
+        use_runtime_trace: Optional[bool] = None,
+        timings_filepath: Optional[str] = None,
+        use_artifacts_cache: Optional[bool] = None,
+        use_pipeline: Optional[bool] = None
 ) -> PackageApiOutput:
 
     if should_save_trace_files is None:
         should_save_trace_files = click.confirm("Should save traces file ?")
     should_save_trace_files: bool
 
-    config = ConfigClient(verbose=verbose).load_render_config_file(
-        filepath=config_filepath, target_os=target_os,
-        overriding_attributes={
-            'package_type': package_type,
-            'output_type': output_type,
-            'python_version': python_version
-        }
-    )
+    with span('config_loading'):
+        config = ConfigClient(verbose=verbose).load_render_config_file(
+            filepath=config_filepath, target_os=target_os,
+            overriding_attributes={
+                'package_type': package_type,
+                'output_type': output_type,
+                'python_version': python_version,
+                'architecture': architecture
+            }
+        )
 
-    def python_path_wrapper(f: Callable[[], Any]) -> Any:
-        print("Adding content root to Python path")
-        added_paths: Set[str] = set()
+    def execute_package_api():
+        # The oci images are not written by a files handler, since their dependencies and code go in separate layers.
+        package_files_handler = safe_get_package_files_handler(output_type=config.output_type) if config.output_type != 'oci' else None
 
-        import sys
-        content_root_dirpath = os.path.abspath(os.path.dirname(os.path.abspath(config.root_filepath)))
-        for root_dirpath, dirs, filenames in os.walk(content_root_dirpath):
-            for dirname in dirs:
-                dirpath: str = os.path.join(root_dirpath, dirname)
-                expected_init_filepath: str = os.path.join(dirpath, '__init__.py')
-                if os.path.exists(expected_init_filepath):
-                    if config.python_path_exclusions is None or not config.python_path_exclusions.path_is_excluded(path=root_dirpath):
-                        full_path: str = os.path.join(root_dirpath, dirname)
-                        added_paths.add(full_path)
-                        sys.path.insert(0, full_path)
-        print(f"Added {len(added_paths)} paths to Python path")
-        print(sys.path)
+        output_base_dirpath: str = get_output_base_dirpath(config=config, config_filepath=config_filepath)
 
-        try:
-            return f()
-        finally:
-            for path in added_paths:
-                sys.path.remove(path)
-            print("Removed all added paths from Python path")
+        dist_dirpath = os.path.join(os.path.dirname(config_filepath), "dist")
+        if not os.path.exists(dist_dirpath):
+            os.makedirs(dist_dirpath)
 
-    def execute_package_api():
-        package_files_handler = safe_get_package_files_handler(output_type=config.output_type)
+        should_use_runtime_trace: bool = (use_runtime_trace is None and config.runtime_trace is not None) or use_runtime_trace is True
+        traces_filepath: Optional[str] = get_traces_filepath(config=config, dist_dirpath=dist_dirpath) if should_save_trace_files is True else None
 
-        resolver = Resolver(
-            root_filepath=config.root_filepath, target_os=target_os,
-            global_exclusions=config.global_exclusions, verbose=verbose
+        # The confirmation is asked before the resolution, since it is part of the inputs of the artifacts
+        # cache key, and since the pipelined build starts installing the dependencies while resolving.
+        # A container image always contains the dependencies, since it cannot be used with lambda layers.
+        confirmed_package_dependencies_in_layer_for_code_package: bool = config.package_type == 'code' and config.output_type != 'oci' and (
+            click.confirm("Package your application dependencies as lambda layer ?")
+            if package_dependencies_in_layer_for_code_package is None else
+            package_dependencies_in_layer_for_code_package
         )
-        resolver.process_file(config.root_filepath)
+        if use_pipeline is True:
+            if config.output_type == 'oci':
+                click.secho("The pipelined build is not used with the oci output type", fg='yellow')
+            elif should_use_runtime_trace or (config.artifacts_cache is not None and use_artifacts_cache is not False):
+                click.secho(
+                    "The pipelined build is not used with a runtime trace or with the artifacts cache, "
+                    "since they require the complete resolution before packaging", fg='yellow'
+                )
+            else:
+                return package_pipelined_api(
+                    config=config, target_os=target_os, dist_dirpath=dist_dirpath, output_base_dirpath=output_base_dirpath,
+                    package_dependencies_in_layer_for_code_package=confirmed_package_dependencies_in_layer_for_code_package,
+                    verbose=verbose, traces_filepath=traces_filepath
+                )
 
-        for filepath in config.filepaths_includes:
-            if os.path.exists(filepath):
-                # Technically, the filepath might not be a Python file, but we still use the
-                # add_python_file to potentially handle the case where it is a Python file.
-                resolver.add_python_file(filepath=filepath)
+        # The traces are streamed while resolving, so they are only written by the resolution used for packaging.
+        resolver = resolve_config_files(
+            config=config, target_os=target_os, verbose=verbose,
+            traces_filepath=traces_filepath if not should_use_runtime_trace else None
+        )
 
-        for folderpath, folder_config in config.folders_includes.items():
-            resolver.import_folder(
-                folderpath=folderpath,
-                included_folders_names=folder_config.included_folders_names,
-                included_files_extensions=folder_config.included_files_extensions,
-                excluded_folders_names=folder_config.excluded_folders_names,
-                excluded_files_extensions=folder_config.excluded_files_extensions
+        if should_use_runtime_trace:
+            if config.runtime_trace is None:
+                raise Exception("The runtime_trace section must be defined in the config file to use a runtime trace")
+            with span('runtime_trace'):
+                runtime_trace_result = trace_handler_execution(
+                    handler_module_name=relative_filepath_to_module_name(
+                        relative_filepath=os.path.relpath(config.root_filepath, output_base_dirpath)
+                    ),
+                    handler_function_name=config.runtime_trace.handler_function_name,
+                    sample_events_filepaths=config.runtime_trace.sample_events_filepaths,
+                    python_paths=[output_base_dirpath, *[path for path in sys.path if path != '']],
+                    timeout_seconds=config.runtime_trace.timeout_seconds
+                )
+            traced_resolver = resolve_config_files(
+                config=config, target_os=target_os, verbose=verbose,
+                allowed_files_absolute_paths=runtime_trace_result.loaded_files_absolute_paths,
+                allowed_top_level_modules_names=runtime_trace_result.top_level_modules_names,
+                traces_filepath=traces_filepath
             )
+            runtime_trace_diff_report = make_runtime_trace_diff_report(static_resolver=resolver, traced_resolver=traced_resolver)
+            print_runtime_trace_diff_report(report=runtime_trace_diff_report)
+            save_runtime_trace_diff_report(report=runtime_trace_diff_report, dist_dirpath=dist_dirpath)
+            # From there, we package the minimal artifact observed by the runtime trace instead of the static resolution.
+            resolver = traced_resolver
 
-        if should_save_trace_files is True:
-            resolver.save_traces_to_json()
+        if traces_filepath is not None:
+            click.secho(f"Import graph traces available at {traces_filepath}", fg='green')
 
         print(f">>> Required dependencies names : {resolver.included_dependencies_names}")
 
-        output_base_dirpath: str = (
-            Path(os.path.realpath(config.project_root_dir)).parent
-            if config.project_root_dir is not None else
-            os.path.dirname(os.path.abspath(config_filepath))
-        )
+        lambda_layer_dirpath = os.path.join(dist_dirpath, 'lambda_layer')
 
-        dist_dirpath = os.path.join(os.path.dirname(config_filepath), "dist")
-        if not os.path.exists(dist_dirpath):
-            os.makedirs(dist_dirpath)
-
-        if config.package_type == 'layer':
-            # When packaging as a layer, we package the applications files with a base_layer_dirpath as the archive_prefix,
-            # and we always install/resolve the dependencies of the applications in the same package as the application files.
-            base_layer_dirpath = make_base_python_layer_packages_dir(python_version=config.python_version)
-            local_file_items, content_file_items = package_files(
-                included_files_absolute_paths=resolver.included_files_absolute_paths,
-                archive_prefix=base_layer_dirpath, output_base_dirpath=output_base_dirpath
-            )
-            lambda_layer_dirpath = os.path.join(dist_dirpath, 'lambda_layer')
+        def resolve_install_and_prune_dependencies_files(base_layer_dirpath: str) -> List[LocalFileItem]:
             dependencies_local_file_items = resolve_install_and_get_dependencies_files(
                 resolver=resolver,
                 lambda_layer_dirpath=lambda_layer_dirpath,
                 base_layer_dirpath=base_layer_dirpath,
                 python_version=config.python_version,
                 use_prototype_docker_install=config.use_prototype_docker_pip_install,
-                should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages
-            )
-            # We package both the application files and the dependencies files under the
-            # build key (which will output either a build.zip file or a build folder)
-            code_and_dependencies_output_path = package_files_handler(
-                dist_dirpath, 'build', [*local_file_items, *dependencies_local_file_items], content_file_items
-            )
-            return PackageApiOutput(
-                code_path=code_and_dependencies_output_path, layer_path=None,
-                required_dependencies_names=resolver.included_dependencies_names
+                docker_builder_config=config.docker_builder,
+                should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages,
+                lock_config=config.dependencies_lock,
+                architecture=config.architecture
             )
+            if config.layer_pruning is not None:
+                # The pruning only filters the files items, the installed files are kept in the lambda_layer dirpath.
+                with span('layer_pruning', category='dependencies'):
+                    dependencies_local_file_items = prune_layer_files(
+                        local_files_items=dependencies_local_file_items, layer_source_dirpath=lambda_layer_dirpath,
+                        python_version=config.python_version, config=config.layer_pruning
+                    )
+            return dependencies_local_file_items
 
-        elif config.package_type == 'code':
-            # When packaging as code we package the application files without any archive_prefix, which we will then package.
-            # After that, was ask the user if he wants to package his applications dependencies as a lambda layer.
-            base_layer_dirpath = make_base_python_layer_packages_dir(python_version=config.python_version)
-            local_file_items, content_file_items = package_files(
-                included_files_absolute_paths=resolver.included_files_absolute_paths,
-                output_base_dirpath=output_base_dirpath
+        def deduplicate_code_and_layer_files(
+                code_local_files_items: List[LocalFileItem], layer_local_files_items: List[LocalFileItem]
+        ) -> Tuple[List[LocalFileItem], List[LocalFileItem]]:
+            if config.should_deduplicate_artifacts_files is not True:
+                return code_local_files_items, layer_local_files_items
+            return apply_artifacts_deduplication(
+                code_local_files_items=code_local_files_items, layer_local_files_items=layer_local_files_items
             )
-            code_output_path: str = package_files_handler(dist_dirpath, 'build', local_file_items, content_file_items)
-            # We first package the applications files under the build key
 
-            confirmed_package_dependencies_in_layer_for_code_package: bool = (
-                click.confirm("Package your application dependencies as lambda layer ?")
-                if package_dependencies_in_layer_for_code_package is None else
-                package_dependencies_in_layer_for_code_package
-            )
-
-            if not confirmed_package_dependencies_in_layer_for_code_package:
+        def package_resolved_files() -> PackageApiOutput:
+            if config.output_type == 'oci':
+                local_file_items, content_file_items = package_files(
+                    included_files_absolute_paths=resolver.included_files_absolute_paths,
+                    output_base_dirpath=output_base_dirpath
+                )
+                if config.priming is not None:
+                    content_file_items.append(make_priming_content_file_item(
+                        resolver=resolver, config=config.priming, output_base_dirpath=output_base_dirpath
+                    ))
+                dependencies_local_file_items = resolve_install_and_prune_dependencies_files(
+                    base_layer_dirpath=make_base_python_layer_packages_dir(python_version=config.python_version)
+                )
+                local_file_items, dependencies_local_file_items = deduplicate_code_and_layer_files(
+                    code_local_files_items=local_file_items, layer_local_files_items=dependencies_local_file_items
+                )
+                check_packaged_files(
+                    config=config, resolver=resolver, dist_dirpath=dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+                    code_local_files_items=local_file_items, code_content_files_items=content_file_items,
+                    layer_local_files_items=dependencies_local_file_items
+                )
+                image_output_path: str = package_oci_image(
+                    config=config, dist_dirpath=dist_dirpath, destination_key='build', output_base_dirpath=output_base_dirpath,
+                    code_local_files_items=local_file_items, code_content_files_items=content_file_items,
+                    dependencies_local_files_items=dependencies_local_file_items
+                )
                 return PackageApiOutput(
-                    code_path=code_output_path, layer_path=None,
+                    code_path=image_output_path, layer_path=None,
                     required_dependencies_names=resolver.included_dependencies_names
                 )
-            else:
-                lambda_layer_dirpath = os.path.join(dist_dirpath, 'lambda_layer')
-                dependencies_local_file_items = resolve_install_and_get_dependencies_files(
-                    resolver=resolver,
-                    lambda_layer_dirpath=lambda_layer_dirpath,
-                    base_layer_dirpath=base_layer_dirpath,
-                    python_version=config.python_version,
-                    use_prototype_docker_install=config.use_prototype_docker_pip_install,
-                    should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages
+
+            if config.package_type == 'layer':
+                # When packaging as a layer, we package the applications files with a base_layer_dirpath as the archive_prefix,
+                # and we always install/resolve the dependencies of the applications in the same package as the application files.
+                base_layer_dirpath = make_base_python_layer_packages_dir(python_version=config.python_version)
+                local_file_items, content_file_items = package_files(
+                    included_files_absolute_paths=resolver.included_files_absolute_paths,
+                    archive_prefix=base_layer_dirpath, output_base_dirpath=output_base_dirpath
+                )
+                if config.priming is not None:
+                    content_file_items.append(make_priming_content_file_item(
+                        resolver=resolver, config=config.priming,
+                        output_base_dirpath=output_base_dirpath, archive_prefix=base_layer_dirpath
+                    ))
+                dependencies_local_file_items = resolve_install_and_prune_dependencies_files(base_layer_dirpath=base_layer_dirpath)
+                local_file_items, dependencies_local_file_items = deduplicate_code_and_layer_files(
+                    code_local_files_items=local_file_items, layer_local_files_items=dependencies_local_file_items
+                )
+                check_packaged_files(
+                    config=config, resolver=resolver, dist_dirpath=dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+                    code_local_files_items=local_file_items, code_content_files_items=content_file_items,
+                    layer_local_files_items=dependencies_local_file_items
+                )
+                # We package both the application files and the dependencies files under the
+                # build key (which will output either a build.zip file or a build folder)
+                code_and_dependencies_output_path = package_files_handler(
+                    dist_dirpath, 'build', [*local_file_items, *dependencies_local_file_items], content_file_items
                 )
-                lambda_layer_format_handler = safe_get_package_files_handler(output_type=config.output_type)
-                layer_output_path = lambda_layer_format_handler(dist_dirpath, 'lambda_layer', dependencies_local_file_items, [])
-                # Then, if the user asked to package his dependencies, we package them under the lambda_layer
-                # key (which will output either a lambda_layer.zip file or a lambda_layer folder)
                 return PackageApiOutput(
-                    code_path=code_output_path, layer_path=layer_output_path,
+                    code_path=code_and_dependencies_output_path, layer_path=None,
                     required_dependencies_names=resolver.included_dependencies_names
                 )
-        else:
-            raise Exception(f"Package type of {config.package_type} not supported")
 
-    return python_path_wrapper(execute_package_api)
+            elif config.package_type == 'code':
+                # When packaging as code we package the application files without any archive_prefix, which we will then package.
+                # After that, was ask the user if he wants to package his applications dependencies as a lambda layer.
+                base_layer_dirpath = make_base_python_layer_packages_dir(python_version=config.python_version)
+                local_file_items, content_file_items = package_files(
+                    included_files_absolute_paths=resolver.included_files_absolute_paths,
+                    output_base_dirpath=output_base_dirpath
+                )
+                if config.priming is not None:
+                    content_file_items.append(make_priming_content_file_item(
+                        resolver=resolver, config=config.priming, output_base_dirpath=output_base_dirpath
+                    ))
+
+                if not confirmed_package_dependencies_in_layer_for_code_package:
+                    check_packaged_files(
+                        config=config, resolver=resolver, dist_dirpath=dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+                        code_local_files_items=local_file_items, code_content_files_items=content_file_items,
+                        layer_local_files_items=[]
+                    )
+                    code_output_path: str = package_files_handler(dist_dirpath, 'build', local_file_items, content_file_items)
+                    return PackageApiOutput(
+                        code_path=code_output_path, layer_path=None,
+                        required_dependencies_names=resolver.included_dependencies_names
+                    )
+                else:
+                    # The dependencies are installed before packaging the applications files, since the files
+                    # present in both artifacts are only kept in one of them.
+                    dependencies_local_file_items = resolve_install_and_prune_dependencies_files(base_layer_dirpath=base_layer_dirpath)
+                    local_file_items, dependencies_local_file_items = deduplicate_code_and_layer_files(
+                        code_local_files_items=local_file_items, layer_local_files_items=dependencies_local_file_items
+                    )
+                    check_packaged_files(
+                        config=config, resolver=resolver, dist_dirpath=dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+                        code_local_files_items=local_file_items, code_content_files_items=content_file_items,
+                        layer_local_files_items=dependencies_local_file_items
+                    )
+                    # We first package the applications files under the build key
+                    code_output_path: str = package_files_handler(dist_dirpath, 'build', local_file_items, content_file_items)
+                    lambda_layer_format_handler = safe_get_package_files_handler(output_type=config.output_type)
+                    if config.layers_splitting is not None:
+                        layers_output_paths: List[str] = package_split_layers(
+                            local_files_items=dependencies_local_file_items, layer_source_dirpath=lambda_layer_dirpath,
+                            dist_dirpath=dist_dirpath, output_type=config.output_type, config=config.layers_splitting,
+                            package_files_handler=lambda_layer_format_handler
+                        )
+                        return PackageApiOutput(
+                            code_path=code_output_path, layer_path=None, layers_paths=layers_output_paths,
+                            required_dependencies_names=resolver.included_dependencies_names
+                        )
+                    layer_output_path = lambda_layer_format_handler(dist_dirpath, 'lambda_layer', dependencies_local_file_items, [])
+                    # Then, if the user asked to package his dependencies, we package them under the lambda_layer
+                    # key (which will output either a lambda_layer.zip file or a lambda_layer folder)
+                    return PackageApiOutput(
+                        code_path=code_output_path, layer_path=layer_output_path,
+                        required_dependencies_names=resolver.included_dependencies_names
+                    )
+            else:
+                raise Exception(f"Package type of {config.package_type} not supported")
+
+        if config.artifacts_cache is None or use_artifacts_cache is False:
+            return package_resolved_files()
+
+        artifacts_cache = ArtifactsCache.from_config(config=config.artifacts_cache)
+        with span('artifacts_cache_key', category='cache'):
+            artifacts_cache_key: str = make_artifacts_cache_key(
+                resolver=resolver, config=config, config_filepath=config_filepath,
+                output_base_dirpath=output_base_dirpath, target_os=target_os,
+                packaging_options={
+                    'use_runtime_trace': should_use_runtime_trace,
+                    'package_dependencies_in_layer_for_code_package': confirmed_package_dependencies_in_layer_for_code_package
+                }
+            )
+        cached_metadata: Optional[dict] = artifacts_cache.restore(key=artifacts_cache_key, destination_dirpath=dist_dirpath)
+        if cached_metadata is not None:
+            click.secho(f"Restored the artifacts from the cache entry {artifacts_cache_key}", fg='green')
+            return PackageApiOutput.from_cache_metadata(metadata=cached_metadata, dist_dirpath=dist_dirpath)
+
+        package_api_output = package_resolved_files()
+        if artifacts_cache.publish(
+                key=artifacts_cache_key, artifacts_paths=package_api_output.artifacts_paths,
+                metadata=package_api_output.to_cache_metadata()
+        ):
+            click.secho(f"Published the artifacts to the cache entry {artifacts_cache_key}", fg='green')
+        return package_api_output
+
+    return python_path_wrapper(config=config, f=execute_package_api)
+
+
+@serverlesspack_cli.command(name='shared-layers')
+@click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
+@click.option('-config', '--config_filepaths', multiple=True, required=True, type=click.Path(exists=True))
+@click.option('-o', '--output_dirpath', type=click.Path(), default="dist/shared_layers")
+@click.option('-v', '--verbose', type=bool, required=False)
+@click.option('-b', '--should_build_layers', type=bool, default=False)
+@click.option('-ml', '--max_shared_layers_per_function', type=int, default=4)
+@click.option('-mb', '--min_shared_layer_bytes', type=int, default=0)
+def shared_layers_cli(
+        target_os: str, config_filepaths: List[str], output_dirpath: str, verbose: bool = False,
+        should_build_layers: bool = False, max_shared_layers_per_function: int = 4, min_shared_layer_bytes: int = 0
+):
+    compute_shared_layers_api(
+        config_filepaths=list(config_filepaths), target_os=target_os, output_dirpath=output_dirpath,
+        verbose=verbose, should_build_layers=should_build_layers,
+        max_shared_layers_per_function=max_shared_layers_per_function,
+        min_shared_layer_bytes=min_shared_layer_bytes
+    )
+
+@serverlesspack_cli.command(name='profile')
+@click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
+@click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
+@click.option('-r', '--runs', type=int, default=5)
+@click.option('-v', '--verbose', type=bool, required=False)
+@click.option('-b', '--baseline_filepath', type=click.Path(), required=False)
+@click.option('-sb', '--should_save_baseline', type=bool, default=False)
+@click.option('-rt', '--regression_threshold', type=float, default=0.2)
+@click.option('-mr', '--min_regression_us', type=int, default=1000)
+@click.option('-fr', '--fail_on_regression', type=bool, default=False)
+@click.option('-iso', '--isolated_from_local_site_packages', type=bool, default=True)
+def profile_cli(
+        target_os: str, config_filepath: str, runs: int = 5, verbose: bool = False,
+        baseline_filepath: Optional[str] = None, should_save_baseline: bool = False,
+        regression_threshold: float = 0.2, min_regression_us: int = 1000, fail_on_regression: bool = False,
+        isolated_from_local_site_packages: bool = True
+):
+    profile_import_costs_api(
+        target_os=target_os, config_filepath=config_filepath, runs=runs, verbose=verbose,
+        baseline_filepath=baseline_filepath, should_save_baseline=should_save_baseline,
+        regression_threshold=regression_threshold, min_regression_us=min_regression_us,
+        fail_on_regression=fail_on_regression, isolated_from_local_site_packages=isolated_from_local_site_packages
+    )
+
+@serverlesspack_cli.command(name='benchmark-priming')
+@click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
+@click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
+@click.option('-e', '--event_filepath', prompt="Filepath of the event to invoke the handler with", type=click.Path(exists=True))
+@click.option('-hf', '--handler_function_name', default='lambda_handler')
+@click.option('-r', '--runs', type=int, default=5)
+@click.option('-v', '--verbose', type=bool, required=False)
+def benchmark_priming_cli(
+        target_os: str, config_filepath: str, event_filepath: str,
+        handler_function_name: str = 'lambda_handler', runs: int = 5, verbose: bool = False
+):
+    benchmark_priming_api(
+        target_os=target_os, config_filepath=config_filepath, event_filepath=event_filepath,
+        handler_function_name=handler_function_name, runs=runs, verbose=verbose
+    )
+
+@serverlesspack_cli.command(name='lock')
+@click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
+@click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
+@click.option('-v', '--verbose', type=bool, required=False)
+@click.option('-vf', '--verify', type=bool, default=False, help="Only check that the lockfile matches the detected dependencies")
+@click.option('-m', '--mode', type=click.Choice(['auto', 'update']), default='update')
+def lock_cli(target_os: str, config_filepath: str, verbose: bool = False, verify: bool = False, mode: str = 'update'):
+    lock_api(target_os=target_os, config_filepath=config_filepath, verbose=verbose, should_verify=verify, mode=mode)
+
+@serverlesspack_cli.command(name='matrix')
+@click.option('-os', '--targets_os', multiple=True, type=click.Choice(['windows', 'linux']), help="Defaults to the build_matrix config section")
+@click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
+@click.option('-v', '--verbose', type=bool, required=False)
+@click.option('-pt', '--package_type', type=click.Choice([e.value for e in PackageType]), required=False)
+@click.option('-ot', '--output_type', type=click.Choice([e.value for e in OutputType]), required=False)
+@click.option('-pv', '--python_versions', multiple=True, type=click.Choice([e.value for e in PythonVersion]), help="Defaults to the build_matrix config section")
+@click.option('-ar', '--architectures', multiple=True, type=click.Choice([e.value for e in Architecture]), help="Defaults to the build_matrix config section")
+@click.option('-dl', '--package_dependencies_in_layer_for_code_package', type=bool, required=False)
+@click.option('-w', '--max_workers', type=int, required=False, help="Number of variants packaged in parallel")
+@click.option('-tm', '--timings_filepath', type=click.Path(), required=False, help="Export the timings of the build phases as a Chrome trace")
+def matrix_cli(
+        targets_os: List[str], config_filepath: str, verbose: bool = False,
+        package_type: Optional[PackageType] = None, output_type: Optional[OutputType] = None,
+        python_versions: Optional[List[str]] = None, architectures: Optional[List[str]] = None,
+        package_dependencies_in_layer_for_code_package: Optional[bool] = None,
+        max_workers: Optional[int] = None, timings_filepath: Optional[str] = None
+):
+    from .build_matrix import package_matrix_api
+    package_matrix_api(
+        config_filepath=config_filepath, targets_os=list(targets_os), python_versions=list(python_versions or []),
+        architectures=list(architectures or []),
+        verbose=verbose, overriding_attributes={'package_type': package_type, 'output_type': output_type},
+        package_dependencies_in_layer_for_code_package=package_dependencies_in_layer_for_code_package,
+        max_workers=max_workers, timings_filepath=timings_filepath
+    )
+
+@serverlesspack_cli.command(name='watch')
+@click.option('-os', '--target_os', prompt="OS to compile to", type=click.Choice(['windows', 'linux']))
+@click.option('-config', '--config_filepath', prompt="Filepath of config file", type=click.Path(exists=True))
+@click.option('-v', '--verbose', type=bool, required=False)
+@click.option('-pt', '--package_type', type=click.Choice([e.value for e in PackageType]), required=False)
+@click.option('-ot', '--output_type', type=click.Choice([e.value for e in OutputType]), required=False)
+@click.option('-pv', '--python_version', type=click.Choice([e.value for e in PythonVersion]), required=False)
+@click.option('-ar', '--architecture', type=click.Choice([e.value for e in Architecture]), required=False)
+@click.option('-i', '--interval_seconds', type=float, default=0.5, help="Interval between two pollings of the files")
+def watch_cli(
+        target_os: str, config_filepath: str, verbose: bool = False,
+        package_type: Optional[PackageType] = None, output_type: Optional[OutputType] = None,
+        python_version: Optional[PythonVersion] = None, architecture: Optional[Architecture] = None,
+        interval_seconds: float = 0.5
+):
+    from .watcher import watch_api
+    watch_api(
+        target_os=target_os, config_filepath=config_filepath, verbose=verbose,
+        overriding_attributes={
+            'package_type': package_type,
+            'output_type': output_type,
+            'python_version': python_version,
+            'architecture': architecture
+        },
+        interval_seconds=interval_seconds
+    )
 
 if __name__ == '__main__':
-    package_cli()
+    serverlesspack_cli()
@@ -1,18 +1,27 @@
 import os
 import json
+from typing import Optional
+
+from .state_store import StateStore, get_state_store
 from .utils import get_serverless_pack_root_folder
 
 
+CLI_CACHE_NAMESPACE = "cli_cache"
+
+
 class CliCache:
+    """Values kept between the runs of the cli, stored in the cli_cache namespace of the state store. The values are
+    loaded as a dict, and each of its top level keys is written back as its own entry by save_cache."""
     _cache = None
 
     @staticmethod
-    def get_cli_cache_filepath() -> str:
-        filepath = os.path.join(get_serverless_pack_root_folder(), "cli_cache.json")
-        if not os.path.isfile(filepath):
-            with open(filepath, "w+") as cache_file:
-                cache_file.write(json.dumps({}))
-        return filepath
+    def get_legacy_cli_cache_filepath() -> str:
+        # The cache was previously written as a JSON file inside the installed package.
+        return os.path.join(get_serverless_pack_root_folder(), "cli_cache.json")
+
+    @staticmethod
+    def store() -> StateStore:
+        return get_state_store()
 
     @staticmethod
     def cache() -> dict:
@@ -22,12 +31,30 @@ class CliCache:
 
     @staticmethod
     def load_cache():
-        expected_cli_cache_filepath = CliCache.get_cli_cache_filepath()
-        if os.path.exists(expected_cli_cache_filepath):
-            with open(expected_cli_cache_filepath) as cache_file:
-                CliCache._cache = json.load(cache_file) or dict()
+        CliCache.migrate_legacy_cache()
+        CliCache._cache = CliCache.store().items(namespace=CLI_CACHE_NAMESPACE)
 
     @staticmethod
     def save_cache():
-        with open(CliCache.get_cli_cache_filepath(), "w+") as cache_file:
-            cache_file.write(json.dumps(CliCache.cache()))
+        CliCache.store().set_many(namespace=CLI_CACHE_NAMESPACE, values=CliCache.cache())
+
+    @staticmethod
+    def migrate_legacy_cache():
+        legacy_filepath: str = CliCache.get_legacy_cli_cache_filepath()
+        if not os.path.isfile(legacy_filepath):
+            return
+        try:
+            with open(legacy_filepath) as cache_file:
+                legacy_cache: Optional[dict] = json.load(cache_file)
+        except (OSError, ValueError):
+            legacy_cache = None
+        with CliCache.store().transaction() as store:
+            # The values already in the store are more recent than the ones of the legacy file.
+            existing_keys = store.get_many(namespace=CLI_CACHE_NAMESPACE, keys=(legacy_cache or {}).keys()).keys()
+            store.set_many(namespace=CLI_CACHE_NAMESPACE, values={
+                key: value for key, value in (legacy_cache or {}).items() if key not in existing_keys
+            })
+        try:
+            os.remove(legacy_filepath)
+        except OSError:
+            pass
@@ -34,12 +34,102 @@ class BaseFolderIncludeItem(BaseExcludeItem):
     included_files_extensions: Optional[List[str]] = None
     included_folders_names: Optional[List[str]] = None
 
+class RuntimeTraceConfig(BaseModel):
+    handler_function_name: str = 'lambda_handler'
+    sample_events_filepaths: List[str] = Field(default_factory=list)
+    timeout_seconds: Optional[int] = None
+
+class PackagePruningOverride(BaseModel):
+    kept_patterns: List[str] = Field(default_factory=list)
+    excluded_patterns: List[str] = Field(default_factory=list)
+    disabled_rule_sets: List[str] = Field(default_factory=list)
+
+class LayerPruningConfig(BaseModel):
+    rule_sets: Optional[List[str]] = None
+    excluded_patterns: List[str] = Field(default_factory=list)
+    packages_overrides: Dict[str, PackagePruningOverride] = Field(default_factory=dict)
+    strip_native_extensions: bool = False
+
+class SizeBudgetsConfig(BaseModel):
+    # The default limits are the unzipped size limit of a function with all its layers,
+    # and the size limit of a zipped deployment package uploaded directly to Lambda.
+    max_code_uncompressed_bytes: Optional[int] = None
+    max_code_compressed_bytes: Optional[int] = 50 * 1024 * 1024
+    max_layer_uncompressed_bytes: Optional[int] = None
+    max_layer_compressed_bytes: Optional[int] = None
+    max_total_uncompressed_bytes: Optional[int] = 250 * 1024 * 1024
+    top_offenders_count: int = 10
+
+class LayersSplittingConfig(BaseModel):
+    # Lambda allows up to 5 layers per function.
+    max_layers_count: int = 5
+    max_layer_uncompressed_bytes: Optional[int] = None
+    churn_threshold: float = 0.2
+
+class PrimingConfig(BaseModel):
+    module_name: str = 'serverlesspack_priming'
+    modules_includes: Optional[List[str]] = None
+    modules_excludes: List[str] = Field(default_factory=list)
+    warmup_callables: List[str] = Field(default_factory=list)
+    handler_function_name: Optional[str] = None
+
+class TracesConfig(BaseModel):
+    filepath: Optional[str] = None
+    output_format: Literal['ndjson', 'binary'] = 'ndjson'
+
+class ArtifactsCacheConfig(BaseModel):
+    dirpath: str
+    max_total_bytes: Optional[int] = 10 * 1024 * 1024 * 1024
+    max_entries_count: Optional[int] = None
+
+class DependenciesLockConfig(BaseModel):
+    filepath: str = 'serverlesspack.lock'
+    mode: Literal['auto', 'frozen', 'update'] = 'auto'
+
+class NativeExtensionsCheckConfig(BaseModel):
+    enabled: bool = True
+    # When not defined, the glibc version of the Lambda runtime of the python version is used.
+    max_glibc_version: Optional[str] = None
+    excluded_patterns: List[str] = Field(default_factory=list)
+
+class BuildMatrixConfig(BaseModel):
+    # When not defined, the target os, python version and architecture of the config are used.
+    targets_os: Optional[List[Literal['linux', 'windows']]] = None
+    python_versions: Optional[List[str]] = None
+    architectures: Optional[List[Literal['x86_64', 'arm64']]] = None
+    max_workers: Optional[int] = None
+
+class OciImageConfig(BaseModel):
+    # When not defined, the lambda_handler function of the root file is used.
+    handler: Optional[str] = None
+    # OCI image layout folder of the base image, like one exported from public.ecr.aws/lambda/python.
+    base_image_layout_dirpath: Optional[str] = None
+    reference: str = 'latest'
+    environment: Dict[str, str] = Field(default_factory=dict)
+
+class ResolutionWorkersConfig(BaseModel):
+    enabled: bool = True
+    # The interpreters not found in the PATH as pythonX.Y (or with the py launcher on Windows), by python version.
+    interpreters_paths: Dict[str, str] = Field(default_factory=dict)
+
+class DockerBuilderConfig(BaseModel):
+    # Name of the builder container, which can be an existing container. By default, one container is created per
+    # python version and architecture, and reused by the next builds.
+    container_name: Optional[str] = None
+    image: Optional[str] = None
+    # Docker volume mounted as the pip cache of the containers created by serverlesspack, shared between the builders.
+    pip_cache_volume: Optional[str] = "serverlesspack-pip-cache"
+    # When false, the container is removed once the build ends, and only the pip cache volume is kept between builds.
+    keep_running: bool = True
+    docker_executable: str = "docker"
+
 class SourceConfig(BaseModel):
     root_file: str
     project_root_dir: Optional[str] = None
     package_type: Optional[Literal['code', 'layer']] = None
-    output_type: Optional[Literal['zip', 'folder']] = None
+    output_type: Optional[Literal['zip', 'folder', 'oci']] = None
     python_version: Optional[str] = None
+    architecture: Optional[Literal['x86_64', 'arm64']] = None
     filepaths_includes: Optional[List[str]] = None
     class FolderIncludeItem(BaseFolderIncludeItem):
         additional_linux: Optional[BaseFolderIncludeItem] = None
@@ -48,36 +138,70 @@ class SourceConfig(BaseModel):
     python_path_exclusions: Optional[BaseExcludeItem] = None
     global_exclusions: Optional[BaseExcludeItem] = None
     use_prototype_docker_pip_install: Optional[bool] = False
+    docker_builder: Optional[DockerBuilderConfig] = None
     should_remove_runtime_provided_packages: Optional[bool] = True
+    should_deduplicate_artifacts_files: Optional[bool] = True
+    runtime_trace: Optional[RuntimeTraceConfig] = None
+    layer_pruning: Optional[LayerPruningConfig] = None
+    size_budgets: Optional[SizeBudgetsConfig] = None
+    layers_splitting: Optional[LayersSplittingConfig] = None
+    priming: Optional[PrimingConfig] = None
+    traces: Optional[TracesConfig] = None
+    artifacts_cache: Optional[ArtifactsCacheConfig] = None
+    dependencies_lock: Optional[DependenciesLockConfig] = None
+    build_matrix: Optional[BuildMatrixConfig] = None
+    native_extensions_check: Optional[NativeExtensionsCheckConfig] = None
+    oci_image: Optional[OciImageConfig] = None
+    resolution_workers: Optional[ResolutionWorkersConfig] = None
 
 @dataclass
 class Config:
     root_filepath: str
     project_root_dir: Optional[str]
     package_type: Literal['code', 'layer']
-    output_type: Literal['zip', 'folder']
+    output_type: Literal['zip', 'folder', 'oci']
     python_version: str
+    architecture: Literal['x86_64', 'arm64']
     filepaths_includes: Set[str]
     folders_includes: Dict[str, BaseFolderIncludeItem]
     python_path_exclusions: Optional[BaseExcludeItem]
     global_exclusions: Optional[BaseExcludeItem]
     use_prototype_docker_pip_install: bool
+    docker_builder: Optional[DockerBuilderConfig]
     should_remove_runtime_provided_packages: bool
+    should_deduplicate_artifacts_files: bool
+    runtime_trace: Optional[RuntimeTraceConfig]
+    layer_pruning: Optional[LayerPruningConfig]
+    size_budgets: Optional[SizeBudgetsConfig]
+    layers_splitting: Optional[LayersSplittingConfig]
+    priming: Optional[PrimingConfig]
+    traces: Optional[TracesConfig]
+    artifacts_cache: Optional[ArtifactsCacheConfig]
+    dependencies_lock: Optional[DependenciesLockConfig]
+    build_matrix: Optional[BuildMatrixConfig]
+    native_extensions_check: Optional[NativeExtensionsCheckConfig]
+    oci_image: Optional[OciImageConfig]
+    resolution_workers: Optional[ResolutionWorkersConfig]
 
 
 class ConfigClient:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
 
-    def load_render_config_file(self, filepath: str, target_os: str, overriding_attributes: Optional[dict] = None) -> Config:
+    def load_render_config_file(
+            self, filepath: str, target_os: str, overriding_attributes: Optional[dict] = None, interactive: bool = True
+    ) -> Config:
         if not os.path.exists(filepath):
             raise Exception(f"Config file not found at : {filepath}")
 
         with open(filepath) as config_file:
             config_data = yaml.safe_load(config_file) or dict()
             try:
-                config = SourceConfig(**{**config_data, **(overriding_attributes or {})})
-                return ConfigClient._render_config(source_config=config, config_filepath=filepath, target_os=target_os)
+                # The attributes that have not been passed (for example, the options not used in the cli) do not override the config file.
+                config = SourceConfig(**{**config_data, **{
+                    key: value for key, value in (overriding_attributes or {}).items() if value is not None
+                }})
+                return ConfigClient._render_config(source_config=config, config_filepath=filepath, target_os=target_os, interactive=interactive)
             except ValidationError as e:
                 raise Exception(f"Error in the config file : {e}")
 
@@ -86,7 +210,7 @@ class ConfigClient:
         return [*one, *two] if one is not None and two is not None else one if one is not None else two if two is not None else None
 
     @staticmethod
-    def _render_config(source_config: SourceConfig, config_filepath: str, target_os: str) -> Config:
+    def _render_config(source_config: SourceConfig, config_filepath: str, target_os: str, interactive: bool = True) -> Config:
         config_location_dirpath: str = os.path.dirname(os.path.abspath(config_filepath))
         # We need to abspath the config filepath before trying to get its dirname, because if the filepath is relative
         # path without parent dir (ie, serverlesspack.config.yaml instead of something like app/serverlesspack.config.yaml)
@@ -97,12 +221,18 @@ class ConfigClient:
         if not os.path.isfile(rendered_absolute_root_filepath):
             raise Exception(f"No file found at {rendered_absolute_root_filepath}")
 
+        if not interactive:
+            # Automations cannot answer the prompts, so the missing attributes are errors instead of blocking them.
+            for attribute_name in ['package_type', 'output_type', 'python_version']:
+                if getattr(source_config, attribute_name) is None:
+                    raise Exception(f"The {attribute_name} must be defined in the config file or overridden when not running interactively")
+
         if source_config.package_type is None:
             import click
             source_config.package_type = click.prompt(text="Export type", type=click.Choice(['code', 'layer']))
         if source_config.output_type is None:
             import click
-            source_config.output_type = click.prompt(text="Format type", type=click.Choice(['zip', 'folder']))
+            source_config.output_type = click.prompt(text="Format type", type=click.Choice(['zip', 'folder', 'oci']))
         if source_config.python_version is None:
             from .cli import PythonVersion
             source_config.python_version = click.prompt(
@@ -116,14 +246,54 @@ class ConfigClient:
             package_type=source_config.package_type,
             output_type=source_config.output_type,
             python_version=source_config.python_version,
+            # The architecture is not prompted, since the functions were only packaged for x86_64 before it was configurable.
+            architecture=source_config.architecture if source_config.architecture is not None else 'x86_64',
             filepaths_includes=set(),
             folders_includes={},
             python_path_exclusions=source_config.python_path_exclusions,
             global_exclusions=source_config.global_exclusions,
             use_prototype_docker_pip_install=source_config.use_prototype_docker_pip_install,
-            should_remove_runtime_provided_packages=source_config.should_remove_runtime_provided_packages
+            docker_builder=source_config.docker_builder,
+            should_remove_runtime_provided_packages=source_config.should_remove_runtime_provided_packages,
+            should_deduplicate_artifacts_files=source_config.should_deduplicate_artifacts_files is not False,
+            runtime_trace=source_config.runtime_trace,
+            layer_pruning=source_config.layer_pruning,
+            size_budgets=source_config.size_budgets,
+            layers_splitting=source_config.layers_splitting,
+            priming=source_config.priming,
+            traces=source_config.traces,
+            artifacts_cache=source_config.artifacts_cache,
+            dependencies_lock=source_config.dependencies_lock,
+            build_matrix=source_config.build_matrix,
+            native_extensions_check=source_config.native_extensions_check,
+            oci_image=source_config.oci_image,
+            resolution_workers=source_config.resolution_workers
         )
 
+        if config.runtime_trace is not None:
+            config.runtime_trace.sample_events_filepaths = [
+                os.path.abspath(os.path.join(config_location_dirpath, sample_event_filepath))
+                for sample_event_filepath in config.runtime_trace.sample_events_filepaths
+            ]
+        if config.traces is not None and config.traces.filepath is not None:
+            config.traces.filepath = os.path.abspath(os.path.join(config_location_dirpath, config.traces.filepath))
+        if config.dependencies_lock is not None:
+            config.dependencies_lock.filepath = os.path.abspath(os.path.join(config_location_dirpath, config.dependencies_lock.filepath))
+        if config.oci_image is not None and config.oci_image.base_image_layout_dirpath is not None:
+            config.oci_image.base_image_layout_dirpath = os.path.abspath(os.path.join(
+                config_location_dirpath, os.path.expanduser(config.oci_image.base_image_layout_dirpath)
+            ))
+        if config.resolution_workers is not None:
+            config.resolution_workers.interpreters_paths = {
+                python_version: os.path.abspath(os.path.join(config_location_dirpath, os.path.expanduser(executable)))
+                if os.sep in executable or '/' in executable else executable
+                for python_version, executable in config.resolution_workers.interpreters_paths.items()
+            }
+        if config.artifacts_cache is not None:
+            config.artifacts_cache.dirpath = os.path.abspath(os.path.join(
+                config_location_dirpath, os.path.expanduser(config.artifacts_cache.dirpath)
+            ))
+
         if source_config.filepaths_includes is not None:
             for filepath in source_config.filepaths_includes:
                 absolute_filepath: str = os.path.abspath(filepath)
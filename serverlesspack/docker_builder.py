@@ -0,0 +1,146 @@
+import atexit
+import os
+import subprocess
+import threading
+import uuid
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import click
+
+from .configuration_client import DockerBuilderConfig
+from .exceptions import DockerBuilderError
+from .instrumentation import add_counter
+from .packager import _construct_pip_install_packages_command
+
+
+CONTAINER_PIP_CACHE_DIRPATH = "/var/cache/serverlesspack-pip"
+CONTAINER_BUILDS_DIRPATH = "/tmp/serverlesspack-builds"
+BUILDER_CONTAINER_LABEL = "serverlesspack.builder"
+
+
+def get_build_image(python_version: str) -> str:
+    return f"public.ecr.aws/sam/build-python{python_version}"
+
+def get_docker_platform(platform: Optional[str]) -> Optional[str]:
+    # The build images are multi architectures, and the arm64 image is emulated on x86_64 machines.
+    return 'linux/arm64' if platform is not None and platform.endswith('_aarch64') else None
+
+
+class DockerBuilder:
+    """Long-lived container of a build image, in which the dependencies are installed with docker exec instead of
+    starting a new container for each build. The pip cache of the containers created by serverlesspack is a docker
+    volume, so the wheels are only downloaded once, even when a builder container is recreated. The requirements files
+    and the installed packages are copied with docker cp, which does not require the folders to be shared with docker."""
+
+    def __init__(self, python_version: str, platform: Optional[str], config: DockerBuilderConfig):
+        self.python_version = python_version
+        self.platform = platform
+        self.config = config
+        self.container_name: str = config.container_name or (
+            f"serverlesspack-builder-python{python_version}-{'arm64' if get_docker_platform(platform) is not None else 'x86_64'}"
+        )
+        self._lock = threading.Lock()
+        # Only the containers created by the builder are removed, never an existing container reused by its name.
+        self._was_created = False
+
+    def _docker(self, arguments: List[str], capture_output: bool = False, check: bool = True) -> subprocess.CompletedProcess:
+        command: List[str] = [self.config.docker_executable, *arguments]
+        try:
+            completed_process = subprocess.run(command, capture_output=capture_output, encoding='utf-8')
+        except OSError as e:
+            raise DockerBuilderError(container_name=self.container_name, command=command, error=str(e))
+        if check and completed_process.returncode != 0:
+            raise DockerBuilderError(
+                container_name=self.container_name, command=command,
+                error=(completed_process.stderr or '').strip() if capture_output else f"Exited with code {completed_process.returncode}"
+            )
+        return completed_process
+
+    def get_container_status(self) -> Optional[str]:
+        completed_process = self._docker(['inspect', '--format', '{{.State.Status}}', self.container_name], capture_output=True, check=False)
+        return completed_process.stdout.strip() if completed_process.returncode == 0 else None
+
+    def ensure_started(self):
+        container_status: Optional[str] = self.get_container_status()
+        if container_status == 'running':
+            add_counter('docker_builder_reused')
+        elif container_status is not None:
+            click.secho(f"Starting the docker builder container {self.container_name}", fg='blue')
+            self._docker(['start', self.container_name], capture_output=True)
+        else:
+            click.secho(f"Creating the docker builder container {self.container_name}", fg='blue')
+            platform_arguments: List[str] = ['--platform', get_docker_platform(self.platform)] if get_docker_platform(self.platform) is not None else []
+            cache_volume_arguments: List[str] = (
+                ['--mount', f"type=volume,source={self.config.pip_cache_volume},target={CONTAINER_PIP_CACHE_DIRPATH}"]
+                if self.config.pip_cache_volume is not None else []
+            )
+            # The container does nothing by itself, it only waits for the installations executed in it.
+            self._docker([
+                'run', '--detach', '--name', self.container_name, '--label', f"{BUILDER_CONTAINER_LABEL}=true",
+                *platform_arguments, *cache_volume_arguments, '--entrypoint', 'tail',
+                self.config.image or get_build_image(python_version=self.python_version), '-f', '/dev/null'
+            ], capture_output=True)
+            add_counter('docker_builder_created')
+            self._was_created = True
+
+    def install(
+            self, packages_names: Union[Set[str], List[str]], target_dirpath: str,
+            should_remove_runtime_provided_packages: bool = True, requirements_filepath: Optional[str] = None
+    ) -> subprocess.CompletedProcess:
+        # The installations of a same builder are executed one after the other, since the pip cache is not safe to share.
+        with self._lock:
+            self.ensure_started()
+            build_dirpath: str = f"{CONTAINER_BUILDS_DIRPATH}/{uuid.uuid4()}"
+            self._docker(['exec', self.container_name, 'mkdir', '-p', f"{build_dirpath}/output"], capture_output=True)
+            try:
+                container_requirements_filepath: Optional[str] = None
+                if requirements_filepath is not None:
+                    container_requirements_filepath = f"{build_dirpath}/requirements.txt"
+                    self._docker(['cp', requirements_filepath, f"{self.container_name}:{container_requirements_filepath}"], capture_output=True)
+                pip_install_command: List[str] = _construct_pip_install_packages_command(
+                    packages_names=packages_names, target_dirpath=f"{build_dirpath}/output",
+                    python_version=self.python_version, platform=self.platform,
+                    should_remove_runtime_provided_packages=should_remove_runtime_provided_packages,
+                    requirements_filepath=container_requirements_filepath,
+                    pip_executable=['pip']
+                )
+                cache_environment_arguments: List[str] = (
+                    ['--env', f"PIP_CACHE_DIR={CONTAINER_PIP_CACHE_DIRPATH}"] if self.config.pip_cache_volume is not None else []
+                )
+                # A failed installation raises before its partial output is copied, and the output of pip is not
+                # captured, so that its progress and errors are displayed like with the local installations.
+                installation_result: subprocess.CompletedProcess = self._docker(
+                    ['exec', *cache_environment_arguments, self.container_name, *pip_install_command]
+                )
+                # The content of the output folder is merged into the target folder, which can already contain packages.
+                os.makedirs(os.path.dirname(os.path.abspath(target_dirpath)), exist_ok=True)
+                self._docker(['cp', f"{self.container_name}:{build_dirpath}/output/.", target_dirpath], capture_output=True)
+                add_counter('docker_builder_installations')
+                return installation_result
+            finally:
+                self._docker(['exec', self.container_name, 'rm', '-rf', build_dirpath], capture_output=True, check=False)
+
+    def remove(self):
+        with self._lock:
+            if self._was_created:
+                self._docker(['rm', '--force', self.container_name], capture_output=True, check=False)
+                self._was_created = False
+
+
+_docker_builders: Dict[Tuple[str, str, Optional[str]], DockerBuilder] = dict()
+_docker_builders_lock = threading.Lock()
+
+def _remove_temporary_builders():
+    for docker_builder in _docker_builders.values():
+        if docker_builder.config.keep_running is not True:
+            docker_builder.remove()
+
+atexit.register(_remove_temporary_builders)
+
+def get_docker_builder(python_version: str, platform: Optional[str], config: DockerBuilderConfig) -> DockerBuilder:
+    """The builder of the python version and platform, shared by the installations of the process. The builders whose
+    config does not keep them running are removed when the process exits, and not after each installation, since the
+    pipelined build installs the dependencies in multiple batches."""
+    docker_builder = DockerBuilder(python_version=python_version, platform=platform, config=config)
+    with _docker_builders_lock:
+        return _docker_builders.setdefault((docker_builder.container_name, config.docker_executable, config.image), docker_builder)
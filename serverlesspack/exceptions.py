@@ -15,3 +15,139 @@ class OutputDirpathTooLow(Exception):
                 'output_base_dirpath': self.output_base_dirpath
             }
         )
+
+
+class SizeBudgetExceeded(Exception):
+    def __init__(self, exceeded_budgets: dict, top_offenders: list):
+        self.exceeded_budgets = exceeded_budgets
+        self.top_offenders = top_offenders
+
+    def __str__(self):
+        return message_with_vars(
+            message="The packaged artifacts exceed the configured size budgets.",
+            vars_dict={
+                **{
+                    budget_name: f"{budget_entry['actual']} bytes for a limit of {budget_entry['limit']} bytes"
+                    for budget_name, budget_entry in self.exceeded_budgets.items()
+                },
+                **{f"top_offender_{i + 1}": offender for i, offender in enumerate(self.top_offenders)}
+            }
+        )
+
+
+class LockfileDrift(Exception):
+    def __init__(self, lockfile_filepath: str, drift_items: list):
+        self.lockfile_filepath = lockfile_filepath
+        self.drift_items = drift_items
+
+    def __str__(self):
+        return message_with_vars(
+            message="The dependencies detected by the resolution do not match the lockfile. "
+                    "Update the lockfile with the lock command, or use the auto or update lock mode.",
+            vars_dict={
+                'lockfile_filepath': self.lockfile_filepath,
+                **{
+                    f"{drift_item.name}": f"{drift_item.kind} (locked {drift_item.locked_version}, installed {drift_item.installed_version})"
+                    for drift_item in self.drift_items
+                }
+            }
+        )
+
+
+class LockedPackagesWithoutHashes(Exception):
+    def __init__(self, packages_names: list):
+        self.packages_names = packages_names
+
+    def __str__(self):
+        return message_with_vars(
+            message="Some locked packages have no hashes, and pip only installs the packages of a requirements file "
+                    "when all of them are hashed. Update the lockfile with the lock command.",
+            vars_dict={'packages_names': ', '.join(self.packages_names)}
+        )
+
+
+class NativeExtensionsMismatch(Exception):
+    def __init__(self, architecture: str, max_glibc_version: str, mismatches: list):
+        self.architecture = architecture
+        self.max_glibc_version = max_glibc_version
+        self.mismatches = mismatches
+
+    def __str__(self):
+        return message_with_vars(
+            message="Some packaged native extensions cannot be loaded by the Lambda runtime. Install wheels built for "
+                    "the target architecture and glibc, or exclude the files in the native_extensions_check config section.",
+            vars_dict={
+                'architecture': self.architecture,
+                'max_glibc_version': self.max_glibc_version,
+                **{
+                    mismatch.relative_filepath: f"{mismatch.kind} (expected {mismatch.expected}, found {mismatch.found})"
+                    for mismatch in self.mismatches
+                }
+            }
+        )
+
+
+class ResolutionWorkerError(Exception):
+    def __init__(self, executable: str, method: str, error: str):
+        self.executable = executable
+        self.method = method
+        self.error = error
+
+    def __str__(self):
+        return message_with_vars(
+            message="A request to the resolution worker of the target interpreter failed.",
+            vars_dict={'executable': self.executable, 'method': self.method, 'error': self.error}
+        )
+
+
+class DockerBuilderError(Exception):
+    def __init__(self, container_name: str, command: list, error: str):
+        self.container_name = container_name
+        self.command = command
+        self.error = error
+
+    def __str__(self):
+        return message_with_vars(
+            message="A command of the docker builder container failed.",
+            vars_dict={'container_name': self.container_name, 'command': ' '.join(self.command), 'error': self.error}
+        )
+
+
+class RuntimeTraceFailed(Exception):
+    def __init__(self, handler_module_name: str, errors: list):
+        self.handler_module_name = handler_module_name
+        self.errors = errors
+
+    def __str__(self):
+        return message_with_vars(
+            message="The handler failed during the runtime trace. The modules it would have loaded after the error are "
+                    "unknown, so the traced files cannot be used to package a minimal artifact.",
+            vars_dict={
+                'handler_module_name': self.handler_module_name,
+                **{f"error_{i + 1}": error for i, error in enumerate(self.errors)}
+            }
+        )
+
+
+class PackagesInstallationFailed(Exception):
+    def __init__(self, packages_names: list, returncode: int):
+        self.packages_names = packages_names
+        self.returncode = returncode
+
+    def __str__(self):
+        return message_with_vars(
+            message="The installation of the packages failed, the installed files would be incomplete.",
+            vars_dict={'packages_names': ', '.join(self.packages_names), 'returncode': self.returncode}
+        )
+
+
+class FilesUpdateFailed(Exception):
+    def __init__(self, errors: dict):
+        # The error message of each file that could not be updated, by filepath.
+        self.errors = errors
+
+    def __str__(self):
+        return message_with_vars(
+            message="Some modified files could not be updated, their previous imports are kept until they are fixed.",
+            vars_dict=self.errors
+        )
@@ -0,0 +1,253 @@
+import json
+import os
+import struct
+from abc import ABC, abstractmethod
+from array import array
+from typing import List, Dict, Optional, Iterator, Tuple, Any
+
+
+EDGE_TYPE_LOCAL = "local"
+EDGE_TYPE_LIBRARY = "library"
+EDGE_TYPE_INIT = "__init__"
+EDGE_TYPES = [EDGE_TYPE_LOCAL, EDGE_TYPE_LIBRARY, EDGE_TYPE_INIT]
+EDGE_TYPES_IDS = {edge_type: i for i, edge_type in enumerate(EDGE_TYPES)}
+NO_DEPENDENCY_NAME_ID = -1
+
+TRACES_FORMATS_EXTENSIONS = {'ndjson': 'ndjson', 'binary': 'bin'}
+BINARY_MAGIC = b'SPTRACE\x01'
+# The binary format is a sequence of records, each starting with a one byte tag. The strings (files paths and
+# dependencies names) are written once when first seen, and the edges refer to them by their interned ids.
+BINARY_NODE_RECORD = struct.Struct('<cII')
+BINARY_DEPENDENCY_NAME_RECORD = struct.Struct('<cII')
+BINARY_EDGE_RECORD = struct.Struct('<cIIBi')
+
+
+class BaseTracesWriter(ABC):
+    """Writer of the nodes, dependencies names and edges of an import graph. Each node and dependency name is written
+    once, before the first edge referring to it, and the edges receive both the id and the value of their dependency name."""
+
+    def __init__(self, filepath: str):
+        output_dirpath: str = os.path.dirname(os.path.abspath(filepath))
+        if not os.path.exists(output_dirpath):
+            os.makedirs(output_dirpath)
+        self.filepath = filepath
+
+    @abstractmethod
+    def write_node(self, node_id: int, path: str):
+        pass
+
+    @abstractmethod
+    def write_dependency_name(self, dependency_name_id: int, dependency_name: str):
+        pass
+
+    @abstractmethod
+    def write_edge(self, source_id: int, target_id: int, edge_type_id: int, dependency_name_id: int, dependency_name: Optional[str]):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class NdjsonTracesWriter(BaseTracesWriter):
+    """One JSON object per line, with the nodes declared before the first edge referring to them. The format has no
+    dependencies names records : the name is written inline in each library edge, which keeps every line readable by
+    itself, and the loader interns the names again from the edges."""
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath=filepath)
+        self.file = open(filepath, 'w', encoding='utf-8')
+
+    def write_node(self, node_id: int, path: str):
+        self.file.write(json.dumps({'node': node_id, 'path': path}) + "\n")
+
+    def write_dependency_name(self, dependency_name_id: int, dependency_name: str):
+        # Nothing to write, since the dependencies names are written inline in the edges.
+        pass
+
+    def write_edge(self, source_id: int, target_id: int, edge_type_id: int, dependency_name_id: int, dependency_name: Optional[str]):
+        edge: Dict[str, Any] = {'source': source_id, 'target': target_id, 'type': EDGE_TYPES[edge_type_id]}
+        if dependency_name is not None:
+            edge['dependency_name'] = dependency_name
+        self.file.write(json.dumps(edge) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class BinaryTracesWriter(BaseTracesWriter):
+    def __init__(self, filepath: str):
+        super().__init__(filepath=filepath)
+        self.file = open(filepath, 'wb')
+        self.file.write(BINARY_MAGIC)
+
+    def write_node(self, node_id: int, path: str):
+        encoded_path: bytes = path.encode('utf-8')
+        self.file.write(BINARY_NODE_RECORD.pack(b'N', node_id, len(encoded_path)))
+        self.file.write(encoded_path)
+
+    def write_dependency_name(self, dependency_name_id: int, dependency_name: str):
+        encoded_dependency_name: bytes = dependency_name.encode('utf-8')
+        self.file.write(BINARY_DEPENDENCY_NAME_RECORD.pack(b'D', dependency_name_id, len(encoded_dependency_name)))
+        self.file.write(encoded_dependency_name)
+
+    def write_edge(self, source_id: int, target_id: int, edge_type_id: int, dependency_name_id: int, dependency_name: Optional[str]):
+        self.file.write(BINARY_EDGE_RECORD.pack(b'E', source_id, target_id, edge_type_id, dependency_name_id))
+
+    def close(self):
+        self.file.close()
+
+traces_writers_by_format_switch = {'ndjson': NdjsonTracesWriter, 'binary': BinaryTracesWriter}
+def make_traces_writer(filepath: str, traces_format: str) -> BaseTracesWriter:
+    writer_class = traces_writers_by_format_switch.get(traces_format, None)
+    if writer_class is None:
+        raise Exception(f"Traces format {traces_format} not supported")
+    return writer_class(filepath=filepath)
+
+
+class ImportGraph:
+    """Import graph of the resolved files. The files paths and the dependencies names are interned, and the edges are
+    stored in typed arrays of ids instead of a list of dicts. Iterating over the graph still yields the edges as
+    dicts with the source, target, type and dependency_name keys. When a writer is attached, the nodes and edges
+    are streamed to it as soon as they are added."""
+
+    def __init__(self, writer: Optional[BaseTracesWriter] = None):
+        self.writer = writer
+        self.nodes: List[str] = list()
+        self.nodes_ids: Dict[str, int] = dict()
+        self.dependencies_names: List[str] = list()
+        self.dependencies_names_ids: Dict[str, int] = dict()
+        self.sources_ids = array('I')
+        self.targets_ids = array('I')
+        self.edges_types_ids = array('B')
+        self.edges_dependencies_names_ids = array('i')
+
+    def intern_node(self, path: str) -> int:
+        node_id: Optional[int] = self.nodes_ids.get(path, None)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.nodes.append(path)
+            self.nodes_ids[path] = node_id
+            if self.writer is not None:
+                self.writer.write_node(node_id=node_id, path=path)
+        return node_id
+
+    def intern_dependency_name(self, dependency_name: Optional[str]) -> int:
+        if dependency_name is None:
+            return NO_DEPENDENCY_NAME_ID
+        dependency_name_id: Optional[int] = self.dependencies_names_ids.get(dependency_name, None)
+        if dependency_name_id is None:
+            dependency_name_id = len(self.dependencies_names)
+            self.dependencies_names.append(dependency_name)
+            self.dependencies_names_ids[dependency_name] = dependency_name_id
+            if self.writer is not None:
+                self.writer.write_dependency_name(dependency_name_id=dependency_name_id, dependency_name=dependency_name)
+        return dependency_name_id
+
+    def add_edge_ids(self, source_id: int, target_id: int, edge_type_id: int, dependency_name_id: int = NO_DEPENDENCY_NAME_ID):
+        self.sources_ids.append(source_id)
+        self.targets_ids.append(target_id)
+        self.edges_types_ids.append(edge_type_id)
+        self.edges_dependencies_names_ids.append(dependency_name_id)
+        if self.writer is not None:
+            self.writer.write_edge(
+                source_id=source_id, target_id=target_id, edge_type_id=edge_type_id, dependency_name_id=dependency_name_id,
+                dependency_name=self.dependencies_names[dependency_name_id] if dependency_name_id != NO_DEPENDENCY_NAME_ID else None
+            )
+
+    def add_edge(self, source: str, target: str, edge_type: str, dependency_name: Optional[str] = None):
+        self.add_edge_ids(
+            source_id=self.intern_node(source), target_id=self.intern_node(target),
+            edge_type_id=EDGE_TYPES_IDS[edge_type], dependency_name_id=self.intern_dependency_name(dependency_name)
+        )
+
+    def iter_edges_ids(self) -> Iterator[Tuple[int, int, int, int]]:
+        return zip(self.sources_ids, self.targets_ids, self.edges_types_ids, self.edges_dependencies_names_ids)
+
+    def __len__(self) -> int:
+        return len(self.sources_ids)
+
+    def __iter__(self) -> Iterator[dict]:
+        for source_id, target_id, edge_type_id, dependency_name_id in self.iter_edges_ids():
+            edge: Dict[str, Any] = {'source': self.nodes[source_id], 'target': self.nodes[target_id], 'type': EDGE_TYPES[edge_type_id]}
+            if dependency_name_id != NO_DEPENDENCY_NAME_ID:
+                edge['dependency_name'] = self.dependencies_names[dependency_name_id]
+            yield edge
+
+    def write(self, writer: BaseTracesWriter):
+        """Write the whole graph to a writer, for graphs that were not streamed while being built."""
+        for node_id, path in enumerate(self.nodes):
+            writer.write_node(node_id=node_id, path=path)
+        for dependency_name_id, dependency_name in enumerate(self.dependencies_names):
+            writer.write_dependency_name(dependency_name_id=dependency_name_id, dependency_name=dependency_name)
+        for source_id, target_id, edge_type_id, dependency_name_id in self.iter_edges_ids():
+            writer.write_edge(
+                source_id=source_id, target_id=target_id, edge_type_id=edge_type_id, dependency_name_id=dependency_name_id,
+                dependency_name=self.dependencies_names[dependency_name_id] if dependency_name_id != NO_DEPENDENCY_NAME_ID else None
+            )
+
+
+def load_binary_import_graph(filepath: str) -> ImportGraph:
+    graph = ImportGraph()
+    with open(filepath, 'rb') as file:
+        data: bytes = file.read()
+    if not data.startswith(BINARY_MAGIC):
+        raise Exception(f"{filepath} is not a binary traces file")
+
+    # The edges ids are parsed directly into the arrays of the graph, without creating any intermediate object.
+    sources_ids, targets_ids = graph.sources_ids, graph.targets_ids
+    edges_types_ids, edges_dependencies_names_ids = graph.edges_types_ids, graph.edges_dependencies_names_ids
+    unpack_edge = BINARY_EDGE_RECORD.unpack_from
+    edge_record_size: int = BINARY_EDGE_RECORD.size
+    string_record_size: int = BINARY_NODE_RECORD.size
+    offset: int = len(BINARY_MAGIC)
+    data_length: int = len(data)
+    while offset < data_length:
+        tag: bytes = data[offset:offset + 1]
+        if tag == b'E':
+            _, source_id, target_id, edge_type_id, dependency_name_id = unpack_edge(data, offset)
+            sources_ids.append(source_id)
+            targets_ids.append(target_id)
+            edges_types_ids.append(edge_type_id)
+            edges_dependencies_names_ids.append(dependency_name_id)
+            offset += edge_record_size
+        elif tag == b'N' or tag == b'D':
+            _, string_id, string_length = BINARY_NODE_RECORD.unpack_from(data, offset)
+            offset += string_record_size
+            string_value: str = data[offset:offset + string_length].decode('utf-8')
+            offset += string_length
+            if tag == b'N':
+                graph.nodes.append(string_value)
+                graph.nodes_ids[string_value] = string_id
+            else:
+                graph.dependencies_names.append(string_value)
+                graph.dependencies_names_ids[string_value] = string_id
+        else:
+            raise Exception(f"Unknown record tag {tag!r} at offset {offset} of {filepath}")
+    return graph
+
+def load_ndjson_import_graph(filepath: str) -> ImportGraph:
+    graph = ImportGraph()
+    with open(filepath, 'r', encoding='utf-8') as file:
+        for line in file:
+            record: dict = json.loads(line)
+            if 'node' in record:
+                graph.nodes.append(record['path'])
+                graph.nodes_ids[record['path']] = record['node']
+            else:
+                graph.add_edge_ids(
+                    source_id=record['source'], target_id=record['target'], edge_type_id=EDGE_TYPES_IDS[record['type']],
+                    dependency_name_id=graph.intern_dependency_name(record.get('dependency_name', None))
+                )
+    return graph
+
+def load_import_graph(filepath: str) -> ImportGraph:
+    """Load a traces file written in any of the supported formats, detected from the start of the file."""
+    with open(filepath, 'rb') as file:
+        is_binary: bool = file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    return load_binary_import_graph(filepath=filepath) if is_binary else load_ndjson_import_graph(filepath=filepath)
@@ -0,0 +1,312 @@
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import click
+from asciitree import LeftAligned
+
+from .configuration_client import ConfigClient, Config
+from .imports_resolver import Resolver
+from .packager import make_base_python_layer_packages_dir
+from .resolution_workers import get_resolution_worker, ResolutionWorker
+from .runtime_baseline import RuntimeBaseline, InstalledDistribution, load_runtime_baseline, read_installed_distributions
+from .utils import relative_filepath_to_module_name, message_with_vars, normalize_distribution_name
+
+
+import_time_line_regex = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+@dataclass
+class ImportTimeNode:
+    module_name: str
+    self_us: int
+    cumulative_us: int
+    children: List['ImportTimeNode'] = field(default_factory=list)
+
+def parse_import_time_output(output: str) -> List[ImportTimeNode]:
+    """Parse the output of python -X importtime into a tree. The lines are written once the import of a module
+    is finished, so the children of a module are always written before the module itself, with a deeper indent."""
+    pending_nodes_by_level: Dict[int, List[ImportTimeNode]] = dict()
+    for line in output.splitlines():
+        line_match = import_time_line_regex.match(line)
+        if line_match is None:
+            continue
+        # The module name of a top level import is prefixed by a single space, and each nesting level adds two spaces.
+        level: int = (len(line_match.group(3)) - 1) // 2
+        node = ImportTimeNode(
+            module_name=line_match.group(4), self_us=int(line_match.group(1)), cumulative_us=int(line_match.group(2)),
+            children=pending_nodes_by_level.pop(level + 1, [])
+        )
+        pending_nodes_by_level.setdefault(level, []).append(node)
+    return pending_nodes_by_level.get(0, [])
+
+
+def extract_artifact(artifact_path: str, destination_dirpath: str):
+    if os.path.isdir(artifact_path):
+        shutil.copytree(artifact_path, destination_dirpath, dirs_exist_ok=True)
+    else:
+        with zipfile.ZipFile(artifact_path, 'r') as zip_object:
+            zip_object.extractall(destination_dirpath)
+
+def get_profiling_interpreter_executable(config: Config) -> str:
+    """The interpreter of the target python version used by the resolution workers, or the running interpreter
+    when the resolution is done in process, so that the imports are timed with the python version of the runtime."""
+    resolution_worker: Optional[ResolutionWorker] = get_resolution_worker(
+        python_version=config.python_version, config=config.resolution_workers
+    )
+    return resolution_worker.executable if resolution_worker is not None else sys.executable
+
+def get_interpreter_site_packages_dirpaths(executable: str) -> List[str]:
+    result = subprocess.run(
+        [executable, '-c', 'import json, site; print(json.dumps([*site.getsitepackages(), site.getusersitepackages()]))'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise Exception(message_with_vars(
+            message="Could not list the site-packages folders of the interpreter",
+            vars_dict={'executable': executable, 'stderr': result.stderr.decode('utf-8', errors='replace')[-4000:]}
+        ))
+    return [dirpath for dirpath in json.loads(result.stdout.decode('utf-8')) if os.path.isdir(dirpath)]
+
+def copy_runtime_provided_distributions(
+        site_packages_dirpaths: List[str], destination_dirpath: str, python_version: str
+) -> List[str]:
+    """Copy the distributions that the Lambda runtime provides (like boto3) from the site-packages of the interpreter,
+    since they have been removed from the packaged layer, and the handler would otherwise fail to import them. Only the
+    first copy of a distribution is used, like with the order of the python path. Return the copied names."""
+    baseline: RuntimeBaseline = load_runtime_baseline(python_version=python_version)
+    copied_names: List[str] = list()
+    for site_packages_dirpath in site_packages_dirpaths:
+        installed_distribution: InstalledDistribution
+        for installed_distribution in read_installed_distributions(layer_dirpath=site_packages_dirpath):
+            name: str = normalize_distribution_name(installed_distribution.name)
+            if not baseline.provides(name) or name in copied_names:
+                continue
+            for relative_filepath in sorted(installed_distribution.relative_filepaths):
+                source_filepath: str = os.path.join(site_packages_dirpath, relative_filepath)
+                # The scripts of the distributions are recorded outside of the site-packages folder.
+                if relative_filepath.startswith('../') or not os.path.isfile(source_filepath):
+                    continue
+                destination_filepath: str = os.path.join(destination_dirpath, relative_filepath)
+                os.makedirs(os.path.dirname(destination_filepath), exist_ok=True)
+                shutil.copy2(source_filepath, destination_filepath)
+            copied_names.append(name)
+    return copied_names
+
+def unpack_artifacts_to_lambda_layout(
+        code_artifact_path: str, layers_artifacts_paths: List[str], destination_dirpath: str,
+        python_version: str, package_type: str, runtime_site_packages_dirpaths: Optional[List[str]] = None
+) -> List[str]:
+    """Unpack the artifacts in a folder mirroring the filesystem of Lambda, and return the python paths in the same
+    order as the Lambda runtime (the function code in /var/task, followed by the layers paths inside /opt, and by the
+    distributions provided by the runtime in /var/runtime, copied from the given site-packages folders)."""
+    task_dirpath: str = os.path.join(destination_dirpath, 'var', 'task')
+    opt_dirpath: str = os.path.join(destination_dirpath, 'opt')
+    runtime_dirpath: str = os.path.join(destination_dirpath, 'var', 'runtime')
+    os.makedirs(task_dirpath, exist_ok=True)
+    os.makedirs(opt_dirpath, exist_ok=True)
+    os.makedirs(runtime_dirpath, exist_ok=True)
+
+    # When packaged as a layer, the code is already prefixed by the python/lib/pythonX/site-packages folders.
+    extract_artifact(artifact_path=code_artifact_path, destination_dirpath=task_dirpath if package_type == 'code' else opt_dirpath)
+    for layer_artifact_path in layers_artifacts_paths:
+        extract_artifact(artifact_path=layer_artifact_path, destination_dirpath=opt_dirpath)
+    copy_runtime_provided_distributions(
+        site_packages_dirpaths=runtime_site_packages_dirpaths or [],
+        destination_dirpath=runtime_dirpath, python_version=python_version
+    )
+
+    return [
+        task_dirpath,
+        os.path.join(opt_dirpath, *Path(make_base_python_layer_packages_dir(python_version=python_version)).parts),
+        os.path.join(opt_dirpath, 'python'),
+        runtime_dirpath,
+    ]
+
+def run_import_time(
+        handler_module_name: str, python_paths: List[str], runs: int,
+        isolated_from_local_site_packages: bool = True, executable: str = sys.executable
+) -> List[List[ImportTimeNode]]:
+    command: List[str] = [executable, '-X', 'importtime']
+    if isolated_from_local_site_packages is True:
+        # Without the site module, only the standard library and the unpacked artifacts are importable, like in Lambda.
+        command.append('-S')
+    command.extend(['-c', f"import {handler_module_name}"])
+
+    environment: Dict[str, str] = {**os.environ, 'PYTHONPATH': os.pathsep.join(python_paths), 'PYTHONDONTWRITEBYTECODE': '1'}
+    runs_trees: List[List[ImportTimeNode]] = list()
+    for i_run in range(runs):
+        # Each run is done in a fresh process, since the modules are only imported once per interpreter.
+        result = subprocess.run(command, env=environment, cwd=python_paths[0], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr: str = result.stderr.decode('utf-8', errors='replace')
+        if result.returncode != 0:
+            raise Exception(message_with_vars(
+                message="The import of the handler failed in the Lambda mirroring layout",
+                vars_dict={'handler_module_name': handler_module_name, 'stderr': stderr[-4000:]}
+            ))
+        # The modules imported during the startup of the interpreter are not related to the handler.
+        runs_trees.append([
+            root_node for root_node in parse_import_time_output(output=stderr)
+            if root_node.module_name == handler_module_name
+        ])
+    return runs_trees
+
+
+def aggregate_runs_trees(runs_trees: List[List[ImportTimeNode]]) -> Dict[str, dict]:
+    """Aggregate the runs by module, using the median of the runs to be less sensitive to a single noisy run."""
+    modules_samples: Dict[str, dict] = dict()
+
+    def visit(node: ImportTimeNode, parent_module_name: Optional[str]):
+        module_samples = modules_samples.setdefault(node.module_name, {'parent': parent_module_name, 'self_us': [], 'cumulative_us': []})
+        module_samples['self_us'].append(node.self_us)
+        module_samples['cumulative_us'].append(node.cumulative_us)
+        for child_node in node.children:
+            visit(node=child_node, parent_module_name=node.module_name)
+
+    for run_tree in runs_trees:
+        for root_node in run_tree:
+            visit(node=root_node, parent_module_name=None)
+
+    return {
+        module_name: {
+            'parent': module_samples['parent'],
+            'self_us': int(statistics.median(module_samples['self_us'])),
+            'cumulative_us': int(statistics.median(module_samples['cumulative_us'])),
+        } for module_name, module_samples in modules_samples.items()
+    }
+
+def get_modules_import_sites(resolver: Resolver, output_base_dirpath: str) -> Dict[str, List[str]]:
+    """Map the top level module names to the files of the resolved code that imports them."""
+    import_sites: Dict[str, set] = dict()
+    for trace in resolver.traces:
+        target_path = Path(trace['target'])
+        if 'site-packages' in target_path.parts:
+            module_name: str = Path(target_path.parts[target_path.parts.index('site-packages') + 1]).stem
+        else:
+            module_name = relative_filepath_to_module_name(os.path.relpath(trace['target'], output_base_dirpath))
+        import_sites.setdefault(module_name, set()).add(os.path.relpath(trace['source'], output_base_dirpath))
+    return {module_name: sorted(sources) for module_name, sources in import_sites.items()}
+
+def find_regressions(
+        modules_costs: Dict[str, dict], baseline_modules_costs: Dict[str, dict],
+        regression_threshold: float, min_regression_us: int
+) -> List[dict]:
+    regressions: List[dict] = list()
+    for module_name, module_costs in modules_costs.items():
+        baseline_cumulative_us: int = baseline_modules_costs.get(module_name, {}).get('cumulative_us', 0)
+        delta_us: int = module_costs['cumulative_us'] - baseline_cumulative_us
+        if delta_us > min_regression_us and module_costs['cumulative_us'] > baseline_cumulative_us * (1 + regression_threshold):
+            regressions.append({
+                'module_name': module_name, 'baseline_cumulative_us': baseline_cumulative_us,
+                'cumulative_us': module_costs['cumulative_us'], 'delta_us': delta_us
+            })
+    return sorted(regressions, key=lambda item: item['delta_us'], reverse=True)
+
+
+def get_built_artifacts_paths(dist_dirpath: str) -> Tuple[str, List[str]]:
+    code_artifact_path: Optional[str] = None
+    for candidate_path in [os.path.join(dist_dirpath, 'build.zip'), os.path.join(dist_dirpath, 'build')]:
+        if os.path.exists(candidate_path):
+            code_artifact_path = candidate_path
+            break
+    if code_artifact_path is None:
+        raise Exception(f"No build artifact found in {dist_dirpath}. Package the application before profiling it.")
+
+    layers_artifacts_paths: List[str] = list()
+    layers_manifest_filepath: str = os.path.join(dist_dirpath, 'lambda_layers.json')
+    if os.path.isfile(layers_manifest_filepath):
+        with open(layers_manifest_filepath, 'r') as layers_manifest_file:
+            layers_artifacts_paths = [layer_entry['path'] for layer_entry in json.load(layers_manifest_file)]
+    else:
+        for candidate_path in [os.path.join(dist_dirpath, 'lambda_layer.zip'), os.path.join(dist_dirpath, 'lambda_layer')]:
+            if os.path.exists(candidate_path):
+                layers_artifacts_paths.append(candidate_path)
+                break
+    return code_artifact_path, layers_artifacts_paths
+
+def print_import_costs_tree(modules_costs: Dict[str, dict], import_sites: Dict[str, List[str]], max_children: int = 10):
+    children_by_parent: Dict[Optional[str], List[str]] = dict()
+    for module_name, module_costs in modules_costs.items():
+        children_by_parent.setdefault(module_costs['parent'], []).append(module_name)
+
+    def make_tree(parent_module_name: Optional[str]) -> dict:
+        children_names: List[str] = sorted(
+            children_by_parent.get(parent_module_name, []),
+            key=lambda name: modules_costs[name]['cumulative_us'], reverse=True
+        )[:max_children]
+        return {
+            f"{name} : {modules_costs[name]['cumulative_us'] / 1000:.1f} ms"
+            f"{f' (imported from {import_sites[name]})' if name in import_sites else ''}": make_tree(parent_module_name=name)
+            for name in children_names
+        }
+
+    print(LeftAligned()({'Import costs': make_tree(parent_module_name=None)}))
+
+
+def profile_import_costs_api(
+        target_os: str, config_filepath: str, runs: int = 5, verbose: bool = False,
+        baseline_filepath: Optional[str] = None, should_save_baseline: bool = False,
+        regression_threshold: float = 0.2, min_regression_us: int = 1000,
+        fail_on_regression: bool = False, isolated_from_local_site_packages: bool = True
+) -> dict:
+    from .cli import python_path_wrapper, resolve_config_files, get_output_base_dirpath
+
+    config: Config = ConfigClient(verbose=verbose).load_render_config_file(filepath=config_filepath, target_os=target_os)
+    output_base_dirpath: str = str(get_output_base_dirpath(config=config, config_filepath=config_filepath))
+    dist_dirpath: str = os.path.join(os.path.dirname(config_filepath), "dist")
+    code_artifact_path, layers_artifacts_paths = get_built_artifacts_paths(dist_dirpath=dist_dirpath)
+
+    handler_module_name: str = relative_filepath_to_module_name(os.path.relpath(config.root_filepath, output_base_dirpath))
+    executable: str = get_profiling_interpreter_executable(config=config)
+    with tempfile.TemporaryDirectory() as lambda_layout_dirpath:
+        python_paths = unpack_artifacts_to_lambda_layout(
+            code_artifact_path=code_artifact_path, layers_artifacts_paths=layers_artifacts_paths,
+            destination_dirpath=lambda_layout_dirpath, python_version=config.python_version, package_type=config.package_type,
+            runtime_site_packages_dirpaths=get_interpreter_site_packages_dirpaths(executable=executable)
+        )
+        runs_trees = run_import_time(
+            handler_module_name=handler_module_name, python_paths=python_paths, runs=runs,
+            isolated_from_local_site_packages=isolated_from_local_site_packages, executable=executable
+        )
+    modules_costs: Dict[str, dict] = aggregate_runs_trees(runs_trees=runs_trees)
+
+    resolver: Resolver = python_path_wrapper(config=config, f=lambda: resolve_config_files(config=config, target_os=target_os, verbose=verbose))
+    import_sites: Dict[str, List[str]] = get_modules_import_sites(resolver=resolver, output_base_dirpath=output_base_dirpath)
+    for module_name, module_costs in modules_costs.items():
+        module_costs['import_sites'] = import_sites.get(module_name, [])
+
+    regressions: List[dict] = list()
+    if baseline_filepath is not None and os.path.isfile(baseline_filepath) and should_save_baseline is not True:
+        with open(baseline_filepath, 'r') as baseline_file:
+            baseline_modules_costs: Dict[str, dict] = json.load(baseline_file)['modules']
+        regressions = find_regressions(
+            modules_costs=modules_costs, baseline_modules_costs=baseline_modules_costs,
+            regression_threshold=regression_threshold, min_regression_us=min_regression_us
+        )
+
+    report: dict = {'handler_module_name': handler_module_name, 'runs': runs, 'modules': modules_costs, 'regressions': regressions}
+    with open(os.path.join(dist_dirpath, "import_profile.json"), 'w+') as report_file:
+        report_file.write(json.dumps(report, indent=2))
+    if baseline_filepath is not None and should_save_baseline is True:
+        with open(baseline_filepath, 'w+') as baseline_file:
+            baseline_file.write(json.dumps(report, indent=2))
+        print(f"Saved import costs baseline to {baseline_filepath}")
+
+    print_import_costs_tree(modules_costs=modules_costs, import_sites=import_sites)
+    for regression in regressions:
+        click.secho(
+            f"Regression of {regression['module_name']} : {regression['baseline_cumulative_us'] / 1000:.1f} ms "
+            f"-> {regression['cumulative_us'] / 1000:.1f} ms", fg='red'
+        )
+    if fail_on_regression is True and len(regressions) > 0:
+        raise Exception(f"{len(regressions)} import costs regressions found compared to the baseline {baseline_filepath}")
+    return report
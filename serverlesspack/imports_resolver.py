@@ -1,18 +1,22 @@
-import json
 import sys
 import os
 import ast
+import copy
 import platform
 import importlib
 import importlib.util
 from pathlib import Path
 from types import ModuleType
-from typing import List, Optional, Set, Any, Literal, Tuple, Dict
+from typing import List, Optional, Set, Any, Literal, Tuple, Dict, Callable
 
 import distlib.database
 from pkg_resources import EggInfoDistribution
 
 from .configuration_client import BaseExcludeItem
+from .exceptions import FilesUpdateFailed
+from .import_graph import ImportGraph, BaseTracesWriter, make_traces_writer, EDGE_TYPE_LOCAL, EDGE_TYPE_LIBRARY, EDGE_TYPE_INIT
+from .instrumentation import span, add_counter
+from .resolution_workers import ResolutionWorker
 from .utils import get_serverless_pack_root_folder, message_with_vars
 
 
@@ -21,12 +25,11 @@ python_base_libs_folder_path = str(Path(os.__file__).parent.parent)
 
 
 def get_distribution_name_of_package(package_filepath: str) -> Optional[str]:
-    module_filepath_path = Path(package_filepath)
-    parents_parts: Optional[List[str]] = getattr(module_filepath_path.parents, '_parts', None)
-    if parents_parts is not None:
-        for i, parent in enumerate(parents_parts):
-            if parent == "site-packages":
-                return parents_parts[i+1] if len(parents_parts)-1 > i+1 else None
+    filepath_parts: Tuple[str, ...] = Path(package_filepath).parts
+    for i, part in enumerate(filepath_parts):
+        if part in ("site-packages", "dist-packages") and len(filepath_parts) > i+1:
+            # The single file modules (like typing_extensions.py or compiled extensions) are directly in the site-packages.
+            return filepath_parts[i+1] if len(filepath_parts)-1 > i+1 else filepath_parts[i+1].split(".", 1)[0]
     return None
 
 def get_package_relative_filepath(absolute_filepath: str, package_name: str) -> Optional[str]:
@@ -48,11 +51,21 @@ class Resolver:
 
     def __init__(
             self, root_filepath: str, target_os: Optional[TARGETS_OS_LITERAL] = None,
-            global_exclusions: Optional[BaseExcludeItem] = None, verbose: bool = False
+            global_exclusions: Optional[BaseExcludeItem] = None, verbose: bool = False,
+            allowed_files_absolute_paths: Optional[Set[str]] = None,
+            allowed_top_level_modules_names: Optional[Set[str]] = None,
+            traces_writer: Optional[BaseTracesWriter] = None,
+            on_file_included: Optional[Callable[[str], None]] = None,
+            on_dependency_included: Optional[Callable[[str, Optional[EggInfoDistribution]], None]] = None,
+            resolution_worker: Optional[ResolutionWorker] = None
     ):
         self.root_filepath = root_filepath
         self.global_exclusions = global_exclusions
         self.verbose = verbose
+        # The allow-lists are used when resolving from a runtime trace. When they are defined, the files and
+        # libraries discovered from the imports are only included if they have been observed in the trace.
+        self.allowed_files_absolute_paths = allowed_files_absolute_paths
+        self.allowed_top_level_modules_names = allowed_top_level_modules_names
 
         self._system_os = platform.system().lower()
         if target_os is not None:
@@ -66,19 +79,46 @@ class Resolver:
         else:
             raise Exception(f"OS {self.target_os} not supported")
 
+        # When the running interpreter does not have the target python version, the modules are imported, and the
+        # standard library and the installed distributions are looked up, by a worker of the target interpreter first.
+        # The libraries only installed for the running interpreter are still found, like before the workers existed.
+        self.resolution_worker = resolution_worker
         from importlib_metadata import packages_distributions
         self.packages_distributions = packages_distributions()
+        self.standard_library_dirpaths: List[str] = [python_base_libs_folder_path]
+        if self.resolution_worker is not None:
+            self.packages_distributions.update(self.resolution_worker.packages_distributions())
+            self.standard_library_dirpaths.insert(0, self.resolution_worker.base_libs_dirpath)
         self.distribution_path = distlib.database.DistributionPath(include_egg=True)
         self.included_dependencies_names: Set[str] = set()
         self.included_dependencies_distributions: Dict[str, Optional[EggInfoDistribution]] = dict()
         self.included_files_absolute_paths: Set[str] = {self.root_filepath}
 
-        self.traces: List[dict] = []
-
-    def save_traces_to_json(self):
-        #     common_prefix_across_all_files = os.path.commonprefix([absolute_filepath for absolute_filepath in included_files_absolute_paths])
-        with open("F:/Inoft/anvers_1944_project/serverlesspack/serverlesspack/visualizer/dist/traces.json", "w+") as file:
-            file.write(json.dumps(self.traces))
+        # When a traces_writer is passed, the edges of the import graph are streamed to it while resolving.
+        self.traces = ImportGraph(writer=traces_writer)
+        self._traced_dependencies_keys: Set[Tuple[str, str]] = set()
+
+        # Unlike the traces which only keep the first import of each file, the direct imports of every processed file
+        # are kept, in order to be able to update the resolution incrementally when some files change (see update_files).
+        self.root_filepaths: Set[str] = {self.root_filepath}
+        self._local_filepaths: Set[str] = {self.root_filepath}
+        self._files_imports: Dict[str, Set[str]] = dict()
+        self._files_dependencies_names: Dict[str, Set[str]] = dict()
+        self._dependencies_entry_filepaths: Dict[str, str] = dict()
+        self._processed_filepaths_stack: List[str] = list()
+        # The files with imports that could not be found, which might be found once a new module has been created.
+        self._files_with_missed_imports: Set[str] = set()
+        # The results of the imports of the modules names, including the failed ones, by module name and importing file.
+        self._modules_imports_memo: Dict[Tuple[str, Optional[str]], Optional[ModuleType]] = dict()
+
+        # The callbacks are called as soon as a file or a library is included, which allows to start packaging
+        # and installing them while the resolution is still running (see the pipeline module).
+        self.on_file_included = on_file_included
+        self.on_dependency_included = on_dependency_included
+
+    def save_traces(self, filepath: str, traces_format: str = 'ndjson'):
+        with make_traces_writer(filepath=filepath, traces_format=traces_format) as traces_writer:
+            self.traces.write(writer=traces_writer)
 
     @property
     def system_os(self) -> str:
@@ -88,10 +128,48 @@ class Resolver:
     def target_os(self) -> TARGETS_OS_LITERAL:
         return self._target_os
 
+    def _substitute_compiled_filepath(self, filepath: str, source_os: str) -> str:
+        """Replace a compiled extension file of the source os (.pyd or .so) with the file of the target os with the
+        same name, or keep the source file with a warning if there is no compiled file for the target os."""
+        source_extension: Optional[str] = Resolver.OS_TO_COMPILED_EXTENSIONS.get(source_os, None)
+        path_filepath = Path(filepath)
+        if source_extension is None or source_os == self.target_os or path_filepath.suffix != f".{source_extension}":
+            return filepath
+        target_path_filepath = path_filepath.with_suffix(f".{Resolver.OS_TO_COMPILED_EXTENSIONS[self.target_os]}")
+        if target_path_filepath.is_file():
+            return str(target_path_filepath)
+        self._verbose_print(make_no_os_matching_file_warning_message(
+            system_os=source_os, target_os=self.target_os, source_filepath=str(target_path_filepath)
+        ))
+        return filepath
+
+    def for_target_os(self, target_os: TARGETS_OS_LITERAL) -> 'Resolver':
+        """Derive the resolution of another target os, without traversing the files again. Only the compiled extension
+        files differ between the target os, so the derived resolver shares the state of this one, except for its
+        included files where the compiled files of the current target os are substituted with those of the new one."""
+        if target_os not in Resolver.TARGETS_OS:
+            raise Exception(f"OS {target_os} not supported")
+        derived_resolver: Resolver = copy.copy(self)
+        derived_resolver._target_os = target_os
+        derived_resolver.included_files_absolute_paths = {
+            derived_resolver._substitute_compiled_filepath(filepath=filepath, source_os=self.target_os)
+            for filepath in self.included_files_absolute_paths
+        }
+        return derived_resolver
+
     def _verbose_print(self, message: str):
         if self.verbose is True:
             print(message)
 
+    def file_is_allowed(self, filepath: str) -> bool:
+        return self.allowed_files_absolute_paths is None or filepath in self.allowed_files_absolute_paths
+
+    def top_level_module_is_allowed(self, top_level_module_name: str) -> bool:
+        return (
+            self.allowed_top_level_modules_names is None
+            or Path(top_level_module_name).stem in self.allowed_top_level_modules_names
+        )
+
     @staticmethod
     def from_code(code: str, target_os: Optional[TARGETS_OS_LITERAL] = None, dirpath: Optional[str] = None):
         filepath_temp_code_file = Resolver.write_code_file(code=code, filename="temp_root.py", dirpath=dirpath)
@@ -155,51 +233,120 @@ class Resolver:
 
         return None
 
-    def _import_module(self, module_name: str, filepath: str) -> Optional[ModuleType]:
+    def is_standard_library_filepath(self, filepath: str) -> bool:
+        # The site-packages of the interpreters installed without a virtual environment are inside their base libs folder.
+        return any(dirpath in filepath for dirpath in self.standard_library_dirpaths) and not any(
+            part in ('site-packages', 'dist-packages') for part in Path(filepath).parts
+        )
+
+    def _get_distribution(self, name: str) -> Optional[Any]:
+        if self.resolution_worker is not None:
+            distribution: Optional[Any] = self.resolution_worker.get_distribution(name=name)
+            if distribution is not None:
+                return distribution
+        return self.distribution_path.get_distribution(name)
+
+    def _import_library_module(self, module_name: str) -> Optional[ModuleType]:
         try:
             # We first try to import the module naively with only their
             # module name. This will work when trying to import libraries.
+            if self.resolution_worker is not None:
+                try:
+                    return self.resolution_worker.import_module(module_name=module_name)
+                except ModuleNotFoundError as e:
+                    self._verbose_print(message=f"{e} with the target interpreter, trying with the running interpreter")
             return importlib.import_module(module_name)
         except ModuleNotFoundError as e:
             self._verbose_print(message=str(e))
-            
-            # If this failed, we try to import the module as a file not inside a library. We do so by creating a relative
-            # module path to the module from the current file, and we try to import the module from its relative path.
+            return None
 
-            # filepath_relative_to_current_module = os.path.relpath(filepath, os.path.abspath(os.path.dirname(__file__)))
-            filepath_relative_to_current_module = os.path.relpath(filepath, sys.argv[0])
-            # We need a filepath relative to the current module, in order to try to import the file module. All the imports done in a file must be relative
-            # to the file trying to import the module. This relative filepath is not destined to be used in the archive paths when packaging the code.
+    def _import_file_module(self, module_name: str, filepath: str) -> Optional[ModuleType]:
+        # If this failed, we try to import the module as a file not inside a library. We do so by creating a relative
+        # module path to the module from the current file, and we try to import the module from its relative path.
 
-            module_path = self._path_to_module_path(base_path=os.path.abspath(filepath_relative_to_current_module), module_name=module_name)
+        # filepath_relative_to_current_module = os.path.relpath(filepath, os.path.abspath(os.path.dirname(__file__)))
+        filepath_relative_to_current_module = os.path.relpath(filepath, sys.argv[0])
+        # We need a filepath relative to the current module, in order to try to import the file module. All the imports done in a file must be relative
+        # to the file trying to import the module. This relative filepath is not destined to be used in the archive paths when packaging the code.
 
-            module_path_v2 = self.get_module_path_v2(filepath=filepath, module_name=module_name)
-            if module_path_v2 is not None:
-                module_path = module_path_v2
+        module_path = self._path_to_module_path(base_path=os.path.abspath(filepath_relative_to_current_module), module_name=module_name)
 
-            try:
-                module_spec = importlib.util.spec_from_file_location(module_path, filepath)
-                return importlib.util.module_from_spec(module_spec) if module_spec is not None else None
-            except ModuleNotFoundError as e:
-                # If both the import as a library and as a file unfortunately
-                # failed, we can stop trying to import the module.
-                self._verbose_print(message_with_vars(
-                    message="Importing of module failed as both a library import and file import",
-                    vars_dict={'module_name': module_name, 'module_path': module_path, 'exception': e}
-                ))
-                return None
+        module_path_v2 = self.get_module_path_v2(filepath=filepath, module_name=module_name)
+        if module_path_v2 is not None:
+            module_path = module_path_v2
+
+        try:
+            module_spec = importlib.util.spec_from_file_location(module_path, filepath)
+            return importlib.util.module_from_spec(module_spec) if module_spec is not None else None
+        except ModuleNotFoundError as e:
+            # If both the import as a library and as a file unfortunately
+            # failed, we can stop trying to import the module.
+            self._verbose_print(message_with_vars(
+                message="Importing of module failed as both a library import and file import",
+                vars_dict={'module_name': module_name, 'module_path': module_path, 'exception': e}
+            ))
+            return None
+
+    def _import_module(self, module_name: str, filepath: str) -> Optional[ModuleType]:
+        """Import the module as a library, or else as a file relative to the importing file, and memoize both the found
+        modules and the misses. Most of the names imported by the 'from module import name' statements are functions or
+        classes and not modules, and they would otherwise go through the failing imports for every file importing them."""
+        # The import as a library only depends on the python path, unlike the import as a file.
+        library_memo_key: Tuple[str, Optional[str]] = (module_name, None)
+        if library_memo_key not in self._modules_imports_memo:
+            add_counter('modules_imports_resolved')
+            self._modules_imports_memo[library_memo_key] = self._import_library_module(module_name=module_name)
+        else:
+            add_counter('modules_imports_memoized')
+        library_module: Optional[ModuleType] = self._modules_imports_memo[library_memo_key]
+        if library_module is not None:
+            return library_module
+        if self._current_processed_filepath is not None:
+            self._files_with_missed_imports.add(self._current_processed_filepath)
+
+        file_memo_key: Tuple[str, Optional[str]] = (module_name, filepath)
+        if file_memo_key not in self._modules_imports_memo:
+            add_counter('modules_imports_resolved')
+            self._modules_imports_memo[file_memo_key] = self._import_file_module(module_name=module_name, filepath=filepath)
+        else:
+            add_counter('modules_imports_memoized')
+        return self._modules_imports_memo[file_memo_key]
+
+    def _record_file_import(self, source_filepath: Optional[str], target_filepath: str, dependency_name: Optional[str] = None):
+        if source_filepath is not None:
+            self._files_imports.setdefault(source_filepath, set()).add(target_filepath)
+            if dependency_name is not None:
+                self._files_dependencies_names.setdefault(source_filepath, set()).add(dependency_name)
+
+    @property
+    def _current_processed_filepath(self) -> Optional[str]:
+        return self._processed_filepaths_stack[-1] if len(self._processed_filepaths_stack) > 0 else None
 
     def add_python_file(self, filepath: str):
+        if self._current_processed_filepath is None:
+            # The files added outside of the processing of a file are added from the config (files and folders includes).
+            self.root_filepaths.add(filepath)
+
         expected_init_filepath = os.path.join(os.path.dirname(filepath), "__init__.py")
         if expected_init_filepath not in self.included_files_absolute_paths:
             if self.global_exclusions is None or not self.global_exclusions.path_is_excluded(path=expected_init_filepath):
                 if os.path.exists(expected_init_filepath):
+                    self.traces.add_edge(source=filepath, target=expected_init_filepath, edge_type=EDGE_TYPE_INIT)
+                    self._record_file_import(source_filepath=filepath, target_filepath=expected_init_filepath)
                     self.included_files_absolute_paths.add(expected_init_filepath)
+                    self._local_filepaths.add(expected_init_filepath)
+                    if self.on_file_included is not None:
+                        self.on_file_included(expected_init_filepath)
                     self.process_file(filepath=expected_init_filepath)
+        else:
+            self._record_file_import(source_filepath=filepath, target_filepath=expected_init_filepath)
 
         if filepath not in self.included_files_absolute_paths:
             if self.global_exclusions is None or not self.global_exclusions.path_is_excluded(path=filepath):
                 self.included_files_absolute_paths.add(filepath)
+                self._local_filepaths.add(filepath)
+                if self.on_file_included is not None:
+                    self.on_file_included(filepath)
 
     def add_package_by_name(self, package_name: str, current_filepath: str):
         imported_package_module = self._import_module(module_name=package_name, filepath=current_filepath)
@@ -217,53 +364,54 @@ class Resolver:
 
                 # At this point, the file should exists, we do not add an additional
                 # check, because if it does not exist, we want to cause an exception.
-                if python_base_libs_folder_path not in imported_package_module_filepath:
-                    path_imported_package_module_filepath = Path(imported_package_module_filepath)
-
-                    if self.system_os == 'windows' and path_imported_package_module_filepath.suffix == '.pyd':
-                        if self.target_os == 'linux':
-                            linux_path_imported_package_module_filepath = path_imported_package_module_filepath.with_suffix('.so')
-                            if linux_path_imported_package_module_filepath.is_file():
-                                path_imported_package_module_filepath = linux_path_imported_package_module_filepath
-                                imported_package_module_filepath = str(path_imported_package_module_filepath)
-                            else:
-                                self._verbose_print(make_no_os_matching_file_warning_message(
-                                    system_os=self.system_os, target_os=self.target_os,
-                                    source_filepath=str(linux_path_imported_package_module_filepath)
-                                ))
-                                # return
-                    elif self.system_os == 'linux' and path_imported_package_module_filepath == '.so':
-                        if self.target_os == 'windows':
-                            windows_path_imported_package_module_filepath = path_imported_package_module_filepath.with_suffix('.pyd')
-                            if windows_path_imported_package_module_filepath.is_file():
-                                path_imported_package_module_filepath = windows_path_imported_package_module_filepath
-                                imported_package_module_filepath = str(path_imported_package_module_filepath)
-                            else:
-                                self._verbose_print(make_no_os_matching_file_warning_message(
-                                    system_os=self.system_os, target_os=self.target_os,
-                                    source_filepath=str(windows_path_imported_package_module_filepath)
-                                ))
-                                # return
+                if not self.is_standard_library_filepath(filepath=imported_package_module_filepath):
+                    imported_package_module_filepath = self._substitute_compiled_filepath(
+                        filepath=imported_package_module_filepath, source_os=self.system_os
+                    )
 
                     package_distribution_name = get_distribution_name_of_package(package_filepath=imported_package_module_filepath)
                     if package_distribution_name is not None:
+                        if not self.top_level_module_is_allowed(top_level_module_name=package_distribution_name):
+                            self._verbose_print(f"Skipped library {package_distribution_name} not observed in the runtime trace")
+                            return
                         # If the file has been found inside a library
                         real_package_name_container: Optional[List[str]] = self.packages_distributions.get(package_distribution_name, None)
                         if real_package_name_container is not None and len(real_package_name_container) > 0:
                             real_package_name = real_package_name_container[0]
+                            self._record_file_import(
+                                source_filepath=self._current_processed_filepath,
+                                target_filepath=self._dependencies_entry_filepaths.get(real_package_name, imported_package_module_filepath),
+                                dependency_name=real_package_name
+                            )
+                            dependency_trace_key: Tuple[str, str] = (current_filepath, real_package_name)
+                            if dependency_trace_key not in self._traced_dependencies_keys:
+                                # Unlike the import traces, the dependency traces are kept for every importing file and
+                                # not only the first one, since they are used to attribute the dependencies to their import sites.
+                                self._traced_dependencies_keys.add(dependency_trace_key)
+                                self.traces.add_edge(
+                                    source=current_filepath, target=imported_package_module_filepath,
+                                    edge_type=EDGE_TYPE_LIBRARY, dependency_name=real_package_name
+                                )
                             if real_package_name not in self.included_dependencies_names:
-                                package_distribution: Optional[EggInfoDistribution] = self.distribution_path.get_distribution(real_package_name)
+                                self._dependencies_entry_filepaths[real_package_name] = imported_package_module_filepath
+                                package_distribution: Optional[EggInfoDistribution] = self._get_distribution(name=real_package_name)
                                 if package_distribution is not None:
                                     package_requirements: Set[str] = getattr(package_distribution, 'run_requires', set())
                                     # todo: do something with the package_requirements ?
 
                                 self.included_dependencies_names.add(real_package_name)
                                 self.included_dependencies_distributions[real_package_name] = package_distribution
+                                if self.on_dependency_included is not None:
+                                    self.on_dependency_included(real_package_name, package_distribution)
                                 self.process_file(filepath=imported_package_module_filepath)
                     else:
                         # If the file is a standalone file not from a library
+                        if not self.file_is_allowed(filepath=imported_package_module_filepath):
+                            self._verbose_print(f"Skipped file {imported_package_module_filepath} not observed in the runtime trace")
+                            return
+                        self._record_file_import(source_filepath=self._current_processed_filepath, target_filepath=imported_package_module_filepath)
                         if imported_package_module_filepath not in self.included_files_absolute_paths:
-                            self.traces.append({'source': current_filepath, 'target': imported_package_module_filepath, 'type': "import"})
+                            self.traces.add_edge(source=current_filepath, target=imported_package_module_filepath, edge_type=EDGE_TYPE_LOCAL)
                             self.add_python_file(filepath=imported_package_module_filepath)
                             self.process_file(filepath=imported_package_module_filepath)
 
@@ -287,20 +435,110 @@ class Resolver:
         else:
             self._verbose_print(f"Node {node.__class__} not supported")
 
-    def process_file(self, filepath: str):
+    @staticmethod
+    def parse_file(filepath: str) -> ast.Module:
+        with open(filepath, mode='r', encoding='utf-8') as file:
+            file_content = file.read()
+        add_counter('files_parsed')
+        add_counter('bytes_parsed', len(file_content))
+        return ast.parse(file_content, filename=filepath)
+
+    def process_file(self, filepath: str, parsed_module: Optional[ast.Module] = None):
         path_filepath = Path(filepath)
         if not path_filepath.exists():
             raise Exception(f"Filepath does not exist : {filepath}")
 
         if path_filepath.suffix == '.py':
             if self.global_exclusions is None or not self.global_exclusions.path_is_excluded(path=filepath):
-                with open(str(path_filepath), mode='r', encoding='utf-8') as file:
-                    file_content = file.read()
-                for node in ast.iter_child_nodes(ast.parse(file_content)):
-                    self.process_node(node=node, current_module=filepath, current_filepath=filepath)
+                with span('resolve_file', category='resolution', filepath=filepath):
+                    if parsed_module is None:
+                        parsed_module = self.parse_file(filepath=str(path_filepath))
+                    self._processed_filepaths_stack.append(filepath)
+                    try:
+                        for node in ast.iter_child_nodes(parsed_module):
+                            self.process_node(node=node, current_module=filepath, current_filepath=filepath)
+                    finally:
+                        self._processed_filepaths_stack.pop()
         else:
             self.add_python_file(filepath=filepath)
 
+    def update_files(self, modified_filepaths: Set[str], deleted_filepaths: Set[str], created_filepaths: Optional[Set[str]] = None):
+        """Update the resolution after some files changed, by only re-parsing the modified files that had been processed,
+        and then re-computing the included files and dependencies from the files reachable from the roots. When python
+        files are created, the files with imports that could not be found are also re-parsed, since a created module is
+        usually imported by a file that has been written before it.
+
+        The modified files that cannot be parsed (like a file saved in the middle of an edit) keep their previous imports,
+        the other changes are still applied, and a FilesUpdateFailed listing the failed files is raised at the end."""
+        importlib.invalidate_caches()
+        for module_name, module in list(sys.modules.items()):
+            # The deleted modules must not be found anymore by the imports of the modified files.
+            if getattr(module, '__file__', None) in deleted_filepaths:
+                del sys.modules[module_name]
+        if self.resolution_worker is not None and len(deleted_filepaths) > 0:
+            self.resolution_worker.invalidate_modules(filepaths=list(deleted_filepaths))
+        # The failed imports might succeed with the new files, and the modules of the deleted files must not be found.
+        self._modules_imports_memo = {
+            memo_key: module for memo_key, module in self._modules_imports_memo.items()
+            if module is not None and getattr(module, '__file__', None) not in deleted_filepaths
+        }
+
+        for filepath in deleted_filepaths:
+            self._files_imports.pop(filepath, None)
+            self._files_dependencies_names.pop(filepath, None)
+            self._local_filepaths.discard(filepath)
+            self._files_with_missed_imports.discard(filepath)
+            self.included_files_absolute_paths.discard(filepath)
+            if filepath != self.root_filepath:
+                self.root_filepaths.discard(filepath)
+
+        if any(filepath.endswith('.py') for filepath in (created_filepaths or ())):
+            modified_filepaths = modified_filepaths | self._files_with_missed_imports
+
+        errors: Dict[str, str] = dict()
+        parsed_modules: Dict[str, ast.Module] = dict()
+        for filepath in sorted(modified_filepaths):
+            if filepath in self._files_imports or filepath in self.included_files_absolute_paths:
+                # All the files are parsed before any of them is processed, so that a file that cannot be parsed does
+                # not lose the imports of its previous content.
+                try:
+                    parsed_modules[filepath] = self.parse_file(filepath=filepath)
+                except (OSError, SyntaxError, ValueError) as e:
+                    errors[filepath] = f"{e.__class__.__name__} : {e}"
+
+        for filepath, parsed_module in parsed_modules.items():
+            self._files_imports[filepath] = set()
+            self._files_dependencies_names[filepath] = set()
+            self._files_with_missed_imports.discard(filepath)
+            # The file is re-processed from its new content. The files it imports that are already included are not
+            # processed again, and the files or libraries that were not imported before are processed as usual.
+            try:
+                self.process_file(filepath=filepath, parsed_module=parsed_module)
+            except Exception as e:
+                errors[filepath] = f"{e.__class__.__name__} : {e}"
+
+        reachable_filepaths: Set[str] = set()
+        filepaths_to_visit: List[str] = list(self.root_filepaths)
+        while len(filepaths_to_visit) > 0:
+            filepath: str = filepaths_to_visit.pop()
+            if filepath not in reachable_filepaths:
+                reachable_filepaths.add(filepath)
+                filepaths_to_visit.extend(self._files_imports.get(filepath, ()))
+
+        self.included_files_absolute_paths = {
+            filepath for filepath in reachable_filepaths if filepath in self._local_filepaths
+        }
+        self.included_dependencies_names = {
+            dependency_name for filepath in reachable_filepaths
+            for dependency_name in self._files_dependencies_names.get(filepath, ())
+        }
+        self.included_dependencies_distributions = {
+            dependency_name: distribution for dependency_name, distribution in self.included_dependencies_distributions.items()
+            if dependency_name in self.included_dependencies_names
+        }
+        if len(errors) > 0:
+            raise FilesUpdateFailed(errors=errors)
+
     def import_folder(
             self, folderpath: str,
             included_files_extensions: Optional[List[str]] = None, included_folders_names: Optional[List[str]] = None,
@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Set
+
+from .artifacts_deduplication import apply_artifacts_deduplication
+from .configuration_client import Config
+from .imports_resolver import Resolver
+from .instrumentation import span, record_timings
+from .layer_pruning import prune_layer_files
+from .layers_splitting import group_layer_files_by_distribution, plan_layers
+from .packager import LocalFileItem, make_base_python_layer_packages_dir, package_files, \
+    resolve_install_and_get_dependencies_files, files_to_zip_bytes
+from .pipeline import check_packaged_files
+from .priming import make_priming_content_file_item
+
+
+@dataclass
+class InMemoryArtifact:
+    name: str
+    content: bytes
+    sha256: str
+    size: int
+
+    @staticmethod
+    def from_content(name: str, content: bytes) -> 'InMemoryArtifact':
+        return InMemoryArtifact(name=name, content=content, sha256=hashlib.sha256(content).hexdigest(), size=len(content))
+
+    @property
+    def base64_sha256(self) -> str:
+        # The CodeSha256 of the Lambda functions and layers versions is the base64 encoding of the digest.
+        return base64.b64encode(bytes.fromhex(self.sha256)).decode('ascii')
+
+    def open(self) -> io.BytesIO:
+        return io.BytesIO(self.content)
+
+@dataclass
+class InMemoryPackageOutput:
+    code: InMemoryArtifact
+    layer: Optional[InMemoryArtifact]
+    required_dependencies_names: Set[str]
+    layers: Optional[List[InMemoryArtifact]] = None
+
+    @property
+    def artifacts(self) -> List[InMemoryArtifact]:
+        return [self.code, *([self.layer] if self.layer is not None else []), *(self.layers or [])]
+
+
+def get_default_output_base_dirpath(config: Config) -> str:
+    # Without the location of the config file, the files are archived relatively to the folder of the root file.
+    return str(
+        Path(os.path.realpath(config.project_root_dir)).parent
+        if config.project_root_dir is not None else
+        os.path.dirname(config.root_filepath)
+    )
+
+@record_timings
+def package_in_memory_api(
+        config: Config, target_os: str, output_base_dirpath: Optional[str] = None,
+        package_dependencies_in_layer_for_code_package: bool = False, verbose: bool = False,
+        timings_filepath: Optional[str] = None
+) -> InMemoryPackageOutput:
+    """Package an already loaded config into zip archives kept in memory, with their sha256 and size, for the deployment
+    tools that upload the artifacts without reading them back from the dist folder. Nothing is prompted, and the only
+    files written are the installed dependencies, in a temporary folder removed once they are archived. The output_type
+    of the config is ignored, since the archives are always zip buffers."""
+    from .cli import python_path_wrapper, resolve_config_files
+
+    output_base_dirpath = output_base_dirpath or get_default_output_base_dirpath(config=config)
+    base_layer_dirpath: str = make_base_python_layer_packages_dir(python_version=config.python_version)
+    code_archive_prefix: Optional[str] = base_layer_dirpath if config.package_type == 'layer' else None
+    should_package_dependencies: bool = config.package_type == 'layer' or package_dependencies_in_layer_for_code_package is True
+
+    def execute_package_in_memory_api() -> InMemoryPackageOutput:
+        resolver: Resolver = resolve_config_files(config=config, target_os=target_os, verbose=verbose)
+        code_local_files_items, code_content_files_items = package_files(
+            included_files_absolute_paths=resolver.included_files_absolute_paths,
+            archive_prefix=code_archive_prefix, output_base_dirpath=output_base_dirpath
+        )
+        if config.priming is not None:
+            code_content_files_items.append(make_priming_content_file_item(
+                resolver=resolver, config=config.priming, output_base_dirpath=output_base_dirpath, archive_prefix=code_archive_prefix
+            ))
+
+        with tempfile.TemporaryDirectory(prefix="serverlesspack-") as temporary_dirpath:
+            lambda_layer_dirpath: str = os.path.join(temporary_dirpath, 'lambda_layer')
+            dependencies_local_files_items: List[LocalFileItem] = []
+            if should_package_dependencies:
+                dependencies_local_files_items = resolve_install_and_get_dependencies_files(
+                    resolver=resolver, lambda_layer_dirpath=lambda_layer_dirpath, base_layer_dirpath=base_layer_dirpath,
+                    python_version=config.python_version, use_prototype_docker_install=config.use_prototype_docker_pip_install,
+                    docker_builder_config=config.docker_builder,
+                    should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages,
+                    lock_config=config.dependencies_lock, architecture=config.architecture
+                )
+                if config.layer_pruning is not None:
+                    with span('layer_pruning', category='dependencies'):
+                        dependencies_local_files_items = prune_layer_files(
+                            local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+                            python_version=config.python_version, config=config.layer_pruning
+                        )
+                if config.should_deduplicate_artifacts_files is True:
+                    code_local_files_items, dependencies_local_files_items = apply_artifacts_deduplication(
+                        code_local_files_items=code_local_files_items, layer_local_files_items=dependencies_local_files_items
+                    )
+            # The size report is printed and enforced, but not saved, since there is no dist folder.
+            check_packaged_files(
+                config=config, resolver=resolver, dist_dirpath=None, lambda_layer_dirpath=lambda_layer_dirpath,
+                code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+                layer_local_files_items=dependencies_local_files_items
+            )
+
+            if config.package_type == 'layer':
+                return InMemoryPackageOutput(
+                    code=InMemoryArtifact.from_content(name='build', content=files_to_zip_bytes(
+                        [*code_local_files_items, *dependencies_local_files_items], code_content_files_items
+                    )),
+                    layer=None, required_dependencies_names=resolver.included_dependencies_names
+                )
+            code_artifact = InMemoryArtifact.from_content(
+                name='build', content=files_to_zip_bytes(code_local_files_items, code_content_files_items)
+            )
+            if not should_package_dependencies:
+                return InMemoryPackageOutput(code=code_artifact, layer=None, required_dependencies_names=resolver.included_dependencies_names)
+            if config.layers_splitting is not None:
+                # Unlike package_split_layers, the churn history of the dist folder is not used nor updated.
+                planned_layers = plan_layers(
+                    groups=group_layer_files_by_distribution(
+                        local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath
+                    ),
+                    config=config.layers_splitting
+                )
+                return InMemoryPackageOutput(
+                    code=code_artifact, layer=None, required_dependencies_names=resolver.included_dependencies_names,
+                    layers=[
+                        InMemoryArtifact.from_content(name=planned_layer.destination_key, content=files_to_zip_bytes(
+                            [local_file_item for group in planned_layer.groups for local_file_item in group.local_files_items], []
+                        )) for planned_layer in planned_layers
+                    ]
+                )
+            return InMemoryPackageOutput(
+                code=code_artifact,
+                layer=InMemoryArtifact.from_content(name='lambda_layer', content=files_to_zip_bytes(dependencies_local_files_items, [])),
+                required_dependencies_names=resolver.included_dependencies_names
+            )
+
+    return python_path_wrapper(config=config, f=execute_package_in_memory_api)
@@ -0,0 +1,215 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Any, Callable
+
+import click
+
+
+@dataclass
+class SpanEvent:
+    name: str
+    category: str
+    start_ns: int
+    thread_id: int
+    args: Dict[str, Any] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    duration_ns: int = 0
+    children_ns: int = 0
+
+@dataclass
+class SpanSummaryItem:
+    name: str
+    calls_count: int = 0
+    total_ns: int = 0
+    self_ns: int = 0
+    counters: Dict[str, int] = field(default_factory=dict)
+
+
+class _NoopSpan:
+    """Returned by span() when the instrumentation is disabled. A single instance is re-used for every call,
+    so that a disabled span only costs a function call and a boolean check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    __slots__ = ('recorder', 'event')
+
+    def __init__(self, recorder: 'InstrumentationRecorder', event: SpanEvent):
+        self.recorder = recorder
+        self.event = event
+
+    def __enter__(self):
+        self.recorder.open_spans_stack().append(self.event)
+        self.event.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.event.duration_ns = time.perf_counter_ns() - self.event.start_ns
+        stack: List[SpanEvent] = self.recorder.open_spans_stack()
+        stack.pop()
+        if len(stack) > 0:
+            # Used to compute the self time of the parent span in the summary.
+            stack[-1].children_ns += self.event.duration_ns
+        self.recorder.record(self.event)
+        return False
+
+
+class InstrumentationRecorder:
+    # The audit events counted as syscalls, which covers the files opened
+    # and the folders listed while resolving and packaging the files.
+    SYSCALLS_AUDIT_EVENTS = {'open', 'os.listdir', 'os.scandir', 'os.remove', 'os.rename', 'os.mkdir', 'shutil.copyfile'}
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[SpanEvent] = list()
+        self.counters: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._audit_hook_installed = False
+        self._origin_ns = time.perf_counter_ns()
+
+    def open_spans_stack(self) -> List[SpanEvent]:
+        stack: Optional[List[SpanEvent]] = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = list()
+            self._local.stack = stack
+        return stack
+
+    def record(self, event: SpanEvent):
+        with self._lock:
+            self.events.append(event)
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+        if not self._audit_hook_installed:
+            # Audit hooks cannot be removed once added, so the hook is only installed the first time
+            # the instrumentation is enabled, and does nothing more than a boolean check when disabled.
+            sys.addaudithook(self._audit_hook)
+            self._audit_hook_installed = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.events = list()
+            self.counters = dict()
+            self._origin_ns = time.perf_counter_ns()
+
+    def _audit_hook(self, event_name: str, event_args: tuple):
+        if self.enabled is True and event_name in InstrumentationRecorder.SYSCALLS_AUDIT_EVENTS:
+            self.add_counter('syscalls', 1)
+
+    def span(self, name: str, category: str = 'phase', **args):
+        if self.enabled is not True:
+            return _NOOP_SPAN
+        return _Span(recorder=self, event=SpanEvent(
+            name=name, category=category, start_ns=0, thread_id=threading.get_ident(), args=args
+        ))
+
+    def add_counter(self, name: str, value: int = 1):
+        if self.enabled is not True:
+            return
+        stack: List[SpanEvent] = self.open_spans_stack()
+        if len(stack) > 0:
+            current_span_counters: Dict[str, int] = stack[-1].counters
+            current_span_counters[name] = current_span_counters.get(name, 0) + value
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_chrome_trace(self) -> dict:
+        trace_events: List[dict] = [{
+            'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'tid': 0, 'args': {'name': 'serverlesspack'}
+        }]
+        for event in sorted(self.events, key=lambda item: item.start_ns):
+            trace_events.append({
+                'name': event.name, 'cat': event.category, 'ph': 'X', 'pid': os.getpid(), 'tid': event.thread_id,
+                'ts': (event.start_ns - self._origin_ns) / 1000, 'dur': event.duration_ns / 1000,
+                'args': {**{key: str(value) for key, value in event.args.items()}, **event.counters}
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': {'counters': self.counters}}
+
+    def export_chrome_trace(self, filepath: str) -> str:
+        """Write the recorded spans in the Chrome trace-event format, which can be opened in chrome://tracing or Perfetto."""
+        output_dirpath: str = os.path.dirname(os.path.abspath(filepath))
+        if not os.path.exists(output_dirpath):
+            os.makedirs(output_dirpath)
+        with open(filepath, 'w+') as file:
+            file.write(json.dumps(self.to_chrome_trace()))
+        return filepath
+
+    def make_summary(self) -> List[SpanSummaryItem]:
+        summary_items: Dict[str, SpanSummaryItem] = dict()
+        for event in self.events:
+            summary_item = summary_items.get(event.name, None)
+            if summary_item is None:
+                summary_item = SpanSummaryItem(name=event.name)
+                summary_items[event.name] = summary_item
+            summary_item.calls_count += 1
+            summary_item.total_ns += event.duration_ns
+            summary_item.self_ns += event.duration_ns - event.children_ns
+            for counter_name, counter_value in event.counters.items():
+                summary_item.counters[counter_name] = summary_item.counters.get(counter_name, 0) + counter_value
+        return sorted(summary_items.values(), key=lambda item: item.self_ns, reverse=True)
+
+    def print_summary(self):
+        summary_items: List[SpanSummaryItem] = self.make_summary()
+        rows: List[List[str]] = [['span', 'calls', 'total ms', 'self ms', 'counters']]
+        for summary_item in summary_items:
+            rows.append([
+                summary_item.name, str(summary_item.calls_count),
+                f"{summary_item.total_ns / 1_000_000:.1f}", f"{summary_item.self_ns / 1_000_000:.1f}",
+                ", ".join(f"{key}={value}" for key, value in sorted(summary_item.counters.items()))
+            ])
+        columns_widths: List[int] = [max(len(row[i_column]) for row in rows) for i_column in range(len(rows[0]))]
+        for i_row, row in enumerate(rows):
+            click.secho("  ".join(cell.ljust(columns_widths[i_column]) for i_column, cell in enumerate(row)), bold=i_row == 0)
+
+
+instrumentation = InstrumentationRecorder()
+span = instrumentation.span
+add_counter = instrumentation.add_counter
+
+
+def record_timings(function: Callable) -> Callable:
+    """Enable the instrumentation during the calls of the decorated function that receive a timings_filepath keyword
+    argument, then export the recorded spans as a Chrome trace to this filepath, and print their summary."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timings_filepath: Optional[str] = kwargs.get('timings_filepath', None)
+        if timings_filepath is None:
+            return function(*args, **kwargs)
+        instrumentation.enable()
+        try:
+            with span(function.__name__):
+                return function(*args, **kwargs)
+        finally:
+            instrumentation.disable()
+            instrumentation.print_summary()
+            instrumentation.export_chrome_trace(filepath=timings_filepath)
+            click.secho(f"Timings trace available at {os.path.abspath(timings_filepath)}", fg='green')
+    return wrapper
+
+def traced(name: str, category: str = 'phase') -> Callable[[Callable], Callable]:
+    """Decorator recording each call of the decorated function as a span."""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if instrumentation.enabled is not True:
+                return function(*args, **kwargs)
+            with span(name, category=category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
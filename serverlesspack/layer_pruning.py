@@ -0,0 +1,180 @@
+import fnmatch
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Set, Iterable
+
+from asciitree import LeftAligned
+
+from .configuration_client import LayerPruningConfig, PackagePruningOverride
+from .packager import LocalFileItem
+
+
+# The built-in rule sets only target files that are never loaded by the Lambda runtime when importing a package. The
+# patterns are matched against the path of the file relative to the root of the installed layer (ie, numpy/tests/x.csv),
+# and the folders matched by the directory patterns are kept when they contain python modules (see should_prune_file).
+BUILT_IN_RULE_SETS: Dict[str, List[str]] = {
+    'tests': ['tests/*', '*/tests/*', '*/test/*'],
+    'bytecode': ['*/__pycache__/*', '*.pyc', '*.pyo'],
+    'stubs': ['*.pyi'],
+    'docs': ['*/docs/*', '*/doc/*', '*.md', '*.rst'],
+    'examples': ['*/examples/*', '*/example/*'],
+    'headers': ['*/include/*', '*.h', '*.hpp', '*.pxd', '*.pyx'],
+}
+FOREIGN_ABI_RULE_SET_NAME = 'foreign_abi'
+DEFAULT_RULE_SETS_NAMES: List[str] = [*BUILT_IN_RULE_SETS.keys(), FOREIGN_ABI_RULE_SET_NAME]
+
+compiled_extension_cpython_tag_regex = re.compile(r'\.cpython-(\d+)[a-z]*-[^.]+\.so$')
+
+
+def get_matched_directory_relative_dirpath(layer_relative_filepath: str, pattern: str) -> Optional[str]:
+    """The folder matched by a directory pattern (like */docs/* for numpy/docs/index.rst, which matches numpy/docs),
+    or None for the patterns on the files names."""
+    if not pattern.endswith('/*'):
+        return None
+    directory_name: str = pattern[:-2].split('/')[-1]
+    parent_parts: Tuple[str, ...] = Path(layer_relative_filepath).parts[:-1]
+    for i_part, part in enumerate(parent_parts):
+        if part == directory_name:
+            return '/'.join(parent_parts[:i_part + 1])
+    return None
+
+def get_python_code_dirpaths(layer_relative_filepaths: Iterable[str]) -> Set[str]:
+    """The folders containing python modules, directly or in their sub folders."""
+    python_code_dirpaths: Set[str] = set()
+    for layer_relative_filepath in layer_relative_filepaths:
+        if layer_relative_filepath.endswith('.py'):
+            parent_parts: Tuple[str, ...] = Path(layer_relative_filepath).parts[:-1]
+            for i_part in range(len(parent_parts)):
+                python_code_dirpaths.add('/'.join(parent_parts[:i_part + 1]))
+    return python_code_dirpaths
+
+def get_layer_file_package_name(layer_relative_filepath: str) -> str:
+    return Path(Path(layer_relative_filepath).parts[0]).stem
+
+def is_foreign_abi_compiled_extension(layer_relative_filepath: str, python_version: str) -> bool:
+    if layer_relative_filepath.endswith('.pyd'):
+        # Windows compiled extensions can never be loaded by the Lambda runtime.
+        return True
+    cpython_tag_match = compiled_extension_cpython_tag_regex.search(layer_relative_filepath)
+    if cpython_tag_match is not None:
+        return cpython_tag_match.group(1) != python_version.replace(".", "")
+    return False
+
+
+class LayerPruner:
+    def __init__(self, config: LayerPruningConfig, python_version: str):
+        self.config = config
+        self.python_version = python_version
+
+        unknown_rule_sets_names = [
+            rule_set_name for rule_set_name in self.enabled_rule_sets_names
+            if rule_set_name not in BUILT_IN_RULE_SETS and rule_set_name != FOREIGN_ABI_RULE_SET_NAME
+        ]
+        if len(unknown_rule_sets_names) > 0:
+            raise Exception(f"Unknown layer pruning rule sets {unknown_rule_sets_names}. Available rule sets : {DEFAULT_RULE_SETS_NAMES}")
+
+    @property
+    def enabled_rule_sets_names(self) -> List[str]:
+        return self.config.rule_sets if self.config.rule_sets is not None else DEFAULT_RULE_SETS_NAMES
+
+    def should_prune_file(self, layer_relative_filepath: str, python_code_dirpaths: Optional[Set[str]] = None) -> bool:
+        """The folders matched by the directory patterns of the rule sets are never pruned when they contain python
+        modules, since they can be imported by the package (like botocore/docs, imported by botocore.client). Without
+        the python_code_dirpaths of the layer, only the python modules themselves are protected."""
+        package_name: str = get_layer_file_package_name(layer_relative_filepath=layer_relative_filepath)
+        package_override: Optional[PackagePruningOverride] = self.config.packages_overrides.get(package_name, None)
+        if package_override is not None:
+            if any(fnmatch.fnmatch(layer_relative_filepath, pattern) for pattern in package_override.kept_patterns):
+                return False
+            if any(fnmatch.fnmatch(layer_relative_filepath, pattern) for pattern in package_override.excluded_patterns):
+                return True
+
+        if '.dist-info/' in layer_relative_filepath:
+            # The metadata of the distributions is tiny, and is used by importlib.metadata at runtime.
+            return False
+        if any(fnmatch.fnmatch(layer_relative_filepath, pattern) for pattern in self.config.excluded_patterns):
+            return True
+
+        disabled_rule_sets_names: List[str] = package_override.disabled_rule_sets if package_override is not None else []
+        for rule_set_name in self.enabled_rule_sets_names:
+            if rule_set_name in disabled_rule_sets_names:
+                continue
+            if rule_set_name == FOREIGN_ABI_RULE_SET_NAME:
+                if is_foreign_abi_compiled_extension(layer_relative_filepath=layer_relative_filepath, python_version=self.python_version):
+                    return True
+            else:
+                for pattern in BUILT_IN_RULE_SETS[rule_set_name]:
+                    if fnmatch.fnmatch(layer_relative_filepath, pattern) and not self._is_python_code_directory_match(
+                            layer_relative_filepath=layer_relative_filepath, pattern=pattern, python_code_dirpaths=python_code_dirpaths
+                    ):
+                        return True
+        return False
+
+    @staticmethod
+    def _is_python_code_directory_match(layer_relative_filepath: str, pattern: str, python_code_dirpaths: Optional[Set[str]]) -> bool:
+        matched_dirpath: Optional[str] = get_matched_directory_relative_dirpath(layer_relative_filepath=layer_relative_filepath, pattern=pattern)
+        if matched_dirpath is None:
+            return False
+        return layer_relative_filepath.endswith('.py') or (python_code_dirpaths is not None and matched_dirpath in python_code_dirpaths)
+
+    def prune(self, local_files_items: List[LocalFileItem], layer_source_dirpath: str) -> Tuple[List[LocalFileItem], Dict[str, int]]:
+        kept_local_files_items: List[LocalFileItem] = list()
+        removed_bytes_by_package: Dict[str, int] = dict()
+
+        strip_executable: Optional[str] = None
+        if self.config.strip_native_extensions is True:
+            strip_executable = shutil.which('strip')
+            if strip_executable is None:
+                print("WARNING - strip_native_extensions is enabled, but no strip executable has been found on the PATH")
+
+        layer_relative_filepaths: List[str] = [
+            Path(os.path.relpath(local_file_item.absolute_filepath, layer_source_dirpath)).as_posix() for local_file_item in local_files_items
+        ]
+        python_code_dirpaths: Set[str] = get_python_code_dirpaths(layer_relative_filepaths=layer_relative_filepaths)
+        for local_file_item, layer_relative_filepath in zip(local_files_items, layer_relative_filepaths):
+            package_name: str = get_layer_file_package_name(layer_relative_filepath=layer_relative_filepath)
+
+            if self.should_prune_file(layer_relative_filepath=layer_relative_filepath, python_code_dirpaths=python_code_dirpaths):
+                removed_bytes_by_package[package_name] = (
+                    removed_bytes_by_package.get(package_name, 0) + os.path.getsize(local_file_item.absolute_filepath)
+                )
+                continue
+
+            if strip_executable is not None and layer_relative_filepath.endswith('.so'):
+                original_size: int = os.path.getsize(local_file_item.absolute_filepath)
+                strip_result = subprocess.run(
+                    [strip_executable, '--strip-unneeded', local_file_item.absolute_filepath],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                )
+                if strip_result.returncode != 0:
+                    # Happens for example when the host strip does not support the architecture of the extension.
+                    print(f"WARNING - Could not strip {layer_relative_filepath} : {strip_result.stderr.decode(errors='replace').strip()}")
+                else:
+                    stripped_bytes: int = original_size - os.path.getsize(local_file_item.absolute_filepath)
+                    removed_bytes_by_package[package_name] = removed_bytes_by_package.get(package_name, 0) + stripped_bytes
+            kept_local_files_items.append(local_file_item)
+
+        return kept_local_files_items, removed_bytes_by_package
+
+
+def print_pruning_report(removed_bytes_by_package: Dict[str, int]):
+    total_removed_bytes: int = sum(removed_bytes_by_package.values())
+    print(LeftAligned()({f"Layer pruning removed {total_removed_bytes} bytes": {
+        f"{package_name} : {removed_bytes} bytes": {}
+        for package_name, removed_bytes in sorted(removed_bytes_by_package.items(), key=lambda item: item[1], reverse=True)
+        if removed_bytes > 0
+    }}))
+
+def prune_layer_files(
+        local_files_items: List[LocalFileItem], layer_source_dirpath: str,
+        python_version: str, config: LayerPruningConfig
+) -> List[LocalFileItem]:
+    pruner = LayerPruner(config=config, python_version=python_version)
+    kept_local_files_items, removed_bytes_by_package = pruner.prune(
+        local_files_items=local_files_items, layer_source_dirpath=os.path.abspath(layer_source_dirpath)
+    )
+    print_pruning_report(removed_bytes_by_package=removed_bytes_by_package)
+    return kept_local_files_items
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Callable, Set
+
+from asciitree import LeftAligned
+
+from .configuration_client import LayersSplittingConfig
+from .packager import LocalFileItem, ContentFileItem
+from .size_report import read_layer_installed_distributions
+from .state_store import StateStore, get_state_store
+
+
+LAYERS_MANIFEST_FILENAME = "lambda_layers.json"
+LAYERS_SPLITTING_HISTORY_NAMESPACE = "layers_splitting_history"
+# The history of a dist folder is forgotten when it has not been built for this duration.
+LAYERS_SPLITTING_HISTORY_TTL_SECONDS = 90 * 24 * 60 * 60
+
+
+@dataclass
+class DistributionFilesGroup:
+    name: str
+    local_files_items: List[LocalFileItem] = field(default_factory=list)
+    requirements_names: Set[str] = field(default_factory=set)
+    uncompressed_bytes: int = 0
+    content_hash: Optional[str] = None
+    change_frequency: float = 0.0
+
+@dataclass
+class PlannedLayer:
+    groups: List[DistributionFilesGroup]
+
+    @property
+    def uncompressed_bytes(self) -> int:
+        return sum(group.uncompressed_bytes for group in self.groups)
+
+    @property
+    def content_hash(self) -> str:
+        layer_hash = hashlib.sha256()
+        for group in sorted(self.groups, key=lambda item: item.name):
+            layer_hash.update(f"{group.name}:{group.content_hash}\n".encode('utf-8'))
+        return layer_hash.hexdigest()
+
+    @property
+    def destination_key(self) -> str:
+        return f"lambda_layer_{self.content_hash[:16]}"
+
+
+def hash_distribution_files(local_files_items: List[LocalFileItem], layer_source_dirpath: str) -> str:
+    group_hash = hashlib.sha256()
+    for local_file_item in sorted(local_files_items, key=lambda item: item.absolute_filepath):
+        if local_file_item.absolute_filepath.endswith('.pyc'):
+            # The bytecode files compiled by pip embed the modification time of their sources, which changes at every
+            # installation. They are not taken into account, otherwise no layer would ever be considered unchanged.
+            continue
+        group_hash.update(Path(os.path.relpath(local_file_item.absolute_filepath, layer_source_dirpath)).as_posix().encode('utf-8'))
+        with open(local_file_item.absolute_filepath, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                group_hash.update(chunk)
+    return group_hash.hexdigest()
+
+def group_layer_files_by_distribution(local_files_items: List[LocalFileItem], layer_source_dirpath: str) -> List[DistributionFilesGroup]:
+    layer_source_dirpath = os.path.abspath(layer_source_dirpath)
+    distributions, distributions_names_by_relative_filepath = read_layer_installed_distributions(layer_source_dirpath=layer_source_dirpath)
+
+    groups: Dict[str, DistributionFilesGroup] = dict()
+    for local_file_item in local_files_items:
+        layer_relative_filepath: str = Path(os.path.relpath(local_file_item.absolute_filepath, layer_source_dirpath)).as_posix()
+        # The files not listed in any RECORD file are grouped by their top level package name.
+        group_name: str = distributions_names_by_relative_filepath.get(
+            layer_relative_filepath, Path(Path(layer_relative_filepath).parts[0]).stem
+        )
+        group = groups.get(group_name, None)
+        if group is None:
+            distribution = distributions.get(group_name, None)
+            group = DistributionFilesGroup(
+                name=group_name, requirements_names=distribution.requirements_names if distribution is not None else set()
+            )
+            groups[group_name] = group
+        group.local_files_items.append(local_file_item)
+        group.uncompressed_bytes += os.path.getsize(local_file_item.absolute_filepath)
+
+    for group in groups.values():
+        group.content_hash = hash_distribution_files(local_files_items=group.local_files_items, layer_source_dirpath=layer_source_dirpath)
+    return list(groups.values())
+
+
+def update_groups_change_frequencies(groups: List[DistributionFilesGroup], history_key: str, store: Optional[StateStore] = None):
+    """Record the content hash of each distribution in the state store, and compute their change frequency
+    as the ratio of builds where their content changed compared to the previous build."""
+    store = store if store is not None else get_state_store()
+    # The history is read and written back in a single transaction, since parallel builds can share the dist folder.
+    with store.transaction():
+        cache_history: Dict[str, dict] = store.get(namespace=LAYERS_SPLITTING_HISTORY_NAMESPACE, key=history_key, default={})
+        for group in groups:
+            group_history: dict = cache_history.setdefault(group.name, {'content_hash': None, 'builds_count': 0, 'changes_count': 0})
+            if group_history['content_hash'] is not None and group_history['content_hash'] != group.content_hash:
+                group_history['changes_count'] += 1
+            group_history['content_hash'] = group.content_hash
+            group_history['builds_count'] += 1
+            group.change_frequency = group_history['changes_count'] / group_history['builds_count']
+        store.set(
+            namespace=LAYERS_SPLITTING_HISTORY_NAMESPACE, key=history_key, value=cache_history,
+            ttl_seconds=LAYERS_SPLITTING_HISTORY_TTL_SECONDS
+        )
+
+def get_groups_components_keys(groups: List[DistributionFilesGroup]) -> Dict[str, str]:
+    """Union the distributions requiring each others, in order to place them next to each others when splitting."""
+    parents: Dict[str, str] = {group.name: group.name for group in groups}
+
+    def find(name: str) -> str:
+        while parents[name] != name:
+            parents[name] = parents[parents[name]]
+            name = parents[name]
+        return name
+
+    for group in groups:
+        for requirement_name in group.requirements_names:
+            if requirement_name in parents:
+                first_root, second_root = find(group.name), find(requirement_name)
+                if first_root != second_root:
+                    parents[max(first_root, second_root)] = min(first_root, second_root)
+    return {group.name: find(group.name) for group in groups}
+
+def plan_layers(groups: List[DistributionFilesGroup], config: LayersSplittingConfig) -> List[PlannedLayer]:
+    components_keys: Dict[str, str] = get_groups_components_keys(groups=groups)
+    # The most stable distributions are placed in the first layers, and the churning distributions are
+    # placed in the last ones, so that a change in a churning distribution does not invalidate a big layer.
+    sorted_groups: List[DistributionFilesGroup] = sorted(groups, key=lambda group: (
+        group.change_frequency > config.churn_threshold, components_keys[group.name], group.name
+    ))
+
+    layers: List[PlannedLayer] = list()
+    for group in sorted_groups:
+        if (
+                config.max_layer_uncompressed_bytes is not None
+                and group.uncompressed_bytes > config.max_layer_uncompressed_bytes
+        ):
+            raise Exception(
+                f"The distribution {group.name} of {group.uncompressed_bytes} bytes is bigger "
+                f"than the max_layer_uncompressed_bytes of {config.max_layer_uncompressed_bytes} bytes"
+            )
+        current_layer: Optional[PlannedLayer] = layers[-1] if len(layers) > 0 else None
+        should_start_new_layer: bool = current_layer is None or (
+            (config.max_layer_uncompressed_bytes is not None
+             and current_layer.uncompressed_bytes + group.uncompressed_bytes > config.max_layer_uncompressed_bytes)
+            or (current_layer.groups[-1].change_frequency <= config.churn_threshold < group.change_frequency
+                and len(layers) < config.max_layers_count)
+        )
+        if should_start_new_layer is True:
+            if len(layers) >= config.max_layers_count:
+                raise Exception(
+                    f"The dependencies cannot fit in {config.max_layers_count} layers "
+                    f"of {config.max_layer_uncompressed_bytes} uncompressed bytes"
+                )
+            layers.append(PlannedLayer(groups=[group]))
+        else:
+            current_layer.groups.append(group)
+    return layers
+
+
+def package_split_layers(
+        local_files_items: List[LocalFileItem], layer_source_dirpath: str, dist_dirpath: str, output_type: str,
+        config: LayersSplittingConfig,
+        package_files_handler: Callable[[str, str, List[LocalFileItem], List[ContentFileItem]], str]
+) -> List[str]:
+    groups = group_layer_files_by_distribution(local_files_items=local_files_items, layer_source_dirpath=layer_source_dirpath)
+    update_groups_change_frequencies(groups=groups, history_key=os.path.abspath(dist_dirpath))
+    layers = plan_layers(groups=groups, config=config)
+
+    manifest_filepath: str = os.path.join(dist_dirpath, LAYERS_MANIFEST_FILENAME)
+    previous_content_hashes: Set[str] = set()
+    if os.path.isfile(manifest_filepath):
+        with open(manifest_filepath, 'r') as manifest_file:
+            previous_content_hashes = {layer_entry['content_hash'] for layer_entry in json.load(manifest_file)}
+
+    layers_entries: List[dict] = list()
+    for i, layer in enumerate(layers):
+        expected_output_path: str = os.path.join(dist_dirpath, f"{layer.destination_key}.zip" if output_type == 'zip' else layer.destination_key)
+        # We only re-use the artifacts listed in the manifest of the previous build, which is written after all the
+        # artifacts have been packaged, so that a build interrupted while writing an artifact cannot cause its re-use.
+        if layer.content_hash in previous_content_hashes and os.path.exists(expected_output_path):
+            print(f"Re-used unchanged layer {layer.destination_key}")
+            output_path = expected_output_path
+        else:
+            output_path = package_files_handler(
+                dist_dirpath, layer.destination_key,
+                [local_file_item for group in layer.groups for local_file_item in group.local_files_items], []
+            )
+        layers_entries.append({
+            'index': i, 'content_hash': layer.content_hash, 'path': output_path,
+            'uncompressed_bytes': layer.uncompressed_bytes,
+            'distributions': {group.name: {'change_frequency': group.change_frequency} for group in layer.groups}
+        })
+
+    current_destinations_keys: Set[str] = {layer.destination_key for layer in layers}
+    for filename in os.listdir(dist_dirpath):
+        if filename.startswith('lambda_layer_') and Path(filename).stem not in current_destinations_keys:
+            # Removes the layers of previous builds that are not part of the current build anymore.
+            outdated_path: str = os.path.join(dist_dirpath, filename)
+            if os.path.isdir(outdated_path):
+                shutil.rmtree(outdated_path)
+            else:
+                os.remove(outdated_path)
+
+    with open(manifest_filepath, 'w+') as manifest_file:
+        manifest_file.write(json.dumps(layers_entries, indent=2))
+
+    print(LeftAligned()({f"Split dependencies in {len(layers)} layers": {
+        f"{layer_entry['path']} ({layer_entry['uncompressed_bytes']} bytes)": {
+            distribution_name: {} for distribution_name in layer_entry['distributions'].keys()
+        } for layer_entry in layers_entries
+    }}))
+    return [layer_entry['path'] for layer_entry in layers_entries]
@@ -0,0 +1,191 @@
+import fnmatch
+import re
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple, List, Iterable, BinaryIO
+
+from asciitree import LeftAligned
+
+from .configuration_client import Config, NativeExtensionsCheckConfig
+from .exceptions import NativeExtensionsMismatch
+from .instrumentation import traced, add_counter
+from .packager import LocalFileItem
+
+
+ELF_MAGIC = b'\x7fELF'
+ELF_CLASS_32 = 1
+ELF_CLASS_64 = 2
+ELF_DATA_LITTLE_ENDIAN = 1
+SHT_GNU_VERNEED = 0x6ffffffe
+
+ELF_MACHINES_NAMES = {3: 'x86', 40: 'arm', 62: 'x86_64', 183: 'arm64'}
+ARCHITECTURES_ELF_MACHINES = {'x86_64': 62, 'arm64': 183}
+
+MISMATCH_KIND_ARCHITECTURE = 'architecture'
+MISMATCH_KIND_GLIBC = 'glibc'
+
+# The shared libraries vendored by auditwheel are named like libgfortran-2e0d59d6.so.5.0.0
+SHARED_LIBRARY_FILENAME_REGEX = re.compile(r'\.so(\.\d+)*$')
+
+
+@dataclass
+class ElfHeaderInfo:
+    machine: int
+    required_glibc_version: Optional[Tuple[int, ...]]
+
+    @property
+    def machine_name(self) -> str:
+        return ELF_MACHINES_NAMES.get(self.machine, f"machine {self.machine}")
+
+def parse_glibc_version(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in version.split('.'))
+
+def format_glibc_version(version: Tuple[int, ...]) -> str:
+    return '.'.join(str(part) for part in version)
+
+def _read_at(file: BinaryIO, offset: int, size: int) -> bytes:
+    file.seek(offset)
+    data: bytes = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated ELF file")
+    return data
+
+def _read_c_string(file: BinaryIO, offset: int) -> str:
+    file.seek(offset)
+    data: bytes = file.read(256)
+    return data.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+
+def read_elf_header_info(filepath: str) -> Optional[ElfHeaderInfo]:
+    """Read the machine and the highest GLIBC symbol version required by an ELF shared library, from its header and
+    its version needs section (.gnu.version_r), without loading it. Returns None if the file is not an ELF file."""
+    with open(filepath, 'rb') as file:
+        identification: bytes = file.read(16)
+        if len(identification) < 16 or identification[:4] != ELF_MAGIC:
+            return None
+        elf_class, elf_data = identification[4], identification[5]
+        byte_order: str = '<' if elf_data == ELF_DATA_LITTLE_ENDIAN else '>'
+        if elf_class == ELF_CLASS_64:
+            (machine,) = struct.unpack(f'{byte_order}H', _read_at(file, 18, 2))
+            section_headers_offset, = struct.unpack(f'{byte_order}Q', _read_at(file, 40, 8))
+            section_header_size, sections_count = struct.unpack(f'{byte_order}HH', _read_at(file, 58, 4))
+            section_header_format = f'{byte_order}IIQQQQIIQQ'
+        elif elf_class == ELF_CLASS_32:
+            (machine,) = struct.unpack(f'{byte_order}H', _read_at(file, 18, 2))
+            section_headers_offset, = struct.unpack(f'{byte_order}I', _read_at(file, 32, 4))
+            section_header_size, sections_count = struct.unpack(f'{byte_order}HH', _read_at(file, 46, 4))
+            section_header_format = f'{byte_order}IIIIIIIIII'
+        else:
+            return None
+
+        sections: List[tuple] = [
+            struct.unpack(section_header_format, _read_at(
+                file, section_headers_offset + i_section * section_header_size, struct.calcsize(section_header_format)
+            )) for i_section in range(sections_count)
+        ]
+        required_glibc_version: Optional[Tuple[int, ...]] = None
+        for section in sections:
+            # The fields of a section header are : name, type, flags, addr, offset, size, link, info, addralign, entsize.
+            if section[1] != SHT_GNU_VERNEED:
+                continue
+            section_offset, strings_section_offset, entries_count = section[4], sections[section[6]][4], section[7]
+            entry_offset: int = section_offset
+            for _ in range(entries_count):
+                # Verneed entry : version, count of auxiliary entries, file name, offset of the first auxiliary entry, offset of the next entry.
+                _, auxiliary_count, _, auxiliary_offset, next_entry_offset = struct.unpack(f'{byte_order}HHIII', _read_at(file, entry_offset, 16))
+                current_auxiliary_offset: int = entry_offset + auxiliary_offset
+                for _ in range(auxiliary_count):
+                    # Vernaux entry : hash, flags, version index, offset of the version name, offset of the next entry.
+                    _, _, _, name_offset, next_auxiliary_offset = struct.unpack(f'{byte_order}IHHII', _read_at(file, current_auxiliary_offset, 16))
+                    version_name: str = _read_c_string(file, strings_section_offset + name_offset)
+                    if re.fullmatch(r'GLIBC_\d+(\.\d+)*', version_name):
+                        version: Tuple[int, ...] = parse_glibc_version(version_name[len('GLIBC_'):])
+                        if required_glibc_version is None or version > required_glibc_version:
+                            required_glibc_version = version
+                    current_auxiliary_offset += next_auxiliary_offset
+                if next_entry_offset == 0:
+                    break
+                entry_offset += next_entry_offset
+        return ElfHeaderInfo(machine=machine, required_glibc_version=required_glibc_version)
+
+
+def get_runtime_glibc_version(python_version: str) -> Tuple[int, ...]:
+    # The python 3.12 and later runtimes run on Amazon Linux 2023, the python 3.8 to 3.11 runtimes on Amazon Linux 2.
+    major, minor = (int(part) for part in python_version.split('.')[:2])
+    if (major, minor) >= (3, 12):
+        return 2, 34
+    if (major, minor) >= (3, 8):
+        return 2, 26
+    return 2, 17
+
+@dataclass
+class NativeExtensionMismatchItem:
+    relative_filepath: str
+    kind: str
+    expected: str
+    found: str
+
+def is_shared_library_filepath(filepath: str) -> bool:
+    return SHARED_LIBRARY_FILENAME_REGEX.search(filepath) is not None
+
+def find_native_extensions_mismatches(
+        local_files_items: Iterable[LocalFileItem], architecture: str, max_glibc_version: Tuple[int, ...],
+        excluded_patterns: Optional[List[str]] = None
+) -> List[NativeExtensionMismatchItem]:
+    expected_machine: int = ARCHITECTURES_ELF_MACHINES[architecture]
+    mismatches: List[NativeExtensionMismatchItem] = []
+    checked_files_count: int = 0
+    for local_file_item in local_files_items:
+        relative_filepath: str = local_file_item.relative_filepath.replace('\\', '/')
+        if not is_shared_library_filepath(relative_filepath):
+            continue
+        if excluded_patterns is not None and any(fnmatch.fnmatch(relative_filepath, pattern) for pattern in excluded_patterns):
+            continue
+        try:
+            elf_header_info: Optional[ElfHeaderInfo] = read_elf_header_info(local_file_item.absolute_filepath)
+        except (ValueError, struct.error, IndexError):
+            elf_header_info = None
+        if elf_header_info is None:
+            continue
+        checked_files_count += 1
+        if elf_header_info.machine != expected_machine:
+            mismatches.append(NativeExtensionMismatchItem(
+                relative_filepath=relative_filepath, kind=MISMATCH_KIND_ARCHITECTURE,
+                expected=architecture, found=elf_header_info.machine_name
+            ))
+        elif elf_header_info.required_glibc_version is not None and elf_header_info.required_glibc_version > max_glibc_version:
+            mismatches.append(NativeExtensionMismatchItem(
+                relative_filepath=relative_filepath, kind=MISMATCH_KIND_GLIBC,
+                expected=f"GLIBC {format_glibc_version(max_glibc_version)} or older",
+                found=f"GLIBC {format_glibc_version(elf_header_info.required_glibc_version)}"
+            ))
+    add_counter('native_extensions_checked', checked_files_count)
+    return mismatches
+
+def print_native_extensions_mismatches(mismatches: List[NativeExtensionMismatchItem]):
+    print(LeftAligned()({'Incompatible native extensions': {
+        f"{mismatch.relative_filepath}": {f"{mismatch.kind} : expected {mismatch.expected}, found {mismatch.found}": {}}
+        for mismatch in mismatches
+    }}))
+
+@traced('native_extensions_check', category='packaging')
+def check_native_extensions(config: Config, target_os: str, local_files_items: Iterable[LocalFileItem]):
+    """Fail the build when a packaged shared library has been built for another architecture, or requires a more
+    recent glibc than the one of the Lambda runtime, instead of letting the import fail at cold start."""
+    check_config: NativeExtensionsCheckConfig = (
+        config.native_extensions_check if config.native_extensions_check is not None else NativeExtensionsCheckConfig()
+    )
+    if target_os != 'linux' or check_config.enabled is not True:
+        return
+    max_glibc_version: Tuple[int, ...] = (
+        parse_glibc_version(check_config.max_glibc_version) if check_config.max_glibc_version is not None
+        else get_runtime_glibc_version(python_version=config.python_version)
+    )
+    mismatches: List[NativeExtensionMismatchItem] = find_native_extensions_mismatches(
+        local_files_items=local_files_items, architecture=config.architecture,
+        max_glibc_version=max_glibc_version, excluded_patterns=check_config.excluded_patterns
+    )
+    if len(mismatches) > 0:
+        print_native_extensions_mismatches(mismatches=mismatches)
+        raise NativeExtensionsMismatch(
+            architecture=config.architecture, max_glibc_version=format_glibc_version(max_glibc_version), mismatches=mismatches
+        )
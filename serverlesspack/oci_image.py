@@ -0,0 +1,278 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Iterable, Tuple, Union
+
+import click
+from asciitree import LeftAligned
+
+from .configuration_client import Config, OciImageConfig
+from .instrumentation import traced, add_counter
+from .packager import LocalFileItem, ContentFileItem
+from .utils import relative_filepath_to_module_name
+
+
+OCI_LAYOUT_VERSION = "1.0.0"
+MEDIA_TYPE_IMAGE_INDEX = "application/vnd.oci.image.index.v1+json"
+MEDIA_TYPE_IMAGE_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+MEDIA_TYPE_IMAGE_CONFIG = "application/vnd.oci.image.config.v1+json"
+MEDIA_TYPE_IMAGE_LAYER_GZIP = "application/vnd.oci.image.layer.v1.tar+gzip"
+ANNOTATION_REF_NAME = "org.opencontainers.image.ref.name"
+ANNOTATION_LAYER_NAME = "serverlesspack.layer.name"
+
+# All the files are copied in the task root of the Lambda base images, where the handler module is looked up and which
+# is in the python path, like the dependencies installed with pip install --target ${LAMBDA_TASK_ROOT}.
+LAMBDA_TASK_ROOT = "var/task"
+ARCHITECTURES_OCI_NAMES = {'x86_64': 'amd64', 'arm64': 'arm64'}
+
+# The entries of the tars have fixed metadata, so that a layer with the same files always has the same digest.
+TAR_ENTRIES_MTIME = 0
+
+
+def get_image_filepath(file_item: Union[LocalFileItem, ContentFileItem]) -> str:
+    relative_filepath: str = file_item.relative_filepath
+    if file_item.archive_prefix is not None:
+        # The site-packages prefix of the layers is not used, since an image is not extracted in /opt like a layer.
+        relative_filepath = relative_filepath[len(file_item.archive_prefix) + 1:]
+    return f"{LAMBDA_TASK_ROOT}/{relative_filepath}".replace(os.sep, '/')
+
+def is_timestamp_based_bytecode(filepath: str) -> bool:
+    # Since python 3.7, the flags after the magic number of a pyc file are 0 when it is invalidated by the mtime of its
+    # source. With the fixed mtime of the entries, these files would never be used, and they change with each install.
+    if not filepath.endswith('.pyc'):
+        return False
+    with open(filepath, 'rb') as file:
+        header: bytes = file.read(8)
+    return len(header) == 8 and header[4:8] == b'\x00\x00\x00\x00'
+
+def _make_tar_info(name: str, size: int = 0, is_directory: bool = False, is_executable: bool = False) -> tarfile.TarInfo:
+    tar_info = tarfile.TarInfo(name=name)
+    tar_info.size = size
+    tar_info.mtime = TAR_ENTRIES_MTIME
+    tar_info.uid = tar_info.gid = 0
+    tar_info.uname = tar_info.gname = ""
+    tar_info.type = tarfile.DIRTYPE if is_directory else tarfile.REGTYPE
+    # Only the executable bit of the files is kept from their permissions, so that the layer does not depend on the umask.
+    tar_info.mode = 0o755 if is_directory or is_executable else 0o644
+    return tar_info
+
+def make_layer_tar(local_files_items: Iterable[LocalFileItem], content_files_items: Iterable[ContentFileItem]) -> bytes:
+    """Write the files to an uncompressed tar, sorted by path and with their parent folders, with fixed metadata."""
+    entries: Dict[str, Tuple[Optional[str], Optional[bytes]]] = {}
+    for local_file_item in local_files_items:
+        if is_timestamp_based_bytecode(local_file_item.absolute_filepath):
+            continue
+        entries[get_image_filepath(local_file_item)] = (local_file_item.absolute_filepath, None)
+    for content_file_item in content_files_items:
+        entries[get_image_filepath(content_file_item)] = (None, content_file_item.content.encode('utf-8'))
+
+    directories_paths = {
+        '/'.join(image_filepath.split('/')[:i_part])
+        for image_filepath in entries for i_part in range(1, image_filepath.count('/') + 1)
+    }
+    tar_buffer = io.BytesIO()
+    # The gnu format is used since the pax format adds headers with the variable access times of the files.
+    with tarfile.open(fileobj=tar_buffer, mode='w', format=tarfile.GNU_FORMAT) as tar_object:
+        for directory_path in sorted(directories_paths):
+            tar_object.addfile(_make_tar_info(name=f"{directory_path}/", is_directory=True))
+        for image_filepath in sorted(entries):
+            absolute_filepath, content = entries[image_filepath]
+            is_executable: bool = False
+            if absolute_filepath is not None:
+                with open(absolute_filepath, 'rb') as file:
+                    content = file.read()
+                # Like the scripts of the distributions, or the executables vendored by some libraries.
+                is_executable = os.stat(absolute_filepath).st_mode & 0o111 != 0
+            tar_object.addfile(
+                _make_tar_info(name=image_filepath, size=len(content), is_executable=is_executable), io.BytesIO(content)
+            )
+    return tar_buffer.getvalue()
+
+def compress_layer_tar(layer_tar: bytes) -> bytes:
+    compressed_buffer = io.BytesIO()
+    # Without a fixed mtime and filename, the gzip header would change the digest of identical layers.
+    with gzip.GzipFile(filename='', mode='wb', fileobj=compressed_buffer, mtime=0) as gzip_file:
+        gzip_file.write(layer_tar)
+    return compressed_buffer.getvalue()
+
+
+@dataclass
+class OciBlob:
+    media_type: str
+    content: bytes
+    annotations: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def digest(self) -> str:
+        return f"sha256:{hashlib.sha256(self.content).hexdigest()}"
+
+    def descriptor(self) -> dict:
+        descriptor: dict = {'mediaType': self.media_type, 'digest': self.digest, 'size': len(self.content)}
+        if len(self.annotations) > 0:
+            descriptor['annotations'] = dict(self.annotations)
+        return descriptor
+
+@dataclass
+class OciLayerItem:
+    name: str
+    local_files_items: List[LocalFileItem]
+    content_files_items: List[ContentFileItem]
+
+@dataclass
+class BaseImage:
+    config: dict
+    layers_descriptors: List[dict]
+    blobs: Dict[str, bytes]
+
+def _encode_json(data: dict) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def load_base_image_layout(dirpath: str, architecture: str) -> BaseImage:
+    """Load the image of the target architecture from an OCI image layout folder, for example exported with
+    skopeo copy docker://public.ecr.aws/lambda/python:3.12 oci:base_image"""
+    def read_blob(digest: str) -> bytes:
+        algorithm, hex_digest = digest.split(':', 1)
+        with open(os.path.join(dirpath, 'blobs', algorithm, hex_digest), 'rb') as blob_file:
+            return blob_file.read()
+
+    with open(os.path.join(dirpath, 'index.json')) as index_file:
+        descriptors: List[dict] = json.load(index_file)['manifests']
+    while True:
+        matching_descriptors = [
+            descriptor for descriptor in descriptors
+            if descriptor.get('platform', {}).get('architecture', ARCHITECTURES_OCI_NAMES[architecture]) == ARCHITECTURES_OCI_NAMES[architecture]
+        ]
+        if len(matching_descriptors) == 0:
+            raise Exception(f"No image for the {architecture} architecture found in the base image layout at {dirpath}")
+        document: dict = json.loads(read_blob(matching_descriptors[0]['digest']))
+        if 'manifests' in document:
+            # Multi architectures images are an index of the manifests of each architecture.
+            descriptors = document['manifests']
+            continue
+        blobs: Dict[str, bytes] = {layer['digest']: read_blob(layer['digest']) for layer in document['layers']}
+        return BaseImage(config=json.loads(read_blob(document['config']['digest'])), layers_descriptors=document['layers'], blobs=blobs)
+
+def get_previous_layers_digests(image_filepath: str) -> Dict[str, str]:
+    """Read the digests of the layers of a previously written image layout tarball, by layer name."""
+    if not os.path.isfile(image_filepath):
+        return {}
+    try:
+        with tarfile.open(image_filepath, mode='r') as tar_object:
+            index: dict = json.load(tar_object.extractfile('index.json'))
+            manifest_digest: str = index['manifests'][0]['digest']
+            manifest: dict = json.load(tar_object.extractfile(f"blobs/sha256/{manifest_digest.split(':', 1)[1]}"))
+    except (tarfile.TarError, KeyError, ValueError):
+        return {}
+    return {
+        layer['annotations'][ANNOTATION_LAYER_NAME]: layer['digest']
+        for layer in manifest['layers'] if ANNOTATION_LAYER_NAME in layer.get('annotations', {})
+    }
+
+def get_default_handler(config: Config, output_base_dirpath: str) -> str:
+    module_name: str = relative_filepath_to_module_name(relative_filepath=os.path.relpath(config.root_filepath, output_base_dirpath))
+    return f"{module_name}.lambda_handler"
+
+@traced('oci_image', category='packaging')
+def write_oci_image_layout(
+        output_filepath: str, layers: List[OciLayerItem], architecture: str, cmd: List[str],
+        image_config: OciImageConfig, base_image: Optional[BaseImage] = None
+) -> List[OciBlob]:
+    """Write an OCI image layout tarball, with a content-addressed gzipped layer for each non empty layer item, on top
+    of the layers of the base image if any. Return the blobs of the written layers."""
+    layers_blobs: List[OciBlob] = []
+    diff_ids: List[str] = []
+    for layer in layers:
+        if len(layer.local_files_items) == 0 and len(layer.content_files_items) == 0:
+            continue
+        layer_tar: bytes = make_layer_tar(local_files_items=layer.local_files_items, content_files_items=layer.content_files_items)
+        diff_ids.append(f"sha256:{hashlib.sha256(layer_tar).hexdigest()}")
+        layers_blobs.append(OciBlob(
+            media_type=MEDIA_TYPE_IMAGE_LAYER_GZIP, content=compress_layer_tar(layer_tar=layer_tar),
+            annotations={ANNOTATION_LAYER_NAME: layer.name}
+        ))
+
+    base_config: dict = base_image.config if base_image is not None else {}
+    container_config: dict = dict(base_config.get('config', {}))
+    container_config['Cmd'] = cmd
+    container_config['WorkingDir'] = container_config.get('WorkingDir', f"/{LAMBDA_TASK_ROOT}")
+    if len(image_config.environment) > 0:
+        container_config['Env'] = [
+            *[variable for variable in container_config.get('Env', []) if variable.split('=', 1)[0] not in image_config.environment],
+            *[f"{name}={value}" for name, value in sorted(image_config.environment.items())]
+        ]
+    config_blob = OciBlob(media_type=MEDIA_TYPE_IMAGE_CONFIG, content=_encode_json({
+        'architecture': ARCHITECTURES_OCI_NAMES[architecture],
+        'os': 'linux',
+        'config': container_config,
+        'rootfs': {'type': 'layers', 'diff_ids': [*base_config.get('rootfs', {}).get('diff_ids', []), *diff_ids]},
+        # The history of the base image is not kept, since its entries must match the layers.
+        'history': [
+            *base_config.get('history', []),
+            *[{'created_by': f"serverlesspack {blob.annotations[ANNOTATION_LAYER_NAME]} layer"} for blob in layers_blobs]
+        ]
+    }))
+    manifest_blob = OciBlob(media_type=MEDIA_TYPE_IMAGE_MANIFEST, content=_encode_json({
+        'schemaVersion': 2,
+        'mediaType': MEDIA_TYPE_IMAGE_MANIFEST,
+        'config': config_blob.descriptor(),
+        'layers': [*(base_image.layers_descriptors if base_image is not None else []), *[blob.descriptor() for blob in layers_blobs]]
+    }), annotations={ANNOTATION_REF_NAME: image_config.reference})
+    index: dict = {'schemaVersion': 2, 'mediaType': MEDIA_TYPE_IMAGE_INDEX, 'manifests': [manifest_blob.descriptor()]}
+
+    blobs_contents: Dict[str, bytes] = dict(base_image.blobs) if base_image is not None else {}
+    for blob in [*layers_blobs, config_blob, manifest_blob]:
+        blobs_contents[blob.digest] = blob.content
+
+    temporary_output_filepath: str = f"{output_filepath}.temp"
+    with tarfile.open(temporary_output_filepath, mode='w', format=tarfile.GNU_FORMAT) as tar_object:
+        files_contents: List[Tuple[str, bytes]] = [
+            ('oci-layout', _encode_json({'imageLayoutVersion': OCI_LAYOUT_VERSION})),
+            ('index.json', _encode_json(index)),
+            *[(f"blobs/sha256/{digest.split(':', 1)[1]}", content) for digest, content in sorted(blobs_contents.items())]
+        ]
+        for directory_path in ['blobs/', 'blobs/sha256/']:
+            tar_object.addfile(_make_tar_info(name=directory_path, is_directory=True))
+        for filepath, content in files_contents:
+            tar_object.addfile(_make_tar_info(name=filepath, size=len(content)), io.BytesIO(content))
+    os.replace(temporary_output_filepath, output_filepath)
+    add_counter('oci_layers_written', len(layers_blobs))
+    return layers_blobs
+
+def package_oci_image(
+        config: Config, dist_dirpath: str, destination_key: str, output_base_dirpath: str,
+        code_local_files_items: List[LocalFileItem], code_content_files_items: List[ContentFileItem],
+        dependencies_local_files_items: List[LocalFileItem]
+) -> str:
+    """Package the dependencies, the application files and the generated files (like the missing __init__ files) into
+    separate layers, from the least to the most frequently changed, so that a change of the application files only
+    changes the digest of their own layer, and the registries never receive the unchanged layers again."""
+    image_config: OciImageConfig = config.oci_image if config.oci_image is not None else OciImageConfig()
+    output_filepath: str = os.path.join(dist_dirpath, f"{destination_key}.oci.tar")
+    previous_layers_digests: Dict[str, str] = get_previous_layers_digests(image_filepath=output_filepath)
+
+    layers_blobs: List[OciBlob] = write_oci_image_layout(
+        output_filepath=output_filepath,
+        layers=[
+            OciLayerItem(name='dependencies', local_files_items=dependencies_local_files_items, content_files_items=[]),
+            OciLayerItem(name='code', local_files_items=code_local_files_items, content_files_items=[]),
+            OciLayerItem(name='generated', local_files_items=[], content_files_items=code_content_files_items)
+        ],
+        architecture=config.architecture,
+        cmd=[image_config.handler if image_config.handler is not None else get_default_handler(config=config, output_base_dirpath=output_base_dirpath)],
+        image_config=image_config,
+        base_image=(
+            load_base_image_layout(dirpath=image_config.base_image_layout_dirpath, architecture=config.architecture)
+            if image_config.base_image_layout_dirpath is not None else None
+        )
+    )
+    print(LeftAligned()({f"OCI image {image_config.reference}": {
+        f"{blob.annotations[ANNOTATION_LAYER_NAME]} layer {blob.digest} ({len(blob.content)} bytes)": {
+            ('unchanged' if previous_layers_digests.get(blob.annotations[ANNOTATION_LAYER_NAME], None) == blob.digest else 'changed'): {}
+        } for blob in layers_blobs
+    }}))
+    click.secho(f"OCI image layout tarball available at {os.path.abspath(output_filepath)}", fg='green')
+    return output_filepath
@@ -1,32 +1,64 @@
+import io
 import logging
 import os
+import shlex
 import shutil
 import subprocess
+import sys
+import time
 import uuid
+import zipfile
 from pathlib import Path
-from typing import List, Dict, Set, Optional, Tuple, Union
+from typing import List, Dict, Set, Optional, Tuple, Union, Iterable, Iterator
 
 from asciitree import LeftAligned
 from pkg_resources import EggInfoDistribution
 import click
 from tqdm import tqdm
 
-from .exceptions import OutputDirpathTooLow
+from .exceptions import OutputDirpathTooLow, PackagesInstallationFailed
 from .imports_resolver import Resolver
-from .packages_lock_client import PackagesLockClient
+from .instrumentation import instrumentation, traced, add_counter
+from .configuration_client import DependenciesLockConfig, DockerBuilderConfig
+from .packages_lock_client import PackagesLockClient, make_pip_base_target_options, resolve_lockfile
 from .utils import message_with_vars
 
 
+def split_interned_dirpath(filepath: str) -> Tuple[str, str]:
+    """Split a filepath after its last separator, with the directory part (including its trailing separator) interned.
+    The files of a same folder share a single directory string, and joining both parts gives back the exact filepath."""
+    i_last_separator: int = max(filepath.rfind('/'), filepath.rfind(os.sep))
+    return sys.intern(filepath[:i_last_separator + 1]), filepath[i_last_separator + 1:]
+
 class BaseFileItem:
+    # The files items are created for every file of the layers, which can be tens of thousands of files. They use slots
+    # instead of a __dict__, and only keep the filename of each path, next to the interned prefixes shared between files.
+    __slots__ = ('archive_prefix', '_relative_dirpath', '_relative_filename')
+
     def __init__(self, archive_prefix: Optional[str], relative_filepath: str):
-        self.relative_filepath = f"{archive_prefix}/{relative_filepath}" if archive_prefix is not None else relative_filepath
+        self.archive_prefix = sys.intern(archive_prefix) if archive_prefix is not None else None
+        self._relative_dirpath, self._relative_filename = split_interned_dirpath(relative_filepath)
+
+    @property
+    def relative_filepath(self) -> str:
+        if self.archive_prefix is not None:
+            return f"{self.archive_prefix}/{self._relative_dirpath}{self._relative_filename}"
+        return f"{self._relative_dirpath}{self._relative_filename}"
 
 class LocalFileItem(BaseFileItem):
+    __slots__ = ('_absolute_dirpath', '_absolute_filename')
+
     def __init__(self, archive_prefix: Optional[str], relative_filepath: str, absolute_filepath: str):
         super().__init__(archive_prefix=archive_prefix, relative_filepath=relative_filepath)
-        self.absolute_filepath = absolute_filepath
+        self._absolute_dirpath, self._absolute_filename = split_interned_dirpath(absolute_filepath)
+
+    @property
+    def absolute_filepath(self) -> str:
+        return f"{self._absolute_dirpath}{self._absolute_filename}"
 
 class ContentFileItem(BaseFileItem):
+    __slots__ = ('content',)
+
     def __init__(self, archive_prefix: Optional[str], relative_filepath: str, content: str):
         super().__init__(archive_prefix=archive_prefix, relative_filepath=relative_filepath)
         self.content = content
@@ -56,99 +88,156 @@ def make_base_python_layer_packages_dir(python_version: str) -> str:
 def make_absolute_python_layer_packages_dirpath(base_target_dirpath: str, python_version: str) -> str:
     return f"{base_target_dirpath}/{make_base_python_layer_packages_dir(python_version=python_version)}"
 
-RUNTIME_PROVIDED_PACKAGES_NAMES = ["boto3", "botocore"]
-def remove_runtime_provided_packages(packages_names: Union[Set[str], List[str]]):
+# todo: move target_wheel_platforms out of this file and add support for windows system_os
+TARGET_WHEEL_PLATFORMS: Dict[Tuple[str, str], str] = {
+    ('linux', 'x86_64'): "manylinux2014_x86_64",
+    ('linux', 'arm64'): "manylinux2014_aarch64"
+}
+def get_wheel_platform(target_os: str, architecture: str = 'x86_64') -> Optional[str]:
+    return TARGET_WHEEL_PLATFORMS.get((target_os, architecture), None)
+
+def remove_runtime_provided_packages(
+        packages_names: Union[Set[str], List[str]], python_version: Optional[str] = None,
+        imported_versions: Optional[Dict[str, Optional[str]]] = None
+) -> Set[str]:
+    from .runtime_baseline import get_runtime_provided_packages_names
     set_packages_names: Set[str] = set(packages_names)
     # Convert the packages_names list to a new set or create a copy
     # of the packages_names set to avoid mutating the input variable.
-    for package_name in RUNTIME_PROVIDED_PACKAGES_NAMES:
-        if package_name in set_packages_names:
-            print(
-                f"Removed {package_name} as we expect it to be provided by the Lambda runtime."
-                f"Set should_remove_runtime_provided_packages to False in the config file to disable this feature."
-            )
-            set_packages_names.remove(package_name)
+    for package_name in sorted(get_runtime_provided_packages_names(
+            packages_names=set_packages_names, python_version=python_version, imported_versions=imported_versions
+    )):
+        print(
+            f"Removed {package_name} as we expect it to be provided by the Lambda runtime. "
+            f"Set should_remove_runtime_provided_packages to False in the config file to disable this feature."
+        )
+        set_packages_names.remove(package_name)
     return set_packages_names
 
 
 def _construct_pip_install_packages_command(
         packages_names: Union[Set[str], List[str]], target_dirpath: str,
         python_version: str, platform: Optional[str] = None,
-        should_remove_runtime_provided_packages: bool = True
-) -> str:
-    cleaned_packages_names: Set[str] = (
-        remove_runtime_provided_packages(packages_names=packages_names)
-        if should_remove_runtime_provided_packages is True else packages_names
-    )
-    packages_string: str = " ".join(cleaned_packages_names)
-
-    kwargs: Dict[str, Optional[str]] = {}
-    kwargs['target'] = f'"{target_dirpath}"'
-    kwargs['implementation'] = 'cp'
-    kwargs['only-binary=:all:'] = None
-    # We need to use an only-binary build mode in order be able to use python-version and platform arguments.
-    # As a side-note, using only-binary instead of a classical source install also slightly reduce the size of most packages.
-    kwargs['python'] = python_version
-    if platform is not None:
-        kwargs['platform'] = f'"{platform}"'
-    kwargs['upgrade'] = None
-
-    compiled_kwargs: str = " ".join([
-        f"--{key}{f' {value}' if value is not None else ''}"
-        for key, value in kwargs.items()
-    ])
-    return f'pip install {packages_string} {compiled_kwargs}'
+        should_remove_runtime_provided_packages: bool = True,
+        requirements_filepath: Optional[str] = None,
+        pip_executable: Optional[List[str]] = None,
+        find_links_dirpath: Optional[str] = None,
+        should_install_requirements: bool = True
+) -> List[str]:
+    command: List[str] = [*(pip_executable if pip_executable is not None else [sys.executable, '-m', 'pip']), 'install']
+    if requirements_filepath is not None:
+        # The requirements file of a lockfile contains every package to install with its hashes, so pip must
+        # neither resolve other dependencies nor upgrade the pinned versions.
+        command.extend(['--requirement', requirements_filepath, '--require-hashes', '--no-deps'])
+    else:
+        cleaned_packages_names: Set[str] = (
+            remove_runtime_provided_packages(packages_names=packages_names, python_version=python_version)
+            if should_remove_runtime_provided_packages is True else packages_names
+        )
+        command.extend(sorted(cleaned_packages_names))
+        command.append('--upgrade')
+        if should_install_requirements is not True:
+            # The packages are installed exactly as listed, their requirements being provided by another artifact.
+            command.append('--no-deps')
+    command.extend(['--target', target_dirpath])
+    if find_links_dirpath is not None:
+        # The wheels already downloaded in the folder are used instead of being downloaded again.
+        command.extend(['--find-links', find_links_dirpath])
+    command.extend(make_pip_base_target_options(python_version=python_version, platform=platform))
+    return command
 
 def download_packages_to_dir(
         packages_names: Union[Set[str], List[str]], target_dirpath: str,
         python_version: str, platform: Optional[str] = None,
-        should_remove_runtime_provided_packages: bool = True
+        should_remove_runtime_provided_packages: bool = True,
+        requirements_filepath: Optional[str] = None,
+        find_links_dirpath: Optional[str] = None,
+        should_install_requirements: bool = True
 ):
-    pip_install_command: str = _construct_pip_install_packages_command(
+    pip_install_command: List[str] = _construct_pip_install_packages_command(
         packages_names=packages_names, target_dirpath=target_dirpath,
         python_version=python_version, platform=platform,
-        should_remove_runtime_provided_packages=should_remove_runtime_provided_packages
+        should_remove_runtime_provided_packages=should_remove_runtime_provided_packages,
+        requirements_filepath=requirements_filepath, find_links_dirpath=find_links_dirpath,
+        should_install_requirements=should_install_requirements
     )
+    # The command is passed as a list of arguments, since a single string command is only supported on Windows without a shell.
     return subprocess.run(pip_install_command)
 
+def download_packages_wheels_to_dir(
+        packages_names: Union[Set[str], List[str]], wheels_dirpath: str, python_version: str, platform: Optional[str] = None
+) -> subprocess.CompletedProcess:
+    """Download the wheels of the packages and of their requirements, without installing them."""
+    return subprocess.run([
+        sys.executable, '-m', 'pip', 'download', *sorted(packages_names), '--dest', wheels_dirpath,
+        *make_pip_base_target_options(python_version=python_version, platform=platform)
+    ])
+
+def check_installation_result(installation_result: Optional[subprocess.CompletedProcess], packages_names: Union[Set[str], List[str]]):
+    # A failed pip install can leave a partial target folder, which must never be packaged as if it was complete.
+    if installation_result is not None and installation_result.returncode != 0:
+        raise PackagesInstallationFailed(packages_names=sorted(packages_names), returncode=installation_result.returncode)
+
 def download_packages_to_dir_with_docker_container(
         packages_names: Union[Set[str], List[str]], target_dirpath: str,
         python_version: str, platform: Optional[str] = None,
-        should_remove_runtime_provided_packages: bool = True
+        should_remove_runtime_provided_packages: bool = True,
+        requirements_filepath: Optional[str] = None,
+        docker_builder_config: Optional[DockerBuilderConfig] = None
 ):
-    def get_free_output_path():
-        import os
-        appdata_dirpath: Optional[str] = os.getenv('APPDATA')
-        if appdata_dirpath is None:
-            raise Exception("APPDATA not defined in Python environment")
-
-        for i_attempt in range(10):
-            build_id: str = str(uuid.uuid4())
-            output_path: str = os.path.join(appdata_dirpath, "serverlesspack", build_id)
-            if not os.path.exists(output_path):
-                return output_path
-        raise Exception("Could not find a free output path after max attempts")
-
-    source_path: str = get_free_output_path()
+    if docker_builder_config is not None:
+        from .docker_builder import get_docker_builder
+        return get_docker_builder(python_version=python_version, platform=platform, config=docker_builder_config).install(
+            packages_names=packages_names, target_dirpath=target_dirpath,
+            should_remove_runtime_provided_packages=should_remove_runtime_provided_packages,
+            requirements_filepath=requirements_filepath
+        )
+
+    from .docker_builder import get_build_image, get_docker_platform
+    from .state_store import get_user_cache_dirpath
+    # We create a temporary output path in the user cache folder instead of directly mounting the target folder, because Docker
+    # only support mounting of folders that are on the main hardrive. This "hack" allow to use external harddrives.
+    source_path: str = os.path.join(get_user_cache_dirpath(), "docker_outputs", str(uuid.uuid4()))
     os.makedirs(source_path)
     print(f"Created a temporary output path at : {source_path}")
-    # We create a temporary output path instead of directly mouting the folder, because Docker only support
-    # mounting of folders that are on the main hardrive. This "hack" allow to use external harddrives.
 
-    pip_install_command: str = _construct_pip_install_packages_command(
+    requirements_mount_arguments: List[str] = (
+        ['--mount', f'type=bind,source={os.path.dirname(os.path.abspath(requirements_filepath))},target=/requirements,readonly']
+        if requirements_filepath is not None else []
+    )
+    pip_install_command: List[str] = _construct_pip_install_packages_command(
         packages_names=packages_names, target_dirpath='/output',
         python_version=python_version, platform=platform,
-        should_remove_runtime_provided_packages=should_remove_runtime_provided_packages
+        should_remove_runtime_provided_packages=should_remove_runtime_provided_packages,
+        requirements_filepath=f"/requirements/{os.path.basename(requirements_filepath)}" if requirements_filepath is not None else None,
+        pip_executable=['pip']
     )
-    docker_wrapped_pip_install_command: str = (
-        f'docker run --mount type=bind,source={source_path},target=/output "public.ecr.aws/sam/build-python{python_version}" /bin/sh -c "{pip_install_command}; exit"'
+    docker_platform: Optional[str] = get_docker_platform(platform=platform)
+    docker_platform_arguments: List[str] = ['--platform', docker_platform] if docker_platform is not None else []
+    # The container runs as root by default, which would leave root owned files in the output folder that the current
+    # user could neither merge nor remove. The HOME of the user must be writable for pip, which has no home in the image.
+    user_arguments: List[str] = (
+        ['--user', f"{os.getuid()}:{os.getgid()}", '--env', 'HOME=/tmp'] if hasattr(os, 'getuid') else []
     )
-    # Command inspired from : https://aws.amazon.com/premiumsupport/knowledge-center/lambda-layer-simulated-docker/
-    subprocess.run(docker_wrapped_pip_install_command)
+    try:
+        # Command inspired from : https://aws.amazon.com/premiumsupport/knowledge-center/lambda-layer-simulated-docker/
+        installation_result = subprocess.run([
+            'docker', 'run', '--rm', *docker_platform_arguments, *user_arguments,
+            '--mount', f'type=bind,source={source_path},target=/output', *requirements_mount_arguments,
+            get_build_image(python_version=python_version), '/bin/sh', '-c', f"{shlex.join(pip_install_command)}; exit"
+        ])
+        # The partial output of a failed installation is never merged into the target folder.
+        check_installation_result(installation_result=installation_result, packages_names=packages_names)
 
-    shutil.move(source_path, target_dirpath)
+        # The installed packages are merged into the target folder, which can already contain packages.
+        os.makedirs(target_dirpath, exist_ok=True)
+        shutil.copytree(source_path, target_dirpath, dirs_exist_ok=True)
+    finally:
+        shutil.rmtree(source_path, ignore_errors=True)
+    return installation_result
 
 
+@traced('files_planning', category='packaging')
 def package_files(included_files_absolute_paths: Set[str], output_base_dirpath: str, archive_prefix: Optional[str] = None) -> Tuple[List[LocalFileItem], List[ContentFileItem]]:
     local_files_items: List[LocalFileItem] = list()
     content_files_items: Dict[str, ContentFileItem] = dict()
@@ -189,20 +278,23 @@ def package_files(included_files_absolute_paths: Set[str], output_base_dirpath:
                     content="", relative_filepath=expected_init_file_relative_filepath
                 )
 
+    add_counter('files_planned', len(local_files_items) + len(content_files_items))
     return local_files_items, list(content_files_items.values())
 
-def recursive_get_files_in_layer_folder(source_dirpath: str, base_layer_dirpath: str) -> List[LocalFileItem]:
-    output_local_file_items: List[LocalFileItem] = list()
-    for root_dirpath, dirs, filenames in os.walk(source_dirpath):
+def iter_files_in_layer_folder(source_dirpath: str, base_layer_dirpath: str) -> Iterator[LocalFileItem]:
+    absolute_source_dirpath: str = os.path.abspath(source_dirpath)
+    for root_dirpath, dirs, filenames in os.walk(absolute_source_dirpath):
+        # The relative dirpath is computed once per folder instead of once per file.
+        relative_dirpath: str = os.path.relpath(root_dirpath, absolute_source_dirpath)
         for filename in filenames:
-            absolute_filepath = os.path.abspath(os.path.join(root_dirpath, filename))
-            relative_filepath = os.path.relpath(absolute_filepath, source_dirpath)
-            output_local_file_items.append(LocalFileItem(
+            yield LocalFileItem(
                 archive_prefix=base_layer_dirpath,
-                relative_filepath=relative_filepath,
-                absolute_filepath=absolute_filepath
-            ))
-    return output_local_file_items
+                relative_filepath=os.path.join(relative_dirpath, filename) if relative_dirpath != '.' else filename,
+                absolute_filepath=os.path.join(root_dirpath, filename)
+            )
+
+def recursive_get_files_in_layer_folder(source_dirpath: str, base_layer_dirpath: str) -> List[LocalFileItem]:
+    return list(iter_files_in_layer_folder(source_dirpath=source_dirpath, base_layer_dirpath=base_layer_dirpath))
 
 def resolve_already_installed_dependencies(dependencies_distributions: Dict[str, Optional[EggInfoDistribution]], dirpath_to_search_into: str) -> Set[str]:
     reused_dependencies_tree_data: Dict[str, dict] = dict()
@@ -233,12 +325,15 @@ def resolve_already_installed_dependencies(dependencies_distributions: Dict[str,
         print(LeftAligned()({'Re-used packages': reused_dependencies_tree_data}))
     return missing_dependencies_names
 
+@traced('dependencies_installation', category='dependencies')
 def resolve_install_and_get_dependencies_files(
         resolver: Resolver, lambda_layer_dirpath: str, base_layer_dirpath: str,
         python_version: str, use_prototype_docker_install: bool = False,
-        should_remove_runtime_provided_packages: bool = True
+        should_remove_runtime_provided_packages: bool = True,
+        lock_config: Optional[DependenciesLockConfig] = None,
+        architecture: str = 'x86_64',
+        docker_builder_config: Optional[DockerBuilderConfig] = None
 ) -> List[LocalFileItem]:
-    # requirements = PackagesLockClient().open_requirements("./requirements.txt")
     # todo: add support for requirements.txt instead of fully relying on dependencies
     #  detection ? Or display insights into which requirements is not used
 
@@ -257,41 +352,103 @@ def resolve_install_and_get_dependencies_files(
     dependencies_names_requiring_installation = resolver.included_dependencies_distributions
 
     if len(dependencies_names_requiring_installation) > 0:
-        # todo: move target_os_to_wheel_platforms out of this file and add support for windows system_os
-        target_os_to_wheel_platforms = {
-            'linux': "manylinux2014_x86_64"
-        }
-        wheel_platform: Optional[str] = target_os_to_wheel_platforms.get(resolver.target_os, None)
-        # todo: add ability to custom wheel_platform in config file
+        wheel_platform: Optional[str] = get_wheel_platform(target_os=resolver.target_os, architecture=architecture)
         if wheel_platform is None:
             logging.warning(
-                f"Could not find a matching wheel platform for target_os {resolver.target_os}."
+                f"Could not find a matching wheel platform for target_os {resolver.target_os} and architecture {architecture}."
                 f"Defaulting to current system_os of {resolver.system_os}"
             )
 
+        imported_versions: Dict[str, Optional[str]] = {
+            package_name: getattr(resolver.included_dependencies_distributions.get(package_name, None), 'version', None)
+            for package_name in resolver.included_dependencies_names
+        }
+        packages_names: Set[str] = (
+            remove_runtime_provided_packages(
+                packages_names=resolver.included_dependencies_names, python_version=python_version, imported_versions=imported_versions
+            ) if should_remove_runtime_provided_packages is True else set(resolver.included_dependencies_names)
+        )
+        requirements_filepath: Optional[str] = None
+        if lock_config is not None:
+            lockfile = resolve_lockfile(
+                lock_client=PackagesLockClient(lockfile_filepath=lock_config.filepath), mode=lock_config.mode,
+                installed_versions={package_name: imported_versions[package_name] for package_name in packages_names},
+                python_version=python_version, platform=wheel_platform
+            )
+            # Only the locked packages required by the detected dependencies are installed, at their exact locked versions.
+            requirements_filepath = f"{lambda_layer_dirpath}.requirements.txt"
+            os.makedirs(os.path.dirname(requirements_filepath), exist_ok=True)
+            PackagesLockClient.write_requirements_file(
+                locked_packages=lockfile.get_packages_closure(packages_names=packages_names), filepath=requirements_filepath
+            )
+
         if use_prototype_docker_install is not True:
             dependencies_installation_result = download_packages_to_dir(
-                packages_names=resolver.included_dependencies_names,
+                packages_names=packages_names,
                 target_dirpath=lambda_layer_dirpath,
                 python_version=python_version,
                 platform=wheel_platform,
-                should_remove_runtime_provided_packages=should_remove_runtime_provided_packages
+                # The runtime provided packages have already been removed from the packages names.
+                should_remove_runtime_provided_packages=False,
+                requirements_filepath=requirements_filepath
             )
         else:
             dependencies_installation_result = download_packages_to_dir_with_docker_container(
-                packages_names=resolver.included_dependencies_names,
+                packages_names=packages_names,
                 target_dirpath=lambda_layer_dirpath,
                 python_version=python_version,
                 platform=wheel_platform,
-                should_remove_runtime_provided_packages=should_remove_runtime_provided_packages
+                should_remove_runtime_provided_packages=False,
+                requirements_filepath=requirements_filepath,
+                docker_builder_config=docker_builder_config
             )
+        check_installation_result(installation_result=dependencies_installation_result, packages_names=packages_names)
     dependencies_local_file_items = recursive_get_files_in_layer_folder(
         source_dirpath=lambda_layer_dirpath, base_layer_dirpath=base_layer_dirpath
     )
+    add_counter('dependencies_installed', len(dependencies_names_requiring_installation))
+    add_counter('installed_files', len(dependencies_local_file_items))
+    if len(dependencies_names_requiring_installation) > 0:
+        from .runtime_baseline import remove_runtime_provided_files
+        dependencies_local_file_items = remove_runtime_provided_files(
+            local_files_items=dependencies_local_file_items, layer_source_dirpath=lambda_layer_dirpath,
+            python_version=python_version, should_remove_runtime_provided_packages=should_remove_runtime_provided_packages,
+            imported_versions=imported_versions
+        )
     return dependencies_local_file_items
 
 
-def files_to_zip(root_path: str, destination_file_key: str, local_files_items: List[LocalFileItem], content_files_items: List[ContentFileItem]) -> str:
+# The content files are generated at each packaging, so a fixed date is used to keep the same archive bytes (and the
+# same SHA-256) when their content does not change. This is the earliest date that the zip format can represent.
+CONTENT_ZIP_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+def write_content_to_zip(zip_object: zipfile.ZipFile, arcname: str, content: str):
+    content_zip_info = zipfile.ZipInfo(filename=arcname, date_time=CONTENT_ZIP_ENTRY_DATE_TIME)
+    content_zip_info.compress_type = zipfile.ZIP_DEFLATED
+    # Without explicit permissions, the files written with writestr are extracted in read only
+    # mode, which is why files_to_zip writes the content files to temporary files instead.
+    content_zip_info.external_attr = 0o100644 << 16
+    zip_object.writestr(content_zip_info, content)
+
+@traced('archiving', category='packaging')
+def files_to_zip_bytes(local_files_items: Iterable[LocalFileItem], content_files_items: Iterable[ContentFileItem]) -> bytes:
+    """Write the files items to a zip archive in memory instead of in the dist folder. The entries are written in the
+    order of their paths, so that the archive does not depend on the order in which the files have been resolved."""
+    files_items: List[Union[LocalFileItem, ContentFileItem]] = sorted(
+        [*local_files_items, *content_files_items], key=lambda file_item: file_item.relative_filepath
+    )
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zip_object:
+        for file_item in files_items:
+            if isinstance(file_item, LocalFileItem):
+                zip_object.write(filename=file_item.absolute_filepath, arcname=file_item.relative_filepath)
+            else:
+                write_content_to_zip(zip_object=zip_object, arcname=file_item.relative_filepath, content=file_item.content)
+        add_counter('files_archived', len(zip_object.infolist()))
+    return zip_buffer.getvalue()
+
+@traced('archiving', category='packaging')
+def files_to_zip(root_path: str, destination_file_key: str, local_files_items: Iterable[LocalFileItem], content_files_items: Iterable[ContentFileItem]) -> str:
     output_zip_filepath = os.path.join(root_path, f'{destination_file_key}.zip')
     if os.path.isfile(output_zip_filepath):
         os.remove(output_zip_filepath)
@@ -319,17 +476,26 @@ def files_to_zip(root_path: str, destination_file_key: str, local_files_items: L
             # file, which we then write to the archive, because using writestr will create file's that are in read only mode, which
             # will not be usable by AWS Lambda. And I never figured out how to write file in read and write mode with writestr.
 
+        if instrumentation.enabled is True:
+            zip_infos = zip_object.infolist()
+            add_counter('files_archived', len(zip_infos))
+            add_counter('bytes_uncompressed', sum(zip_info.file_size for zip_info in zip_infos))
+            add_counter('bytes_compressed', sum(zip_info.compress_size for zip_info in zip_infos))
+
     click.secho(f"Packaged zipped file available at {os.path.abspath(output_zip_filepath)}", fg='green')
     return output_zip_filepath
 
-def files_to_folder(root_path: str, destination_dirname: str, local_files_items: List[LocalFileItem], content_files_items: List[ContentFileItem]) -> str:
+@traced('archiving', category='packaging')
+def files_to_folder(root_path: str, destination_dirname: str, local_files_items: Iterable[LocalFileItem], content_files_items: Iterable[ContentFileItem]) -> str:
     destination_dirpath = os.path.join(root_path, destination_dirname)
 
     if os.path.isdir(destination_dirpath):
         print(f"Deleting content of {destination_dirpath}...")
         shutil.rmtree(destination_dirpath)
 
+    written_files_count: int = 0
     for local_file_item in tqdm(local_files_items, desc="Copying local files"):
+        written_files_count += 1
         absolute_target_filepath = os.path.join(destination_dirpath, local_file_item.relative_filepath)
         absolute_target_parent_dirname = os.path.dirname(absolute_target_filepath)
         if not os.path.exists(absolute_target_parent_dirname):
@@ -337,9 +503,11 @@ def files_to_folder(root_path: str, destination_dirname: str, local_files_items:
         shutil.copy(src=local_file_item.absolute_filepath, dst=absolute_target_filepath)
 
     for content_file_item in tqdm(content_files_items, desc="Writing content files"):
+        written_files_count += 1
         absolute_target_filepath = os.path.join(destination_dirpath, content_file_item.relative_filepath)
         with open(absolute_target_filepath, "w+") as file:
             file.write(content_file_item.content)
 
+    add_counter('files_archived', written_files_count)
     click.secho(f"Folder available at {os.path.abspath(destination_dirpath)}", fg='green')
     return destination_dirpath
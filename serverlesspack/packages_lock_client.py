@@ -1,94 +1,305 @@
-"""
-THE ENTIRETY OF THIS FILE WILL BE DEPRECATED
-"""
-
-import ast
-import importlib
-import importlib.metadata
+import json
 import os
+import re
 import subprocess
 import sys
-from dataclasses import dataclass
-from pathlib import Path
-from types import ModuleType
-from typing import List, Dict, Optional
-import re
-import pkg_resources
+import tempfile
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Set
+
+from asciitree import LeftAligned
+
+from .exceptions import LockfileDrift, LockedPackagesWithoutHashes
+from .utils import normalize_distribution_name
+
+
+LOCKFILE_VERSION = 1
+
+DRIFT_KIND_UNLOCKED = "unlocked"
+DRIFT_KIND_VERSION_MISMATCH = "version_mismatch"
+DRIFT_KIND_UNUSED = "unused"
+DRIFT_KIND_PLATFORM_MISMATCH = "platform_mismatch"
 
 
 @dataclass
-class RequirementModuleItem:
-    module_name: str
+class LockedPackageItem:
+    name: str
     version: str
-    version_selector: str
+    hashes: List[str]
+    # Whether the package has been detected by the resolver, or is only required by another locked package.
+    requested: bool
+    requires: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'version': self.version, 'hashes': self.hashes, 'requested': self.requested, 'requires': self.requires}
+
+    @staticmethod
+    def from_dict(data: dict) -> 'LockedPackageItem':
+        return LockedPackageItem(
+            name=data['name'], version=data['version'], hashes=data.get('hashes', []),
+            requested=data.get('requested', False), requires=data.get('requires', [])
+        )
+
+@dataclass
+class Lockfile:
+    python_version: str
+    platform: Optional[str]
+    packages: Dict[str, LockedPackageItem] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            'version': LOCKFILE_VERSION, 'python_version': self.python_version, 'platform': self.platform,
+            'packages': {key: self.packages[key].to_dict() for key in sorted(self.packages.keys())}
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Lockfile':
+        if data.get('version', None) != LOCKFILE_VERSION:
+            raise Exception(f"Lockfile version {data.get('version', None)} not supported, expected {LOCKFILE_VERSION}")
+        return Lockfile(
+            python_version=data['python_version'], platform=data.get('platform', None),
+            packages={key: LockedPackageItem.from_dict(item) for key, item in data.get('packages', {}).items()}
+        )
+
+    def get_packages_closure(self, packages_names: Set[str]) -> List[LockedPackageItem]:
+        """Return the locked packages required to install the packages_names, with their own locked requirements."""
+        closure_keys: Set[str] = set()
+        keys_to_visit: List[str] = [normalize_distribution_name(package_name) for package_name in packages_names]
+        while len(keys_to_visit) > 0:
+            key: str = keys_to_visit.pop()
+            if key not in closure_keys and key in self.packages:
+                closure_keys.add(key)
+                keys_to_visit.extend(self.packages[key].requires)
+        return [self.packages[key] for key in sorted(closure_keys)]
+
+@dataclass
+class LockDriftItem:
+    name: str
+    kind: str
+    locked_version: Optional[str] = None
+    installed_version: Optional[str] = None
+
+
+def get_requirement_name(requirement: str) -> Optional[str]:
+    requirement_match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', requirement)
+    return requirement_match.group(1) if requirement_match is not None else None
+
+def make_pip_base_target_options(python_version: str, platform: Optional[str] = None) -> List[str]:
+    # We need to use an only-binary build mode in order be able to use python-version and platform arguments.
+    # As a side-note, using only-binary instead of a classical source install also slightly reduce the size of most packages.
+    options: List[str] = ['--implementation', 'cp', '--only-binary=:all:', '--python-version', python_version]
+    if platform is not None:
+        options.extend(['--platform', platform])
+    return options
+
 
 class PackagesLockClient:
-    def __init__(self):
-        self.requirements_modules: Dict[str, RequirementModuleItem] = dict()
-
-    def find_requirements(self):
-        pass
-
-    def get_root_module_name(self, module_filepath):
-        module_filepath_path = Path(module_filepath)
-        parents_parts: Optional[List[str]] = getattr(module_filepath_path.parents, '_parts', None)
-        if parents_parts is not None:
-            for i, parent in enumerate(parents_parts):
-                if parent == "site-packages":
-                    return parents_parts[i + 1] if len(parents_parts) - 1 > i + 1 else None
-        return None
-
-    def open_requirements(self, filepath: str) -> Dict[str, RequirementModuleItem]:
-        with Path(filepath).open() as requirements_txt:
-            crude_requirements: List[str] = [str(requirement) for requirement in pkg_resources.parse_requirements(requirements_txt)]
-            print(crude_requirements)
-            for requirement in crude_requirements:
-                requirement_matches = re.match(r'(.*)(~=|==)(.*)', requirement)
-                module_name = requirement_matches[1]
-                version_selector = requirement_matches[2]
-                package_version = requirement_matches[3]
-
-                if module_name not in self.requirements_modules:
-                    self.requirements_modules[module_name] = RequirementModuleItem(
-                        module_name=module_name, version=package_version, version_selector=version_selector
-                    )
-        print(self.requirements_modules)
-        return self.requirements_modules
-
-    def _import_module(self, module_name: str) -> Optional[ModuleType]:
-        try:
-            return importlib.import_module(module_name)
-        except ModuleNotFoundError as e:
-            try:
-                return importlib.import_module(module_name.lower())
-            except ModuleNotFoundError as e:
-                return None
-
-    def resolve(self):
-        for module_data in self.requirements_modules.values():
-            # result = subprocess.run(f"{sys.executable} pip show {module_data['module_name']}")
-            module_infos_bytes = subprocess.check_output([sys.executable, '-m', 'pip', 'show', module_data["module_name"]])
-            module_infos_str = module_infos_bytes.decode()
-
-            distribution = importlib.metadata.distribution(distribution_name=module_data['module_name'])
-
-            location_matches = re.findall(r'(Location: )(.*)', module_infos_str)
-            if len(location_matches) > 0:
-                module_root_location = location_matches[0][1].replace("\r", "").replace("\n", "")
-                module_location = os.path.join(module_root_location, module_data['module_name'])
-
-            imported_module = self._import_module(module_data['module_name'])
-            for item in imported_module.__dict__:
-                if isinstance(item, ast.Module):
-                    print(item)
-                    # self.requirements_modules[item]
-            print(imported_module)
-
-    def save_to_file(self):
-        pass
-
-
-if __name__ == '__main__':
-    client = PackagesLockClient()
-    client.open_requirements()
-    client.resolve()
+    def __init__(self, lockfile_filepath: str):
+        self.lockfile_filepath = lockfile_filepath
+
+    def load(self) -> Optional[Lockfile]:
+        if not os.path.isfile(self.lockfile_filepath):
+            return None
+        with open(self.lockfile_filepath) as lockfile_file:
+            return Lockfile.from_dict(json.load(lockfile_file))
+
+    def save(self, lockfile: Lockfile):
+        lockfile_dirpath: str = os.path.dirname(os.path.abspath(self.lockfile_filepath))
+        os.makedirs(lockfile_dirpath, exist_ok=True)
+        # The lockfile is written to a temporary file first, to never leave a truncated lockfile if the build is interrupted.
+        temporary_filepath: str = f"{self.lockfile_filepath}.tmp"
+        with open(temporary_filepath, 'w') as lockfile_file:
+            json.dump(lockfile.to_dict(), lockfile_file, indent=2)
+            lockfile_file.write("\n")
+        os.replace(temporary_filepath, self.lockfile_filepath)
+
+    @staticmethod
+    def lock(pinned_requirements: Dict[str, Optional[str]], python_version: str, platform: Optional[str] = None) -> Lockfile:
+        """Resolve the pinned requirements and all their own requirements for the target python version and platform,
+        with the hashes of the wheels that pip would install. Nothing is installed, pip only reports its resolution."""
+        lockfile = Lockfile(python_version=python_version, platform=platform)
+        if len(pinned_requirements) == 0:
+            return lockfile
+
+        requirements: List[str] = [
+            f"{name}=={version}" if version is not None else name
+            for name, version in sorted(pinned_requirements.items())
+        ]
+        with tempfile.TemporaryDirectory() as target_dirpath:
+            # The platform options of pip are only accepted with a target folder, even with a dry run.
+            pip_result = subprocess.run(
+                [
+                    sys.executable, '-m', 'pip', 'install', *requirements, '--dry-run', '--ignore-installed',
+                    '--quiet', '--report', '-', '--target', target_dirpath,
+                    *make_pip_base_target_options(python_version=python_version, platform=platform)
+                ],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+        if pip_result.returncode != 0:
+            raise Exception(f"Could not resolve the dependencies to lock : {pip_result.stderr}")
+        report: dict = json.loads(pip_result.stdout)
+
+        install_items: List[dict] = report.get('install', [])
+        installed_keys: Set[str] = {normalize_distribution_name(item['metadata']['name']) for item in install_items}
+        for install_item in install_items:
+            metadata: dict = install_item['metadata']
+            archive_hashes: Dict[str, str] = install_item.get('download_info', {}).get('archive_info', {}).get('hashes', {})
+            requirements_names: List[Optional[str]] = [
+                get_requirement_name(requirement=requirement) for requirement in metadata.get('requires_dist', [])
+            ]
+            lockfile.packages[normalize_distribution_name(metadata['name'])] = LockedPackageItem(
+                name=metadata['name'], version=metadata['version'],
+                hashes=[f"{algorithm}:{value}" for algorithm, value in sorted(archive_hashes.items())],
+                requested=install_item.get('requested', False),
+                # The environment markers and extras are not evaluated, so only the requirements that pip actually
+                # resolved are kept, which makes the requires an over-approximation among the locked packages.
+                requires=sorted({
+                    normalize_distribution_name(name) for name in requirements_names
+                    if name is not None and normalize_distribution_name(name) in installed_keys
+                })
+            )
+        return lockfile
+
+    @staticmethod
+    def find_drift(
+            lockfile: Lockfile, installed_versions: Dict[str, Optional[str]],
+            python_version: str, platform: Optional[str] = None
+    ) -> List[LockDriftItem]:
+        """Compare the distributions detected by the resolver and their installed versions with the lockfile."""
+        drift_items: List[LockDriftItem] = []
+        if lockfile.python_version != python_version or lockfile.platform != platform:
+            drift_items.append(LockDriftItem(
+                name="*", kind=DRIFT_KIND_PLATFORM_MISMATCH,
+                locked_version=f"python {lockfile.python_version} on {lockfile.platform}",
+                installed_version=f"python {python_version} on {platform}"
+            ))
+        detected_keys: Set[str] = set()
+        for name, installed_version in sorted(installed_versions.items()):
+            key: str = normalize_distribution_name(name)
+            detected_keys.add(key)
+            locked_package: Optional[LockedPackageItem] = lockfile.packages.get(key, None)
+            if locked_package is None:
+                drift_items.append(LockDriftItem(name=name, kind=DRIFT_KIND_UNLOCKED, installed_version=installed_version))
+            elif installed_version is not None and locked_package.version != installed_version:
+                drift_items.append(LockDriftItem(
+                    name=name, kind=DRIFT_KIND_VERSION_MISMATCH,
+                    locked_version=locked_package.version, installed_version=installed_version
+                ))
+        for key, locked_package in sorted(lockfile.packages.items()):
+            if locked_package.requested is True and key not in detected_keys:
+                drift_items.append(LockDriftItem(name=locked_package.name, kind=DRIFT_KIND_UNUSED, locked_version=locked_package.version))
+        return drift_items
+
+    @staticmethod
+    def write_requirements_file(locked_packages: List[LockedPackageItem], filepath: str):
+        # The requirements file is installed with --require-hashes, which makes pip reject the whole file when a
+        # single requirement has no hash, so the file is not written instead of failing later in the installation.
+        unhashed_packages_names: List[str] = sorted(locked_package.name for locked_package in locked_packages if len(locked_package.hashes) == 0)
+        if len(unhashed_packages_names) > 0:
+            raise LockedPackagesWithoutHashes(packages_names=unhashed_packages_names)
+        with open(filepath, 'w') as requirements_file:
+            for locked_package in locked_packages:
+                hashes_options: str = " ".join(f"--hash={package_hash}" for package_hash in locked_package.hashes)
+                requirements_file.write(f"{locked_package.name}=={locked_package.version} {hashes_options}\n")
+
+
+def print_lock_drift(drift_items: List[LockDriftItem]):
+    if len(drift_items) == 0:
+        print(LeftAligned()({'Lockfile': {'No drift between the lockfile and the installed dependencies': {}}}))
+        return
+    print(LeftAligned()({'Lockfile drift': {
+        f"{drift_item.name} : {drift_item.kind}": {
+            **({f"locked {drift_item.locked_version}": {}} if drift_item.locked_version is not None else {}),
+            **({f"installed {drift_item.installed_version}": {}} if drift_item.installed_version is not None else {})
+        } for drift_item in drift_items
+    }}))
+
+def resolve_lockfile(
+        lock_client: PackagesLockClient, mode: str, installed_versions: Dict[str, Optional[str]],
+        python_version: str, platform: Optional[str] = None
+) -> Lockfile:
+    """Load, create or update the lockfile according to the mode :
+    - update : the detected dependencies are locked again at their installed versions.
+    - auto : the existing pins are kept, and only the dependencies missing from the lockfile are locked.
+    - frozen : the lockfile is used as is, and any drift with the detected dependencies raises an exception."""
+    lockfile: Optional[Lockfile] = lock_client.load()
+    if mode == 'frozen':
+        if lockfile is None:
+            raise Exception(f"No lockfile found at {lock_client.lockfile_filepath} while using the frozen lock mode")
+        drift_items: List[LockDriftItem] = [
+            drift_item for drift_item in PackagesLockClient.find_drift(
+                lockfile=lockfile, installed_versions=installed_versions, python_version=python_version, platform=platform
+            ) if drift_item.kind != DRIFT_KIND_UNUSED
+        ]
+        if len(drift_items) > 0:
+            print_lock_drift(drift_items=drift_items)
+            raise LockfileDrift(lockfile_filepath=lock_client.lockfile_filepath, drift_items=drift_items)
+        return lockfile
+
+    if mode == 'auto' and lockfile is not None and lockfile.python_version == python_version and lockfile.platform == platform:
+        missing_requirements: Dict[str, Optional[str]] = {
+            name: version for name, version in installed_versions.items()
+            if normalize_distribution_name(name) not in lockfile.packages
+        }
+        if len(missing_requirements) == 0:
+            return lockfile
+        # The already locked packages are kept pinned, so that adding a dependency does not upgrade the others.
+        pinned_requirements: Dict[str, Optional[str]] = {
+            locked_package.name: locked_package.version
+            for locked_package in lockfile.packages.values() if locked_package.requested is True
+        }
+        pinned_requirements.update(missing_requirements)
+    elif mode in ('auto', 'update'):
+        pinned_requirements: Dict[str, Optional[str]] = dict(installed_versions)
+    else:
+        raise Exception(f"Lock mode {mode} not supported")
+
+    lockfile = PackagesLockClient.lock(pinned_requirements=pinned_requirements, python_version=python_version, platform=platform)
+    lock_client.save(lockfile=lockfile)
+    print(f"Locked {len(lockfile.packages)} packages in {lock_client.lockfile_filepath}")
+    return lockfile
+
+
+def lock_api(target_os: str, config_filepath: str, verbose: bool = False, should_verify: bool = False, mode: str = 'update') -> List[LockDriftItem]:
+    """Lock the dependencies detected by the resolution of the config, or only verify that the lockfile matches them.
+    The verification never installs nor downloads anything, and raises a LockfileDrift exception on drift."""
+    from .cli import python_path_wrapper, resolve_config_files
+    from .configuration_client import ConfigClient, DependenciesLockConfig
+    from .packager import get_wheel_platform, remove_runtime_provided_packages
+
+    config = ConfigClient(verbose=verbose).load_render_config_file(filepath=config_filepath, target_os=target_os)
+    lock_config: DependenciesLockConfig = config.dependencies_lock if config.dependencies_lock is not None else DependenciesLockConfig(
+        filepath=os.path.join(os.path.dirname(os.path.abspath(config_filepath)), DependenciesLockConfig().filepath)
+    )
+    resolver = python_path_wrapper(config=config, f=lambda: resolve_config_files(config=config, target_os=target_os, verbose=verbose))
+    imported_versions: Dict[str, Optional[str]] = {
+        package_name: getattr(resolver.included_dependencies_distributions.get(package_name, None), 'version', None)
+        for package_name in resolver.included_dependencies_names
+    }
+    packages_names: Set[str] = (
+        remove_runtime_provided_packages(
+            packages_names=resolver.included_dependencies_names, python_version=config.python_version, imported_versions=imported_versions
+        ) if config.should_remove_runtime_provided_packages is True else set(resolver.included_dependencies_names)
+    )
+    installed_versions: Dict[str, Optional[str]] = {package_name: imported_versions[package_name] for package_name in packages_names}
+    wheel_platform: Optional[str] = get_wheel_platform(target_os=target_os, architecture=config.architecture)
+    lock_client = PackagesLockClient(lockfile_filepath=lock_config.filepath)
+
+    if should_verify is True:
+        lockfile: Optional[Lockfile] = lock_client.load()
+        if lockfile is None:
+            raise Exception(f"No lockfile found at {lock_config.filepath}")
+        drift_items: List[LockDriftItem] = PackagesLockClient.find_drift(
+            lockfile=lockfile, installed_versions=installed_versions,
+            python_version=config.python_version, platform=wheel_platform
+        )
+        print_lock_drift(drift_items=drift_items)
+        if len(drift_items) > 0:
+            raise LockfileDrift(lockfile_filepath=lock_config.filepath, drift_items=drift_items)
+        return drift_items
+
+    resolve_lockfile(
+        lock_client=lock_client, mode=mode, installed_versions=installed_versions,
+        python_version=config.python_version, platform=wheel_platform
+    )
+    return []
@@ -0,0 +1,492 @@
+import functools
+import os
+import queue
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Optional, Set, Union, Dict, Any
+
+import click
+
+from .artifacts_deduplication import apply_artifacts_deduplication
+from .configuration_client import Config, DependenciesLockConfig, DockerBuilderConfig
+from .instrumentation import span, add_counter
+from .imports_resolver import Resolver
+from .layer_pruning import prune_layer_files
+from .layers_splitting import package_split_layers
+from .native_extensions import check_native_extensions
+from .packager import LocalFileItem, ContentFileItem, FileItemsFactory, get_wheel_platform, \
+    make_base_python_layer_packages_dir, package_files, iter_files_in_layer_folder, download_packages_to_dir, \
+    download_packages_to_dir_with_docker_container, remove_runtime_provided_packages, write_content_to_zip, \
+    check_installation_result, download_packages_wheels_to_dir
+from .packages_lock_client import PackagesLockClient, Lockfile, LockDriftItem, resolve_lockfile, print_lock_drift, \
+    DRIFT_KIND_UNUSED
+from .exceptions import LockfileDrift
+from .priming import make_priming_content_file_item
+from .size_report import make_size_report, print_size_report, save_size_report, enforce_size_budgets
+from .utils import normalize_distribution_name
+
+
+_END_OF_STREAM = object()
+
+
+class ArchiveWriterThread(threading.Thread):
+    """Write the files items to a zip or a folder as soon as they are put in the queue of the thread, so that the
+    archiving of the files overlaps with the stages that produce them."""
+
+    def __init__(self, dist_dirpath: str, destination_key: str, output_type: str):
+        super().__init__(name=f"archive-writer-{destination_key}", daemon=True)
+        self.output_type = output_type
+        self.output_path = os.path.join(dist_dirpath, f"{destination_key}.zip" if output_type == 'zip' else destination_key)
+        self.files_items_queue: queue.Queue = queue.Queue()
+        self.written_files_count: int = 0
+        self.error: Optional[BaseException] = None
+        self._has_received_end_of_stream: bool = False
+
+    def put(self, file_item: Union[LocalFileItem, ContentFileItem]):
+        self.files_items_queue.put(file_item)
+
+    def run(self):
+        try:
+            with span('archiving', category='packaging', destination=os.path.basename(self.output_path)):
+                if self.output_type == 'zip':
+                    self._write_zip()
+                else:
+                    self._write_folder()
+                add_counter('files_archived', self.written_files_count)
+        except BaseException as e:
+            self.error = e
+            # The remaining items are consumed, to not keep them in memory after the writer stopped.
+            while not self._has_received_end_of_stream and self.files_items_queue.get() is not _END_OF_STREAM:
+                pass
+
+    def _iter_unique_files_items(self):
+        written_relative_filepaths: Set[str] = set()
+        while True:
+            file_item = self.files_items_queue.get()
+            if file_item is _END_OF_STREAM:
+                self._has_received_end_of_stream = True
+                return
+            relative_filepath: str = file_item.relative_filepath
+            if relative_filepath not in written_relative_filepaths:
+                written_relative_filepaths.add(relative_filepath)
+                self.written_files_count += 1
+                yield file_item
+
+    def _write_zip(self):
+        if os.path.isfile(self.output_path):
+            os.remove(self.output_path)
+        with zipfile.ZipFile(self.output_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_object:
+            for file_item in self._iter_unique_files_items():
+                if isinstance(file_item, LocalFileItem):
+                    zip_object.write(filename=file_item.absolute_filepath, arcname=file_item.relative_filepath)
+                else:
+                    write_content_to_zip(zip_object=zip_object, arcname=file_item.relative_filepath, content=file_item.content)
+
+    def _write_folder(self):
+        if os.path.isdir(self.output_path):
+            shutil.rmtree(self.output_path)
+        for file_item in self._iter_unique_files_items():
+            target_filepath: str = os.path.join(self.output_path, file_item.relative_filepath)
+            os.makedirs(os.path.dirname(target_filepath), exist_ok=True)
+            if isinstance(file_item, LocalFileItem):
+                shutil.copy(src=file_item.absolute_filepath, dst=target_filepath)
+            else:
+                with open(target_filepath, 'w+') as file:
+                    file.write(file_item.content)
+
+    def stop(self):
+        self.files_items_queue.put(_END_OF_STREAM)
+        self.join()
+
+    def finish(self) -> str:
+        self.files_items_queue.put(_END_OF_STREAM)
+        self.join()
+        if self.error is not None:
+            raise self.error
+        click.secho(f"Packaged {self.written_files_count} files to {os.path.abspath(self.output_path)}", fg='green')
+        return self.output_path
+
+
+def merge_installation_dirpath(source_dirpath: str, destination_dirpath: str):
+    """Move the installed files of a batch to the layer folder. The batches install disjoint sets of pinned distributions,
+    so only the folders shared by several distributions (like namespace packages) are merged."""
+    for root_dirpath, dirs, filenames in os.walk(source_dirpath):
+        target_root_dirpath: str = os.path.join(destination_dirpath, os.path.relpath(root_dirpath, source_dirpath))
+        os.makedirs(target_root_dirpath, exist_ok=True)
+        for filename in filenames:
+            target_filepath: str = os.path.join(target_root_dirpath, filename)
+            if not os.path.exists(target_filepath):
+                os.replace(os.path.join(root_dirpath, filename), target_filepath)
+    shutil.rmtree(source_dirpath)
+
+
+class DependenciesInstallerThread(threading.Thread):
+    """Install the dependencies while they are discovered by the resolution, with a single consistent set of versions.
+
+    With a frozen lockfile, the locked packages are installed in concurrent batches with their pinned versions and
+    without their dependencies, in separate folders merged into the layer folder once the resolution is done. Without a
+    lockfile, the versions of the requirements shared by several dependencies can only be resolved from all of them, so
+    only the downloads of the wheels overlap with the resolution, in batches of the dependencies discovered while every
+    slot was busy, and all the dependencies are installed by a single pip resolution from the downloaded wheels at the
+    end. With the other lock modes, the lockfile is updated and installed once the resolution is done."""
+
+    def __init__(
+            self, lambda_layer_dirpath: str, python_version: str, platform: Optional[str],
+            use_prototype_docker_install: bool = False, should_remove_runtime_provided_packages: bool = True,
+            lock_config: Optional[DependenciesLockConfig] = None, max_concurrent_installations: Optional[int] = None,
+            docker_builder_config: Optional[DockerBuilderConfig] = None
+    ):
+        super().__init__(name="dependencies-installer", daemon=True)
+        self.lambda_layer_dirpath = lambda_layer_dirpath
+        self.batches_dirpath = f"{lambda_layer_dirpath}_batches"
+        self.wheels_dirpath = f"{lambda_layer_dirpath}_wheels"
+        self.python_version = python_version
+        self.platform = platform
+        self.use_prototype_docker_install = use_prototype_docker_install
+        self.docker_builder_config = docker_builder_config
+        self.should_remove_runtime_provided_packages = should_remove_runtime_provided_packages
+        self.lock_config = lock_config
+        self.dependencies_queue: queue.Queue = queue.Queue()
+        self.installed_versions: Dict[str, Optional[str]] = dict()
+        self.installed_locked_keys: Set[str] = set()
+        self.batches_count: int = 0
+        self.error: Optional[BaseException] = None
+        if max_concurrent_installations is None:
+            # The startup of pip is mostly bound by the CPU, so running more installations than cores does not help.
+            max_concurrent_installations = min(4, os.cpu_count() or 1)
+        self._installations_slots = threading.Semaphore(max_concurrent_installations)
+        self._installations_executor = ThreadPoolExecutor(max_workers=max_concurrent_installations, thread_name_prefix="dependencies-batch")
+        self._installations_futures: List[Future] = []
+
+        # A frozen lockfile is known before the resolution, so its packages can be installed while resolving. Otherwise,
+        # the lockfile can only be updated from all the dependencies, and they are installed once the resolution is done.
+        self.lock_client: Optional[PackagesLockClient] = (
+            PackagesLockClient(lockfile_filepath=lock_config.filepath) if lock_config is not None else None
+        )
+        self.frozen_lockfile: Optional[Lockfile] = None
+        if lock_config is not None and lock_config.mode == 'frozen':
+            self.frozen_lockfile = self.lock_client.load()
+            if self.frozen_lockfile is None:
+                raise Exception(f"No lockfile found at {lock_config.filepath} while using the frozen lock mode")
+
+    @property
+    def installs_while_resolving(self) -> bool:
+        return self.frozen_lockfile is not None
+
+    @property
+    def downloads_while_resolving(self) -> bool:
+        # The docker installations run pip inside the build image, which cannot use the wheels downloaded on the host.
+        return self.lock_config is None and self.use_prototype_docker_install is not True
+
+    @property
+    def processes_batches_while_resolving(self) -> bool:
+        return self.installs_while_resolving or self.downloads_while_resolving
+
+    def add_dependency(self, dependency_name: str, distribution: Optional[Any]):
+        self.dependencies_queue.put((dependency_name, getattr(distribution, 'version', None)))
+
+    def run(self):
+        is_end_of_stream: bool = False
+        try:
+            pending_versions: Dict[str, Optional[str]] = dict()
+            while not is_end_of_stream:
+                if self.processes_batches_while_resolving:
+                    # Waiting for a free slot before taking the dependencies from the queue groups the
+                    # dependencies discovered while all the slots were busy in the same batch.
+                    self._installations_slots.acquire()
+                dependency_item = self.dependencies_queue.get()
+                while True:
+                    if dependency_item is _END_OF_STREAM:
+                        is_end_of_stream = True
+                        break
+                    pending_versions[dependency_item[0]] = dependency_item[1]
+                    try:
+                        dependency_item = self.dependencies_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if self.processes_batches_while_resolving or is_end_of_stream:
+                    if self.should_remove_runtime_provided_packages is True:
+                        pending_names: Set[str] = remove_runtime_provided_packages(
+                            packages_names=pending_versions.keys(), python_version=self.python_version, imported_versions=pending_versions
+                        )
+                        pending_versions = {name: pending_versions[name] for name in pending_names}
+                    if not self._submit_batch(batch_versions=pending_versions) and self.processes_batches_while_resolving:
+                        self._installations_slots.release()
+                    pending_versions = dict()
+            for future in self._installations_futures:
+                future.result()
+            if self.lock_client is None and len(self.installed_versions) > 0:
+                # All the dependencies are installed by a single pip resolution, once all their wheels have been downloaded.
+                if os.path.isdir(self.wheels_dirpath):
+                    # The wheels of the batches are gathered in the folder used as --find-links, which is not recursive.
+                    for batch_dirname in os.listdir(self.wheels_dirpath):
+                        batch_wheels_dirpath: str = os.path.join(self.wheels_dirpath, batch_dirname)
+                        for wheel_filename in os.listdir(batch_wheels_dirpath):
+                            if not os.path.exists(os.path.join(self.wheels_dirpath, wheel_filename)):
+                                os.replace(os.path.join(batch_wheels_dirpath, wheel_filename), os.path.join(self.wheels_dirpath, wheel_filename))
+                self.batches_count += 1
+                self._install_batch(
+                    batch_index=self.batches_count, packages_names=set(self.installed_versions.keys()), requirements_filepath=None,
+                    find_links_dirpath=self.wheels_dirpath if self.downloads_while_resolving else None
+                )
+            if os.path.isdir(self.batches_dirpath):
+                with span('dependencies_merging', category='dependencies'):
+                    for batch_dirname in sorted(os.listdir(self.batches_dirpath), key=int):
+                        merge_installation_dirpath(
+                            source_dirpath=os.path.join(self.batches_dirpath, batch_dirname), destination_dirpath=self.lambda_layer_dirpath
+                        )
+                    shutil.rmtree(self.batches_dirpath)
+        except BaseException as e:
+            self.error = e
+            while not is_end_of_stream and self.dependencies_queue.get() is not _END_OF_STREAM:
+                pass
+        finally:
+            self._installations_executor.shutdown(wait=True)
+            shutil.rmtree(self.wheels_dirpath, ignore_errors=True)
+
+    def _submit_batch(self, batch_versions: Dict[str, Optional[str]]) -> bool:
+        if len(batch_versions) == 0:
+            return False
+        self.installed_versions.update(batch_versions)
+        if self.lock_client is None:
+            if not self.downloads_while_resolving:
+                return False
+            self.batches_count += 1
+            self._installations_futures.append(self._installations_executor.submit(
+                self._download_batch, batch_index=self.batches_count, packages_names=set(batch_versions.keys())
+            ))
+            return True
+
+        lockfile: Lockfile = self.frozen_lockfile if self.frozen_lockfile is not None else resolve_lockfile(
+            lock_client=self.lock_client, mode=self.lock_config.mode, installed_versions=self.installed_versions,
+            python_version=self.python_version, platform=self.platform
+        )
+        if self.frozen_lockfile is not None:
+            drift_items: List[LockDriftItem] = [
+                drift_item for drift_item in PackagesLockClient.find_drift(
+                    lockfile=lockfile, installed_versions=batch_versions,
+                    python_version=self.python_version, platform=self.platform
+                ) if drift_item.kind != DRIFT_KIND_UNUSED
+            ]
+            if len(drift_items) > 0:
+                print_lock_drift(drift_items=drift_items)
+                raise LockfileDrift(lockfile_filepath=self.lock_client.lockfile_filepath, drift_items=drift_items)
+        # The locked packages shared by several batches are only installed by the first one.
+        locked_packages = [
+            locked_package for locked_package in lockfile.get_packages_closure(packages_names=set(batch_versions.keys()))
+            if normalize_distribution_name(locked_package.name) not in self.installed_locked_keys
+        ]
+        if len(locked_packages) == 0:
+            return False
+        self.installed_locked_keys.update(normalize_distribution_name(locked_package.name) for locked_package in locked_packages)
+        requirements_filepath: str = f"{self.lambda_layer_dirpath}.requirements-{self.batches_count + 1}.txt"
+        PackagesLockClient.write_requirements_file(locked_packages=locked_packages, filepath=requirements_filepath)
+
+        self.batches_count += 1
+        self._installations_futures.append(self._installations_executor.submit(
+            self._install_batch, batch_index=self.batches_count, packages_names=set(batch_versions.keys()),
+            requirements_filepath=requirements_filepath
+        ))
+        return True
+
+    def _download_batch(self, batch_index: int, packages_names: Set[str]):
+        try:
+            with span('dependencies_download', category='dependencies', batch=batch_index):
+                # Each batch downloads to its own folder, since concurrent downloads of a same wheel would write the same file.
+                download_result = download_packages_wheels_to_dir(
+                    packages_names=packages_names, wheels_dirpath=os.path.join(self.wheels_dirpath, str(batch_index)),
+                    python_version=self.python_version, platform=self.platform
+                )
+                check_installation_result(installation_result=download_result, packages_names=packages_names)
+        finally:
+            self._installations_slots.release()
+
+    def _install_batch(
+            self, batch_index: int, packages_names: Set[str], requirements_filepath: Optional[str],
+            find_links_dirpath: Optional[str] = None
+    ):
+        try:
+            with span('dependencies_installation', category='dependencies', batch=batch_index):
+                download_function = functools.partial(download_packages_to_dir, find_links_dirpath=find_links_dirpath) \
+                    if self.use_prototype_docker_install is not True else functools.partial(
+                        download_packages_to_dir_with_docker_container, docker_builder_config=self.docker_builder_config
+                    )
+                installation_result = download_function(
+                    packages_names=packages_names, target_dirpath=os.path.join(self.batches_dirpath, str(batch_index)),
+                    python_version=self.python_version, platform=self.platform,
+                    # The runtime provided packages have already been removed from the batch.
+                    should_remove_runtime_provided_packages=False,
+                    requirements_filepath=requirements_filepath
+                )
+                # The error is raised by the future of the batch, and then by the finish function of the installer.
+                check_installation_result(installation_result=installation_result, packages_names=packages_names)
+                add_counter('dependencies_installed', len(packages_names))
+        finally:
+            if self.installs_while_resolving:
+                self._installations_slots.release()
+
+    def stop(self):
+        self.dependencies_queue.put(_END_OF_STREAM)
+        self.join()
+
+    def finish(self):
+        self.dependencies_queue.put(_END_OF_STREAM)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+def check_packaged_files(
+        config: Config, resolver: Resolver, dist_dirpath: Optional[str], lambda_layer_dirpath: str,
+        code_local_files_items: List[LocalFileItem], code_content_files_items: List[ContentFileItem],
+        layer_local_files_items: List[LocalFileItem]
+):
+    check_native_extensions(
+        config=config, target_os=resolver.target_os, local_files_items=[*code_local_files_items, *layer_local_files_items]
+    )
+    if config.size_budgets is not None:
+        with span('size_report', category='reporting'):
+            size_report = make_size_report(
+                resolver=resolver, budgets=config.size_budgets,
+                code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+                layer_local_files_items=layer_local_files_items,
+                layer_source_dirpath=lambda_layer_dirpath if len(layer_local_files_items) > 0 else None
+            )
+        print_size_report(report=size_report, top_offenders_count=config.size_budgets.top_offenders_count)
+        if dist_dirpath is not None:
+            save_size_report(report=size_report, dist_dirpath=dist_dirpath)
+        enforce_size_budgets(report=size_report, budgets=config.size_budgets)
+
+def package_pipelined_api(
+        config: Config, target_os: str, dist_dirpath: str, output_base_dirpath: str,
+        package_dependencies_in_layer_for_code_package: bool, verbose: bool = False, traces_filepath: Optional[str] = None
+):
+    """Package with the resolution, the dependencies installation and the archiving running concurrently. The local
+    files are streamed to the code archive while they are resolved, the dependencies are installed as soon as they are
+    discovered, and the layer archive is written while the code archive is being finished."""
+    from .cli import PackageApiOutput, resolve_config_files, safe_get_package_files_handler
+
+    base_layer_dirpath: str = make_base_python_layer_packages_dir(python_version=config.python_version)
+    code_archive_prefix: Optional[str] = base_layer_dirpath if config.package_type == 'layer' else None
+    should_package_dependencies: bool = config.package_type == 'layer' or package_dependencies_in_layer_for_code_package is True
+    lambda_layer_dirpath: str = os.path.abspath(os.path.join(dist_dirpath, 'lambda_layer'))
+    if os.path.exists(lambda_layer_dirpath):
+        shutil.rmtree(lambda_layer_dirpath)
+
+    code_writer = ArchiveWriterThread(dist_dirpath=dist_dirpath, destination_key='build', output_type=config.output_type)
+    installer: Optional[DependenciesInstallerThread] = (
+        DependenciesInstallerThread(
+            lambda_layer_dirpath=lambda_layer_dirpath, python_version=config.python_version,
+            platform=get_wheel_platform(target_os=target_os, architecture=config.architecture),
+            use_prototype_docker_install=config.use_prototype_docker_pip_install,
+            should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages,
+            lock_config=config.dependencies_lock, docker_builder_config=config.docker_builder
+        ) if should_package_dependencies else None
+    )
+    code_writer.start()
+    if installer is not None:
+        installer.start()
+
+    code_files_factory = FileItemsFactory(archive_prefix=code_archive_prefix)
+    def on_file_included(filepath: str):
+        code_writer.put(code_files_factory.make_local_file_item(
+            relative_filepath=os.path.relpath(filepath, output_base_dirpath), absolute_filepath=filepath
+        ))
+
+    try:
+        # The root file is included when the resolver is created, before any callback can be called.
+        on_file_included(config.root_filepath)
+        resolver: Resolver = resolve_config_files(
+            config=config, target_os=target_os, verbose=verbose, traces_filepath=traces_filepath,
+            on_file_included=on_file_included,
+            on_dependency_included=installer.add_dependency if installer is not None else None
+        )
+        print(f">>> Required dependencies names : {resolver.included_dependencies_names}")
+
+        # The files planning is only used for the checks and the missing __init__ files,
+        # since the local files have already been streamed to the code archive.
+        code_local_files_items, code_content_files_items = package_files(
+            included_files_absolute_paths=resolver.included_files_absolute_paths,
+            archive_prefix=code_archive_prefix, output_base_dirpath=output_base_dirpath
+        )
+        if config.priming is not None:
+            code_content_files_items.append(make_priming_content_file_item(
+                resolver=resolver, config=config.priming, output_base_dirpath=output_base_dirpath, archive_prefix=code_archive_prefix
+            ))
+        for content_file_item in code_content_files_items:
+            code_writer.put(content_file_item)
+
+        dependencies_local_files_items: List[LocalFileItem] = []
+        if installer is not None:
+            installer.finish()
+            dependencies_local_files_items = list(iter_files_in_layer_folder(
+                source_dirpath=lambda_layer_dirpath, base_layer_dirpath=base_layer_dirpath
+            ))
+            add_counter('installed_files', len(dependencies_local_files_items))
+            from .runtime_baseline import remove_runtime_provided_files
+            dependencies_local_files_items = remove_runtime_provided_files(
+                local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+                python_version=config.python_version,
+                should_remove_runtime_provided_packages=config.should_remove_runtime_provided_packages,
+                imported_versions=installer.installed_versions
+            )
+            if config.layer_pruning is not None:
+                with span('layer_pruning', category='dependencies'):
+                    dependencies_local_files_items = prune_layer_files(
+                        local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+                        python_version=config.python_version, config=config.layer_pruning
+                    )
+            if config.should_deduplicate_artifacts_files is True:
+                # The code files have already been streamed to the code archive, so only the layer files can be removed.
+                _, dependencies_local_files_items = apply_artifacts_deduplication(
+                    code_local_files_items=code_local_files_items, layer_local_files_items=dependencies_local_files_items,
+                    can_remove_code_files=False
+                )
+        check_packaged_files(
+            config=config, resolver=resolver, dist_dirpath=dist_dirpath, lambda_layer_dirpath=lambda_layer_dirpath,
+            code_local_files_items=code_local_files_items, code_content_files_items=code_content_files_items,
+            layer_local_files_items=dependencies_local_files_items
+        )
+
+        if config.package_type == 'layer':
+            # The application files and the dependencies files are packaged together under the build key.
+            for dependency_local_file_item in dependencies_local_files_items:
+                code_writer.put(dependency_local_file_item)
+            return PackageApiOutput(
+                code_path=code_writer.finish(), layer_path=None,
+                required_dependencies_names=resolver.included_dependencies_names
+            )
+        if installer is None:
+            return PackageApiOutput(
+                code_path=code_writer.finish(), layer_path=None,
+                required_dependencies_names=resolver.included_dependencies_names
+            )
+
+        # The layers are written while the code writer thread finishes the code archive.
+        package_files_handler = safe_get_package_files_handler(output_type=config.output_type)
+        if config.layers_splitting is not None:
+            layers_output_paths: List[str] = package_split_layers(
+                local_files_items=dependencies_local_files_items, layer_source_dirpath=lambda_layer_dirpath,
+                dist_dirpath=dist_dirpath, output_type=config.output_type, config=config.layers_splitting,
+                package_files_handler=package_files_handler
+            )
+            return PackageApiOutput(
+                code_path=code_writer.finish(), layer_path=None, layers_paths=layers_output_paths,
+                required_dependencies_names=resolver.included_dependencies_names
+            )
+        layer_writer = ArchiveWriterThread(dist_dirpath=dist_dirpath, destination_key='lambda_layer', output_type=config.output_type)
+        layer_writer.start()
+        for dependency_local_file_item in dependencies_local_files_items:
+            layer_writer.put(dependency_local_file_item)
+        layer_output_path: str = layer_writer.finish()
+        return PackageApiOutput(
+            code_path=code_writer.finish(), layer_path=layer_output_path,
+            required_dependencies_names=resolver.included_dependencies_names
+        )
+    finally:
+        # The threads are always stopped, including when a stage failed. Stopping an already finished thread does nothing.
+        for thread in [code_writer, installer]:
+            if thread is not None and thread.is_alive():
+                thread.stop()
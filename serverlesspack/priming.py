@@ -0,0 +1,220 @@
+import fnmatch
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Optional, Set
+
+from asciitree import LeftAligned
+
+from .configuration_client import ConfigClient, Config, PrimingConfig
+from .imports_resolver import Resolver
+from .packager import FileItemsFactory, ContentFileItem
+from .utils import relative_filepath_to_module_name, message_with_vars
+
+
+PRIMING_MODULE_TEMPLATE = '''"""
+Generated by serverlesspack. Eagerly imports the modules of the application during the init phase of Lambda.
+"""
+
+import importlib
+
+
+def _prime(module_name):
+    try:
+        importlib.import_module(module_name)
+    except Exception as e:
+        print(f"serverlesspack priming : could not import {{module_name}} : {{e}}")
+
+def _warmup(module_name, function_name):
+    try:
+        getattr(importlib.import_module(module_name), function_name)()
+    except Exception as e:
+        print(f"serverlesspack priming : could not warmup {{module_name}}.{{function_name}} : {{e}}")
+
+
+{primed_modules_lines}
+{warmup_callables_lines}
+{handler_export_line}
+'''
+
+
+def get_file_module_name(filepath: str, output_base_dirpath: str) -> Optional[str]:
+    path = Path(filepath)
+    if path.suffix != '.py':
+        return None
+    if 'site-packages' in path.parts:
+        site_packages_index: int = path.parts.index('site-packages')
+        return relative_filepath_to_module_name(os.path.join(*path.parts[site_packages_index + 1:]))
+    return relative_filepath_to_module_name(os.path.relpath(filepath, output_base_dirpath))
+
+def get_ordered_primed_filepaths(resolver: Resolver) -> List[str]:
+    """Order the resolved files so that the imported files are primed before the files importing them. The files
+    of an import cycle are not primed separately, only the file through which the cycle is entered is primed, in
+    order to import the cycle in the same order as the application would, and avoid circular import errors."""
+    edges: Dict[str, List[str]] = dict()
+    for trace in resolver.traces:
+        edges.setdefault(trace['source'], []).append(trace['target'])
+
+    # Iterative Tarjan algorithm, which outputs the strongly connected components in reverse topological order,
+    # meaning that the components of the imported files are always output before the components importing them.
+    indexes: Dict[str, int] = dict()
+    low_links: Dict[str, int] = dict()
+    stack: List[str] = list()
+    on_stack: Set[str] = set()
+    ordered_filepaths: List[str] = list()
+
+    def visit(start_filepath: str):
+        work_stack: List[tuple] = [(start_filepath, 0)]
+        while len(work_stack) > 0:
+            filepath, i_edge = work_stack.pop()
+            if i_edge == 0:
+                indexes[filepath] = low_links[filepath] = len(indexes)
+                stack.append(filepath)
+                on_stack.add(filepath)
+            targets: List[str] = edges.get(filepath, [])
+            if i_edge > 0:
+                low_links[filepath] = min(low_links[filepath], low_links[targets[i_edge - 1]])
+            while i_edge < len(targets) and targets[i_edge] in indexes:
+                if targets[i_edge] in on_stack:
+                    low_links[filepath] = min(low_links[filepath], indexes[targets[i_edge]])
+                i_edge += 1
+            if i_edge < len(targets):
+                work_stack.append((filepath, i_edge + 1))
+                work_stack.append((targets[i_edge], 0))
+                continue
+            if low_links[filepath] == indexes[filepath]:
+                component: List[str] = list()
+                while True:
+                    member: str = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == filepath:
+                        break
+                # The root of the component is the first visited file, through which the cycle is entered.
+                ordered_filepaths.append(filepath)
+
+    for filepath in [resolver.root_filepath, *sorted(edges.keys()), *sorted(resolver.included_files_absolute_paths)]:
+        if filepath not in indexes:
+            visit(filepath)
+    return ordered_filepaths
+
+def make_priming_module_content(resolver: Resolver, config: PrimingConfig, output_base_dirpath: str) -> str:
+    primed_modules_names: List[str] = list()
+    for filepath in get_ordered_primed_filepaths(resolver=resolver):
+        module_name: Optional[str] = get_file_module_name(filepath=filepath, output_base_dirpath=output_base_dirpath)
+        if module_name is None or module_name in primed_modules_names:
+            continue
+        if config.modules_includes is not None and not any(fnmatch.fnmatch(module_name, pattern) for pattern in config.modules_includes):
+            continue
+        if any(fnmatch.fnmatch(module_name, pattern) for pattern in config.modules_excludes):
+            continue
+        primed_modules_names.append(module_name)
+
+    warmup_callables_lines: List[str] = list()
+    for warmup_callable in config.warmup_callables:
+        if ':' not in warmup_callable:
+            raise Exception(f"The warmup callable {warmup_callable} must be formatted as module.path:function_name")
+        module_name, function_name = warmup_callable.split(':', 1)
+        warmup_callables_lines.append(f"_warmup({module_name!r}, {function_name!r})")
+
+    handler_module_name: str = relative_filepath_to_module_name(os.path.relpath(resolver.root_filepath, output_base_dirpath))
+    return PRIMING_MODULE_TEMPLATE.format(
+        primed_modules_lines="\n".join(f"_prime({module_name!r})" for module_name in primed_modules_names),
+        warmup_callables_lines="\n".join(warmup_callables_lines),
+        handler_export_line=(
+            f"from {handler_module_name} import {config.handler_function_name}"
+            if config.handler_function_name is not None else ""
+        )
+    )
+
+def make_priming_content_file_item(
+        resolver: Resolver, config: PrimingConfig, output_base_dirpath: str, archive_prefix: Optional[str] = None
+) -> ContentFileItem:
+    return FileItemsFactory(archive_prefix=archive_prefix).make_content_file_item(
+        relative_filepath=f"{config.module_name}.py",
+        content=make_priming_module_content(resolver=resolver, config=config, output_base_dirpath=output_base_dirpath)
+    )
+
+
+FIRST_INVOKE_BENCHMARK_SCRIPT = '''
+import importlib, json, sys, time
+from types import SimpleNamespace
+init_start = time.perf_counter()
+for module_name in sys.argv[3:]:
+    importlib.import_module(module_name)
+handler = getattr(importlib.import_module(sys.argv[1]), sys.argv[2])
+invoke_start = time.perf_counter()
+handler(json.loads(sys.stdin.read()), SimpleNamespace(function_name="benchmark", aws_request_id="benchmark", get_remaining_time_in_millis=lambda: 300000))
+invoke_end = time.perf_counter()
+print(json.dumps({"init_ms": (invoke_start - init_start) * 1000, "first_invoke_ms": (invoke_end - invoke_start) * 1000}))
+'''
+
+def measure_first_invoke_latency(
+        python_paths: List[str], handler_module_name: str, handler_function_name: str,
+        event: dict, runs: int, primed_modules_names: List[str], executable: str = sys.executable
+) -> Dict[str, float]:
+    environment: Dict[str, str] = {**os.environ, 'PYTHONPATH': os.pathsep.join(python_paths), 'PYTHONDONTWRITEBYTECODE': '1'}
+    samples: Dict[str, List[float]] = {'init_ms': [], 'first_invoke_ms': []}
+    for i_run in range(runs):
+        result = subprocess.run(
+            [executable, '-S', '-c', FIRST_INVOKE_BENCHMARK_SCRIPT, handler_module_name, handler_function_name, *primed_modules_names],
+            input=json.dumps(event).encode('utf-8'), env=environment, cwd=python_paths[0],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if result.returncode != 0:
+            raise Exception(message_with_vars(
+                message="The first invoke benchmark of the handler failed",
+                vars_dict={'stderr': result.stderr.decode('utf-8', errors='replace')[-4000:]}
+            ))
+        run_result: dict = json.loads(result.stdout.decode('utf-8').strip().splitlines()[-1])
+        for key in samples.keys():
+            samples[key].append(run_result[key])
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+def benchmark_priming_api(
+        target_os: str, config_filepath: str, event_filepath: str, handler_function_name: str,
+        runs: int = 5, verbose: bool = False
+) -> Dict[str, Dict[str, float]]:
+    from .cli import get_output_base_dirpath
+    from .import_profiler import get_built_artifacts_paths, unpack_artifacts_to_lambda_layout, \
+        get_profiling_interpreter_executable, get_interpreter_site_packages_dirpaths
+
+    config: Config = ConfigClient(verbose=verbose).load_render_config_file(filepath=config_filepath, target_os=target_os)
+    if config.priming is None:
+        raise Exception("The priming section must be defined in the config file to benchmark the priming module")
+    output_base_dirpath: str = str(get_output_base_dirpath(config=config, config_filepath=config_filepath))
+    handler_module_name: str = relative_filepath_to_module_name(os.path.relpath(config.root_filepath, output_base_dirpath))
+    code_artifact_path, layers_artifacts_paths = get_built_artifacts_paths(dist_dirpath=os.path.join(os.path.dirname(config_filepath), "dist"))
+    with open(event_filepath, 'r') as event_file:
+        event: dict = json.load(event_file)
+
+    # Like the import profiling, the handler runs with the target interpreter and the distributions of the runtime.
+    executable: str = get_profiling_interpreter_executable(config=config)
+    with tempfile.TemporaryDirectory() as lambda_layout_dirpath:
+        python_paths = unpack_artifacts_to_lambda_layout(
+            code_artifact_path=code_artifact_path, layers_artifacts_paths=layers_artifacts_paths,
+            destination_dirpath=lambda_layout_dirpath, python_version=config.python_version, package_type=config.package_type,
+            runtime_site_packages_dirpaths=get_interpreter_site_packages_dirpaths(executable=executable)
+        )
+        results: Dict[str, Dict[str, float]] = {
+            'without_priming': measure_first_invoke_latency(
+                python_paths=python_paths, handler_module_name=handler_module_name,
+                handler_function_name=handler_function_name, event=event, runs=runs, primed_modules_names=[],
+                executable=executable
+            ),
+            'with_priming': measure_first_invoke_latency(
+                python_paths=python_paths, handler_module_name=handler_module_name,
+                handler_function_name=handler_function_name, event=event, runs=runs,
+                primed_modules_names=[config.priming.module_name], executable=executable
+            ),
+        }
+
+    print(LeftAligned()({f"First invoke benchmark ({runs} runs)": {
+        f"{variant} : init {result['init_ms']:.1f} ms, first invoke {result['first_invoke_ms']:.1f} ms": {}
+        for variant, result in results.items()
+    }}))
+    return results
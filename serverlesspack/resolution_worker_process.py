@@ -0,0 +1,153 @@
+"""Resolution worker, started by the resolution_workers module with the interpreter of a target python version.
+
+This file is executed as a script by interpreters which might not have the dependencies of serverlesspack installed,
+so it must only import the standard library. It reads one JSON request per line on its stdin, and writes one JSON
+response per line, with the id of its request, on a copy of its original stdout. The stdout of the process is then
+redirected to its stderr, so that the modules printing while being imported cannot corrupt the responses.
+"""
+import importlib
+import json
+import os
+import sys
+from pathlib import Path
+
+
+class ResolutionWorkerState:
+    def __init__(self):
+        self.added_paths = []
+        self.initial_modules_names = set(sys.modules.keys())
+        # The results are kept between the builds, as long as the python paths of the project do not change.
+        self.imported_modules_results = {}
+        self.packages_distributions = None
+        self.distributions_versions = {}
+
+    def clear_caches(self):
+        self.imported_modules_results.clear()
+        self.packages_distributions = None
+        self.distributions_versions.clear()
+        importlib.invalidate_caches()
+
+    def hello(self):
+        return {
+            'python_version': f"{sys.version_info[0]}.{sys.version_info[1]}",
+            'executable': sys.executable,
+            'base_libs_dirpath': str(Path(os.__file__).parent.parent),
+            'pid': os.getpid()
+        }
+
+    def set_paths(self, paths):
+        if paths == self.added_paths:
+            return {'changed': False}
+        for path in self.added_paths:
+            if path in sys.path:
+                sys.path.remove(path)
+        for path in reversed(paths):
+            sys.path.insert(0, path)
+        self.added_paths = list(paths)
+        # The modules of the previous project must not be found from the new python paths.
+        for module_name in list(sys.modules.keys()):
+            if module_name not in self.initial_modules_names:
+                del sys.modules[module_name]
+        self.clear_caches()
+        return {'changed': True}
+
+    def import_module(self, module_name):
+        cached_result = self.imported_modules_results.get(module_name, None)
+        if cached_result is not None:
+            return cached_result
+        try:
+            module = importlib.import_module(module_name)
+        except ModuleNotFoundError as e:
+            # The missing modules are not cached, since they might be found once some files have been written.
+            return {'error': {'type': 'ModuleNotFoundError', 'message': str(e)}}
+        except BaseException as e:
+            return {'error': {'type': type(e).__name__, 'message': str(e)}}
+        result = {'file': getattr(module, '__file__', None), 'name': getattr(module, '__name__', None)}
+        self.imported_modules_results[module_name] = result
+        return result
+
+    def get_packages_distributions(self):
+        if self.packages_distributions is None:
+            self.packages_distributions = compute_packages_distributions()
+        return self.packages_distributions
+
+    def get_distribution_version(self, name):
+        if name not in self.distributions_versions:
+            try:
+                from importlib import metadata
+                self.distributions_versions[name] = metadata.version(name)
+            except Exception:
+                self.distributions_versions[name] = None
+        return {'version': self.distributions_versions[name]}
+
+    def invalidate_modules(self, filepaths):
+        filepaths = set(filepaths)
+        for module_name, module in list(sys.modules.items()):
+            if getattr(module, '__file__', None) in filepaths:
+                del sys.modules[module_name]
+        self.imported_modules_results = {
+            module_name: result for module_name, result in self.imported_modules_results.items()
+            if result['file'] not in filepaths
+        }
+        importlib.invalidate_caches()
+        return {}
+
+
+def compute_packages_distributions():
+    try:
+        from importlib.metadata import packages_distributions
+        return packages_distributions()
+    except ImportError:
+        pass
+    try:
+        from importlib_metadata import packages_distributions
+        return packages_distributions()
+    except ImportError:
+        pass
+    # The interpreters older than python 3.10 without importlib_metadata use the top_level.txt files of the distributions.
+    from importlib import metadata
+    packages_distributions = {}
+    for distribution in metadata.distributions():
+        top_level_content = distribution.read_text('top_level.txt') or ''
+        for package_name in top_level_content.split():
+            packages_distributions.setdefault(package_name, []).append(distribution.metadata['Name'])
+    return packages_distributions
+
+
+def main():
+    # The folder of this script is the first python path of the interpreter, and its modules must not be found.
+    if len(sys.path) > 0 and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    responses_output = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    state = ResolutionWorkerState()
+    methods = {
+        'hello': lambda params: state.hello(),
+        'set_paths': lambda params: state.set_paths(paths=params['paths']),
+        'import_module': lambda params: state.import_module(module_name=params['module_name']),
+        'packages_distributions': lambda params: state.get_packages_distributions(),
+        'distribution_version': lambda params: state.get_distribution_version(name=params['name']),
+        'invalidate_modules': lambda params: state.invalidate_modules(filepaths=params['filepaths'])
+    }
+    for line in sys.stdin:
+        if line.strip() == '':
+            continue
+        request = json.loads(line)
+        if request['method'] == 'shutdown':
+            break
+        method = methods.get(request['method'], None)
+        if method is None:
+            response = {'id': request['id'], 'error': f"Method {request['method']} not supported"}
+        else:
+            try:
+                response = {'id': request['id'], 'result': method(request.get('params', {}))}
+            except Exception as e:
+                response = {'id': request['id'], 'error': f"{type(e).__name__}: {e}"}
+        responses_output.write(json.dumps(response) + '\n')
+        responses_output.flush()
+
+
+if __name__ == '__main__':
+    main()
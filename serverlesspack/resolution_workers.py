@@ -0,0 +1,200 @@
+import atexit
+import json
+import os
+import shutil
+import site
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Optional, Dict, List, Any
+
+import click
+
+from .configuration_client import ResolutionWorkersConfig
+from .exceptions import ResolutionWorkerError
+from .instrumentation import add_counter
+from .utils import get_serverless_pack_root_folder
+
+
+RESOLUTION_WORKER_SCRIPT_FILEPATH = os.path.join(get_serverless_pack_root_folder(), 'resolution_worker_process.py')
+
+
+@dataclass
+class WorkerDistribution:
+    # Only the version of the distributions found by the resolution is used (see the lockfile and the artifacts cache).
+    name: str
+    version: Optional[str]
+
+
+class ResolutionWorker:
+    """Long-lived process of a target interpreter, to which the resolver delegates the imports of the modules, the
+    location of the standard library and the metadata of the installed distributions. Its imported modules and its
+    metadata are kept warm between the resolutions, until the python paths of the project change."""
+
+    def __init__(self, executable: str):
+        self.executable = executable
+        self._process = subprocess.Popen(
+            [executable, '-u', RESOLUTION_WORKER_SCRIPT_FILEPATH],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding='utf-8', bufsize=1
+        )
+        self._lock = threading.Lock()
+        self._last_request_id = 0
+        self._packages_distributions: Optional[Dict[str, List[str]]] = None
+        hello_result: dict = self.request(method='hello')
+        self.python_version: str = hello_result['python_version']
+        self.base_libs_dirpath: str = hello_result['base_libs_dirpath']
+        self.pid: int = hello_result['pid']
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.poll() is None
+
+    def request(self, method: str, **params) -> Any:
+        with self._lock:
+            self._last_request_id += 1
+            request_id: int = self._last_request_id
+            try:
+                self._process.stdin.write(json.dumps({'id': request_id, 'method': method, 'params': params}) + '\n')
+                self._process.stdin.flush()
+                response_line: str = self._process.stdout.readline()
+            except (BrokenPipeError, OSError) as e:
+                raise ResolutionWorkerError(executable=self.executable, method=method, error=str(e))
+            if response_line == '':
+                raise ResolutionWorkerError(executable=self.executable, method=method, error="The worker process exited")
+            add_counter('resolution_worker_requests')
+            response: dict = json.loads(response_line)
+            if response.get('id') != request_id:
+                raise ResolutionWorkerError(executable=self.executable, method=method, error=f"Unexpected response {response_line}")
+            if 'error' in response:
+                raise ResolutionWorkerError(executable=self.executable, method=method, error=response['error'])
+            return response['result']
+
+    def set_paths(self, paths: List[str]):
+        if self.request(method='set_paths', paths=paths)['changed'] is True:
+            self._packages_distributions = None
+
+    def import_module(self, module_name: str) -> ModuleType:
+        """Import the module in the worker, and return a module of the main interpreter with only its name and filepath,
+        which are the only attributes used by the resolver. Raise a ModuleNotFoundError like importlib.import_module."""
+        result: dict = self.request(method='import_module', module_name=module_name)
+        error: Optional[dict] = result.get('error', None)
+        if error is not None:
+            if error['type'] == 'ModuleNotFoundError':
+                raise ModuleNotFoundError(error['message'], name=module_name)
+            raise ResolutionWorkerError(
+                executable=self.executable, method='import_module', error=f"{error['type']} when importing {module_name} : {error['message']}"
+            )
+        module = ModuleType(result['name'] or module_name)
+        if result['file'] is not None:
+            module.__file__ = result['file']
+        return module
+
+    def packages_distributions(self) -> Dict[str, List[str]]:
+        if self._packages_distributions is None:
+            self._packages_distributions = self.request(method='packages_distributions')
+        return self._packages_distributions
+
+    def get_distribution(self, name: str) -> Optional[WorkerDistribution]:
+        version: Optional[str] = self.request(method='distribution_version', name=name)['version']
+        return WorkerDistribution(name=name, version=version) if version is not None else None
+
+    def invalidate_modules(self, filepaths: List[str]):
+        self.request(method='invalidate_modules', filepaths=filepaths)
+
+    def close(self):
+        if self.is_alive:
+            try:
+                self._process.stdin.write(json.dumps({'id': 0, 'method': 'shutdown'}) + '\n')
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+
+
+class ResolutionWorkersPool:
+    def __init__(self):
+        self._workers_by_executable: Dict[str, ResolutionWorker] = dict()
+        self._lock = threading.Lock()
+
+    def get_worker(self, executable: str) -> ResolutionWorker:
+        with self._lock:
+            worker: Optional[ResolutionWorker] = self._workers_by_executable.get(executable, None)
+            if worker is None or not worker.is_alive:
+                worker = ResolutionWorker(executable=executable)
+                self._workers_by_executable[executable] = worker
+                add_counter('resolution_workers_started')
+            return worker
+
+    def close(self):
+        with self._lock:
+            for worker in self._workers_by_executable.values():
+                worker.close()
+            self._workers_by_executable.clear()
+
+resolution_workers_pool = ResolutionWorkersPool()
+atexit.register(resolution_workers_pool.close)
+
+
+def find_target_interpreter(python_version: str, config: ResolutionWorkersConfig) -> Optional[str]:
+    configured_executable: Optional[str] = config.interpreters_paths.get(python_version, None)
+    if configured_executable is not None:
+        return configured_executable
+    if sys.platform == 'win32':
+        launcher_executable: Optional[str] = shutil.which('py')
+        if launcher_executable is not None:
+            completed_process = subprocess.run(
+                [launcher_executable, f"-{python_version}", '-c', 'import sys; print(sys.executable)'],
+                capture_output=True, encoding='utf-8'
+            )
+            return completed_process.stdout.strip() if completed_process.returncode == 0 else None
+    return shutil.which(f"python{python_version}")
+
+def is_interpreter_path(path: str) -> bool:
+    # The libraries of the interpreter running the cli must not be found by the target interpreter.
+    interpreter_prefixes: List[str] = [os.path.abspath(prefix) for prefix in {sys.prefix, sys.base_prefix, sys.exec_prefix}]
+    absolute_path: str = os.path.abspath(path)
+    return (
+        any(absolute_path == prefix or absolute_path.startswith(prefix + os.sep) for prefix in interpreter_prefixes)
+        or os.path.basename(absolute_path) in ('site-packages', 'dist-packages')
+        or absolute_path == os.path.abspath(site.getuserbase())
+        or absolute_path.startswith(os.path.abspath(site.getuserbase()) + os.sep)
+    )
+
+def get_project_python_paths() -> List[str]:
+    """The python paths of the running interpreter which are not part of its installation, like the current folder and
+    the content root folders added by python_path_wrapper, in the same order."""
+    project_python_paths: List[str] = []
+    for path in sys.path:
+        absolute_path: str = os.path.abspath(path or os.getcwd())
+        if not is_interpreter_path(absolute_path) and absolute_path not in project_python_paths:
+            project_python_paths.append(absolute_path)
+    return project_python_paths
+
+def get_resolution_worker(python_version: str, config: Optional[ResolutionWorkersConfig] = None) -> Optional[ResolutionWorker]:
+    """Return a worker of the interpreter of the target python version, with the python paths of the project, or None
+    when the running interpreter already has the target version, or when no interpreter of the version is found."""
+    config = config if config is not None else ResolutionWorkersConfig()
+    if config.enabled is not True or python_version == f"{sys.version_info[0]}.{sys.version_info[1]}":
+        return None
+    executable: Optional[str] = find_target_interpreter(python_version=python_version, config=config)
+    if executable is None:
+        click.secho(
+            f"No python{python_version} interpreter found, the resolution uses the running python "
+            f"{sys.version_info[0]}.{sys.version_info[1]} interpreter", fg='yellow'
+        )
+        return None
+    try:
+        worker: ResolutionWorker = resolution_workers_pool.get_worker(executable=executable)
+    except (OSError, ResolutionWorkerError) as e:
+        click.secho(f"Could not start a resolution worker with {executable}, the running interpreter is used : {e}", fg='yellow')
+        return None
+    if worker.python_version != python_version:
+        click.secho(
+            f"The interpreter {executable} is a python {worker.python_version} interpreter instead of "
+            f"python {python_version}, the running interpreter is used", fg='yellow'
+        )
+        return None
+    worker.set_paths(paths=get_project_python_paths())
+    return worker
@@ -0,0 +1,266 @@
+import csv
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from email.parser import HeaderParser
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, List, Set, Iterable, Tuple
+
+import click
+from asciitree import LeftAligned
+from distlib.markers import interpret
+from distlib.util import parse_requirement
+from distlib.version import NormalizedMatcher, UnsupportedVersionError
+
+from .instrumentation import add_counter
+from .packager import LocalFileItem
+from .utils import get_serverless_pack_root_folder, normalize_distribution_name
+
+
+RUNTIME_PACKAGES_MANIFEST_FILEPATH = os.path.join(get_serverless_pack_root_folder(), 'data', 'lambda_runtime_packages.json')
+# Used for the python versions missing from the manifest, which were only known to provide the AWS SDK.
+FALLBACK_RUNTIME_PACKAGES_NAMES = ["boto3", "botocore"]
+RELEASE_REGEX = re.compile(r'(\d+)\.(\d+)')
+
+
+@dataclass
+class RuntimeBaseline:
+    python_version: str
+    # The versions of the distributions provided by the runtime, by normalized name. A version of None means that
+    # the distribution is provided, but that its version is not known.
+    packages_versions: Dict[str, Optional[str]]
+
+    def get_version(self, package_name: str) -> Optional[str]:
+        return self.packages_versions.get(normalize_distribution_name(package_name), None)
+
+    def provides(self, package_name: str) -> bool:
+        return normalize_distribution_name(package_name) in self.packages_versions
+
+    def is_compatible_with(self, package_name: str, version: Optional[str]) -> bool:
+        """Whether the runtime copy can replace the version of a package the code has been developed with, which is the
+        case when they share their major version (or their minor version for the 0.x versions)."""
+        runtime_version: Optional[str] = self.get_version(package_name)
+        if runtime_version is None or version is None:
+            return True
+        runtime_release_match, release_match = RELEASE_REGEX.match(runtime_version), RELEASE_REGEX.match(version)
+        if runtime_release_match is None or release_match is None:
+            return runtime_version == version
+        compared_parts_count: int = 2 if release_match.group(1) == '0' else 1
+        return runtime_release_match.groups()[:compared_parts_count] == release_match.groups()[:compared_parts_count]
+
+    def satisfies(self, package_name: str, requirements: Iterable[str]) -> bool:
+        runtime_version: Optional[str] = self.get_version(package_name)
+        for requirement in requirements:
+            if runtime_version is None:
+                # A requirement with a version constraint cannot be checked against an unknown version.
+                return False
+            try:
+                if not NormalizedMatcher(requirement).match(runtime_version):
+                    return False
+            except UnsupportedVersionError:
+                return False
+        return True
+
+@lru_cache(maxsize=None)
+def load_runtime_baseline(python_version: str) -> RuntimeBaseline:
+    with open(RUNTIME_PACKAGES_MANIFEST_FILEPATH) as manifest_file:
+        manifest: dict = json.load(manifest_file)
+    runtime_packages: Optional[Dict[str, str]] = manifest['runtimes'].get(python_version, None)
+    if runtime_packages is None:
+        return RuntimeBaseline(python_version=python_version, packages_versions={
+            normalize_distribution_name(package_name): None for package_name in FALLBACK_RUNTIME_PACKAGES_NAMES
+        })
+    return RuntimeBaseline(python_version=python_version, packages_versions={
+        normalize_distribution_name(package_name): version for package_name, version in runtime_packages.items()
+    })
+
+
+@dataclass
+class InstalledDistribution:
+    name: str
+    version: str
+    dist_info_dirname: str
+    requires_dist: List[str]
+    # The paths of the files of the distribution relative to the layer folder, from its RECORD file.
+    relative_filepaths: Set[str] = field(default_factory=set)
+
+def read_installed_distributions(layer_dirpath: str) -> List[InstalledDistribution]:
+    installed_distributions: List[InstalledDistribution] = []
+    if not os.path.isdir(layer_dirpath):
+        return installed_distributions
+    for dirname in sorted(os.listdir(layer_dirpath)):
+        metadata_filepath: str = os.path.join(layer_dirpath, dirname, 'METADATA')
+        if not dirname.endswith('.dist-info') or not os.path.isfile(metadata_filepath):
+            continue
+        with open(metadata_filepath, encoding='utf-8', errors='replace') as metadata_file:
+            metadata = HeaderParser().parse(metadata_file)
+        installed_distribution = InstalledDistribution(
+            name=metadata['Name'], version=metadata['Version'], dist_info_dirname=dirname,
+            requires_dist=metadata.get_all('Requires-Dist') or []
+        )
+        record_filepath: str = os.path.join(layer_dirpath, dirname, 'RECORD')
+        if os.path.isfile(record_filepath):
+            with open(record_filepath, encoding='utf-8', newline='') as record_file:
+                for row in csv.reader(record_file):
+                    if len(row) > 0:
+                        installed_distribution.relative_filepaths.add(os.path.normpath(row[0]).replace(os.sep, '/'))
+        installed_distributions.append(installed_distribution)
+    return installed_distributions
+
+
+def make_markers_environment(python_version: str) -> Dict[str, str]:
+    return {
+        'python_version': python_version, 'python_full_version': f"{python_version}.0",
+        'implementation_name': 'cpython', 'platform_python_implementation': 'CPython',
+        'os_name': 'posix', 'sys_platform': 'linux', 'platform_system': 'Linux', 'extra': ''
+    }
+
+def get_requirements_by_distribution(
+        installed_distributions: Iterable[InstalledDistribution], python_version: str
+) -> Dict[str, List[Tuple[str, str]]]:
+    """The version constraints of the installed distributions on each other, by normalized required name, as
+    (requiring distribution name, requirement) tuples, without the requirements of extras or of other platforms."""
+    markers_environment: Dict[str, str] = make_markers_environment(python_version=python_version)
+    requirements_by_distribution: Dict[str, List[Tuple[str, str]]] = {}
+    for installed_distribution in installed_distributions:
+        for requires_dist in installed_distribution.requires_dist:
+            requirement_marker: Optional[str] = requires_dist.split(';', 1)[1].strip() if ';' in requires_dist else None
+            if requirement_marker is not None and not interpret(requirement_marker, markers_environment):
+                continue
+            requirement = parse_requirement(requires_dist.split(';', 1)[0])
+            if requirement is None or not requirement.constraints:
+                continue
+            requirements_by_distribution.setdefault(normalize_distribution_name(requirement.name), []).append(
+                (installed_distribution.name, requirement.requirement)
+            )
+    return requirements_by_distribution
+
+
+@dataclass
+class RuntimeProvidedDistributionItem:
+    name: str
+    installed_version: str
+    runtime_version: Optional[str]
+    # The requiring distributions for which the runtime version is not compatible, when the distribution is kept.
+    conflicting_requirements: List[str]
+
+def find_runtime_provided_distributions(
+        installed_distributions: List[InstalledDistribution], baseline: RuntimeBaseline,
+        imported_versions: Optional[Dict[str, Optional[str]]] = None
+) -> Tuple[List[RuntimeProvidedDistributionItem], List[RuntimeProvidedDistributionItem]]:
+    """Split the installed distributions provided by the runtime between the ones whose runtime version satisfies the
+    requirements of the other kept distributions, which can be removed, and the ones that must be kept. The libraries
+    imported by the code are also kept when the runtime version is not compatible with the version used locally."""
+    requirements_by_distribution = get_requirements_by_distribution(
+        installed_distributions=installed_distributions, python_version=baseline.python_version
+    )
+    removable_names: Set[str] = {
+        normalize_distribution_name(installed_distribution.name) for installed_distribution in installed_distributions
+        if baseline.provides(installed_distribution.name)
+    }
+    conflicting_requirements_by_name: Dict[str, List[str]] = {}
+    for imported_name, imported_version in (imported_versions or {}).items():
+        name: str = normalize_distribution_name(imported_name)
+        if name in removable_names and not baseline.is_compatible_with(package_name=name, version=imported_version):
+            removable_names.remove(name)
+            conflicting_requirements_by_name[name] = [f"the code imports it with version {imported_version}"]
+    is_stable: bool = False
+    while not is_stable:
+        # The requirements of the removed distributions are met by the runtime itself, and removing a distribution
+        # makes its requirements apply to the runtime copies, until no more distribution must be kept.
+        is_stable = True
+        for name in sorted(removable_names):
+            conflicting_requirements: List[str] = [
+                f"{requiring_name} requires {requirement}" for requiring_name, requirement in requirements_by_distribution.get(name, [])
+                if normalize_distribution_name(requiring_name) not in removable_names
+                and not baseline.satisfies(package_name=name, requirements=[requirement])
+            ]
+            if len(conflicting_requirements) > 0:
+                removable_names.remove(name)
+                conflicting_requirements_by_name[name] = conflicting_requirements
+                is_stable = False
+
+    removed_items: List[RuntimeProvidedDistributionItem] = []
+    kept_items: List[RuntimeProvidedDistributionItem] = []
+    for installed_distribution in installed_distributions:
+        name: str = normalize_distribution_name(installed_distribution.name)
+        if not baseline.provides(name):
+            continue
+        item = RuntimeProvidedDistributionItem(
+            name=installed_distribution.name, installed_version=installed_distribution.version,
+            runtime_version=baseline.get_version(name), conflicting_requirements=conflicting_requirements_by_name.get(name, [])
+        )
+        (removed_items if name in removable_names else kept_items).append(item)
+    return removed_items, kept_items
+
+def print_runtime_provided_distributions_report(
+        removed_items: List[RuntimeProvidedDistributionItem], removed_bytes: int, python_version: str
+):
+    print(LeftAligned()({f"Removed {removed_bytes} bytes of distributions provided by the python{python_version} Lambda runtime": {
+        f"{item.name} {item.installed_version} (runtime {item.runtime_version or 'unknown version'})": {} for item in removed_items
+    }}))
+
+def get_runtime_provided_packages_names(
+        packages_names: Iterable[str], python_version: Optional[str], imported_versions: Optional[Dict[str, Optional[str]]] = None
+) -> Set[str]:
+    """The names of the packages imported by the code that do not need to be installed, since the runtime provides
+    them with a version compatible with the one used locally."""
+    baseline: RuntimeBaseline = load_runtime_baseline(python_version=python_version or "")
+    return {
+        package_name for package_name in packages_names if baseline.provides(package_name)
+        and baseline.is_compatible_with(package_name=package_name, version=(imported_versions or {}).get(package_name, None))
+    }
+
+def warn_shadowing_distributions(kept_items: List[RuntimeProvidedDistributionItem], python_version: str):
+    for item in kept_items:
+        if item.runtime_version is not None and item.runtime_version == item.installed_version:
+            continue
+        # The layers are before the runtime folder in the python path, so the packaged copy is also used by the boto3
+        # of the runtime, when the function does not package its own.
+        click.secho(
+            f"WARNING - The packaged {item.name} {item.installed_version} shadows the {item.runtime_version or 'unknown'} "
+            f"version of the python{python_version} Lambda runtime"
+            + (f", since {', '.join(item.conflicting_requirements)}" if len(item.conflicting_requirements) > 0 else ""),
+            fg='yellow'
+        )
+
+def remove_runtime_provided_files(
+        local_files_items: List[LocalFileItem], layer_source_dirpath: str, python_version: str,
+        should_remove_runtime_provided_packages: bool = True, imported_versions: Optional[Dict[str, Optional[str]]] = None
+) -> List[LocalFileItem]:
+    """Remove the files of the installed distributions that the Lambda runtime already provides with a compatible
+    version, like the urllib3 installed as a dependency of requests, and warn about the kept distributions that
+    shadow the copies of the runtime. Like the layer pruning, only the files items are filtered."""
+    baseline: RuntimeBaseline = load_runtime_baseline(python_version=python_version)
+    installed_distributions: List[InstalledDistribution] = read_installed_distributions(layer_dirpath=layer_source_dirpath)
+    removed_items, kept_items = find_runtime_provided_distributions(
+        installed_distributions=installed_distributions, baseline=baseline, imported_versions=imported_versions
+    )
+    if should_remove_runtime_provided_packages is not True:
+        kept_items, removed_items = [*removed_items, *kept_items], []
+    warn_shadowing_distributions(kept_items=kept_items, python_version=python_version)
+    if len(removed_items) == 0:
+        return local_files_items
+
+    removed_names: Set[str] = {normalize_distribution_name(item.name) for item in removed_items}
+    removed_relative_filepaths: Set[str] = set()
+    removed_dist_info_dirnames: Set[str] = set()
+    for installed_distribution in installed_distributions:
+        if normalize_distribution_name(installed_distribution.name) in removed_names:
+            removed_relative_filepaths.update(installed_distribution.relative_filepaths)
+            removed_dist_info_dirnames.add(installed_distribution.dist_info_dirname)
+
+    kept_local_files_items: List[LocalFileItem] = []
+    removed_bytes: int = 0
+    absolute_layer_source_dirpath: str = os.path.abspath(layer_source_dirpath)
+    for local_file_item in local_files_items:
+        layer_relative_filepath: str = Path(os.path.relpath(local_file_item.absolute_filepath, absolute_layer_source_dirpath)).as_posix()
+        if layer_relative_filepath in removed_relative_filepaths or layer_relative_filepath.split('/', 1)[0] in removed_dist_info_dirnames:
+            removed_bytes += os.path.getsize(local_file_item.absolute_filepath)
+            continue
+        kept_local_files_items.append(local_file_item)
+    add_counter('runtime_provided_files_removed', len(local_files_items) - len(kept_local_files_items))
+    print_runtime_provided_distributions_report(removed_items=removed_items, removed_bytes=removed_bytes, python_version=python_version)
+    return kept_local_files_items
@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import List, Set, Dict, Optional
+
+from asciitree import LeftAligned
+
+from .exceptions import RuntimeTraceFailed
+from .imports_resolver import Resolver
+from .utils import get_serverless_pack_root_folder
+
+
+@dataclass
+class RuntimeTraceResult:
+    loaded_modules_names: Set[str]
+    loaded_files_absolute_paths: Set[str]
+
+    @property
+    def top_level_modules_names(self) -> Set[str]:
+        return {module_name.split(".", 1)[0] for module_name in self.loaded_modules_names}
+
+
+def trace_handler_execution(
+        handler_module_name: str, handler_function_name: str,
+        sample_events_filepaths: List[str], python_paths: List[str],
+        timeout_seconds: Optional[int] = None
+) -> RuntimeTraceResult:
+    bootstrap_filepath: str = os.path.join(get_serverless_pack_root_folder(), "runtime_trace_bootstrap.py")
+    with tempfile.TemporaryDirectory() as temporary_dirpath:
+        output_filepath: str = os.path.join(temporary_dirpath, "runtime_trace.json")
+        command: List[str] = [
+            sys.executable, bootstrap_filepath,
+            '--handler_module_name', handler_module_name,
+            '--handler_function_name', handler_function_name,
+            '--output_filepath', output_filepath
+        ]
+        for sample_event_filepath in sample_events_filepaths:
+            command.extend(['--sample_event_filepath', sample_event_filepath])
+
+        environment: Dict[str, str] = {**os.environ, 'PYTHONPATH': os.pathsep.join(python_paths)}
+        subprocess.run(command, env=environment, timeout=timeout_seconds, check=True)
+
+        with open(output_filepath, 'r') as output_file:
+            trace_data: dict = json.load(output_file)
+
+    loaded_files_absolute_paths: Set[str] = set(trace_data['opened_files_absolute_paths'])
+    for module_filepath in trace_data['loaded_modules_files'].values():
+        if module_filepath is not None:
+            loaded_files_absolute_paths.add(os.path.abspath(module_filepath))
+
+    errors: List[str] = trace_data['errors']
+    if len(errors) > 0:
+        # A handler failing on import or partway through an event has not loaded the modules it would have imported
+        # after the error, so packaging from such a trace would drop files required at runtime.
+        raise RuntimeTraceFailed(handler_module_name=handler_module_name, errors=errors)
+
+    return RuntimeTraceResult(
+        loaded_modules_names=set(trace_data['loaded_modules_files'].keys()),
+        loaded_files_absolute_paths=loaded_files_absolute_paths
+    )
+
+
+def make_runtime_trace_diff_report(static_resolver: Resolver, traced_resolver: Resolver) -> dict:
+    removed_files_absolute_paths: Set[str] = (
+        static_resolver.included_files_absolute_paths - traced_resolver.included_files_absolute_paths
+    )
+    removed_dependencies_names: Set[str] = (
+        static_resolver.included_dependencies_names - traced_resolver.included_dependencies_names
+    )
+    return {
+        'static_files_count': len(static_resolver.included_files_absolute_paths),
+        'traced_files_count': len(traced_resolver.included_files_absolute_paths),
+        'removed_files_bytes': sum(
+            os.path.getsize(filepath) for filepath in removed_files_absolute_paths if os.path.isfile(filepath)
+        ),
+        'removed_files_absolute_paths': sorted(removed_files_absolute_paths),
+        'static_dependencies_names': sorted(static_resolver.included_dependencies_names),
+        'traced_dependencies_names': sorted(traced_resolver.included_dependencies_names),
+        'removed_dependencies_names': sorted(removed_dependencies_names),
+    }
+
+def print_runtime_trace_diff_report(report: dict):
+    print(LeftAligned()({'Runtime trace diff': {
+        f"Removed {len(report['removed_files_absolute_paths'])} files ({report['removed_files_bytes']} bytes)": {
+            filepath: {} for filepath in report['removed_files_absolute_paths']
+        },
+        f"Removed {len(report['removed_dependencies_names'])} dependencies": {
+            dependency_name: {} for dependency_name in report['removed_dependencies_names']
+        }
+    }}))
+
+def save_runtime_trace_diff_report(report: dict, dist_dirpath: str) -> str:
+    report_filepath: str = os.path.join(dist_dirpath, "runtime_trace_diff.json")
+    with open(report_filepath, 'w+') as report_file:
+        report_file.write(json.dumps(report, indent=2))
+    return report_filepath
@@ -0,0 +1,90 @@
+"""
+Executed as a standalone script in a subprocess by the runtime_trace module. It must only import from the standard
+library, since it runs the handler inside an interpreter where serverlesspack itself might not be importable.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import traceback
+from types import SimpleNamespace
+from typing import Set, List, Any, Optional
+
+
+class RecordingMetaPathFinder:
+    """Import hook that only records the requested modules names, and let the other finders do the actual import."""
+
+    def __init__(self):
+        self.requested_modules_names: Set[str] = set()
+
+    def find_spec(self, fullname: str, path: Optional[Any] = None, target: Optional[Any] = None):
+        self.requested_modules_names.add(fullname)
+        return None
+
+
+def make_fake_lambda_context(handler_function_name: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        function_name=handler_function_name, function_version="$LATEST",
+        invoked_function_arn="arn:aws:lambda:local:000000000000:function:serverlesspack-runtime-trace",
+        memory_limit_in_mb=128, aws_request_id="serverlesspack-runtime-trace",
+        log_group_name="serverlesspack-runtime-trace", log_stream_name="serverlesspack-runtime-trace",
+        get_remaining_time_in_millis=lambda: 300000
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--handler_module_name', required=True)
+    parser.add_argument('--handler_function_name', required=True)
+    parser.add_argument('--output_filepath', required=True)
+    parser.add_argument('--sample_event_filepath', action='append', default=[])
+    args = parser.parse_args()
+
+    opened_files_absolute_paths: Set[str] = set()
+
+    def audit_hook(event: str, event_args: tuple):
+        if event == 'open' and len(event_args) > 0:
+            opened_path = event_args[0]
+            if isinstance(opened_path, bytes):
+                opened_path = os.fsdecode(opened_path)
+            if isinstance(opened_path, str):
+                opened_files_absolute_paths.add(os.path.abspath(opened_path))
+
+    recording_finder = RecordingMetaPathFinder()
+    sys.meta_path.insert(0, recording_finder)
+    sys.addaudithook(audit_hook)
+    # Audit hooks cannot be removed once added, which is not an issue since we are running in a dedicated process.
+
+    errors: List[str] = []
+    try:
+        handler_module = importlib.import_module(args.handler_module_name)
+        handler_function = getattr(handler_module, args.handler_function_name)
+        for sample_event_filepath in args.sample_event_filepath:
+            with open(sample_event_filepath, 'r') as sample_event_file:
+                sample_event = json.load(sample_event_file)
+            try:
+                handler_function(sample_event, make_fake_lambda_context(args.handler_function_name))
+            except Exception:
+                # The trace is invalidated by the exception, since the handler stopped before importing its remaining modules.
+                errors.append(f"{sample_event_filepath}: {traceback.format_exc()}")
+    except Exception:
+        errors.append(traceback.format_exc())
+
+    sys.meta_path.remove(recording_finder)
+    loaded_modules_files = {
+        module_name: getattr(module, '__file__', None)
+        for module_name, module in list(sys.modules.items())
+    }
+    with open(args.output_filepath, 'w+') as output_file:
+        output_file.write(json.dumps({
+            'loaded_modules_files': loaded_modules_files,
+            'requested_modules_names': sorted(recording_finder.requested_modules_names),
+            'opened_files_absolute_paths': sorted(opened_files_absolute_paths),
+            'errors': errors
+        }))
+
+
+if __name__ == '__main__':
+    main()
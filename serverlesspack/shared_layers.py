@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from typing import List, Dict, Set, Optional, FrozenSet, Tuple
+
+from asciitree import LeftAligned
+
+from .configuration_client import ConfigClient, Config
+from .native_extensions import check_native_extensions
+from .packager import make_base_python_layer_packages_dir, download_packages_to_dir, \
+    iter_files_in_layer_folder, files_to_zip, check_installation_result, get_wheel_platform, LocalFileItem, \
+    remove_runtime_provided_packages
+from .size_report import normalize_distribution_name
+
+
+@dataclass
+class SharedLayerItem:
+    key: str
+    dependencies_names: Set[str]
+    functions_keys: Set[str]
+    uncompressed_bytes: int
+    path: Optional[str] = None
+    # The versions the layer key has been computed with, which are the exact versions installed in the layer.
+    dependencies_versions: Dict[str, Optional[str]] = field(default_factory=dict)
+
+@dataclass
+class FunctionLayersItem:
+    shared_layers_keys: List[str] = field(default_factory=list)
+    remainder_layer: Optional[SharedLayerItem] = None
+
+@dataclass
+class SharedLayersPlan:
+    shared_layers: List[SharedLayerItem]
+    functions: Dict[str, FunctionLayersItem]
+
+    @property
+    def total_uncompressed_bytes(self) -> int:
+        unique_layers: Dict[str, SharedLayerItem] = {layer.key: layer for layer in self.shared_layers}
+        for function_item in self.functions.values():
+            if function_item.remainder_layer is not None:
+                unique_layers[function_item.remainder_layer.key] = function_item.remainder_layer
+        return sum(layer.uncompressed_bytes for layer in unique_layers.values())
+
+    def to_dict(self) -> dict:
+        def layer_to_dict(layer: SharedLayerItem) -> dict:
+            return {
+                'key': layer.key, 'dependencies_names': sorted(layer.dependencies_names),
+                'dependencies_versions': {name: layer.dependencies_versions.get(name, None) for name in sorted(layer.dependencies_names)},
+                'functions_keys': sorted(layer.functions_keys), 'uncompressed_bytes': layer.uncompressed_bytes,
+                'path': layer.path
+            }
+        return {
+            'total_uncompressed_bytes': self.total_uncompressed_bytes,
+            'shared_layers': [layer_to_dict(layer) for layer in self.shared_layers],
+            'functions': {
+                function_key: {
+                    'shared_layers_keys': function_item.shared_layers_keys,
+                    'remainder_layer': layer_to_dict(function_item.remainder_layer) if function_item.remainder_layer is not None else None
+                } for function_key, function_item in self.functions.items()
+            }
+        }
+
+
+def make_dependencies_set_key(
+        dependencies_names: Set[str], dependencies_versions: Dict[str, Optional[str]], python_version: str, platform: Optional[str] = None
+) -> str:
+    # The key of a layer only depends on its content, which allows to share the built layers between the functions
+    # and between the different builds. The wheels installed for another platform are a different content.
+    dependencies_set_hash = hashlib.sha256(f"{python_version}\n{platform}".encode('utf-8'))
+    for dependency_name in sorted(dependencies_names):
+        dependencies_set_hash.update(f"\n{dependency_name}=={dependencies_versions.get(dependency_name, None)}".encode('utf-8'))
+    return dependencies_set_hash.hexdigest()[:16]
+
+def get_local_distributions_metadata(dependencies_names: Set[str]) -> Dict[str, dict]:
+    """Returns the version, the size and the requirements of the locally installed distributions, and of
+    their requirements, by reading their metadata (the dependencies are not installed for the target yet)."""
+    from importlib_metadata import distribution, PackageNotFoundError
+
+    distributions_metadata: Dict[str, dict] = dict()
+    distributions_names_to_visit: List[str] = list(dependencies_names)
+    while len(distributions_names_to_visit) > 0:
+        distribution_name: str = normalize_distribution_name(distributions_names_to_visit.pop())
+        if distribution_name in distributions_metadata:
+            continue
+        try:
+            local_distribution = distribution(distribution_name)
+        except PackageNotFoundError:
+            distributions_metadata[distribution_name] = {'version': None, 'uncompressed_bytes': 0, 'requirements_names': set()}
+            continue
+
+        uncompressed_bytes: int = 0
+        for package_path in local_distribution.files or []:
+            if package_path.size is not None:
+                uncompressed_bytes += package_path.size
+        requirements_names: Set[str] = set()
+        for requirement in local_distribution.requires or []:
+            requirement_match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', requirement)
+            if requirement_match is not None and 'extra ==' not in requirement:
+                requirements_names.add(normalize_distribution_name(requirement_match.group(1)))
+        distributions_metadata[distribution_name] = {
+            'version': local_distribution.version, 'uncompressed_bytes': uncompressed_bytes,
+            'requirements_names': requirements_names
+        }
+        distributions_names_to_visit.extend(requirements_names)
+    return distributions_metadata
+
+def get_dependencies_closure(dependencies_names: Set[str], distributions_metadata: Dict[str, dict]) -> Set[str]:
+    closure: Set[str] = set()
+    distributions_names_to_visit: List[str] = [normalize_distribution_name(name) for name in dependencies_names]
+    while len(distributions_names_to_visit) > 0:
+        distribution_name: str = distributions_names_to_visit.pop()
+        if distribution_name not in closure:
+            closure.add(distribution_name)
+            distributions_names_to_visit.extend(distributions_metadata.get(distribution_name, {}).get('requirements_names', set()))
+    return closure
+
+
+def plan_shared_layers(
+        functions_dependencies_names: Dict[str, Set[str]], dependencies_sizes: Dict[str, int],
+        dependencies_versions: Dict[str, Optional[str]], python_version: str, platform: Optional[str] = None,
+        max_shared_layers_per_function: int = 4, min_shared_layer_bytes: int = 0
+) -> SharedLayersPlan:
+    # The dependencies used by the exact same set of functions are grouped together. Each group used by more than
+    # one function is a candidate shared layer, which saves its size for every additional function that uses it.
+    groups_dependencies_names: Dict[FrozenSet[str], Set[str]] = dict()
+    for dependency_name in set().union(*functions_dependencies_names.values()) if len(functions_dependencies_names) > 0 else set():
+        functions_keys: FrozenSet[str] = frozenset(
+            function_key for function_key, dependencies_names in functions_dependencies_names.items()
+            if dependency_name in dependencies_names
+        )
+        groups_dependencies_names.setdefault(functions_keys, set()).add(dependency_name)
+
+    def get_group_bytes(dependencies_names: Set[str]) -> int:
+        return sum(dependencies_sizes.get(dependency_name, 0) for dependency_name in dependencies_names)
+
+    candidates_groups = sorted([
+        (functions_keys, dependencies_names) for functions_keys, dependencies_names in groups_dependencies_names.items()
+        if len(functions_keys) > 1 and get_group_bytes(dependencies_names) >= min_shared_layer_bytes
+    ], key=lambda item: (get_group_bytes(item[1]) * (len(item[0]) - 1), sorted(item[1])), reverse=True)
+
+    functions: Dict[str, FunctionLayersItem] = {function_key: FunctionLayersItem() for function_key in functions_dependencies_names.keys()}
+    shared_layers: List[SharedLayerItem] = list()
+    for functions_keys, dependencies_names in candidates_groups:
+        # Lambda limits the number of layers of a function, and one slot is always kept for the remainder layer.
+        if all(len(functions[function_key].shared_layers_keys) < max_shared_layers_per_function for function_key in functions_keys):
+            shared_layer = SharedLayerItem(
+                key=make_dependencies_set_key(dependencies_names, dependencies_versions, python_version, platform),
+                dependencies_names=dependencies_names, functions_keys=set(functions_keys),
+                uncompressed_bytes=get_group_bytes(dependencies_names),
+                dependencies_versions={name: dependencies_versions.get(name, None) for name in dependencies_names}
+            )
+            shared_layers.append(shared_layer)
+            for function_key in functions_keys:
+                functions[function_key].shared_layers_keys.append(shared_layer.key)
+
+    shared_layers_by_key: Dict[str, SharedLayerItem] = {layer.key: layer for layer in shared_layers}
+    for function_key, function_item in functions.items():
+        shared_dependencies_names: Set[str] = set().union(*[
+            shared_layers_by_key[layer_key].dependencies_names for layer_key in function_item.shared_layers_keys
+        ]) if len(function_item.shared_layers_keys) > 0 else set()
+        remainder_dependencies_names: Set[str] = functions_dependencies_names[function_key] - shared_dependencies_names
+        if len(remainder_dependencies_names) > 0:
+            function_item.remainder_layer = SharedLayerItem(
+                key=make_dependencies_set_key(remainder_dependencies_names, dependencies_versions, python_version, platform),
+                dependencies_names=remainder_dependencies_names, functions_keys={function_key},
+                uncompressed_bytes=get_group_bytes(remainder_dependencies_names),
+                dependencies_versions={name: dependencies_versions.get(name, None) for name in remainder_dependencies_names}
+            )
+    return SharedLayersPlan(shared_layers=shared_layers, functions=functions)
+
+
+def build_planned_layer(
+        layer: SharedLayerItem, output_dirpath: str, python_version: str, platform: Optional[str],
+        config: Optional[Config] = None, target_os: str = 'linux'
+) -> str:
+    layer_dirpath: str = os.path.join(output_dirpath, layer.key)
+    layer_zip_filepath: str = os.path.join(layer_dirpath, 'lambda_layer.zip')
+    if os.path.isfile(layer_zip_filepath):
+        print(f"Re-used cached layer {layer.key}")
+        return layer_zip_filepath
+
+    installation_dirpath: str = os.path.join(layer_dirpath, 'installation')
+    # Each layer only contains its planned distributions, at the versions of its key. Their requirements are planned in
+    # the other layers of the functions, and would otherwise be duplicated in every layer and change with each release.
+    packages_names: Set[str] = remove_runtime_provided_packages(
+        packages_names=layer.dependencies_names, python_version=python_version, imported_versions=layer.dependencies_versions
+    )
+    pinned_packages_names: Set[str] = {
+        f"{name}=={layer.dependencies_versions[name]}" if layer.dependencies_versions.get(name, None) is not None else name
+        for name in packages_names
+    }
+    try:
+        installation_result = download_packages_to_dir(
+            packages_names=pinned_packages_names, target_dirpath=installation_dirpath,
+            python_version=python_version, platform=platform,
+            should_remove_runtime_provided_packages=False, should_install_requirements=False
+        )
+        # A failed installation must not be zipped, since the incomplete layer would be re-used as cached by the next builds.
+        check_installation_result(installation_result=installation_result, packages_names=pinned_packages_names)
+        local_files_items: List[LocalFileItem] = list(iter_files_in_layer_folder(
+            source_dirpath=installation_dirpath,
+            base_layer_dirpath=make_base_python_layer_packages_dir(python_version=python_version)
+        ))
+        if config is not None:
+            # The layer is checked before being zipped, since a zipped layer is re-used without being checked again.
+            check_native_extensions(config=config, target_os=target_os, local_files_items=local_files_items)
+        # The zip file is written under a temporary name and then renamed, so that an interrupted
+        # build cannot leave an incomplete layer that would be considered as cached by the next builds.
+        temporary_zip_filepath: str = files_to_zip(layer_dirpath, 'lambda_layer_temp', local_files_items, [])
+        os.replace(temporary_zip_filepath, layer_zip_filepath)
+    finally:
+        # Only the zip file is kept, the installed packages would otherwise accumulate for every built layer.
+        shutil.rmtree(installation_dirpath, ignore_errors=True)
+    return layer_zip_filepath
+
+
+def get_layers_group_key(python_version: str, architecture: str) -> str:
+    return f"python{python_version}-{architecture}"
+
+def compute_shared_layers_api(
+        config_filepaths: List[str], target_os: str, output_dirpath: str, verbose: bool = False,
+        should_build_layers: bool = False, max_shared_layers_per_function: int = 4, min_shared_layer_bytes: int = 0
+) -> Dict[str, SharedLayersPlan]:
+    """Plan the layers shared between the functions of the config files. The layers can only be shared between the
+    functions of a same python version and architecture, so a plan is made for each of them, keyed like python3.9-x86_64."""
+    from .cli import python_path_wrapper, resolve_config_files
+
+    functions_dependencies_names_by_group: Dict[Tuple[str, str], Dict[str, Set[str]]] = dict()
+    # The first config of each group provides the native extensions check of the group built layers.
+    configs_by_group: Dict[Tuple[str, str], Config] = dict()
+    for config_filepath in config_filepaths:
+        config = ConfigClient(verbose=verbose).load_render_config_file(filepath=config_filepath, target_os=target_os)
+        resolver = python_path_wrapper(config=config, f=lambda: resolve_config_files(config=config, target_os=target_os, verbose=verbose))
+        group: Tuple[str, str] = (config.python_version, config.architecture)
+        configs_by_group.setdefault(group, config)
+        functions_dependencies_names_by_group.setdefault(group, {})[os.path.abspath(config_filepath)] = {
+            normalize_distribution_name(dependency_name) for dependency_name in resolver.included_dependencies_names
+        }
+
+    plans_by_group_key: Dict[str, SharedLayersPlan] = dict()
+    for (python_version, architecture), functions_dependencies_names in functions_dependencies_names_by_group.items():
+        platform: Optional[str] = get_wheel_platform(target_os=target_os, architecture=architecture)
+        distributions_metadata = get_local_distributions_metadata(dependencies_names=set().union(*functions_dependencies_names.values()))
+        plan = plan_shared_layers(
+            functions_dependencies_names={
+                function_key: get_dependencies_closure(dependencies_names, distributions_metadata)
+                for function_key, dependencies_names in functions_dependencies_names.items()
+            },
+            dependencies_sizes={name: metadata['uncompressed_bytes'] for name, metadata in distributions_metadata.items()},
+            dependencies_versions={name: metadata['version'] for name, metadata in distributions_metadata.items()},
+            python_version=python_version, platform=platform, max_shared_layers_per_function=max_shared_layers_per_function,
+            min_shared_layer_bytes=min_shared_layer_bytes
+        )
+        if should_build_layers is True:
+            for layer in [
+                *plan.shared_layers,
+                *[function_item.remainder_layer for function_item in plan.functions.values() if function_item.remainder_layer is not None]
+            ]:
+                layer.path = build_planned_layer(
+                    layer=layer, output_dirpath=output_dirpath, python_version=python_version, platform=platform,
+                    config=configs_by_group[(python_version, architecture)], target_os=target_os
+                )
+        plans_by_group_key[get_layers_group_key(python_version=python_version, architecture=architecture)] = plan
+
+    if not os.path.exists(output_dirpath):
+        os.makedirs(output_dirpath)
+    with open(os.path.join(output_dirpath, "shared_layers_plan.json"), 'w+') as plan_file:
+        plan_file.write(json.dumps({
+            group_key: plan.to_dict() for group_key, plan in plans_by_group_key.items()
+        }, indent=2))
+
+    for group_key, plan in plans_by_group_key.items():
+        print(LeftAligned()({f"{group_key} : {plan.total_uncompressed_bytes} bytes to build": {
+            **{
+                f"Shared layer {layer.key} ({layer.uncompressed_bytes} bytes)": {
+                    ", ".join(sorted(layer.dependencies_names)): {}, f"Used by {len(layer.functions_keys)} functions": {}
+                } for layer in plan.shared_layers
+            },
+            **{
+                f"Remainder of {function_key}": {
+                    ", ".join(sorted(function_item.remainder_layer.dependencies_names)): {}
+                } for function_key, function_item in plan.functions.items() if function_item.remainder_layer is not None
+            }
+        }}))
+    return plans_by_group_key
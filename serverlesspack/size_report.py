@@ -0,0 +1,272 @@
+import csv
+import json
+import os
+import re
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Set, Tuple
+
+from asciitree import LeftAligned
+
+from .artifacts_deduplication import get_importable_relative_filepath
+from .configuration_client import SizeBudgetsConfig
+from .exceptions import SizeBudgetExceeded
+from .import_graph import EDGE_TYPE_LIBRARY
+from .imports_resolver import Resolver
+from .packager import LocalFileItem, ContentFileItem
+from .utils import normalize_distribution_name
+
+
+CODE_ARTIFACT_KEY = 'code'
+LAYER_ARTIFACT_KEY = 'layer'
+
+
+def compute_local_file_sizes(filepath: str, chunk_size: int = 1024 * 1024) -> Tuple[int, int]:
+    # We use a raw deflate stream (negative wbits) with the default compression level,
+    # which is the same compression used by the ZIP_DEFLATED method of the zip archives.
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    uncompressed_size, compressed_size = 0, 0
+    with open(filepath, 'rb') as file:
+        while True:
+            chunk: bytes = file.read(chunk_size)
+            if not chunk:
+                break
+            uncompressed_size += len(chunk)
+            compressed_size += len(compressor.compress(chunk))
+    compressed_size += len(compressor.flush())
+    return uncompressed_size, compressed_size
+
+def compute_content_sizes(content: str) -> Tuple[int, int]:
+    encoded_content: bytes = content.encode('utf-8')
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return len(encoded_content), len(compressor.compress(encoded_content) + compressor.flush())
+
+
+@dataclass
+class InstalledDistributionItem:
+    name: str
+    requirements_names: Set[str] = field(default_factory=set)
+
+def read_layer_installed_distributions(layer_source_dirpath: str) -> Tuple[Dict[str, InstalledDistributionItem], Dict[str, str]]:
+    """Returns the installed distributions by normalized name, and the normalized distribution name of each file path
+    relative to the layer root, by reading the METADATA and RECORD files of the dist-info folders written by pip."""
+    distributions: Dict[str, InstalledDistributionItem] = dict()
+    distributions_names_by_relative_filepath: Dict[str, str] = dict()
+    if not os.path.isdir(layer_source_dirpath):
+        return distributions, distributions_names_by_relative_filepath
+
+    for dirname in os.listdir(layer_source_dirpath):
+        if not dirname.endswith('.dist-info'):
+            continue
+        dist_info_dirpath: str = os.path.join(layer_source_dirpath, dirname)
+        distribution = InstalledDistributionItem(name=normalize_distribution_name(dirname.split('-', 1)[0]))
+
+        metadata_filepath: str = os.path.join(dist_info_dirpath, 'METADATA')
+        if os.path.isfile(metadata_filepath):
+            with open(metadata_filepath, 'r', encoding='utf-8', errors='replace') as metadata_file:
+                for line in metadata_file:
+                    if line.startswith('Name:'):
+                        distribution.name = normalize_distribution_name(line[len('Name:'):].strip())
+                    elif line.startswith('Requires-Dist:') and 'extra ==' not in line:
+                        requirement_match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', line[len('Requires-Dist:'):])
+                        if requirement_match is not None:
+                            distribution.requirements_names.add(normalize_distribution_name(requirement_match.group(1)))
+                    elif line.strip() == '':
+                        # The headers section of the METADATA file ends with the first empty line.
+                        break
+
+        record_filepath: str = os.path.join(dist_info_dirpath, 'RECORD')
+        if os.path.isfile(record_filepath):
+            with open(record_filepath, 'r', encoding='utf-8', errors='replace', newline='') as record_file:
+                for row in csv.reader(record_file):
+                    if len(row) > 0:
+                        distributions_names_by_relative_filepath[Path(os.path.normpath(row[0])).as_posix()] = distribution.name
+        distributions[distribution.name] = distribution
+    return distributions, distributions_names_by_relative_filepath
+
+def get_distributions_closure(distribution_name: str, distributions: Dict[str, InstalledDistributionItem]) -> Set[str]:
+    closure: Set[str] = set()
+    distributions_names_to_visit: List[str] = [distribution_name]
+    while len(distributions_names_to_visit) > 0:
+        current_distribution_name: str = distributions_names_to_visit.pop()
+        if current_distribution_name in closure or current_distribution_name not in distributions:
+            continue
+        closure.add(current_distribution_name)
+        distributions_names_to_visit.extend(distributions[current_distribution_name].requirements_names)
+    return closure
+
+
+def make_size_report(
+        resolver: Resolver, budgets: SizeBudgetsConfig,
+        code_local_files_items: List[LocalFileItem], code_content_files_items: List[ContentFileItem],
+        layer_local_files_items: List[LocalFileItem], layer_source_dirpath: Optional[str]
+) -> dict:
+    distributions, distributions_names_by_relative_filepath = (
+        read_layer_installed_distributions(layer_source_dirpath=os.path.abspath(layer_source_dirpath))
+        if layer_source_dirpath is not None else ({}, {})
+    )
+
+    files_entries: List[dict] = list()
+    # When packaged as a layer, the code files are prefixed by the python/lib/pythonX/site-packages folders, which must
+    # not be taken for their package.
+    for local_file_item in code_local_files_items:
+        uncompressed_size, compressed_size = compute_local_file_sizes(filepath=local_file_item.absolute_filepath)
+        files_entries.append({
+            'artifact': CODE_ARTIFACT_KEY, 'path': local_file_item.relative_filepath,
+            'package': Path(get_importable_relative_filepath(local_file_item)).parts[0], 'distribution': None,
+            'uncompressed_bytes': uncompressed_size, 'compressed_bytes': compressed_size
+        })
+    for content_file_item in code_content_files_items:
+        uncompressed_size, compressed_size = compute_content_sizes(content=content_file_item.content)
+        files_entries.append({
+            'artifact': CODE_ARTIFACT_KEY, 'path': content_file_item.relative_filepath,
+            'package': Path(get_importable_relative_filepath(content_file_item)).parts[0], 'distribution': None,
+            'uncompressed_bytes': uncompressed_size, 'compressed_bytes': compressed_size
+        })
+    for local_file_item in layer_local_files_items:
+        uncompressed_size, compressed_size = compute_local_file_sizes(filepath=local_file_item.absolute_filepath)
+        layer_relative_filepath: str = (
+            Path(os.path.relpath(local_file_item.absolute_filepath, layer_source_dirpath)).as_posix()
+            if layer_source_dirpath is not None else local_file_item.relative_filepath
+        )
+        files_entries.append({
+            'artifact': LAYER_ARTIFACT_KEY, 'path': local_file_item.relative_filepath,
+            'package': Path(Path(layer_relative_filepath).parts[0]).stem,
+            'distribution': distributions_names_by_relative_filepath.get(layer_relative_filepath, None),
+            'uncompressed_bytes': uncompressed_size, 'compressed_bytes': compressed_size
+        })
+
+    def make_sizes_entry() -> dict:
+        return {'uncompressed_bytes': 0, 'compressed_bytes': 0, 'files_count': 0}
+
+    def add_to_sizes_entry(sizes_entry: dict, file_entry: dict):
+        sizes_entry['uncompressed_bytes'] += file_entry['uncompressed_bytes']
+        sizes_entry['compressed_bytes'] += file_entry['compressed_bytes']
+        sizes_entry['files_count'] += 1
+
+    artifacts_sizes: Dict[str, dict] = {CODE_ARTIFACT_KEY: make_sizes_entry(), LAYER_ARTIFACT_KEY: make_sizes_entry()}
+    total_sizes: dict = make_sizes_entry()
+    packages_sizes: Dict[str, dict] = dict()
+    distributions_sizes: Dict[str, dict] = dict()
+    for file_entry in files_entries:
+        add_to_sizes_entry(artifacts_sizes[file_entry['artifact']], file_entry)
+        add_to_sizes_entry(total_sizes, file_entry)
+        package_key: str = f"{file_entry['artifact']}:{file_entry['package']}"
+        add_to_sizes_entry(packages_sizes.setdefault(package_key, make_sizes_entry()), file_entry)
+        if file_entry['distribution'] is not None:
+            add_to_sizes_entry(distributions_sizes.setdefault(file_entry['distribution'], make_sizes_entry()), file_entry)
+
+    import_sites_by_dependency: Dict[str, Set[str]] = dict()
+    for trace in resolver.traces:
+        if trace['type'] == EDGE_TYPE_LIBRARY and trace['source'] in resolver.included_files_absolute_paths:
+            import_sites_by_dependency.setdefault(normalize_distribution_name(trace['dependency_name']), set()).add(trace['source'])
+
+    closures_by_dependency: Dict[str, Set[str]] = {
+        normalize_distribution_name(dependency_name): get_distributions_closure(
+            distribution_name=normalize_distribution_name(dependency_name), distributions=distributions
+        ) for dependency_name in resolver.included_dependencies_names
+    }
+    # The bytes of a distribution required by several dependencies are split between them, so that the attributed
+    # bytes of the dependencies add up to the size of the layer. The inclusive bytes are the size of the full closure,
+    # in which the shared distributions are counted for every dependency that requires them.
+    owners_by_distribution: Dict[str, List[str]] = dict()
+    for dependency_name, closure in sorted(closures_by_dependency.items()):
+        for distribution_name in closure:
+            owners_by_distribution.setdefault(distribution_name, []).append(dependency_name)
+
+    def get_attributed_bytes(dependency_name: str, distribution_name: str, size_key: str) -> int:
+        owners: List[str] = owners_by_distribution[distribution_name]
+        share, remainder = divmod(distributions_sizes.get(distribution_name, make_sizes_entry())[size_key], len(owners))
+        # The remaining bytes of the division are given to the first owners, which keeps the exact total.
+        return share + (1 if owners.index(dependency_name) < remainder else 0)
+
+    dependencies_entries: Dict[str, dict] = dict()
+    for normalized_dependency_name, closure in closures_by_dependency.items():
+        dependencies_entries[normalized_dependency_name] = {
+            **distributions_sizes.get(normalized_dependency_name, make_sizes_entry()),
+            'transitive_distributions': sorted(closure - {normalized_dependency_name}),
+            'shared_distributions': sorted(name for name in closure if len(owners_by_distribution[name]) > 1),
+            'attributed_uncompressed_bytes': sum(get_attributed_bytes(normalized_dependency_name, name, 'uncompressed_bytes') for name in closure),
+            'attributed_compressed_bytes': sum(get_attributed_bytes(normalized_dependency_name, name, 'compressed_bytes') for name in closure),
+            'inclusive_uncompressed_bytes': sum(distributions_sizes.get(name, make_sizes_entry())['uncompressed_bytes'] for name in closure),
+            'inclusive_compressed_bytes': sum(distributions_sizes.get(name, make_sizes_entry())['compressed_bytes'] for name in closure),
+            'import_sites': sorted(import_sites_by_dependency.get(normalized_dependency_name, set()))
+        }
+
+    import_sites_entries: Dict[str, dict] = dict()
+    for dependency_name, dependency_entry in dependencies_entries.items():
+        for import_site_filepath in dependency_entry['import_sites']:
+            import_site_entry: dict = import_sites_entries.setdefault(import_site_filepath, {
+                'dependencies': [], 'attributed_uncompressed_bytes': 0, 'attributed_compressed_bytes': 0
+            })
+            import_site_entry['dependencies'].append(dependency_name)
+            import_site_entry['attributed_uncompressed_bytes'] += dependency_entry['attributed_uncompressed_bytes']
+            import_site_entry['attributed_compressed_bytes'] += dependency_entry['attributed_compressed_bytes']
+
+    budgets_entries: Dict[str, dict] = dict()
+    for budget_name, limit, actual in [
+        ('max_code_uncompressed_bytes', budgets.max_code_uncompressed_bytes, artifacts_sizes[CODE_ARTIFACT_KEY]['uncompressed_bytes']),
+        ('max_code_compressed_bytes', budgets.max_code_compressed_bytes, artifacts_sizes[CODE_ARTIFACT_KEY]['compressed_bytes']),
+        ('max_layer_uncompressed_bytes', budgets.max_layer_uncompressed_bytes, artifacts_sizes[LAYER_ARTIFACT_KEY]['uncompressed_bytes']),
+        ('max_layer_compressed_bytes', budgets.max_layer_compressed_bytes, artifacts_sizes[LAYER_ARTIFACT_KEY]['compressed_bytes']),
+        ('max_total_uncompressed_bytes', budgets.max_total_uncompressed_bytes, total_sizes['uncompressed_bytes']),
+    ]:
+        if limit is not None:
+            budgets_entries[budget_name] = {'limit': limit, 'actual': actual, 'exceeded': actual > limit}
+
+    return {
+        'artifacts': artifacts_sizes,
+        'total': total_sizes,
+        'budgets': budgets_entries,
+        'dependencies': dependencies_entries,
+        'import_sites': import_sites_entries,
+        'packages': packages_sizes,
+        'files': files_entries,
+    }
+
+
+def get_top_offenders(report: dict, count: int) -> List[str]:
+    # The dependencies are the most actionable offenders, since their import sites tell which imports
+    # caused their inclusion. They are followed by the biggest first-party packages of the code artifact.
+    top_offenders: List[str] = [
+        f"{dependency_name} : {dependency_entry['attributed_uncompressed_bytes']} bytes "
+        f"({dependency_entry['attributed_compressed_bytes']} compressed, {dependency_entry['inclusive_uncompressed_bytes']} bytes "
+        f"including its shared requirements) imported from {dependency_entry['import_sites']}"
+        for dependency_name, dependency_entry in sorted(
+            report['dependencies'].items(), key=lambda item: item[1]['attributed_uncompressed_bytes'], reverse=True
+        )
+    ]
+    top_offenders.extend([
+        f"{package_key} : {package_entry['uncompressed_bytes']} bytes ({package_entry['compressed_bytes']} compressed)"
+        for package_key, package_entry in sorted(
+            report['packages'].items(), key=lambda item: item[1]['uncompressed_bytes'], reverse=True
+        )
+        if package_key.startswith(f"{CODE_ARTIFACT_KEY}:")
+    ])
+    return top_offenders[:count]
+
+def print_size_report(report: dict, top_offenders_count: int):
+    print(LeftAligned()({'Size report': {
+        **{
+            f"{artifact_key} : {sizes_entry['uncompressed_bytes']} bytes ({sizes_entry['compressed_bytes']} compressed)": {}
+            for artifact_key, sizes_entry in report['artifacts'].items()
+        },
+        'Top offenders': {offender: {} for offender in get_top_offenders(report=report, count=top_offenders_count)}
+    }}))
+
+def save_size_report(report: dict, dist_dirpath: str) -> str:
+    report_filepath: str = os.path.join(dist_dirpath, "size_report.json")
+    with open(report_filepath, 'w+') as report_file:
+        report_file.write(json.dumps(report, indent=2))
+    return report_filepath
+
+def enforce_size_budgets(report: dict, budgets: SizeBudgetsConfig):
+    exceeded_budgets: Dict[str, dict] = {
+        budget_name: budget_entry for budget_name, budget_entry in report['budgets'].items() if budget_entry['exceeded'] is True
+    }
+    if len(exceeded_budgets) > 0:
+        raise SizeBudgetExceeded(
+            exceeded_budgets=exceeded_budgets,
+            top_offenders=get_top_offenders(report=report, count=budgets.top_offenders_count)
+        )
@@ -0,0 +1,183 @@
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+CACHE_DIRPATH_ENVIRONMENT_VARIABLE = "SERVERLESSPACK_CACHE_DIR"
+STATE_STORE_FILENAME = "state.sqlite3"
+# Incremented when the schema of the entries table changes, in order to not read the entries of an incompatible version.
+STATE_STORE_SCHEMA_VERSION = 1
+# Older SQLite versions only support 999 variables per statement.
+MAX_VARIABLES_PER_STATEMENT = 900
+
+
+def get_user_cache_dirpath() -> str:
+    """The cache folder of the current user for serverlesspack, which can be overridden with the SERVERLESSPACK_CACHE_DIR
+    environment variable, for example to share the cache between the jobs of a CI runner."""
+    overriding_dirpath: Optional[str] = os.environ.get(CACHE_DIRPATH_ENVIRONMENT_VARIABLE, None)
+    if overriding_dirpath:
+        return os.path.abspath(os.path.expanduser(overriding_dirpath))
+    if sys.platform == 'win32':
+        base_dirpath: str = os.environ.get('LOCALAPPDATA', None) or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base_dirpath, 'serverlesspack', 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.expanduser(os.path.join('~', 'Library', 'Caches', 'serverlesspack'))
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', None) or os.path.expanduser(os.path.join('~', '.cache')), 'serverlesspack')
+
+def _iter_chunks(values: List[Any], chunk_size: int = MAX_VARIABLES_PER_STATEMENT) -> Iterator[List[Any]]:
+    for i_start in range(0, len(values), chunk_size):
+        yield values[i_start:i_start + chunk_size]
+
+
+class StateStore:
+    """Local store of the state kept between the builds, in an SQLite database of the user cache folder.
+
+    The entries are JSON values grouped in namespaces, with an optional expiration. The database is in WAL mode, so that
+    the parallel builds can read while another one writes, and the read-modify-write sequences are made atomic with the
+    transaction context manager. Each thread uses its own connection, since the connections cannot be shared."""
+
+    def __init__(self, filepath: Optional[str] = None, timeout_seconds: float = 30.0):
+        self.filepath = filepath if filepath is not None else os.path.join(get_user_cache_dirpath(), STATE_STORE_FILENAME)
+        self.timeout_seconds = timeout_seconds
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.filepath)), exist_ok=True)
+        self._initialize_schema()
+        self.evict_expired()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(self._local, 'connection', None)
+        if connection is None:
+            # The transactions are explicitly started by the transaction function, every other statement is committed when executed.
+            connection = sqlite3.connect(self.filepath, timeout=self.timeout_seconds, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.transaction_depth = 0
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _initialize_schema(self):
+        with self.transaction():
+            user_version: int = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if user_version != STATE_STORE_SCHEMA_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS entries")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, expires_at REAL, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at) WHERE expires_at IS NOT NULL")
+            self._connection.execute(f"PRAGMA user_version = {STATE_STORE_SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self) -> Iterator['StateStore']:
+        """Execute the reads and writes of the block atomically. The write lock of the database is taken when the
+        transaction starts, so that no other build can modify the read entries before they are written back."""
+        connection: sqlite3.Connection = self._connection
+        if self._local.transaction_depth > 0:
+            # The nested transactions are part of the outer transaction.
+            self._local.transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self._local.transaction_depth -= 1
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.transaction_depth = 1
+        try:
+            yield self
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            self._local.transaction_depth = 0
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row: Optional[tuple] = self._connection.execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """The values of the found keys, the missing and expired keys are not part of the returned dict."""
+        values: Dict[str, Any] = dict()
+        now: float = time.time()
+        for keys_chunk in _iter_chunks(list(dict.fromkeys(keys))):
+            for key, value in self._connection.execute(
+                f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({', '.join('?' * len(keys_chunk))}) "
+                f"AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, *keys_chunk, now)
+            ):
+                values[key] = json.loads(value)
+        return values
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        return {
+            key: json.loads(value) for key, value in self._connection.execute(
+                "SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            )
+        }
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        self.set_many(namespace=namespace, values={key: value}, ttl_seconds=ttl_seconds)
+
+    def set_many(self, namespace: str, values: Dict[str, Any], ttl_seconds: Optional[float] = None):
+        now: float = time.time()
+        expires_at: Optional[float] = now + ttl_seconds if ttl_seconds is not None else None
+        with self.transaction():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, updated_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value, sort_keys=True), now, expires_at) for key, value in values.items()]
+            )
+
+    def delete(self, namespace: str, key: str):
+        self.delete_many(namespace=namespace, keys=[key])
+
+    def delete_many(self, namespace: str, keys: Iterable[str]):
+        with self.transaction():
+            for keys_chunk in _iter_chunks(list(keys)):
+                self._connection.execute(
+                    f"DELETE FROM entries WHERE namespace = ? AND key IN ({', '.join('?' * len(keys_chunk))})", (namespace, *keys_chunk)
+                )
+
+    def clear(self, namespace: str):
+        self._connection.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def evict_expired(self) -> int:
+        return self._connection.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+_state_store: Optional[StateStore] = None
+_state_store_lock = threading.Lock()
+
+def get_state_store() -> StateStore:
+    """The store of the user cache folder, opened once per process."""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = StateStore()
+            atexit.register(_state_store.close)
+        return _state_store
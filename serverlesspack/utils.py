@@ -1,4 +1,5 @@
 import os
+import re
 
 
 def get_serverless_pack_root_folder() -> str:
@@ -9,3 +10,13 @@ def message_with_vars(message: str, vars_dict: dict):
     for key, var in vars_dict.items():
         output_message += f"\n  --{key}:{var}"
     return output_message
+
+def relative_filepath_to_module_name(relative_filepath: str) -> str:
+    from pathlib import Path
+    module_path = Path(relative_filepath).with_suffix('')
+    if module_path.name == '__init__':
+        module_path = module_path.parent
+    return ".".join(module_path.parts)
+
+def normalize_distribution_name(distribution_name: str) -> str:
+    return re.sub(r"[-_.]+", "-", distribution_name).lower()
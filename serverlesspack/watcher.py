@@ -0,0 +1,365 @@
+import hashlib
+import os
+import shutil
+import struct
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Set, Tuple, Union
+
+import click
+
+from .configuration_client import ConfigClient, Config
+from .exceptions import FilesUpdateFailed
+from .imports_resolver import Resolver
+from .layer_pruning import prune_layer_files
+from .packager import LocalFileItem, ContentFileItem, make_base_python_layer_packages_dir, package_files, \
+    resolve_install_and_get_dependencies_files, write_content_to_zip
+from .priming import make_priming_content_file_item
+
+
+FileSignature = Tuple[int, int]
+EntrySignature = Tuple[str, ...]
+WATCHED_EXCLUDED_DIRNAMES = {'__pycache__', 'dist', 'node_modules', '.git', '.idea', '.venv', 'venv'}
+
+
+@dataclass
+class SnapshotChanges:
+    created_filepaths: Set[str] = field(default_factory=set)
+    modified_filepaths: Set[str] = field(default_factory=set)
+    deleted_filepaths: Set[str] = field(default_factory=set)
+
+    @property
+    def has_changes(self) -> bool:
+        return len(self.created_filepaths) > 0 or len(self.modified_filepaths) > 0 or len(self.deleted_filepaths) > 0
+
+class DirectorySnapshot:
+    """Polling snapshot of the modification times and sizes of the files in the watched folders."""
+
+    def __init__(self, dirpaths: List[str], excluded_dirpaths: Optional[List[str]] = None):
+        self.dirpaths = [os.path.abspath(dirpath) for dirpath in dirpaths]
+        self.excluded_dirpaths = {os.path.abspath(dirpath) for dirpath in (excluded_dirpaths or [])}
+        self.files_signatures: Dict[str, FileSignature] = self.take()
+
+    def take(self) -> Dict[str, FileSignature]:
+        files_signatures: Dict[str, FileSignature] = dict()
+        for dirpath in self.dirpaths:
+            for root_dirpath, dirs, filenames in os.walk(dirpath, topdown=True):
+                dirs[:] = [
+                    dirname for dirname in dirs
+                    if dirname not in WATCHED_EXCLUDED_DIRNAMES and not dirname.startswith('.')
+                    and os.path.join(root_dirpath, dirname) not in self.excluded_dirpaths
+                ]
+                for filename in filenames:
+                    filepath: str = os.path.join(root_dirpath, filename)
+                    try:
+                        stat_result = os.stat(filepath)
+                    except FileNotFoundError:
+                        # The file has been removed between the listing of its folder and its stat.
+                        continue
+                    files_signatures[filepath] = (stat_result.st_mtime_ns, stat_result.st_size)
+        return files_signatures
+
+    def poll(self) -> SnapshotChanges:
+        new_files_signatures: Dict[str, FileSignature] = self.take()
+        changes = SnapshotChanges(
+            created_filepaths=new_files_signatures.keys() - self.files_signatures.keys(),
+            deleted_filepaths=self.files_signatures.keys() - new_files_signatures.keys(),
+            modified_filepaths={
+                filepath for filepath, signature in new_files_signatures.items()
+                if filepath in self.files_signatures and self.files_signatures[filepath] != signature
+            }
+        )
+        self.files_signatures = new_files_signatures
+        return changes
+
+
+def make_entry_signature(file_item: Union[LocalFileItem, ContentFileItem]) -> EntrySignature:
+    if isinstance(file_item, LocalFileItem):
+        stat_result = os.stat(file_item.absolute_filepath)
+        return 'local', file_item.absolute_filepath, str(stat_result.st_mtime_ns), str(stat_result.st_size)
+    return 'content', hashlib.sha1(file_item.content.encode('utf-8')).hexdigest()
+
+@dataclass
+class ArtifactUpdateResult:
+    written_entries_count: int = 0
+    reused_entries_count: int = 0
+    removed_entries_count: int = 0
+
+class IncrementalArtifactWriter:
+    """Keeps the signatures of the entries of the last written artifact, in order to only rewrite the changed entries."""
+
+    def __init__(self, dist_dirpath: str, destination_key: str, output_type: str):
+        self.output_type = output_type
+        self.output_path = os.path.join(dist_dirpath, f"{destination_key}.zip" if output_type == 'zip' else destination_key)
+        self.entries_signatures: Dict[str, EntrySignature] = dict()
+
+    def update(self, files_items: List[Union[LocalFileItem, ContentFileItem]]) -> ArtifactUpdateResult:
+        files_items_by_arcname: Dict[str, Union[LocalFileItem, ContentFileItem]] = {
+            file_item.relative_filepath: file_item for file_item in files_items
+        }
+        new_entries_signatures: Dict[str, EntrySignature] = {
+            arcname: make_entry_signature(file_item) for arcname, file_item in files_items_by_arcname.items()
+        }
+        changed_arcnames: Set[str] = {
+            arcname for arcname, signature in new_entries_signatures.items()
+            if self.entries_signatures.get(arcname, None) != signature
+        }
+        removed_arcnames: Set[str] = self.entries_signatures.keys() - new_entries_signatures.keys()
+        if self.output_type == 'zip':
+            result = self._update_zip(files_items_by_arcname=files_items_by_arcname, changed_arcnames=changed_arcnames)
+        else:
+            result = self._update_folder(
+                files_items_by_arcname=files_items_by_arcname, changed_arcnames=changed_arcnames, removed_arcnames=removed_arcnames
+            )
+        result.removed_entries_count = len(removed_arcnames)
+        self.entries_signatures = new_entries_signatures
+        return result
+
+    def _update_folder(
+            self, files_items_by_arcname: Dict[str, Union[LocalFileItem, ContentFileItem]],
+            changed_arcnames: Set[str], removed_arcnames: Set[str]
+    ) -> ArtifactUpdateResult:
+        if len(self.entries_signatures) == 0 and os.path.isdir(self.output_path):
+            # Nothing is known about the files of a folder left by a previous run, so it is fully rewritten.
+            shutil.rmtree(self.output_path)
+        for arcname in removed_arcnames:
+            target_filepath: str = os.path.join(self.output_path, arcname)
+            if os.path.isfile(target_filepath):
+                os.remove(target_filepath)
+        for arcname in changed_arcnames:
+            target_filepath: str = os.path.join(self.output_path, arcname)
+            os.makedirs(os.path.dirname(target_filepath), exist_ok=True)
+            file_item = files_items_by_arcname[arcname]
+            if isinstance(file_item, LocalFileItem):
+                shutil.copy(src=file_item.absolute_filepath, dst=target_filepath)
+            else:
+                with open(target_filepath, 'w+') as file:
+                    file.write(file_item.content)
+        return ArtifactUpdateResult(
+            written_entries_count=len(changed_arcnames),
+            reused_entries_count=len(files_items_by_arcname) - len(changed_arcnames)
+        )
+
+    def _update_zip(
+            self, files_items_by_arcname: Dict[str, Union[LocalFileItem, ContentFileItem]], changed_arcnames: Set[str]
+    ) -> ArtifactUpdateResult:
+        # A zip file cannot have its entries replaced in place. A new archive is written, where the compressed data
+        # of the unchanged entries is copied as is from the previous archive, and only the changed entries are compressed.
+        can_reuse_previous_zip: bool = len(self.entries_signatures) > 0 and os.path.isfile(self.output_path)
+        temporary_output_path: str = f"{self.output_path}.tmp"
+        result = ArtifactUpdateResult()
+        previous_zip_object: Optional[zipfile.ZipFile] = zipfile.ZipFile(self.output_path, 'r') if can_reuse_previous_zip else None
+        try:
+            with zipfile.ZipFile(temporary_output_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_object:
+                for arcname, file_item in files_items_by_arcname.items():
+                    previous_zip_info: Optional[zipfile.ZipInfo] = (
+                        previous_zip_object.NameToInfo.get(arcname, None) if previous_zip_object is not None else None
+                    )
+                    if arcname not in changed_arcnames and previous_zip_info is not None:
+                        copy_raw_zip_entry(source_zip_object=previous_zip_object, destination_zip_object=zip_object, zip_info=previous_zip_info)
+                        result.reused_entries_count += 1
+                    elif isinstance(file_item, LocalFileItem):
+                        zip_object.write(filename=file_item.absolute_filepath, arcname=arcname)
+                        result.written_entries_count += 1
+                    else:
+                        write_content_to_zip(zip_object=zip_object, arcname=arcname, content=file_item.content)
+                        result.written_entries_count += 1
+        finally:
+            if previous_zip_object is not None:
+                previous_zip_object.close()
+        os.replace(temporary_output_path, self.output_path)
+        return result
+
+def can_copy_raw_zip_entries(source_zip_object: zipfile.ZipFile, destination_zip_object: zipfile.ZipFile) -> bool:
+    """Whether the internals of the zipfile module used to copy the compressed data of the entries are available, since
+    they are not part of its public api and could change with the python versions."""
+    return (
+        hasattr(zipfile, 'sizeFileHeader') and hasattr(zipfile, 'ZIP64_LIMIT') and hasattr(zipfile.ZipInfo, 'FileHeader')
+        and getattr(source_zip_object, 'fp', None) is not None and getattr(destination_zip_object, 'fp', None) is not None
+        and hasattr(destination_zip_object, 'start_dir') and hasattr(destination_zip_object, '_didModify')
+    )
+
+def copy_raw_zip_entry(source_zip_object: zipfile.ZipFile, destination_zip_object: zipfile.ZipFile, zip_info: zipfile.ZipInfo):
+    """Copy the compressed data of an entry to another archive without decompressing and compressing it again. The
+    zipfile module has no public api for this, so the local header is written like ZipFile.write does internally, and
+    the entry is compressed again through the public api when the internals are not available."""
+    if not can_copy_raw_zip_entries(source_zip_object=source_zip_object, destination_zip_object=destination_zip_object):
+        recompressed_zip_info = zipfile.ZipInfo(filename=zip_info.filename, date_time=zip_info.date_time)
+        recompressed_zip_info.compress_type = zip_info.compress_type
+        recompressed_zip_info.external_attr = zip_info.external_attr
+        recompressed_zip_info.create_system = zip_info.create_system
+        destination_zip_object.writestr(recompressed_zip_info, source_zip_object.read(zip_info))
+        return
+
+    source_file = source_zip_object.fp
+    source_file.seek(zip_info.header_offset)
+    local_header: bytes = source_file.read(zipfile.sizeFileHeader)
+    filename_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    source_file.seek(zip_info.header_offset + zipfile.sizeFileHeader + filename_length + extra_length)
+    compressed_data: bytes = source_file.read(zip_info.compress_size)
+
+    copied_zip_info = zipfile.ZipInfo(filename=zip_info.filename, date_time=zip_info.date_time)
+    copied_zip_info.compress_type = zip_info.compress_type
+    copied_zip_info.external_attr = zip_info.external_attr
+    copied_zip_info.create_system = zip_info.create_system
+    copied_zip_info.CRC = zip_info.CRC
+    copied_zip_info.compress_size = zip_info.compress_size
+    copied_zip_info.file_size = zip_info.file_size
+    # The data descriptor flag is not kept, since the sizes and CRC are written in the local header.
+    copied_zip_info.flag_bits = zip_info.flag_bits & ~0x08
+
+    destination_file = destination_zip_object.fp
+    copied_zip_info.header_offset = destination_file.tell()
+    destination_file.write(copied_zip_info.FileHeader(zip64=zip_info.file_size > zipfile.ZIP64_LIMIT or zip_info.compress_size > zipfile.ZIP64_LIMIT))
+    destination_file.write(compressed_data)
+    destination_zip_object.filelist.append(copied_zip_info)
+    destination_zip_object.NameToInfo[copied_zip_info.filename] = copied_zip_info
+    destination_zip_object.start_dir = destination_file.tell()
+    destination_zip_object._didModify = True
+
+
+class WatchSession:
+    def __init__(self, config: Config, config_filepath: str, target_os: str, verbose: bool = False):
+        from .cli import get_output_base_dirpath, resolve_config_files
+        self.config = config
+        self.target_os = target_os
+        self.verbose = verbose
+        self.output_base_dirpath: str = str(get_output_base_dirpath(config=config, config_filepath=config_filepath))
+        self.dist_dirpath: str = os.path.join(os.path.dirname(os.path.abspath(config_filepath)), "dist")
+        os.makedirs(self.dist_dirpath, exist_ok=True)
+        self.lambda_layer_dirpath: str = os.path.join(self.dist_dirpath, 'lambda_layer')
+        self.archive_prefix: Optional[str] = (
+            make_base_python_layer_packages_dir(python_version=config.python_version)
+            if config.package_type == 'layer' else None
+        )
+
+        self.resolver: Resolver = resolve_config_files(config=config, target_os=target_os, verbose=verbose)
+        self.dependencies_local_files_items: List[LocalFileItem] = list()
+        self.installed_dependencies_names: Optional[Set[str]] = None
+        self.artifact_writer = IncrementalArtifactWriter(dist_dirpath=self.dist_dirpath, destination_key='build', output_type=config.output_type)
+
+        watched_dirpaths: List[str] = [os.path.dirname(os.path.abspath(config.root_filepath)), *config.folders_includes.keys()]
+        if config.project_root_dir is not None:
+            watched_dirpaths.append(config.project_root_dir)
+        self.snapshot = DirectorySnapshot(dirpaths=watched_dirpaths, excluded_dirpaths=[self.dist_dirpath])
+        # The changes already consumed from the snapshot that could not be applied, retried with the next changes.
+        self.pending_modified_filepaths: Set[str] = set()
+
+    def make_files_items(self) -> List[Union[LocalFileItem, ContentFileItem]]:
+        local_files_items, content_files_items = package_files(
+            included_files_absolute_paths=self.resolver.included_files_absolute_paths,
+            archive_prefix=self.archive_prefix, output_base_dirpath=self.output_base_dirpath
+        )
+        if self.config.priming is not None:
+            content_files_items.append(make_priming_content_file_item(
+                resolver=self.resolver, config=self.config.priming,
+                output_base_dirpath=self.output_base_dirpath, archive_prefix=self.archive_prefix
+            ))
+        if self.config.package_type == 'layer':
+            if self.installed_dependencies_names != self.resolver.included_dependencies_names:
+                # The dependencies are only installed again when the set of imported libraries changed.
+                self.dependencies_local_files_items = resolve_install_and_get_dependencies_files(
+                    resolver=self.resolver, lambda_layer_dirpath=self.lambda_layer_dirpath,
+                    base_layer_dirpath=self.archive_prefix, python_version=self.config.python_version,
+                    use_prototype_docker_install=self.config.use_prototype_docker_pip_install,
+                    docker_builder_config=self.config.docker_builder,
+                    should_remove_runtime_provided_packages=self.config.should_remove_runtime_provided_packages,
+                    lock_config=self.config.dependencies_lock, architecture=self.config.architecture
+                )
+                if self.config.layer_pruning is not None:
+                    self.dependencies_local_files_items = prune_layer_files(
+                        local_files_items=self.dependencies_local_files_items, layer_source_dirpath=self.lambda_layer_dirpath,
+                        python_version=self.config.python_version, config=self.config.layer_pruning
+                    )
+                self.installed_dependencies_names = set(self.resolver.included_dependencies_names)
+            local_files_items.extend(self.dependencies_local_files_items)
+        return [*local_files_items, *content_files_items]
+
+    def build(self) -> Tuple[ArtifactUpdateResult, float]:
+        start = time.perf_counter()
+        result = self.artifact_writer.update(files_items=self.make_files_items())
+        return result, (time.perf_counter() - start) * 1000
+
+    def apply_changes(self, changes: SnapshotChanges) -> Tuple[ArtifactUpdateResult, float, float]:
+        start = time.perf_counter()
+        modified_filepaths: Set[str] = {
+            filepath for filepath in changes.modified_filepaths | self.pending_modified_filepaths
+            if filepath.endswith('.py') and filepath not in changes.deleted_filepaths
+        }
+        try:
+            self.resolver.update_files(
+                modified_filepaths=modified_filepaths, deleted_filepaths=changes.deleted_filepaths,
+                created_filepaths=changes.created_filepaths
+            )
+            self.pending_modified_filepaths = set()
+        except FilesUpdateFailed as e:
+            # The other changes have been applied, so the artifact is still updated, and the failed files are
+            # processed again with the next changes, since the snapshot will not report them until they change again.
+            self.pending_modified_filepaths = set(e.errors.keys())
+            click.secho(f"Kept the previous imports of the files that could not be updated : {e}", fg='red')
+        if len(changes.created_filepaths) > 0:
+            # The created files are only included when imported by a resolved file, or when inside an included folder.
+            for folderpath, folder_config in self.config.folders_includes.items():
+                self.resolver.import_folder(
+                    folderpath=folderpath,
+                    included_folders_names=folder_config.included_folders_names,
+                    included_files_extensions=folder_config.included_files_extensions,
+                    excluded_folders_names=folder_config.excluded_folders_names,
+                    excluded_files_extensions=folder_config.excluded_files_extensions
+                )
+        resolution_ms: float = (time.perf_counter() - start) * 1000
+        result, archive_ms = self.build()
+        return result, resolution_ms, archive_ms
+
+    def run(self, interval_seconds: float = 0.5, max_rebuilds_count: Optional[int] = None):
+        result, archive_ms = self.build()
+        click.secho(
+            f"Built {self.artifact_writer.output_path} ({result.written_entries_count} entries) in {archive_ms:.0f} ms. "
+            f"Watching for changes...", fg='green'
+        )
+        rebuilds_count: int = 0
+        while max_rebuilds_count is None or rebuilds_count < max_rebuilds_count:
+            time.sleep(interval_seconds)
+            detection_start = time.perf_counter()
+            changes: SnapshotChanges = self.snapshot.poll()
+            if not changes.has_changes:
+                continue
+            polling_ms: float = (time.perf_counter() - detection_start) * 1000
+            try:
+                result, resolution_ms, archive_ms = self.apply_changes(changes=changes)
+            except Exception as e:
+                # An invalid intermediate state of the files should not stop the watch mode. The modified files are
+                # processed again with the next changes, since they have already been consumed from the snapshot.
+                self.pending_modified_filepaths.update(changes.modified_filepaths - changes.deleted_filepaths)
+                click.secho(f"Could not update the artifact : {e}", fg='red')
+                continue
+            rebuilds_count += 1
+            click.secho(
+                f"Updated {self.artifact_writer.output_path} in {polling_ms + resolution_ms + archive_ms:.0f} ms "
+                f"(polling {polling_ms:.0f} ms, resolution {resolution_ms:.0f} ms, archive {archive_ms:.0f} ms) : "
+                f"{len(changes.created_filepaths)} created, {len(changes.modified_filepaths)} modified, "
+                f"{len(changes.deleted_filepaths)} deleted files, {result.written_entries_count} entries written, "
+                f"{result.reused_entries_count} reused, {result.removed_entries_count} removed", fg='green'
+            )
+
+
+def watch_api(
+        target_os: str, config_filepath: str, verbose: bool = False, overriding_attributes: Optional[dict] = None,
+        interval_seconds: float = 0.5, max_rebuilds_count: Optional[int] = None
+):
+    from .cli import python_path_wrapper
+    config: Config = ConfigClient(verbose=verbose).load_render_config_file(
+        filepath=config_filepath, target_os=target_os, overriding_attributes=overriding_attributes
+    )
+    if config.output_type == 'oci':
+        raise Exception("The watch mode only supports the zip and folder output types")
+
+    def run_session():
+        session = WatchSession(config=config, config_filepath=config_filepath, target_os=target_os, verbose=verbose)
+        try:
+            session.run(interval_seconds=interval_seconds, max_rebuilds_count=max_rebuilds_count)
+        except KeyboardInterrupt:
+            click.echo("Stopped watching")
+
+    python_path_wrapper(config=config, f=run_session)
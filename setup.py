@@ -6,10 +6,11 @@ setup(
     version="0.6.0",
     packages=find_packages(),
     include_package_data=True,
+    package_data={"serverlesspack": ["data/*.json"]},
     install_requires=["click", "PyYAML", "pydantic", "boto3", "distlib", "importlib-metadata", "colorama", "asciitree", "tqdm"],
     entry_points={
         "console_scripts": [
-            "serverlesspack = serverlesspack:package_cli",
+            "serverlesspack = serverlesspack:serverlesspack_cli",
         ],
     },
     url="https://github.com/Robinson04/serverlesspack",
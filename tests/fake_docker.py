@@ -0,0 +1,107 @@
+"""Stand-in of the docker cli for the docker builder tests, which keeps its containers in the folder of the
+FAKE_DOCKER_STATE_DIRPATH environment variable. The filesystem of each container is a folder, the pip installations
+executed in them write a package listing the installed packages names, and every command is appended to calls.jsonl."""
+import json
+import os
+import shutil
+import sys
+
+
+STATE_DIRPATH = os.environ['FAKE_DOCKER_STATE_DIRPATH']
+CONTAINERS_FILEPATH = os.path.join(STATE_DIRPATH, 'containers.json')
+
+
+def load_containers() -> dict:
+    if not os.path.isfile(CONTAINERS_FILEPATH):
+        return {}
+    with open(CONTAINERS_FILEPATH) as containers_file:
+        return json.load(containers_file)
+
+def save_containers(containers: dict):
+    with open(CONTAINERS_FILEPATH, 'w') as containers_file:
+        json.dump(containers, containers_file)
+
+def get_container_path(container_name: str, path: str) -> str:
+    return os.path.join(STATE_DIRPATH, 'containers', container_name, path.lstrip('/'))
+
+def copy(source_path: str, destination_path: str):
+    if source_path.endswith('/.'):
+        shutil.copytree(source_path[:-2], destination_path, dirs_exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+        shutil.copyfile(source_path, destination_path)
+
+def execute(container_name: str, environment: dict, command: list) -> int:
+    if command[:2] == ['mkdir', '-p']:
+        os.makedirs(get_container_path(container_name, command[2]), exist_ok=True)
+    elif command[:2] == ['rm', '-rf']:
+        shutil.rmtree(get_container_path(container_name, command[2]), ignore_errors=True)
+    elif command[:2] == ['pip', 'install']:
+        target_dirpath: str = get_container_path(container_name, command[command.index('--target') + 1])
+        if '--requirement' in command:
+            with open(get_container_path(container_name, command[command.index('--requirement') + 1])) as requirements_file:
+                packages_names = [line.split('==')[0] for line in requirements_file.read().split()]
+        else:
+            packages_names = command[2:command.index('--upgrade')]
+        if 'missing-package' in packages_names:
+            print("ERROR: No matching distribution found for missing-package", file=sys.stderr)
+            return 1
+        for package_name in packages_names:
+            os.makedirs(os.path.join(target_dirpath, package_name), exist_ok=True)
+            with open(os.path.join(target_dirpath, package_name, '__init__.py'), 'w') as init_file:
+                init_file.write(f"PIP_CACHE_DIR = {environment.get('PIP_CACHE_DIR')!r}\n")
+    else:
+        print(f"Unsupported command {command}", file=sys.stderr)
+        return 1
+    return 0
+
+def main(arguments: list) -> int:
+    with open(os.path.join(STATE_DIRPATH, 'calls.jsonl'), 'a') as calls_file:
+        calls_file.write(json.dumps(arguments) + '\n')
+    containers: dict = load_containers()
+    command_name: str = arguments[0]
+    if command_name == 'inspect':
+        container = containers.get(arguments[-1], None)
+        if container is None:
+            print(f"Error: No such object: {arguments[-1]}", file=sys.stderr)
+            return 1
+        print(container['status'])
+    elif command_name == 'run':
+        container_name: str = arguments[arguments.index('--name') + 1]
+        containers[container_name] = {'status': 'running', 'arguments': arguments}
+        save_containers(containers)
+        print(container_name)
+    elif command_name == 'start':
+        containers[arguments[1]]['status'] = 'running'
+        save_containers(containers)
+    elif command_name == 'rm':
+        containers.pop(arguments[-1], None)
+        save_containers(containers)
+        shutil.rmtree(get_container_path(arguments[-1], ''), ignore_errors=True)
+    elif command_name == 'exec':
+        environment: dict = {}
+        i_argument: int = 1
+        while arguments[i_argument] == '--env':
+            key, value = arguments[i_argument + 1].split('=', 1)
+            environment[key] = value
+            i_argument += 2
+        if containers.get(arguments[i_argument], {}).get('status') != 'running':
+            print(f"Error: container {arguments[i_argument]} is not running", file=sys.stderr)
+            return 1
+        return execute(container_name=arguments[i_argument], environment=environment, command=arguments[i_argument + 1:])
+    elif command_name == 'cp':
+        source_path, destination_path = arguments[1], arguments[2]
+        if ':' in source_path:
+            container_name, container_path = source_path.split(':', 1)
+            copy(get_container_path(container_name, container_path.rstrip('.').rstrip('/')) + ('/.' if container_path.endswith('/.') else ''), destination_path)
+        else:
+            container_name, container_path = destination_path.split(':', 1)
+            copy(source_path, get_container_path(container_name, container_path))
+    else:
+        print(f"Unsupported docker command {command_name}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
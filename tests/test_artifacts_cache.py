@@ -0,0 +1,50 @@
+import os
+import tempfile
+import time
+import unittest
+
+from serverlesspack.artifacts_cache import ArtifactsCache
+
+
+class TestArtifactsCache(unittest.TestCase):
+    def write_artifact(self, dirpath: str, filename: str, content: bytes) -> str:
+        filepath = os.path.join(dirpath, filename)
+        with open(filepath, 'wb') as file:
+            file.write(content)
+        return filepath
+
+    def test_publish_and_restore(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            cache = ArtifactsCache(dirpath=os.path.join(dirpath, "cache"))
+            build_dirpath = os.path.join(dirpath, "build")
+            os.makedirs(os.path.join(build_dirpath, "lambda_layer", "python"))
+            code_path = self.write_artifact(build_dirpath, "build.zip", b"code")
+            self.write_artifact(os.path.join(build_dirpath, "lambda_layer", "python"), "module.py", b"layer")
+
+            self.assertIsNone(cache.restore(key="a" * 64, destination_dirpath=build_dirpath))
+            self.assertTrue(cache.publish(key="a" * 64, artifacts_paths=[code_path, os.path.join(build_dirpath, "lambda_layer")], metadata={'code_path': "build.zip"}))
+            # A second worker publishing the same key keeps the first entry.
+            self.assertFalse(cache.publish(key="a" * 64, artifacts_paths=[code_path], metadata={}))
+
+            restored_dirpath = os.path.join(dirpath, "restored")
+            self.assertEqual({'code_path': "build.zip"}, cache.restore(key="a" * 64, destination_dirpath=restored_dirpath))
+            with open(os.path.join(restored_dirpath, "build.zip"), 'rb') as file:
+                self.assertEqual(b"code", file.read())
+            self.assertTrue(os.path.isfile(os.path.join(restored_dirpath, "lambda_layer", "python", "module.py")))
+            self.assertEqual([], os.listdir(cache.staging_dirpath))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            cache = ArtifactsCache(dirpath=os.path.join(dirpath, "cache"), max_entries_count=2)
+            artifact_path = self.write_artifact(dirpath, "build.zip", b"code")
+            for key in ["a" * 64, "b" * 64]:
+                cache.publish(key=key, artifacts_paths=[artifact_path], metadata={})
+                time.sleep(0.02)
+            # Restoring the first entry makes the second one the least recently used.
+            cache.restore(key="a" * 64, destination_dirpath=os.path.join(dirpath, "restored"))
+            cache.publish(key="c" * 64, artifacts_paths=[artifact_path], metadata={})
+            self.assertEqual({"a" * 64, "c" * 64}, {entry['key'] for entry in cache.list_entries()})
+
+
+if __name__ == '__main__':
+    unittest.main()
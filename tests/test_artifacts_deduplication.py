@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.artifacts_deduplication import deduplicate_artifacts_files, get_site_packages_relative_filepath
+from serverlesspack.packager import package_files, recursive_get_files_in_layer_folder
+
+
+class TestArtifactsDeduplication(unittest.TestCase):
+    def write_files(self, base_dirpath: str, files: dict):
+        for relative_filepath, content in files.items():
+            absolute_filepath = os.path.join(base_dirpath, relative_filepath)
+            os.makedirs(os.path.dirname(absolute_filepath), exist_ok=True)
+            with open(absolute_filepath, 'w') as file:
+                file.write(content)
+
+    def test_get_site_packages_relative_filepath(self):
+        self.assertEqual('yaml/__init__.py', get_site_packages_relative_filepath('.venv/lib/python3.9/site-packages/yaml/__init__.py'))
+        self.assertEqual('six.py', get_site_packages_relative_filepath('venv/Lib/dist-packages/six.py'))
+        self.assertIsNone(get_site_packages_relative_filepath('app/handler.py'))
+
+    def test_deduplicate_artifacts_files(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            project_dirpath = os.path.join(dirpath, 'project')
+            layer_dirpath = os.path.join(dirpath, 'lambda_layer')
+            self.write_files(project_dirpath, {
+                'handler.py': "import six\n",
+                'six.py': "x" * 100,
+                'yaml/__init__.py': "vendored and modified",
+                '.venv/lib/python3.9/site-packages/click/core.py': "y" * 50,
+                '.venv/lib/python3.9/site-packages/click/utils.py': "modified",
+            })
+            self.write_files(layer_dirpath, {
+                'six.py': "x" * 100,
+                'yaml/__init__.py': "original",
+                'click/core.py': "y" * 50,
+                'click/utils.py': "original",
+            })
+            code_local_files_items, _ = package_files(
+                included_files_absolute_paths={
+                    os.path.join(project_dirpath, relative_filepath) for relative_filepath in [
+                        'handler.py', 'six.py', 'yaml/__init__.py',
+                        '.venv/lib/python3.9/site-packages/click/core.py', '.venv/lib/python3.9/site-packages/click/utils.py'
+                    ]
+                },
+                output_base_dirpath=project_dirpath
+            )
+            layer_local_files_items = recursive_get_files_in_layer_folder(
+                source_dirpath=layer_dirpath, base_layer_dirpath='python/lib/python3.9/site-packages'
+            )
+
+            result = deduplicate_artifacts_files(
+                code_local_files_items=code_local_files_items, layer_local_files_items=layer_local_files_items
+            )
+            self.assertEqual({
+                'handler.py', 'six.py', 'yaml/__init__.py', '.venv/lib/python3.9/site-packages/click/utils.py'
+            }, {item.relative_filepath.replace(os.sep, '/') for item in result.code_local_files_items})
+            self.assertEqual({
+                'python/lib/python3.9/site-packages/yaml/__init__.py', 'python/lib/python3.9/site-packages/click/core.py',
+                'python/lib/python3.9/site-packages/click/utils.py'
+            }, {item.relative_filepath.replace(os.sep, '/') for item in result.layer_local_files_items})
+            self.assertEqual(150, result.saved_bytes)
+            self.assertEqual(['yaml/__init__.py'], result.shadowing_relative_filepaths)
+
+            # When the code files cannot be removed, only the layer copies shadowed by the code package are removed.
+            result = deduplicate_artifacts_files(
+                code_local_files_items=code_local_files_items, layer_local_files_items=layer_local_files_items,
+                can_remove_code_files=False
+            )
+            self.assertEqual(len(code_local_files_items), len(result.code_local_files_items))
+            self.assertEqual(100, result.saved_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.build_matrix import MatrixTarget, make_matrix_targets, get_target_included_files
+from serverlesspack.imports_resolver import Resolver
+
+
+class TestBuildMatrix(unittest.TestCase):
+    def test_make_matrix_targets(self):
+        targets = make_matrix_targets(targets_os=['linux', 'windows', 'linux'], python_versions=['3.9', '3.10'])
+        self.assertEqual(
+            ["linux-x86_64-python3.9", "linux-x86_64-python3.10", "windows-x86_64-python3.9", "windows-x86_64-python3.10"],
+            [target.key for target in targets]
+        )
+        self.assertIn(MatrixTarget(target_os='windows', python_version='3.10'), targets)
+        self.assertEqual(
+            ["linux-x86_64-python3.12", "linux-arm64-python3.12"],
+            [target.key for target in make_matrix_targets(targets_os=['linux'], python_versions=['3.12'], architectures=['x86_64', 'arm64'])]
+        )
+
+    def test_resolver_for_target_os(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            resolver = Resolver.from_code(code="VALUE = 1\n", target_os='linux', dirpath=dirpath)
+            compiled_filepaths = {}
+            for extension in ['so', 'pyd']:
+                compiled_filepaths[extension] = os.path.join(dirpath, f"native.{extension}")
+                with open(compiled_filepaths[extension], 'wb') as file:
+                    file.write(b"")
+            linux_only_filepath = os.path.join(dirpath, "linux_only.so")
+            with open(linux_only_filepath, 'wb') as file:
+                file.write(b"")
+            resolver.included_files_absolute_paths.update({compiled_filepaths['so'], linux_only_filepath})
+
+            windows_resolver = resolver.for_target_os(target_os='windows')
+            self.assertEqual('windows', windows_resolver.target_os)
+            # The compiled files without a windows counterpart are kept, with a warning.
+            self.assertEqual(
+                {resolver.root_filepath, compiled_filepaths['pyd'], linux_only_filepath},
+                windows_resolver.included_files_absolute_paths
+            )
+            # The resolution of the original target os is left untouched.
+            self.assertIn(compiled_filepaths['so'], resolver.included_files_absolute_paths)
+            self.assertEqual(
+                resolver.included_files_absolute_paths,
+                windows_resolver.for_target_os(target_os='linux').included_files_absolute_paths
+            )
+
+
+    def test_get_target_included_files(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            filepaths = {
+                filename: os.path.join(dirpath, filename) for filename in [
+                    "app.py", "native.cpython-39-x86_64-linux-gnu.so", "native.cpython-310-aarch64-linux-gnu.so",
+                    "stable.abi3.so", "other.cpython-39-x86_64-linux-gnu.so"
+                ]
+            }
+            for filepath in filepaths.values():
+                with open(filepath, 'wb') as file:
+                    file.write(b"")
+            included_files_absolute_paths = {
+                filepaths[filename] for filename in
+                ["app.py", "native.cpython-39-x86_64-linux-gnu.so", "stable.abi3.so", "other.cpython-39-x86_64-linux-gnu.so"]
+            }
+            target_included_files = get_target_included_files(
+                included_files_absolute_paths=included_files_absolute_paths,
+                target=MatrixTarget(target_os='linux', python_version='3.10', architecture='arm64')
+            )
+            # The extension without a build for the target is kept, with a warning.
+            self.assertEqual({
+                filepaths["app.py"], filepaths["native.cpython-310-aarch64-linux-gnu.so"],
+                filepaths["stable.abi3.so"], filepaths["other.cpython-39-x86_64-linux-gnu.so"]
+            }, target_included_files)
+            self.assertEqual(included_files_absolute_paths, get_target_included_files(
+                included_files_absolute_paths=included_files_absolute_paths,
+                target=MatrixTarget(target_os='linux', python_version='3.9', architecture='x86_64')
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+from serverlesspack.configuration_client import DockerBuilderConfig
+from serverlesspack.docker_builder import DockerBuilder, CONTAINER_PIP_CACHE_DIRPATH
+from serverlesspack.exceptions import DockerBuilderError
+
+
+FAKE_DOCKER_SCRIPT_FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_docker.py')
+
+
+@unittest.skipIf(sys.platform == 'win32', "The fake docker cli is started with a shell script")
+class TestDockerBuilder(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.state_dirpath = os.path.join(self.temporary_directory.name, 'fake_docker_state')
+        os.makedirs(self.state_dirpath)
+        self.docker_executable = os.path.join(self.temporary_directory.name, 'docker')
+        with open(self.docker_executable, 'w') as executable_file:
+            executable_file.write(f"#!/bin/sh\nexec {sys.executable} {FAKE_DOCKER_SCRIPT_FILEPATH} \"$@\"\n")
+        os.chmod(self.docker_executable, os.stat(self.docker_executable).st_mode | stat.S_IEXEC)
+        self.previous_state_dirpath = os.environ.get('FAKE_DOCKER_STATE_DIRPATH', None)
+        os.environ['FAKE_DOCKER_STATE_DIRPATH'] = self.state_dirpath
+
+    def tearDown(self):
+        if self.previous_state_dirpath is None:
+            os.environ.pop('FAKE_DOCKER_STATE_DIRPATH')
+        else:
+            os.environ['FAKE_DOCKER_STATE_DIRPATH'] = self.previous_state_dirpath
+        self.temporary_directory.cleanup()
+
+    def read_calls(self) -> list:
+        with open(os.path.join(self.state_dirpath, 'calls.jsonl')) as calls_file:
+            return [json.loads(line) for line in calls_file]
+
+    def make_builder(self, **config_attributes) -> DockerBuilder:
+        return DockerBuilder(
+            python_version='3.9', platform='manylinux2014_aarch64',
+            config=DockerBuilderConfig(docker_executable=self.docker_executable, **config_attributes)
+        )
+
+    def test_container_is_reused_between_builds(self):
+        target_dirpath = os.path.join(self.temporary_directory.name, 'lambda_layer')
+        builder = self.make_builder()
+        self.assertEqual('serverlesspack-builder-python3.9-arm64', builder.container_name)
+        self.assertEqual(0, builder.install(packages_names={'requests'}, target_dirpath=target_dirpath).returncode)
+        with open(os.path.join(target_dirpath, 'requests', '__init__.py')) as init_file:
+            self.assertEqual(f"PIP_CACHE_DIR = {CONTAINER_PIP_CACHE_DIRPATH!r}\n", init_file.read())
+
+        # Another process finds the running container, and merges its installation in the existing target folder.
+        requirements_filepath = os.path.join(self.temporary_directory.name, 'requirements.txt')
+        with open(requirements_filepath, 'w') as requirements_file:
+            requirements_file.write("click==8.1.7\n")
+        self.make_builder().install(packages_names={'click'}, target_dirpath=target_dirpath, requirements_filepath=requirements_filepath)
+        self.assertEqual({'requests', 'click'}, set(os.listdir(target_dirpath)))
+
+        calls = self.read_calls()
+        run_calls = [call for call in calls if call[0] == 'run']
+        self.assertEqual(1, len(run_calls))
+        self.assertIn('linux/arm64', run_calls[0])
+        self.assertIn(f"type=volume,source=serverlesspack-pip-cache,target={CONTAINER_PIP_CACHE_DIRPATH}", run_calls[0])
+        self.assertIn('public.ecr.aws/sam/build-python3.9', run_calls[0])
+        self.assertEqual(2, len([call for call in calls if call[0] == 'exec' and 'pip' in call]))
+        # The builds folders are removed from the container after each installation.
+        self.assertEqual([], os.listdir(os.path.join(self.state_dirpath, 'containers', builder.container_name, 'tmp', 'serverlesspack-builds')))
+
+    def test_existing_container(self):
+        builder = self.make_builder(container_name='my-builder')
+        builder.install(packages_names={'requests'}, target_dirpath=os.path.join(self.temporary_directory.name, 'first'))
+        builder.remove()
+        self.assertNotIn('my-builder', json.load(open(os.path.join(self.state_dirpath, 'containers.json'))))
+
+        # An existing stopped container is started, and is never removed, since it was not created by the builder.
+        with open(os.path.join(self.state_dirpath, 'containers.json'), 'w') as containers_file:
+            json.dump({'my-builder': {'status': 'exited'}}, containers_file)
+        builder = self.make_builder(container_name='my-builder', keep_running=False)
+        builder.install(packages_names={'requests'}, target_dirpath=os.path.join(self.temporary_directory.name, 'second'))
+        builder.remove()
+        self.assertIn(['start', 'my-builder'], self.read_calls())
+        self.assertIn('my-builder', json.load(open(os.path.join(self.state_dirpath, 'containers.json'))))
+
+    def test_failed_installation(self):
+        target_dirpath = os.path.join(self.temporary_directory.name, 'lambda_layer')
+        builder = self.make_builder()
+        with self.assertRaises(DockerBuilderError):
+            builder.install(packages_names={'missing-package'}, target_dirpath=target_dirpath)
+        self.assertFalse(os.path.exists(target_dirpath))
+        # The build folder of the failed installation is removed from the container.
+        self.assertEqual([], os.listdir(os.path.join(self.state_dirpath, 'containers', builder.container_name, 'tmp', 'serverlesspack-builds')))
+
+        with self.assertRaises(DockerBuilderError):
+            DockerBuilder(
+                python_version='3.9', platform=None,
+                config=DockerBuilderConfig(docker_executable=os.path.join(self.temporary_directory.name, 'missing-docker'))
+            ).install(packages_names={'requests'}, target_dirpath=target_dirpath)
+
+
+if __name__ == '__main__':
+    unittest.main()
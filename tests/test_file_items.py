@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from serverlesspack.packager import LocalFileItem, ContentFileItem, iter_files_in_layer_folder, files_to_zip
+
+
+class TestFileItems(unittest.TestCase):
+    def test_paths_are_rebuilt_exactly(self):
+        local_file_item = LocalFileItem(
+            archive_prefix="python/lib/python3.9/site-packages", relative_filepath=os.path.join("click", "core.py"),
+            absolute_filepath=os.path.join(os.sep, "venv", "site-packages", "click", "core.py")
+        )
+        self.assertEqual(f"python/lib/python3.9/site-packages/{os.path.join('click', 'core.py')}", local_file_item.relative_filepath)
+        self.assertEqual(os.path.join(os.sep, "venv", "site-packages", "click", "core.py"), local_file_item.absolute_filepath)
+        self.assertEqual("app.py", ContentFileItem(archive_prefix=None, relative_filepath="app.py", content="").relative_filepath)
+        self.assertFalse(hasattr(local_file_item, '__dict__'))
+
+    def test_files_of_a_folder_share_their_dirpath(self):
+        first_item = LocalFileItem(archive_prefix=None, relative_filepath="click/core.py", absolute_filepath="/venv/click/core.py")
+        second_item = LocalFileItem(archive_prefix=None, relative_filepath="click/types.py", absolute_filepath="/venv/click/types.py")
+        self.assertIs(first_item._absolute_dirpath, second_item._absolute_dirpath)
+        self.assertIs(first_item._relative_dirpath, second_item._relative_dirpath)
+
+    def test_zip_from_generator(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            layer_dirpath = os.path.join(dirpath, "layer")
+            os.makedirs(os.path.join(layer_dirpath, "package"))
+            for relative_filepath in ["root.py", os.path.join("package", "__init__.py"), os.path.join("package", "module.py")]:
+                with open(os.path.join(layer_dirpath, relative_filepath), 'w') as file:
+                    file.write("VALUE = 1\n")
+
+            zip_filepath = files_to_zip(dirpath, 'lambda_layer', iter_files_in_layer_folder(
+                source_dirpath=layer_dirpath, base_layer_dirpath="python"
+            ), [])
+            with zipfile.ZipFile(zip_filepath) as zip_object:
+                self.assertEqual(
+                    ["python/package/__init__.py", "python/package/module.py", "python/root.py"],
+                    sorted(zip_object.namelist())
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
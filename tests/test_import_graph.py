@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+
+from serverlesspack.import_graph import ImportGraph, BaseTracesWriter, make_traces_writer, load_import_graph, \
+    EDGE_TYPE_LOCAL, EDGE_TYPE_LIBRARY, EDGE_TYPE_INIT
+
+
+class TestImportGraph(unittest.TestCase):
+    EDGES = [
+        {'source': '/project/app.py', 'target': '/project/services/api.py', 'type': EDGE_TYPE_LOCAL},
+        {'source': '/project/services/api.py', 'target': '/project/services/__init__.py', 'type': EDGE_TYPE_INIT},
+        {'source': '/project/services/api.py', 'target': '/venv/site-packages/click/__init__.py', 'type': EDGE_TYPE_LIBRARY, 'dependency_name': 'click'},
+        {'source': '/project/app.py', 'target': '/venv/site-packages/click/__init__.py', 'type': EDGE_TYPE_LIBRARY, 'dependency_name': 'click'},
+    ]
+
+    def make_graph(self, writer=None) -> ImportGraph:
+        graph = ImportGraph(writer=writer)
+        for edge in self.EDGES:
+            graph.add_edge(source=edge['source'], target=edge['target'], edge_type=edge['type'], dependency_name=edge.get('dependency_name', None))
+        return graph
+
+    def test_nodes_are_interned(self):
+        graph = self.make_graph()
+        self.assertEqual(4, len(graph.nodes))
+        self.assertEqual(['click'], graph.dependencies_names)
+        self.assertEqual(self.EDGES, list(graph))
+
+    def test_streamed_traces_round_trip(self):
+        for traces_format in ['ndjson', 'binary']:
+            with self.subTest(traces_format=traces_format), tempfile.TemporaryDirectory() as dirpath:
+                filepath = os.path.join(dirpath, "traces", f"traces.{traces_format}")
+                with make_traces_writer(filepath=filepath, traces_format=traces_format) as writer:
+                    self.make_graph(writer=writer)
+                self.assertEqual(self.EDGES, list(load_import_graph(filepath=filepath)))
+
+    def test_written_graph_round_trip(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            filepath = os.path.join(dirpath, "traces.bin")
+            with make_traces_writer(filepath=filepath, traces_format='binary') as writer:
+                self.make_graph().write(writer=writer)
+            self.assertEqual(self.EDGES, list(load_import_graph(filepath=filepath)))
+
+    def test_ndjson_dependencies_names_are_inline(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            filepath = os.path.join(dirpath, "traces.ndjson")
+            with make_traces_writer(filepath=filepath, traces_format='ndjson') as writer:
+                self.make_graph(writer=writer)
+            with open(filepath) as traces_file:
+                records = [json.loads(line) for line in traces_file]
+            self.assertEqual(['click', 'click'], [record['dependency_name'] for record in records if 'dependency_name' in record])
+            self.assertEqual(len(self.EDGES) + 4, len(records))
+
+    def test_incomplete_writer_cannot_be_instantiated(self):
+        class NodesOnlyTracesWriter(BaseTracesWriter):
+            def write_node(self, node_id: int, path: str):
+                pass
+
+        with tempfile.TemporaryDirectory() as dirpath, self.assertRaises(TypeError):
+            NodesOnlyTracesWriter(filepath=os.path.join(dirpath, "traces"))
+
+
+if __name__ == '__main__':
+    unittest.main()
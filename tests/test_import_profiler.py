@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.import_profiler import parse_import_time_output, aggregate_runs_trees, find_regressions, \
+    copy_runtime_provided_distributions
+
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:        50 |         50 |   used_module.helpers
+import time:       100 |        150 | used_module
+import time:       300 |        300 |     numpy.core
+import time:       200 |        500 |   numpy
+import time:      1000 |       1500 | app
+"""
+
+
+class TestImportProfiler(unittest.TestCase):
+    def test_parse_import_time_output(self):
+        roots = parse_import_time_output(output=IMPORT_TIME_OUTPUT)
+        self.assertEqual(['used_module', 'app'], [node.module_name for node in roots])
+        self.assertEqual(['used_module.helpers'], [node.module_name for node in roots[0].children])
+        self.assertEqual(['numpy'], [node.module_name for node in roots[1].children])
+        self.assertEqual(['numpy.core'], [node.module_name for node in roots[1].children[0].children])
+
+    def test_aggregate_and_find_regressions(self):
+        modules_costs = aggregate_runs_trees(runs_trees=[parse_import_time_output(output=IMPORT_TIME_OUTPUT)])
+        self.assertEqual({'parent': 'app', 'self_us': 200, 'cumulative_us': 500}, modules_costs['numpy'])
+        regressions = find_regressions(
+            modules_costs=modules_costs, baseline_modules_costs={'app': {'cumulative_us': 1400}, 'numpy': {'cumulative_us': 100}},
+            regression_threshold=0.2, min_regression_us=100
+        )
+        self.assertIn('numpy', [regression['module_name'] for regression in regressions])
+        self.assertNotIn('app', [regression['module_name'] for regression in regressions])
+
+    def test_copy_runtime_provided_distributions(self):
+        with tempfile.TemporaryDirectory() as site_packages_dirpath, tempfile.TemporaryDirectory() as runtime_dirpath:
+            for name, module_relative_filepath in [('boto3', 'boto3/__init__.py'), ('requests', 'requests/__init__.py')]:
+                os.makedirs(os.path.join(site_packages_dirpath, os.path.dirname(module_relative_filepath)))
+                with open(os.path.join(site_packages_dirpath, module_relative_filepath), 'w') as module_file:
+                    module_file.write('')
+                dist_info_dirpath = os.path.join(site_packages_dirpath, f"{name}-1.0.dist-info")
+                os.makedirs(dist_info_dirpath)
+                with open(os.path.join(dist_info_dirpath, 'METADATA'), 'w') as metadata_file:
+                    metadata_file.write(f"Name: {name}\nVersion: 1.0\n")
+                with open(os.path.join(dist_info_dirpath, 'RECORD'), 'w') as record_file:
+                    record_file.write(f"{module_relative_filepath},,\n../../../bin/{name},,\n")
+
+            copied_names = copy_runtime_provided_distributions(
+                site_packages_dirpaths=[site_packages_dirpath], destination_dirpath=runtime_dirpath, python_version='3.9'
+            )
+            self.assertEqual(['boto3'], copied_names)
+            self.assertTrue(os.path.isfile(os.path.join(runtime_dirpath, 'boto3', '__init__.py')))
+            self.assertFalse(os.path.exists(os.path.join(runtime_dirpath, 'requests')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from serverlesspack.configuration_client import ConfigClient
+from serverlesspack.in_memory_packaging import package_in_memory_api
+from serverlesspack.packager import LocalFileItem, ContentFileItem, files_to_zip_bytes
+
+
+class TestInMemoryPackaging(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as file:
+            file.write(content)
+
+    def test_package_in_memory_api(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            self.write_file(os.path.join(dirpath, "in_memory_app.py"), "import in_memory_helper\n")
+            self.write_file(os.path.join(dirpath, "in_memory_helper.py"), "VALUE = 1\n")
+            config_filepath = os.path.join(dirpath, "serverlesspack.config.yaml")
+            self.write_file(config_filepath, "root_file: in_memory_app.py\npackage_type: code\n")
+
+            with self.assertRaises(Exception):
+                # The missing attributes are not prompted when not running interactively.
+                ConfigClient().load_render_config_file(filepath=config_filepath, target_os='linux', interactive=False)
+            config = ConfigClient().load_render_config_file(
+                filepath=config_filepath, target_os='linux', interactive=False,
+                overriding_attributes={'output_type': 'zip', 'python_version': '3.9'}
+            )
+
+            sys.path.insert(0, dirpath)
+            try:
+                output = package_in_memory_api(config=config, target_os='linux')
+            finally:
+                sys.path.remove(dirpath)
+            self.assertIsNone(output.layer)
+            self.assertEqual(hashlib.sha256(output.code.content).hexdigest(), output.code.sha256)
+            self.assertEqual(len(output.code.content), output.code.size)
+            with zipfile.ZipFile(output.code.open()) as zip_object:
+                self.assertEqual(["in_memory_app.py", "in_memory_helper.py"], sorted(zip_object.namelist()))
+            # Nothing is written next to the config file.
+            self.assertFalse(os.path.exists(os.path.join(dirpath, "dist")))
+
+    def test_files_to_zip_bytes_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            self.write_file(os.path.join(dirpath, "b.py"), "B = 1\n")
+            self.write_file(os.path.join(dirpath, "a.py"), "A = 1\n")
+            local_files_items = [
+                LocalFileItem(archive_prefix=None, relative_filepath="b.py", absolute_filepath=os.path.join(dirpath, "b.py")),
+                LocalFileItem(archive_prefix=None, relative_filepath="a.py", absolute_filepath=os.path.join(dirpath, "a.py")),
+            ]
+            content_file_item = ContentFileItem(archive_prefix=None, relative_filepath="_priming.py", content="PRIMED = True\n")
+            first_bytes = files_to_zip_bytes(local_files_items, [content_file_item])
+            # The content entries must not embed the packaging time, and the entries must not depend on the input order.
+            second_bytes = files_to_zip_bytes(list(reversed(local_files_items)), [content_file_item])
+            self.assertEqual(first_bytes, second_bytes)
+            with zipfile.ZipFile(io.BytesIO(first_bytes)) as zip_object:
+                self.assertEqual(['_priming.py', 'a.py', 'b.py'], zip_object.namelist())
+                self.assertEqual((1980, 1, 1, 0, 0, 0), zip_object.getinfo('_priming.py').date_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
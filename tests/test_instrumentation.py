@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+
+from serverlesspack.instrumentation import InstrumentationRecorder
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled_recorder_records_nothing(self):
+        recorder = InstrumentationRecorder()
+        with recorder.span('resolution'):
+            recorder.add_counter('files_parsed')
+        self.assertEqual([], recorder.events)
+        self.assertEqual({}, recorder.counters)
+
+    def test_nested_spans_self_time_and_counters(self):
+        recorder = InstrumentationRecorder()
+        recorder.enable()
+        with recorder.span('resolution'):
+            for i in range(3):
+                with recorder.span('resolve_file', filepath=f"file_{i}.py"):
+                    recorder.add_counter('files_parsed')
+                    recorder.add_counter('bytes_parsed', 10)
+        recorder.disable()
+
+        summary_items = {summary_item.name: summary_item for summary_item in recorder.make_summary()}
+        self.assertEqual(3, summary_items['resolve_file'].calls_count)
+        self.assertEqual({'files_parsed': 3, 'bytes_parsed': 30}, summary_items['resolve_file'].counters)
+        resolution = summary_items['resolution']
+        self.assertEqual(resolution.total_ns - summary_items['resolve_file'].total_ns, resolution.self_ns)
+        self.assertEqual(3, recorder.counters['files_parsed'])
+
+    def test_chrome_trace_export(self):
+        recorder = InstrumentationRecorder()
+        recorder.enable()
+        with recorder.span('archiving', category='packaging'):
+            recorder.add_counter('bytes_compressed', 42)
+        recorder.disable()
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            filepath = recorder.export_chrome_trace(filepath=os.path.join(dirpath, "timings.json"))
+            with open(filepath, 'r') as file:
+                trace = json.load(file)
+        complete_events = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual(1, len(complete_events))
+        self.assertEqual('archiving', complete_events[0]['name'])
+        self.assertEqual('packaging', complete_events[0]['cat'])
+        self.assertEqual(42, complete_events[0]['args']['bytes_compressed'])
+        self.assertGreaterEqual(complete_events[0]['dur'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
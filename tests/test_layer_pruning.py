@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.configuration_client import LayerPruningConfig, PackagePruningOverride
+from serverlesspack.layer_pruning import LayerPruner, prune_layer_files
+from serverlesspack.packager import recursive_get_files_in_layer_folder
+
+
+class TestLayerPruning(unittest.TestCase):
+    def test_should_prune_file(self):
+        pruner = LayerPruner(config=LayerPruningConfig(), python_version='3.9')
+        self.assertTrue(pruner.should_prune_file('numpy/core/tests/data/umath-validation-set-exp.csv'))
+        # The python modules of the tests, docs, examples and include folders can be imported, and are never pruned.
+        self.assertFalse(pruner.should_prune_file('numpy/core/tests/test_api.py'))
+        self.assertTrue(pruner.should_prune_file('numpy/__pycache__/version.cpython-39.pyc'))
+        self.assertTrue(pruner.should_prune_file('numpy/__init__.pyi'))
+        self.assertTrue(pruner.should_prune_file('numpy/core/include/numpy/arrayobject.h'))
+        self.assertTrue(pruner.should_prune_file('numpy/core/_multiarray_umath.cpython-38-x86_64-linux-gnu.so'))
+        self.assertFalse(pruner.should_prune_file('numpy/core/_multiarray_umath.cpython-39-x86_64-linux-gnu.so'))
+        self.assertFalse(pruner.should_prune_file('numpy/core/__init__.py'))
+        self.assertFalse(pruner.should_prune_file('numpy-1.21.0.dist-info/METADATA'))
+
+    def test_packages_overrides(self):
+        pruner = LayerPruner(config=LayerPruningConfig(packages_overrides={
+            'scipy': PackagePruningOverride(kept_patterns=['scipy/_lib/tests/*'], excluded_patterns=['scipy/misc/*.dat']),
+            'pandas': PackagePruningOverride(disabled_rule_sets=['tests'])
+        }), python_version='3.9')
+        self.assertFalse(pruner.should_prune_file('scipy/_lib/tests/__init__.py'))
+        self.assertTrue(pruner.should_prune_file('scipy/misc/face.dat'))
+        self.assertFalse(pruner.should_prune_file('pandas/tests/__init__.py'))
+        self.assertTrue(pruner.should_prune_file('pandas/__pycache__/__init__.cpython-39.pyc'))
+
+    def test_prune_reports_removed_bytes_per_package(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            for relative_filepath, content in {
+                'requests/__init__.py': "",
+                'requests/tests/fixture.json': "x" * 10,
+                'six.pyi': "x" * 5,
+            }.items():
+                absolute_filepath = os.path.join(layer_dirpath, relative_filepath)
+                os.makedirs(os.path.dirname(absolute_filepath), exist_ok=True)
+                with open(absolute_filepath, 'w+') as file:
+                    file.write(content)
+
+            local_files_items = recursive_get_files_in_layer_folder(
+                source_dirpath=layer_dirpath, base_layer_dirpath='python/lib/python3.9/site-packages'
+            )
+            pruner = LayerPruner(config=LayerPruningConfig(), python_version='3.9')
+            kept_local_files_items, removed_bytes_by_package = pruner.prune(
+                local_files_items=local_files_items, layer_source_dirpath=layer_dirpath
+            )
+            self.assertEqual(
+                ['python/lib/python3.9/site-packages/requests/__init__.py'],
+                [local_file_item.relative_filepath for local_file_item in kept_local_files_items]
+            )
+            self.assertEqual({'requests': 10, 'six': 5}, removed_bytes_by_package)
+
+    def test_python_code_folders_are_not_pruned(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            for relative_filepath in [
+                'botocore/__init__.py', 'botocore/client.py', 'botocore/docs/__init__.py', 'botocore/docs/docstring.py',
+                'botocore/docs/shapes.json', 'pkg/__init__.py', 'pkg/test/helpers.py', 'pkg/docs/index.rst', 'pkg/docs/guide/usage.txt'
+            ]:
+                absolute_filepath = os.path.join(layer_dirpath, relative_filepath)
+                os.makedirs(os.path.dirname(absolute_filepath), exist_ok=True)
+                with open(absolute_filepath, 'w+') as file:
+                    file.write("x")
+
+            local_files_items = recursive_get_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath='')
+            kept_local_files_items = prune_layer_files(
+                local_files_items=local_files_items, layer_source_dirpath=layer_dirpath,
+                python_version='3.9', config=LayerPruningConfig()
+            )
+            kept_relative_filepaths = {
+                os.path.relpath(local_file_item.absolute_filepath, layer_dirpath).replace(os.sep, '/') for local_file_item in kept_local_files_items
+            }
+            # botocore.client imports botocore.docs.docstring, so the whole docs package must be kept, including its data files.
+            self.assertEqual({
+                'botocore/__init__.py', 'botocore/client.py', 'botocore/docs/__init__.py', 'botocore/docs/docstring.py',
+                'botocore/docs/shapes.json', 'pkg/__init__.py', 'pkg/test/helpers.py'
+            }, kept_relative_filepaths)
+
+
+if __name__ == '__main__':
+    unittest.main()
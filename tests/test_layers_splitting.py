@@ -0,0 +1,38 @@
+import unittest
+
+from serverlesspack.configuration_client import LayersSplittingConfig
+from serverlesspack.layers_splitting import DistributionFilesGroup, plan_layers
+
+
+class TestLayersSplitting(unittest.TestCase):
+    @staticmethod
+    def make_group(name: str, uncompressed_bytes: int, change_frequency: float = 0.0, requirements_names=None) -> DistributionFilesGroup:
+        return DistributionFilesGroup(
+            name=name, uncompressed_bytes=uncompressed_bytes, content_hash=name,
+            change_frequency=change_frequency, requirements_names=set(requirements_names or [])
+        )
+
+    def test_churning_distributions_are_placed_in_their_own_layer(self):
+        layers = plan_layers(groups=[
+            self.make_group('internal-lib', 10, change_frequency=0.9),
+            self.make_group('numpy', 100),
+            self.make_group('pandas', 100, requirements_names=['numpy']),
+        ], config=LayersSplittingConfig())
+        self.assertEqual([['numpy', 'pandas'], ['internal-lib']], [[group.name for group in layer.groups] for layer in layers])
+
+    def test_layers_respect_max_size(self):
+        layers = plan_layers(groups=[
+            self.make_group('a', 60), self.make_group('b', 60), self.make_group('c', 30)
+        ], config=LayersSplittingConfig(max_layer_uncompressed_bytes=100))
+        self.assertEqual([['a'], ['b', 'c']], [[group.name for group in layer.groups] for layer in layers])
+        self.assertNotEqual(layers[0].content_hash, layers[1].content_hash)
+
+    def test_too_many_layers_raises(self):
+        with self.assertRaises(Exception):
+            plan_layers(groups=[
+                self.make_group('a', 60), self.make_group('b', 60)
+            ], config=LayersSplittingConfig(max_layers_count=1, max_layer_uncompressed_bytes=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import unittest
+from collections import Counter
+
+from serverlesspack.imports_resolver import Resolver
+
+
+class CountingResolver(Resolver):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.library_imports_counter = Counter()
+
+    def _import_library_module(self, module_name: str):
+        self.library_imports_counter[module_name] += 1
+        return super()._import_library_module(module_name=module_name)
+
+
+class TestModulesImportsMemo(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as file:
+            file.write(content)
+
+    def test_modules_imports_are_memoized(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            self.write_file(os.path.join(dirpath, "memo_helpers.py"), "def helper():\n    pass\n")
+            self.write_file(os.path.join(dirpath, "memo_first.py"), "from memo_helpers import helper\n")
+            self.write_file(os.path.join(dirpath, "memo_second.py"), "from memo_helpers import helper\ndef load():\n    from memo_missing import name\n")
+            root_filepath = os.path.join(dirpath, "memo_app.py")
+            self.write_file(root_filepath, "import memo_first\nimport memo_second\nfrom memo_helpers import helper\n")
+
+            sys.path.insert(0, dirpath)
+            try:
+                resolver = CountingResolver(root_filepath=root_filepath, target_os='linux')
+                resolver.process_file(root_filepath)
+
+                self.assertEqual(
+                    {root_filepath, *(os.path.join(dirpath, f"memo_{name}.py") for name in ['helpers', 'first', 'second'])},
+                    resolver.included_files_absolute_paths
+                )
+                # The module, the imported names which are not modules, and the missing modules are imported once.
+                self.assertEqual(1, resolver.library_imports_counter['memo_helpers'])
+                self.assertEqual(1, resolver.library_imports_counter['memo_helpers.helper'])
+                self.assertEqual(1, resolver.library_imports_counter['memo_missing'])
+                self.assertIsNone(resolver._modules_imports_memo[('memo_missing', None)])
+
+                # The misses are forgotten when the files change, since the new files might provide the modules.
+                self.write_file(os.path.join(dirpath, "memo_missing.py"), "name = 1\n")
+                resolver.update_files(modified_filepaths={os.path.join(dirpath, "memo_second.py")}, deleted_filepaths=set())
+                self.assertIn(os.path.join(dirpath, "memo_missing.py"), resolver.included_files_absolute_paths)
+                self.assertEqual(1, resolver.library_imports_counter['memo_helpers'])
+            finally:
+                sys.path.remove(dirpath)
+                for module_name in ['memo_helpers', 'memo_first', 'memo_second', 'memo_missing']:
+                    sys.modules.pop(module_name, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
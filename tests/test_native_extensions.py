@@ -0,0 +1,80 @@
+import os
+import struct
+import tempfile
+import unittest
+from typing import List
+
+from serverlesspack.configuration_client import NativeExtensionsCheckConfig
+from serverlesspack.native_extensions import read_elf_header_info, find_native_extensions_mismatches, \
+    get_runtime_glibc_version, MISMATCH_KIND_ARCHITECTURE, MISMATCH_KIND_GLIBC
+from serverlesspack.packager import LocalFileItem
+
+
+def make_elf_shared_library(machine: int, glibc_versions: List[str]) -> bytes:
+    """Make a minimal 64 bits little endian ELF file, with only a dynamic strings section and a version needs section."""
+    strings: bytes = b"\x00libc.so.6\x00" + b"".join(f"GLIBC_{version}\x00".encode('ascii') for version in glibc_versions)
+    strings_offset: int = 64
+    verneed_offset: int = strings_offset + len(strings)
+    verneed: bytes = struct.pack('<HHIII', 1, len(glibc_versions), 1, 16, 0)
+    name_offset: int = len(b"\x00libc.so.6\x00")
+    for i_version, version in enumerate(glibc_versions):
+        is_last: bool = i_version == len(glibc_versions) - 1
+        verneed += struct.pack('<IHHII', 0, 0, i_version + 2, name_offset, 0 if is_last else 16)
+        name_offset += len(f"GLIBC_{version}\x00")
+    section_headers_offset: int = verneed_offset + len(verneed)
+    section_headers: bytes = b"".join([
+        struct.pack('<IIQQQQIIQQ', 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        struct.pack('<IIQQQQIIQQ', 0, 3, 0, 0, strings_offset, len(strings), 0, 0, 1, 0),
+        struct.pack('<IIQQQQIIQQ', 0, 0x6ffffffe, 0, 0, verneed_offset, len(verneed), 1, 1, 8, 0)
+    ])
+    header: bytes = (
+        b"\x7fELF" + bytes([2, 1, 1]) + b"\x00" * 9
+        + struct.pack('<HHIQQQIHHHHHH', 3, machine, 1, 0, 0, section_headers_offset, 0, 64, 0, 0, 64, 3, 0)
+    )
+    return header + strings + verneed + section_headers
+
+
+class TestNativeExtensions(unittest.TestCase):
+    def write_file(self, dirpath: str, relative_filepath: str, content: bytes) -> LocalFileItem:
+        absolute_filepath = os.path.join(dirpath, relative_filepath)
+        os.makedirs(os.path.dirname(absolute_filepath), exist_ok=True)
+        with open(absolute_filepath, 'wb') as file:
+            file.write(content)
+        return LocalFileItem(archive_prefix="python", relative_filepath=relative_filepath, absolute_filepath=absolute_filepath)
+
+    def test_read_elf_header_info(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            file_item = self.write_file(dirpath, "native.so", make_elf_shared_library(machine=183, glibc_versions=["2.17", "2.28", "2.4"]))
+            elf_header_info = read_elf_header_info(file_item.absolute_filepath)
+            self.assertEqual("arm64", elf_header_info.machine_name)
+            self.assertEqual((2, 28), elf_header_info.required_glibc_version)
+            self.assertIsNone(read_elf_header_info(self.write_file(dirpath, "text.so", b"not an elf file").absolute_filepath))
+
+    def test_find_native_extensions_mismatches(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            files_items = [
+                self.write_file(dirpath, "numpy/core/multiarray.cpython-39-aarch64-linux-gnu.so", make_elf_shared_library(machine=183, glibc_versions=["2.17"])),
+                self.write_file(dirpath, "numpy.libs/libgfortran-2e0d59d6.so.5.0.0", make_elf_shared_library(machine=62, glibc_versions=["2.17", "2.28"])),
+                self.write_file(dirpath, "orjson/orjson.cpython-39-x86_64-linux-gnu.so", make_elf_shared_library(machine=62, glibc_versions=["2.17"])),
+                self.write_file(dirpath, "vendored/ignored.so", make_elf_shared_library(machine=183, glibc_versions=[])),
+                self.write_file(dirpath, "module.py", b"VALUE = 1\n")
+            ]
+            mismatches = find_native_extensions_mismatches(
+                local_files_items=files_items, architecture='x86_64', max_glibc_version=get_runtime_glibc_version(python_version="3.9"),
+                excluded_patterns=NativeExtensionsCheckConfig(excluded_patterns=["python/vendored/*"]).excluded_patterns
+            )
+            self.assertEqual(
+                [
+                    ("python/numpy/core/multiarray.cpython-39-aarch64-linux-gnu.so", MISMATCH_KIND_ARCHITECTURE, "arm64"),
+                    ("python/numpy.libs/libgfortran-2e0d59d6.so.5.0.0", MISMATCH_KIND_GLIBC, "GLIBC 2.28")
+                ],
+                [(mismatch.relative_filepath, mismatch.kind, mismatch.found) for mismatch in mismatches]
+            )
+            # The Lambda python 3.12 runtime is built on a more recent glibc.
+            self.assertEqual([], find_native_extensions_mismatches(
+                local_files_items=files_items[1:3], architecture='x86_64', max_glibc_version=get_runtime_glibc_version(python_version="3.12")
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import tempfile
+import time
+import unittest
+
+from serverlesspack.configuration_client import OciImageConfig
+from serverlesspack.oci_image import OciLayerItem, write_oci_image_layout, get_previous_layers_digests, make_layer_tar
+from serverlesspack.packager import LocalFileItem, ContentFileItem
+
+
+class TestOciImage(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as file:
+            file.write(content)
+
+    def make_layers(self, dirpath: str, app_content: str):
+        self.write_file(os.path.join(dirpath, "app.py"), app_content)
+        self.write_file(os.path.join(dirpath, "site-packages", "dependency", "__init__.py"), "VALUE = 1\n")
+        return [
+            OciLayerItem(name='dependencies', local_files_items=[LocalFileItem(
+                archive_prefix="python/lib/python3.9/site-packages", relative_filepath="dependency/__init__.py",
+                absolute_filepath=os.path.join(dirpath, "site-packages", "dependency", "__init__.py")
+            )], content_files_items=[]),
+            OciLayerItem(name='code', local_files_items=[LocalFileItem(
+                archive_prefix=None, relative_filepath="app.py", absolute_filepath=os.path.join(dirpath, "app.py")
+            )], content_files_items=[]),
+            OciLayerItem(name='generated', local_files_items=[], content_files_items=[ContentFileItem(
+                archive_prefix=None, relative_filepath="package/__init__.py", content=""
+            )]),
+            OciLayerItem(name='empty', local_files_items=[], content_files_items=[])
+        ]
+
+    def test_write_oci_image_layout(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            image_filepath = os.path.join(dirpath, "build.oci.tar")
+            first_layers_blobs = write_oci_image_layout(
+                output_filepath=image_filepath, layers=self.make_layers(dirpath=dirpath, app_content="VALUE = 1\n"),
+                architecture='arm64', cmd=["app.lambda_handler"], image_config=OciImageConfig(reference='v1')
+            )
+            # The empty layers are not written.
+            self.assertEqual(['dependencies', 'code', 'generated'], [blob.annotations['serverlesspack.layer.name'] for blob in first_layers_blobs])
+            with tarfile.open(image_filepath) as tar_object:
+                self.assertEqual({'imageLayoutVersion': '1.0.0'}, json.load(tar_object.extractfile('oci-layout')))
+                index = json.load(tar_object.extractfile('index.json'))
+                self.assertEqual('v1', index['manifests'][0]['annotations']['org.opencontainers.image.ref.name'])
+                manifest = json.load(tar_object.extractfile(f"blobs/sha256/{index['manifests'][0]['digest'][len('sha256:'):]}"))
+                image_config = json.load(tar_object.extractfile(f"blobs/sha256/{manifest['config']['digest'][len('sha256:'):]}"))
+                dependencies_layer = tar_object.extractfile(f"blobs/sha256/{manifest['layers'][0]['digest'][len('sha256:'):]}").read()
+            self.assertEqual('arm64', image_config['architecture'])
+            self.assertEqual(["app.lambda_handler"], image_config['config']['Cmd'])
+            self.assertEqual(3, len(image_config['rootfs']['diff_ids']))
+            with tarfile.open(fileobj=io.BytesIO(gzip.decompress(dependencies_layer))) as layer_tar_object:
+                # The dependencies are copied in the task root, without the site-packages prefix of the layers.
+                self.assertEqual(
+                    ['var/', 'var/task/', 'var/task/dependency/', 'var/task/dependency/__init__.py'],
+                    [member.name.rstrip('/') + ('/' if member.isdir() else '') for member in layer_tar_object.getmembers()]
+                )
+                self.assertTrue(all(member.mtime == 0 for member in layer_tar_object.getmembers()))
+
+            # A change of the application files only changes the digest of the code layer.
+            time.sleep(1)
+            second_layers_blobs = write_oci_image_layout(
+                output_filepath=image_filepath, layers=self.make_layers(dirpath=dirpath, app_content="VALUE = 2\n"),
+                architecture='arm64', cmd=["app.lambda_handler"], image_config=OciImageConfig(reference='v1')
+            )
+            self.assertEqual(
+                [True, False, True],
+                [first.digest == second.digest for first, second in zip(first_layers_blobs, second_layers_blobs)]
+            )
+            self.assertEqual(
+                {blob.annotations['serverlesspack.layer.name']: blob.digest for blob in second_layers_blobs},
+                get_previous_layers_digests(image_filepath=image_filepath)
+            )
+
+
+    def test_make_layer_tar_keeps_the_executable_bit(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            script_filepath = os.path.join(dirpath, "bin", "tool")
+            module_filepath = os.path.join(dirpath, "module.py")
+            self.write_file(script_filepath, "#!/bin/sh\n")
+            self.write_file(module_filepath, "VALUE = 1\n")
+            os.chmod(script_filepath, 0o775)
+            os.chmod(module_filepath, 0o664)
+            layer_tar = make_layer_tar(local_files_items=[
+                LocalFileItem(archive_prefix=None, relative_filepath="bin/tool", absolute_filepath=script_filepath),
+                LocalFileItem(archive_prefix=None, relative_filepath="module.py", absolute_filepath=module_filepath),
+            ], content_files_items=[])
+            with tarfile.open(fileobj=io.BytesIO(layer_tar)) as layer_tar_object:
+                self.assertEqual(0o755, layer_tar_object.getmember('var/task/bin/tool').mode)
+                self.assertEqual(0o644, layer_tar_object.getmember('var/task/module.py').mode)
+
+
+if __name__ == '__main__':
+    unittest.main()
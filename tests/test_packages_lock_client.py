@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.exceptions import LockfileDrift, LockedPackagesWithoutHashes
+from serverlesspack.packages_lock_client import PackagesLockClient, Lockfile, LockedPackageItem, resolve_lockfile, \
+    DRIFT_KIND_UNLOCKED, DRIFT_KIND_VERSION_MISMATCH, DRIFT_KIND_UNUSED
+
+
+class TestPackagesLockClient(unittest.TestCase):
+    def make_lockfile(self) -> Lockfile:
+        return Lockfile(python_version="3.9", platform="manylinux2014_x86_64", packages={
+            'requests': LockedPackageItem(name="requests", version="2.31.0", hashes=["sha256:aa"], requested=True, requires=['urllib3']),
+            'urllib3': LockedPackageItem(name="urllib3", version="2.0.7", hashes=["sha256:bb"], requested=False),
+            'pyyaml': LockedPackageItem(name="PyYAML", version="6.0.1", hashes=["sha256:cc"], requested=True)
+        })
+
+    def test_lockfile_round_trip_and_closure(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            lock_client = PackagesLockClient(lockfile_filepath=os.path.join(dirpath, "serverlesspack.lock"))
+            lock_client.save(lockfile=self.make_lockfile())
+            lockfile = lock_client.load()
+            self.assertEqual(self.make_lockfile(), lockfile)
+            self.assertEqual(["requests", "urllib3"], [item.name for item in lockfile.get_packages_closure(packages_names={"requests"})])
+
+            requirements_filepath = os.path.join(dirpath, "requirements.txt")
+            PackagesLockClient.write_requirements_file(lockfile.get_packages_closure(packages_names={"PyYAML"}), requirements_filepath)
+            with open(requirements_filepath) as requirements_file:
+                self.assertEqual("PyYAML==6.0.1 --hash=sha256:cc\n", requirements_file.read())
+
+    def test_write_requirements_file_without_hashes(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            requirements_filepath = os.path.join(dirpath, "requirements.txt")
+            with self.assertRaises(LockedPackagesWithoutHashes) as context:
+                PackagesLockClient.write_requirements_file([
+                    LockedPackageItem(name="requests", version="2.31.0", hashes=["sha256:aa"], requested=True),
+                    LockedPackageItem(name="local-package", version="0.1.0", hashes=[], requested=True)
+                ], requirements_filepath)
+            self.assertEqual(["local-package"], context.exception.packages_names)
+            self.assertFalse(os.path.exists(requirements_filepath))
+
+    def test_find_drift(self):
+        drift_items = PackagesLockClient.find_drift(
+            lockfile=self.make_lockfile(), installed_versions={'requests': "2.32.0", 'click': "8.1.7"},
+            python_version="3.9", platform="manylinux2014_x86_64"
+        )
+        self.assertEqual(
+            [("click", DRIFT_KIND_UNLOCKED), ("requests", DRIFT_KIND_VERSION_MISMATCH), ("PyYAML", DRIFT_KIND_UNUSED)],
+            [(drift_item.name, drift_item.kind) for drift_item in drift_items]
+        )
+
+    def test_frozen_mode_raises_on_drift(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            lock_client = PackagesLockClient(lockfile_filepath=os.path.join(dirpath, "serverlesspack.lock"))
+            lock_client.save(lockfile=self.make_lockfile())
+            # The unused locked packages are not a drift when installing, since only the required ones are installed.
+            resolve_lockfile(
+                lock_client=lock_client, mode='frozen', installed_versions={'requests': "2.31.0"},
+                python_version="3.9", platform="manylinux2014_x86_64"
+            )
+            with self.assertRaises(LockfileDrift):
+                resolve_lockfile(
+                    lock_client=lock_client, mode='frozen', installed_versions={'requests': "2.31.0", 'click': "8.1.7"},
+                    python_version="3.9", platform="manylinux2014_x86_64"
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
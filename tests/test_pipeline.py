@@ -0,0 +1,112 @@
+import os
+import subprocess
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from serverlesspack.exceptions import PackagesInstallationFailed
+from serverlesspack.packager import LocalFileItem, ContentFileItem
+from serverlesspack.pipeline import ArchiveWriterThread, DependenciesInstallerThread, merge_installation_dirpath
+
+
+class TestPipeline(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as file:
+            file.write(content)
+
+    def test_archive_writer_thread(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            module_filepath = os.path.join(dirpath, "app.py")
+            self.write_file(module_filepath, "VALUE = 1\n")
+            writer = ArchiveWriterThread(dist_dirpath=dirpath, destination_key='build', output_type='zip')
+            writer.start()
+            for _ in range(2):
+                # The files included twice are only written once.
+                writer.put(LocalFileItem(archive_prefix=None, relative_filepath="app.py", absolute_filepath=module_filepath))
+            writer.put(ContentFileItem(archive_prefix=None, relative_filepath="services/__init__.py", content=""))
+            output_path = writer.finish()
+            with zipfile.ZipFile(output_path) as zip_object:
+                self.assertEqual(["app.py", "services/__init__.py"], zip_object.namelist())
+
+    def test_archive_writer_thread_error(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            writer = ArchiveWriterThread(dist_dirpath=dirpath, destination_key='build', output_type='folder')
+            writer.start()
+            writer.put(LocalFileItem(archive_prefix=None, relative_filepath="app.py", absolute_filepath=os.path.join(dirpath, "missing.py")))
+            writer.put(ContentFileItem(archive_prefix=None, relative_filepath="other.py", content=""))
+            with self.assertRaises(FileNotFoundError):
+                writer.finish()
+
+    @staticmethod
+    def fake_download_wheels(packages_names, wheels_dirpath, python_version, platform):
+        os.makedirs(wheels_dirpath, exist_ok=True)
+        for package_name in [*packages_names, 'urllib3']:
+            with open(os.path.join(wheels_dirpath, f"{package_name}-1.0-py3-none-any.whl"), 'w') as file:
+                file.write("")
+        return subprocess.CompletedProcess(args=[], returncode=0)
+
+    def test_dependencies_installer_thread_single_resolution(self):
+        installations = []
+        def download(packages_names, target_dirpath, find_links_dirpath=None, **kwargs):
+            installations.append((set(packages_names), sorted(os.listdir(find_links_dirpath))))
+            os.makedirs(os.path.join(target_dirpath, 'urllib3'))
+            return subprocess.CompletedProcess(args=[], returncode=0)
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            lambda_layer_dirpath = os.path.join(dirpath, "lambda_layer")
+            with mock.patch('serverlesspack.pipeline.download_packages_to_dir', download), \
+                    mock.patch('serverlesspack.pipeline.download_packages_wheels_to_dir', self.fake_download_wheels):
+                installer = DependenciesInstallerThread(
+                    lambda_layer_dirpath=lambda_layer_dirpath, python_version="3.9", platform=None,
+                    should_remove_runtime_provided_packages=False
+                )
+                installer.start()
+                installer.add_dependency("requests", distribution=None)
+                installer.add_dependency("botocore", distribution=None)
+                installer.finish()
+            # The wheels are downloaded while resolving, and the shared requirements are installed by a single resolution.
+            self.assertEqual(1, len(installations))
+            self.assertEqual({'requests', 'botocore'}, installations[0][0])
+            self.assertIn('urllib3-1.0-py3-none-any.whl', installations[0][1])
+            self.assertEqual(['urllib3'], os.listdir(lambda_layer_dirpath))
+            self.assertFalse(os.path.exists(installer.wheels_dirpath))
+
+    def test_dependencies_installer_thread_error(self):
+        def failed_download(packages_names, target_dirpath, **kwargs):
+            return subprocess.CompletedProcess(args=[], returncode=1)
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            with mock.patch('serverlesspack.pipeline.download_packages_to_dir', failed_download), \
+                    mock.patch('serverlesspack.pipeline.download_packages_wheels_to_dir', self.fake_download_wheels):
+                installer = DependenciesInstallerThread(
+                    lambda_layer_dirpath=os.path.join(dirpath, "lambda_layer"), python_version="3.9", platform=None,
+                    should_remove_runtime_provided_packages=False
+                )
+                installer.start()
+                installer.add_dependency("numpy", distribution=None)
+                with self.assertRaises(PackagesInstallationFailed):
+                    installer.finish()
+
+    def test_merge_installation_dirpath(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            layer_dirpath = os.path.join(dirpath, "layer")
+            first_batch_dirpath = os.path.join(dirpath, "batches", "1")
+            second_batch_dirpath = os.path.join(dirpath, "batches", "2")
+            self.write_file(os.path.join(first_batch_dirpath, "google", "protobuf", "__init__.py"), "first")
+            self.write_file(os.path.join(first_batch_dirpath, "six.py"), "first")
+            self.write_file(os.path.join(second_batch_dirpath, "google", "api", "__init__.py"), "second")
+            self.write_file(os.path.join(second_batch_dirpath, "six.py"), "second")
+            merge_installation_dirpath(source_dirpath=first_batch_dirpath, destination_dirpath=layer_dirpath)
+            merge_installation_dirpath(source_dirpath=second_batch_dirpath, destination_dirpath=layer_dirpath)
+
+            self.assertTrue(os.path.isfile(os.path.join(layer_dirpath, "google", "protobuf", "__init__.py")))
+            self.assertTrue(os.path.isfile(os.path.join(layer_dirpath, "google", "api", "__init__.py")))
+            with open(os.path.join(layer_dirpath, "six.py")) as file:
+                self.assertEqual("first", file.read())
+            self.assertFalse(os.path.exists(second_batch_dirpath))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from types import SimpleNamespace
+
+from serverlesspack.configuration_client import PrimingConfig
+from serverlesspack.priming import get_ordered_primed_filepaths, make_priming_module_content
+
+
+class TestPriming(unittest.TestCase):
+    @staticmethod
+    def make_resolver(edges: list) -> SimpleNamespace:
+        return SimpleNamespace(
+            root_filepath='/project/app.py',
+            traces=[{'source': source, 'target': target, 'type': "local"} for source, target in edges],
+            included_files_absolute_paths={target for _, target in edges}
+        )
+
+    def test_imported_files_are_primed_first(self):
+        resolver = self.make_resolver([
+            ('/project/app.py', '/project/services/api.py'),
+            ('/project/services/api.py', '/project/utils.py'),
+            ('/project/app.py', '/project/utils.py'),
+        ])
+        self.assertEqual(
+            ['/project/utils.py', '/project/services/api.py', '/project/app.py'],
+            get_ordered_primed_filepaths(resolver=resolver)
+        )
+
+    def test_cycles_are_only_primed_through_their_entry_file(self):
+        resolver = self.make_resolver([
+            ('/project/app.py', '/project/a.py'),
+            ('/project/a.py', '/project/b.py'),
+            ('/project/b.py', '/project/a.py'),
+            ('/project/b.py', '/project/c.py'),
+        ])
+        self.assertEqual(
+            ['/project/c.py', '/project/a.py', '/project/app.py'],
+            get_ordered_primed_filepaths(resolver=resolver)
+        )
+
+    def test_module_content_applies_includes_excludes_and_warmups(self):
+        resolver = self.make_resolver([
+            ('/project/app.py', '/project/services/__init__.py'),
+            ('/project/app.py', '/project/services/api.py'),
+            ('/project/app.py', '/venv/lib/site-packages/requests/__init__.py'),
+        ])
+        content = make_priming_module_content(resolver=resolver, config=PrimingConfig(
+            modules_excludes=['requests'], warmup_callables=['services.api:load_models'],
+            handler_function_name='lambda_handler'
+        ), output_base_dirpath='/project')
+        self.assertIn("_prime('services')", content)
+        self.assertIn("_prime('services.api')", content)
+        self.assertNotIn("_prime('requests')", content)
+        self.assertIn("_warmup('services.api', 'load_models')", content)
+        self.assertIn("from app import lambda_handler", content)
+        compile(content, 'serverlesspack_priming.py', 'exec')
+
+
+if __name__ == '__main__':
+    unittest.main()
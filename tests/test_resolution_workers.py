@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from serverlesspack.configuration_client import ResolutionWorkersConfig
+from serverlesspack.imports_resolver import Resolver
+from serverlesspack.resolution_workers import ResolutionWorkersPool, get_resolution_worker
+
+
+class TestResolutionWorkers(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as file:
+            file.write(content)
+
+    def test_resolution_worker(self):
+        pool = ResolutionWorkersPool()
+        try:
+            with tempfile.TemporaryDirectory() as dirpath:
+                # The prints of the imported modules must not corrupt the responses of the worker.
+                self.write_file(os.path.join(dirpath, "worker_helper.py"), "print('imported')\nVALUE = 1\n")
+                worker = pool.get_worker(executable=sys.executable)
+                self.assertEqual(f"{sys.version_info[0]}.{sys.version_info[1]}", worker.python_version)
+                self.assertIs(worker, pool.get_worker(executable=sys.executable))
+
+                with self.assertRaises(ModuleNotFoundError):
+                    worker.import_module(module_name="worker_helper")
+                worker.set_paths(paths=[dirpath])
+                module = worker.import_module(module_name="worker_helper")
+                self.assertEqual(os.path.join(dirpath, "worker_helper.py"), module.__file__)
+                # The module has been imported by the worker process, not by the running interpreter.
+                self.assertNotIn("worker_helper", sys.modules)
+                self.assertIn(worker.base_libs_dirpath, worker.import_module(module_name="json").__file__)
+
+                root_filepath = os.path.join(dirpath, "worker_app.py")
+                self.write_file(root_filepath, "import json\nimport worker_helper\n")
+                resolver = Resolver(root_filepath=root_filepath, target_os='linux', resolution_worker=worker)
+                resolver.process_file(root_filepath)
+                self.assertEqual({root_filepath, os.path.join(dirpath, "worker_helper.py")}, resolver.included_files_absolute_paths)
+        finally:
+            pool.close()
+
+    def test_get_resolution_worker(self):
+        running_python_version = f"{sys.version_info[0]}.{sys.version_info[1]}"
+        # No worker is needed when the running interpreter has the target python version.
+        self.assertIsNone(get_resolution_worker(python_version=running_python_version))
+        self.assertIsNone(get_resolution_worker(python_version="3.1", config=ResolutionWorkersConfig(enabled=False)))
+        self.assertIsNone(get_resolution_worker(
+            python_version="3.1", config=ResolutionWorkersConfig(interpreters_paths={"3.1": sys.executable})
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from serverlesspack.packager import recursive_get_files_in_layer_folder, remove_runtime_provided_packages
+from serverlesspack.runtime_baseline import RuntimeBaseline, load_runtime_baseline, remove_runtime_provided_files
+
+
+class TestRuntimeBaseline(unittest.TestCase):
+    def write_distribution(self, layer_dirpath: str, name: str, version: str, files: dict, requires_dist: list = ()):
+        dist_info_dirname = f"{name}-{version}.dist-info"
+        for relative_filepath, content in files.items():
+            absolute_filepath = os.path.join(layer_dirpath, relative_filepath)
+            os.makedirs(os.path.dirname(absolute_filepath), exist_ok=True)
+            with open(absolute_filepath, 'w') as file:
+                file.write(content)
+        os.makedirs(os.path.join(layer_dirpath, dist_info_dirname))
+        with open(os.path.join(layer_dirpath, dist_info_dirname, 'METADATA'), 'w') as metadata_file:
+            metadata_file.write(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+            for requirement in requires_dist:
+                metadata_file.write(f"Requires-Dist: {requirement}\n")
+        with open(os.path.join(layer_dirpath, dist_info_dirname, 'RECORD'), 'w') as record_file:
+            for relative_filepath in [*files.keys(), f"{dist_info_dirname}/METADATA", f"{dist_info_dirname}/RECORD"]:
+                record_file.write(f"{relative_filepath},,\n")
+
+    def test_is_compatible_with(self):
+        baseline = RuntimeBaseline(python_version='3.9', packages_versions={'urllib3': '1.26.19', 'jmespath': '0.10.0', 'six': None})
+        self.assertTrue(baseline.is_compatible_with('urllib3', '1.25.0'))
+        self.assertFalse(baseline.is_compatible_with('urllib3', '2.2.1'))
+        self.assertTrue(baseline.is_compatible_with('jmespath', '0.10.1'))
+        self.assertFalse(baseline.is_compatible_with('jmespath', '0.9.5'))
+        self.assertTrue(baseline.is_compatible_with('six', '1.16.0'))
+        self.assertTrue(baseline.satisfies('urllib3', ['urllib3 (<3,>=1.21.1)']))
+        self.assertFalse(baseline.satisfies('urllib3', ['urllib3 (>=2)']))
+        self.assertFalse(baseline.satisfies('six', ['six (>=1.5)']))
+
+    def test_load_runtime_baseline(self):
+        baseline = load_runtime_baseline(python_version='3.9')
+        self.assertTrue(baseline.provides('s3transfer'))
+        self.assertTrue(baseline.provides('python_dateutil'))
+        self.assertIsNotNone(baseline.get_version('botocore'))
+        # The python versions missing from the manifest are only known to provide the AWS SDK, at unknown versions.
+        fallback_baseline = load_runtime_baseline(python_version='2.7')
+        self.assertEqual({'boto3': None, 'botocore': None}, fallback_baseline.packages_versions)
+
+    def test_remove_runtime_provided_packages(self):
+        self.assertEqual(
+            {'requests', 'urllib3'},
+            remove_runtime_provided_packages(
+                packages_names={'requests', 'boto3', 'jmespath', 'urllib3'}, python_version='3.9',
+                imported_versions={'boto3': '1.34.0', 'jmespath': None, 'urllib3': '2.2.1'}
+            )
+        )
+
+    def test_remove_runtime_provided_files(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            self.write_distribution(layer_dirpath, 'requests', '2.32.3', {'requests/__init__.py': ""}, [
+                'urllib3 (<3,>=1.21.1)', 'six (>=1.5)', 'PySocks (!=1.5.7,>=1.5.6) ; extra == "socks"'
+            ])
+            self.write_distribution(layer_dirpath, 'urllib3', '1.26.18', {'urllib3/__init__.py': "x" * 10})
+            self.write_distribution(layer_dirpath, 'six', '1.16.0', {'six.py': "x" * 5})
+            local_files_items = recursive_get_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath=layer_dirpath)
+
+            kept_items = remove_runtime_provided_files(
+                local_files_items=local_files_items, layer_source_dirpath=layer_dirpath, python_version='3.9'
+            )
+            kept_filepaths = {os.path.relpath(item.absolute_filepath, layer_dirpath).replace(os.sep, '/') for item in kept_items}
+            self.assertEqual({
+                'requests/__init__.py', 'requests-2.32.3.dist-info/METADATA', 'requests-2.32.3.dist-info/RECORD'
+            }, kept_filepaths)
+
+            # A distribution requiring a version that the runtime does not have keeps its requirement in the layer.
+            self.write_distribution(layer_dirpath, 'modern-client', '1.0.0', {'modern_client/__init__.py': ""}, ['urllib3 (>=2)'])
+            local_files_items = recursive_get_files_in_layer_folder(source_dirpath=layer_dirpath, base_layer_dirpath=layer_dirpath)
+            kept_items = remove_runtime_provided_files(
+                local_files_items=local_files_items, layer_source_dirpath=layer_dirpath, python_version='3.9'
+            )
+            kept_filepaths = {os.path.relpath(item.absolute_filepath, layer_dirpath).replace(os.sep, '/') for item in kept_items}
+            self.assertIn('urllib3/__init__.py', kept_filepaths)
+            self.assertNotIn('six.py', kept_filepaths)
+
+            kept_items = remove_runtime_provided_files(
+                local_files_items=local_files_items, layer_source_dirpath=layer_dirpath, python_version='3.9',
+                should_remove_runtime_provided_packages=False
+            )
+            self.assertEqual(len(local_files_items), len(kept_items))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from serverlesspack.exceptions import RuntimeTraceFailed
+from serverlesspack.imports_resolver import Resolver
+from serverlesspack.runtime_trace import trace_handler_execution
+
+
+class TestRuntimeTrace(unittest.TestCase):
+    def test_trace_excludes_modules_not_loaded_at_runtime(self):
+        with tempfile.TemporaryDirectory() as project_dirpath:
+            project_dirpath = os.path.realpath(project_dirpath)
+            with open(os.path.join(project_dirpath, 'traced_app.py'), 'w+') as file:
+                file.write(
+                    "import traced_used_module\n\n"
+                    "def lambda_handler(event, context):\n"
+                    "    if event.get('rare'):\n"
+                    "        import traced_rare_module\n"
+                    "    return traced_used_module.value\n"
+                )
+            with open(os.path.join(project_dirpath, 'traced_used_module.py'), 'w+') as file:
+                file.write("value = 1\n")
+            with open(os.path.join(project_dirpath, 'traced_rare_module.py'), 'w+') as file:
+                file.write("value = 2\n")
+            sample_event_filepath = os.path.join(project_dirpath, 'event.json')
+            with open(sample_event_filepath, 'w+') as file:
+                file.write("{}")
+
+            trace_result = trace_handler_execution(
+                handler_module_name='traced_app', handler_function_name='lambda_handler',
+                sample_events_filepaths=[sample_event_filepath], python_paths=[project_dirpath]
+            )
+
+            root_filepath = os.path.join(project_dirpath, 'traced_app.py')
+            sys.path.insert(0, project_dirpath)
+            try:
+                static_resolver = Resolver(root_filepath=root_filepath, target_os=Resolver.LINUX_KEY)
+                static_resolver.process_file(root_filepath)
+                traced_resolver = Resolver(
+                    root_filepath=root_filepath, target_os=Resolver.LINUX_KEY,
+                    allowed_files_absolute_paths=trace_result.loaded_files_absolute_paths,
+                    allowed_top_level_modules_names=trace_result.top_level_modules_names
+                )
+                traced_resolver.process_file(root_filepath)
+            finally:
+                sys.path.remove(project_dirpath)
+
+            rare_module_filepath = os.path.join(project_dirpath, 'traced_rare_module.py')
+            self.assertIn(rare_module_filepath, static_resolver.included_files_absolute_paths)
+            self.assertNotIn(rare_module_filepath, traced_resolver.included_files_absolute_paths)
+            self.assertIn(os.path.join(project_dirpath, 'traced_used_module.py'), traced_resolver.included_files_absolute_paths)
+
+    def test_trace_fails_when_the_handler_module_raises_on_import(self):
+        with tempfile.TemporaryDirectory() as project_dirpath:
+            with open(os.path.join(project_dirpath, 'failing_traced_app.py'), 'w+') as file:
+                file.write(
+                    "import json\n"
+                    "raise RuntimeError('missing configuration')\n\n"
+                    "def lambda_handler(event, context):\n"
+                    "    import traced_lazy_module\n"
+                )
+            sample_event_filepath = os.path.join(project_dirpath, 'event.json')
+            with open(sample_event_filepath, 'w+') as file:
+                file.write("{}")
+
+            # The few modules loaded before the error must not be used as the minimal artifact.
+            with self.assertRaises(RuntimeTraceFailed) as context:
+                trace_handler_execution(
+                    handler_module_name='failing_traced_app', handler_function_name='lambda_handler',
+                    sample_events_filepaths=[sample_event_filepath], python_paths=[project_dirpath]
+                )
+            self.assertIn('missing configuration', str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
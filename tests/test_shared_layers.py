@@ -0,0 +1,109 @@
+import os
+import struct
+import subprocess
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from serverlesspack.exceptions import PackagesInstallationFailed, NativeExtensionsMismatch
+from serverlesspack.shared_layers import plan_shared_layers, build_planned_layer, SharedLayerItem
+
+
+class TestSharedLayers(unittest.TestCase):
+    def test_plan_shared_layers(self):
+        plan = plan_shared_layers(
+            functions_dependencies_names={
+                'a': {'numpy', 'pandas', 'requests'},
+                'b': {'numpy', 'pandas'},
+                'c': {'requests', 'jinja2'},
+            },
+            dependencies_sizes={'numpy': 100, 'pandas': 200, 'requests': 10, 'jinja2': 5},
+            dependencies_versions={}, python_version='3.9'
+        )
+        self.assertEqual(
+            [{'numpy', 'pandas'}, {'requests'}],
+            [layer.dependencies_names for layer in plan.shared_layers]
+        )
+        self.assertIsNone(plan.functions['a'].remainder_layer)
+        self.assertIsNone(plan.functions['b'].remainder_layer)
+        self.assertEqual({'jinja2'}, plan.functions['c'].remainder_layer.dependencies_names)
+        self.assertEqual(315, plan.total_uncompressed_bytes)
+
+    def test_max_shared_layers_per_function(self):
+        plan = plan_shared_layers(
+            functions_dependencies_names={'a': {'numpy', 'requests'}, 'b': {'numpy'}, 'c': {'requests'}},
+            dependencies_sizes={'numpy': 100, 'requests': 10}, dependencies_versions={},
+            python_version='3.9', max_shared_layers_per_function=1
+        )
+        self.assertEqual([{'numpy'}], [layer.dependencies_names for layer in plan.shared_layers])
+        self.assertEqual({'requests'}, plan.functions['a'].remainder_layer.dependencies_names)
+        # The identical remainders of different functions share the same key, so they are only built once.
+        self.assertEqual(plan.functions['a'].remainder_layer.key, plan.functions['c'].remainder_layer.key)
+
+    def test_layers_keys_depend_on_the_platform(self):
+        plans = [plan_shared_layers(
+            functions_dependencies_names={'a': {'numpy'}, 'b': {'numpy'}}, dependencies_sizes={'numpy': 100},
+            dependencies_versions={'numpy': '1.21.0'}, python_version='3.9', platform=platform
+        ) for platform in ["manylinux2014_x86_64", "manylinux2014_aarch64"]]
+        self.assertNotEqual(plans[0].shared_layers[0].key, plans[1].shared_layers[0].key)
+
+    def test_layer_installs_its_pinned_distributions_only(self):
+        installations = []
+        def download(packages_names, target_dirpath, python_version, platform, **kwargs):
+            installations.append((set(packages_names), kwargs))
+            os.makedirs(os.path.join(target_dirpath, 'requests'))
+            with open(os.path.join(target_dirpath, 'requests', '__init__.py'), 'w+') as file:
+                file.write("")
+            return subprocess.CompletedProcess(args=[], returncode=0)
+
+        plan = plan_shared_layers(
+            functions_dependencies_names={'a': {'requests', 'urllib3'}, 'b': {'requests', 'urllib3', 'numpy'}},
+            dependencies_sizes={'requests': 10, 'urllib3': 10, 'numpy': 100},
+            dependencies_versions={'requests': '2.31.0', 'urllib3': '2.0.7', 'numpy': None}, python_version='3.9'
+        )
+        with tempfile.TemporaryDirectory() as output_dirpath:
+            with mock.patch('serverlesspack.shared_layers.download_packages_to_dir', download):
+                for layer in [plan.shared_layers[0], plan.functions['b'].remainder_layer]:
+                    build_planned_layer(layer=layer, output_dirpath=output_dirpath, python_version='3.9', platform=None)
+        self.assertEqual([{'requests==2.31.0', 'urllib3==2.0.7'}, {'numpy'}], [packages_names for packages_names, _ in installations])
+        self.assertTrue(all(kwargs['should_install_requirements'] is False for _, kwargs in installations))
+
+    def test_built_layer_native_extensions_are_checked(self):
+        def download(packages_names, target_dirpath, python_version, platform, **kwargs):
+            os.makedirs(os.path.join(target_dirpath, 'numpy'))
+            with open(os.path.join(target_dirpath, 'numpy', 'multiarray.cpython-39-aarch64-linux-gnu.so'), 'wb') as file:
+                # A minimal ELF header of an arm64 shared library, without any section.
+                file.write(b"\x7fELF" + bytes([2, 1, 1]) + b"\x00" * 9 + struct.pack('<HHIQQQIHHHHHH', 3, 183, 1, 0, 0, 0, 0, 64, 0, 0, 64, 0, 0))
+            return subprocess.CompletedProcess(args=[], returncode=0)
+
+        layer = SharedLayerItem(key='0123456789abcdef', dependencies_names={'numpy'}, functions_keys={'a'}, uncompressed_bytes=0)
+        config = SimpleNamespace(python_version='3.9', architecture='x86_64', native_extensions_check=None)
+        with tempfile.TemporaryDirectory() as output_dirpath:
+            with mock.patch('serverlesspack.shared_layers.download_packages_to_dir', download):
+                with self.assertRaises(NativeExtensionsMismatch):
+                    build_planned_layer(
+                        layer=layer, output_dirpath=output_dirpath, python_version='3.9', platform="manylinux2014_x86_64",
+                        config=config, target_os='linux'
+                    )
+            self.assertFalse(os.path.exists(os.path.join(output_dirpath, layer.key, 'lambda_layer.zip')))
+
+    def test_failed_installation_is_not_zipped(self):
+        def failed_download(packages_names, target_dirpath, python_version, platform, **kwargs):
+            # The failed installation leaves a partially installed package.
+            os.makedirs(os.path.join(target_dirpath, 'numpy'))
+            with open(os.path.join(target_dirpath, 'numpy', '__init__.py'), 'w+') as file:
+                file.write("")
+            return subprocess.CompletedProcess(args=[], returncode=1)
+
+        layer = SharedLayerItem(key='0123456789abcdef', dependencies_names={'numpy'}, functions_keys={'a'}, uncompressed_bytes=0)
+        with tempfile.TemporaryDirectory() as output_dirpath:
+            with mock.patch('serverlesspack.shared_layers.download_packages_to_dir', failed_download):
+                with self.assertRaises(PackagesInstallationFailed):
+                    build_planned_layer(layer=layer, output_dirpath=output_dirpath, python_version='3.9', platform=None)
+            self.assertFalse(os.path.exists(os.path.join(output_dirpath, layer.key, 'lambda_layer.zip')))
+            self.assertFalse(os.path.exists(os.path.join(output_dirpath, layer.key, 'installation')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from serverlesspack.configuration_client import SizeBudgetsConfig
+from serverlesspack.exceptions import SizeBudgetExceeded
+from serverlesspack.packager import LocalFileItem, ContentFileItem
+from serverlesspack.size_report import read_layer_installed_distributions, get_distributions_closure, \
+    make_size_report, enforce_size_budgets
+
+
+class TestSizeReport(unittest.TestCase):
+    def test_read_layer_installed_distributions(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            for dist_info_dirname, metadata, record in [
+                ('requests-2.28.1.dist-info', "Name: requests\nRequires-Dist: urllib3 (<1.27,>=1.21.1)\nRequires-Dist: PySocks ; extra == 'socks'\n\nBody", "requests/__init__.py,,\n"),
+                ('urllib3-1.26.12.dist-info', "Name: urllib3\n", "urllib3/__init__.py,,\n"),
+            ]:
+                dist_info_dirpath = os.path.join(layer_dirpath, dist_info_dirname)
+                os.makedirs(dist_info_dirpath)
+                with open(os.path.join(dist_info_dirpath, 'METADATA'), 'w+') as file:
+                    file.write(metadata)
+                with open(os.path.join(dist_info_dirpath, 'RECORD'), 'w+') as file:
+                    file.write(record)
+
+            distributions, distributions_names_by_relative_filepath = read_layer_installed_distributions(layer_dirpath)
+            self.assertEqual({'urllib3'}, distributions['requests'].requirements_names)
+            self.assertEqual('urllib3', distributions_names_by_relative_filepath['urllib3/__init__.py'])
+            self.assertEqual({'requests', 'urllib3'}, get_distributions_closure('requests', distributions))
+            self.assertEqual({'urllib3'}, get_distributions_closure('urllib3', distributions))
+
+    def make_layer(self, layer_dirpath: str) -> list:
+        local_files_items = []
+        for dist_info_dirname, metadata, relative_filepath, size in [
+            ('requests-2.28.1.dist-info', "Name: requests\nRequires-Dist: urllib3\n", 'requests/__init__.py', 100),
+            ('botocore-1.29.0.dist-info', "Name: botocore\nRequires-Dist: urllib3\n", 'botocore/__init__.py', 200),
+            ('urllib3-1.26.12.dist-info', "Name: urllib3\n", 'urllib3/__init__.py', 51),
+        ]:
+            dist_info_dirpath = os.path.join(layer_dirpath, dist_info_dirname)
+            os.makedirs(dist_info_dirpath)
+            with open(os.path.join(dist_info_dirpath, 'METADATA'), 'w+') as file:
+                file.write(metadata)
+            with open(os.path.join(dist_info_dirpath, 'RECORD'), 'w+') as file:
+                file.write(f"{relative_filepath},,\n")
+            absolute_filepath = os.path.join(layer_dirpath, relative_filepath)
+            os.makedirs(os.path.dirname(absolute_filepath))
+            with open(absolute_filepath, 'w+') as file:
+                file.write("x" * size)
+            local_files_items.append(LocalFileItem(archive_prefix="python", relative_filepath=f"python/{relative_filepath}", absolute_filepath=absolute_filepath))
+        return local_files_items
+
+    def test_shared_requirements_attribution(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            resolver = SimpleNamespace(traces=[], included_files_absolute_paths=set(), included_dependencies_names={'requests', 'botocore'})
+            report = make_size_report(
+                resolver=resolver, budgets=SizeBudgetsConfig(), code_local_files_items=[], code_content_files_items=[],
+                layer_local_files_items=self.make_layer(layer_dirpath), layer_source_dirpath=layer_dirpath
+            )
+            dependencies = report['dependencies']
+            # The 51 bytes of urllib3 are split between the two dependencies that require it.
+            self.assertEqual((226, 125), (dependencies['botocore']['attributed_uncompressed_bytes'], dependencies['requests']['attributed_uncompressed_bytes']))
+            self.assertEqual((251, 151), (dependencies['botocore']['inclusive_uncompressed_bytes'], dependencies['requests']['inclusive_uncompressed_bytes']))
+            self.assertEqual(['urllib3'], dependencies['requests']['shared_distributions'])
+            self.assertEqual(
+                report['artifacts']['layer']['uncompressed_bytes'],
+                sum(dependency_entry['attributed_uncompressed_bytes'] for dependency_entry in dependencies.values())
+            )
+
+    def test_layer_code_packages_without_archive_prefix(self):
+        with tempfile.TemporaryDirectory() as code_dirpath:
+            code_filepath = os.path.join(code_dirpath, "handlers", "app.py")
+            os.makedirs(os.path.dirname(code_filepath))
+            with open(code_filepath, 'w+') as file:
+                file.write("VALUE = 1\n")
+            archive_prefix = "python/lib/python3.9/site-packages"
+            resolver = SimpleNamespace(traces=[], included_files_absolute_paths=set(), included_dependencies_names=set())
+            report = make_size_report(
+                resolver=resolver, budgets=SizeBudgetsConfig(),
+                code_local_files_items=[LocalFileItem(
+                    archive_prefix=archive_prefix, relative_filepath="handlers/app.py", absolute_filepath=code_filepath
+                )],
+                code_content_files_items=[ContentFileItem(
+                    archive_prefix=archive_prefix, relative_filepath="priming.py", content="PRIMED = []\n"
+                )],
+                layer_local_files_items=[], layer_source_dirpath=None
+            )
+            self.assertEqual({'code:handlers', 'code:priming.py'}, set(report['packages'].keys()))
+
+    def test_enforce_size_budgets(self):
+        with tempfile.TemporaryDirectory() as layer_dirpath:
+            resolver = SimpleNamespace(traces=[], included_files_absolute_paths=set(), included_dependencies_names={'requests', 'botocore'})
+            budgets = SizeBudgetsConfig(max_layer_uncompressed_bytes=300, top_offenders_count=1)
+            layer_local_files_items = self.make_layer(layer_dirpath)
+            report = make_size_report(
+                resolver=resolver, budgets=budgets, code_local_files_items=[], code_content_files_items=[],
+                layer_local_files_items=layer_local_files_items, layer_source_dirpath=layer_dirpath
+            )
+            with self.assertRaises(SizeBudgetExceeded) as context:
+                enforce_size_budgets(report=report, budgets=budgets)
+            self.assertEqual(['max_layer_uncompressed_bytes'], list(context.exception.exceeded_budgets.keys()))
+            self.assertEqual(1, len(context.exception.top_offenders))
+            self.assertTrue(context.exception.top_offenders[0].startswith("botocore : 226 bytes"))
+
+            # The budgets are evaluated when the report is made, and a report within its budgets does not raise.
+            within_budgets = SizeBudgetsConfig(max_layer_uncompressed_bytes=400)
+            enforce_size_budgets(report=make_size_report(
+                resolver=resolver, budgets=within_budgets, code_local_files_items=[], code_content_files_items=[],
+                layer_local_files_items=layer_local_files_items, layer_source_dirpath=layer_dirpath
+            ), budgets=within_budgets)
+
+
+if __name__ == '__main__':
+    unittest.main()
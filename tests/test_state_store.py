@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from serverlesspack.layers_splitting import DistributionFilesGroup, update_groups_change_frequencies
+from serverlesspack.state_store import StateStore, get_user_cache_dirpath, CACHE_DIRPATH_ENVIRONMENT_VARIABLE
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.temporary_directory.name, 'cache', 'state.sqlite3')
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_namespaces_and_bulk_operations(self):
+        store = StateStore(filepath=self.filepath)
+        try:
+            store.set_many(namespace='hashes', values={'a.py': 'hash-a', 'b.py': 'hash-b'})
+            store.set(namespace='manifests', key='a.py', value={'size': 1})
+            self.assertEqual('hash-a', store.get(namespace='hashes', key='a.py'))
+            self.assertEqual({'size': 1}, store.get(namespace='manifests', key='a.py'))
+            self.assertEqual({'a.py': 'hash-a'}, store.get_many(namespace='hashes', keys=['a.py', 'missing.py']))
+
+            store.set_many(namespace='bulk', values={str(i): i for i in range(2000)})
+            self.assertEqual(2000, len(store.get_many(namespace='bulk', keys=[str(i) for i in range(2000)])))
+            store.delete_many(namespace='bulk', keys=[str(i) for i in range(1500)])
+            self.assertEqual(500, len(store.items(namespace='bulk')))
+            store.clear(namespace='bulk')
+            self.assertEqual({}, store.items(namespace='bulk'))
+            self.assertEqual('hash-b', store.get(namespace='hashes', key='b.py'))
+        finally:
+            store.close()
+
+        # The entries are persisted between the stores opened on the same file.
+        reopened_store = StateStore(filepath=self.filepath)
+        try:
+            self.assertEqual({'a.py': 'hash-a', 'b.py': 'hash-b'}, reopened_store.items(namespace='hashes'))
+        finally:
+            reopened_store.close()
+
+    def test_ttl_eviction(self):
+        store = StateStore(filepath=self.filepath)
+        try:
+            store.set(namespace='memos', key='expired', value=1, ttl_seconds=-1)
+            store.set(namespace='memos', key='kept', value=2, ttl_seconds=3600)
+            self.assertIsNone(store.get(namespace='memos', key='expired'))
+            self.assertEqual({'kept': 2}, store.items(namespace='memos'))
+            self.assertEqual(1, store.evict_expired())
+        finally:
+            store.close()
+
+    def test_transaction(self):
+        store = StateStore(filepath=self.filepath)
+        try:
+            with self.assertRaises(ValueError):
+                with store.transaction():
+                    store.set(namespace='counters', key='builds', value=1)
+                    raise ValueError()
+            self.assertIsNone(store.get(namespace='counters', key='builds'))
+
+            def increment_builds_count():
+                # Each thread uses another store on the same file, like parallel builds.
+                thread_store = StateStore(filepath=self.filepath)
+                try:
+                    for _ in range(20):
+                        with thread_store.transaction():
+                            thread_store.set(
+                                namespace='counters', key='builds',
+                                value=thread_store.get(namespace='counters', key='builds', default=0) + 1
+                            )
+                finally:
+                    thread_store.close()
+
+            threads = [threading.Thread(target=increment_builds_count) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(80, store.get(namespace='counters', key='builds'))
+        finally:
+            store.close()
+
+    def test_layers_splitting_history(self):
+        store = StateStore(filepath=self.filepath)
+        try:
+            for content_hash in ['first', 'first', 'second', 'second']:
+                group = DistributionFilesGroup(name='requests', content_hash=content_hash)
+                update_groups_change_frequencies(groups=[group], history_key='/dist', store=store)
+            self.assertEqual(0.25, group.change_frequency)
+        finally:
+            store.close()
+
+    def test_get_user_cache_dirpath(self):
+        previous_value = os.environ.get(CACHE_DIRPATH_ENVIRONMENT_VARIABLE, None)
+        os.environ[CACHE_DIRPATH_ENVIRONMENT_VARIABLE] = self.temporary_directory.name
+        try:
+            self.assertEqual(os.path.abspath(self.temporary_directory.name), get_user_cache_dirpath())
+        finally:
+            if previous_value is None:
+                os.environ.pop(CACHE_DIRPATH_ENVIRONMENT_VARIABLE)
+            else:
+                os.environ[CACHE_DIRPATH_ENVIRONMENT_VARIABLE] = previous_value
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from serverlesspack.exceptions import FilesUpdateFailed
+from serverlesspack.imports_resolver import Resolver
+from serverlesspack.packager import LocalFileItem, ContentFileItem
+from serverlesspack.watcher import DirectorySnapshot, IncrementalArtifactWriter
+
+
+class TestWatcher(unittest.TestCase):
+    def write_file(self, filepath: str, content: str):
+        with open(filepath, 'w') as file:
+            file.write(content)
+        # The modification times must differ for the snapshot to detect the change.
+        time.sleep(0.01)
+
+    def test_update_files_re_resolves_changed_imports(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            root_filepath = os.path.join(dirpath, "watched_app.py")
+            first_filepath = os.path.join(dirpath, "watched_first.py")
+            second_filepath = os.path.join(dirpath, "watched_second.py")
+            self.write_file(root_filepath, "import watched_first\n")
+            self.write_file(first_filepath, "VALUE = 1\n")
+            self.write_file(second_filepath, "VALUE = 2\n")
+            sys.path.insert(0, dirpath)
+            try:
+                resolver = Resolver(root_filepath=root_filepath, target_os='linux')
+                resolver.process_file(root_filepath)
+                self.assertEqual({root_filepath, first_filepath}, resolver.included_files_absolute_paths)
+
+                snapshot = DirectorySnapshot(dirpaths=[dirpath])
+                self.write_file(root_filepath, "import watched_second\n")
+                changes = snapshot.poll()
+                self.assertEqual({root_filepath}, changes.modified_filepaths)
+                resolver.update_files(modified_filepaths=changes.modified_filepaths, deleted_filepaths=changes.deleted_filepaths)
+                self.assertEqual({root_filepath, second_filepath}, resolver.included_files_absolute_paths)
+            finally:
+                sys.path.remove(dirpath)
+                for module_name in ["watched_first", "watched_second"]:
+                    sys.modules.pop(module_name, None)
+
+    def test_update_files_keeps_the_imports_of_unparsable_files(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            root_filepath = os.path.join(dirpath, "watched_root.py")
+            first_filepath = os.path.join(dirpath, "watched_helper.py")
+            second_filepath = os.path.join(dirpath, "watched_models.py")
+            third_filepath = os.path.join(dirpath, "watched_utils.py")
+            self.write_file(root_filepath, "import watched_helper\nimport watched_models\n")
+            self.write_file(first_filepath, "VALUE = 1\n")
+            self.write_file(second_filepath, "VALUE = 2\n")
+            self.write_file(third_filepath, "VALUE = 3\n")
+            sys.path.insert(0, dirpath)
+            try:
+                resolver = Resolver(root_filepath=root_filepath, target_os='linux')
+                resolver.process_file(root_filepath)
+                self.assertEqual({root_filepath, first_filepath, second_filepath}, resolver.included_files_absolute_paths)
+
+                # The root file is saved in the middle of an edit, while the helper file imports a new module.
+                self.write_file(root_filepath, "import watched_helper\nimport watched_models\ndef handler(:\n")
+                self.write_file(first_filepath, "import watched_utils\n")
+                with self.assertRaises(FilesUpdateFailed) as context:
+                    resolver.update_files(modified_filepaths={root_filepath, first_filepath}, deleted_filepaths=set())
+                self.assertEqual([root_filepath], list(context.exception.errors.keys()))
+                self.assertEqual(
+                    {root_filepath, first_filepath, second_filepath, third_filepath}, resolver.included_files_absolute_paths
+                )
+
+                self.write_file(root_filepath, "import watched_helper\n")
+                resolver.update_files(modified_filepaths={root_filepath}, deleted_filepaths=set())
+                self.assertEqual({root_filepath, first_filepath, third_filepath}, resolver.included_files_absolute_paths)
+            finally:
+                sys.path.remove(dirpath)
+                for module_name in ["watched_helper", "watched_models", "watched_utils"]:
+                    sys.modules.pop(module_name, None)
+
+    def test_update_files_picks_up_created_modules(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            root_filepath = os.path.join(dirpath, "watched_handler.py")
+            created_filepath = os.path.join(dirpath, "watched_created.py")
+            self.write_file(root_filepath, "import watched_created\n")
+            sys.path.insert(0, dirpath)
+            try:
+                resolver = Resolver(root_filepath=root_filepath, target_os='linux')
+                resolver.process_file(root_filepath)
+                self.assertEqual({root_filepath}, resolver.included_files_absolute_paths)
+
+                # The importing file is not modified, only the module it imports is created.
+                snapshot = DirectorySnapshot(dirpaths=[dirpath])
+                self.write_file(created_filepath, "VALUE = 1\n")
+                changes = snapshot.poll()
+                resolver.update_files(
+                    modified_filepaths=changes.modified_filepaths, deleted_filepaths=changes.deleted_filepaths,
+                    created_filepaths=changes.created_filepaths
+                )
+                self.assertEqual({root_filepath, created_filepath}, resolver.included_files_absolute_paths)
+            finally:
+                sys.path.remove(dirpath)
+                sys.modules.pop("watched_created", None)
+
+    def test_zip_only_rewrites_changed_entries(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            first_filepath = os.path.join(dirpath, "first.py")
+            second_filepath = os.path.join(dirpath, "second.py")
+            self.write_file(first_filepath, "VALUE = 1\n")
+            self.write_file(second_filepath, "VALUE = 2\n")
+            writer = IncrementalArtifactWriter(dist_dirpath=dirpath, destination_key='build', output_type='zip')
+
+            def make_files_items():
+                return [
+                    LocalFileItem(archive_prefix=None, relative_filepath="first.py", absolute_filepath=first_filepath),
+                    LocalFileItem(archive_prefix=None, relative_filepath="second.py", absolute_filepath=second_filepath),
+                    ContentFileItem(archive_prefix=None, relative_filepath="priming.py", content="PRIMED = []\n")
+                ]
+            self.assertEqual(3, writer.update(files_items=make_files_items()).written_entries_count)
+
+            self.write_file(second_filepath, "VALUE = 3\n")
+            result = writer.update(files_items=make_files_items())
+            self.assertEqual((1, 2), (result.written_entries_count, result.reused_entries_count))
+            with zipfile.ZipFile(writer.output_path) as zip_object:
+                self.assertIsNone(zip_object.testzip())
+                self.assertEqual(b"VALUE = 1\n", zip_object.read("first.py"))
+                self.assertEqual(b"VALUE = 3\n", zip_object.read("second.py"))
+                self.assertEqual(0o100644, zip_object.getinfo("priming.py").external_attr >> 16)
+
+    def test_zip_reuses_entries_without_the_zipfile_internals(self):
+        with tempfile.TemporaryDirectory() as dirpath:
+            first_filepath = os.path.join(dirpath, "first.py")
+            second_filepath = os.path.join(dirpath, "second.py")
+            self.write_file(first_filepath, "VALUE = 1\n")
+            self.write_file(second_filepath, "VALUE = 2\n")
+            writer = IncrementalArtifactWriter(dist_dirpath=dirpath, destination_key='build', output_type='zip')
+
+            def make_files_items():
+                return [
+                    LocalFileItem(archive_prefix=None, relative_filepath="first.py", absolute_filepath=first_filepath),
+                    LocalFileItem(archive_prefix=None, relative_filepath="second.py", absolute_filepath=second_filepath),
+                ]
+            writer.update(files_items=make_files_items())
+
+            self.write_file(second_filepath, "VALUE = 3\n")
+            with patch('serverlesspack.watcher.can_copy_raw_zip_entries', return_value=False):
+                result = writer.update(files_items=make_files_items())
+            self.assertEqual((1, 1), (result.written_entries_count, result.reused_entries_count))
+            with zipfile.ZipFile(writer.output_path) as zip_object:
+                self.assertIsNone(zip_object.testzip())
+                self.assertEqual(b"VALUE = 1\n", zip_object.read("first.py"))
+                self.assertEqual(b"VALUE = 3\n", zip_object.read("second.py"))
+
+
+if __name__ == '__main__':
+    unittest.main()